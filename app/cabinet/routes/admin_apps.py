@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.models import User
+from app.services.app_config_provider import get_remnawave_config_uuid
 from app.services.remnawave_service import RemnaWaveService
 from app.services.system_settings_service import bot_configuration_service
 
@@ -462,20 +463,12 @@ class UpdateRemnaWaveUuidRequest(BaseModel):
     uuid: str | None = None
 
 
-def _get_remnawave_config_uuid() -> str | None:
-    """Get RemnaWave config UUID from system settings or env."""
-    try:
-        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
-    except Exception:
-        return settings.CABINET_REMNA_SUB_CONFIG
-
-
 @router.get('/remnawave/status', response_model=RemnaWaveConfigStatus)
 async def get_remnawave_config_status(
     admin: User = Depends(get_current_admin_user),
 ):
     """Get RemnaWave config integration status."""
-    config_uuid = _get_remnawave_config_uuid()
+    config_uuid = get_remnawave_config_uuid()
     return RemnaWaveConfigStatus(
         enabled=bool(config_uuid),
         config_uuid=config_uuid,
@@ -527,7 +520,7 @@ async def get_remnawave_subscription_config(
     Fetch subscription page config from RemnaWave panel.
     Uses CABINET_REMNA_SUB_CONFIG setting for the config UUID.
     """
-    config_uuid = _get_remnawave_config_uuid()
+    config_uuid = get_remnawave_config_uuid()
     if not config_uuid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -14,7 +14,7 @@ from app.database.crud.server_squad import (
     sync_with_remnawave,
 )
 from app.database.models import User
-from app.utils.cache import cache
+from app.utils.cache import AVAILABLE_COUNTRIES_NAMESPACE, cache
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
 from ..schemas.remnawave import (
@@ -899,7 +899,7 @@ async def sync_servers(
     created, updated, removed = await sync_with_remnawave(db, squads)
 
     try:
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
     except Exception as e:
         logger.warning('Failed to clear countries cache', error=e)
 
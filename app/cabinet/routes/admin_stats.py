@@ -5,26 +5,26 @@ import time
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from sqlalchemy import and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database.crud.campaign import get_campaign_statistics, get_campaigns_count, get_campaigns_list
-from app.database.crud.server_squad import get_server_statistics
-from app.database.crud.subscription import get_subscriptions_statistics
-from app.database.crud.transaction import get_revenue_by_period, get_transactions_statistics
 from app.database.models import (
     ReferralEarning,
     Subscription,
     SubscriptionStatus,
-    Tariff,
     Transaction,
     TransactionType,
     User,
 )
+from app.services.dashboard_stats_service import dashboard_stats_service
+from app.services.index_advisor_service import index_advisor
 from app.services.remnawave_service import RemnaWaveService
 from app.services.version_service import version_service
+from app.utils.cache import cache
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
 
@@ -157,6 +157,55 @@ class SystemInfoResponse(BaseModel):
     subscriptions_active: int
 
 
+class IndexAdvisorScan(BaseModel):
+    """Full table scan found in a query plan."""
+
+    table: str
+    table_rows: int
+
+
+class IndexAdvisorQuery(BaseModel):
+    """Query plan check result."""
+
+    name: str
+    description: str
+    flagged: bool
+    sequential_scans: list[IndexAdvisorScan]
+    plan: list[str]
+    error: str | None = None
+
+
+class IndexAdvisorResponse(BaseModel):
+    """Index advisor report for registered hot queries."""
+
+    min_table_rows: int
+    flagged_count: int
+    queries: list[IndexAdvisorQuery]
+
+
+class CacheNamespaceStatsItem(BaseModel):
+    """Hit/miss/latency counters of one cache namespace."""
+
+    namespace: str
+    local_hits: int
+    redis_hits: int
+    misses: int
+    coalesced: int
+    load_errors: int
+    invalidations: int
+    hit_ratio: float
+    avg_redis_ms: float
+    avg_load_ms: float
+
+
+class CacheStatsResponse(BaseModel):
+    """Two-tier cache counters of the current process."""
+
+    redis_connected: bool
+    local_entries: int
+    namespaces: list[CacheNamespaceStatsItem]
+
+
 # ============ Extended Stats Schemas ============
 
 
@@ -247,30 +296,17 @@ class RecentPaymentsResponse(BaseModel):
 @router.get('/dashboard', response_model=DashboardStats)
 async def get_dashboard_stats(
     admin: User = Depends(get_current_admin_user),
-    db: AsyncSession = Depends(get_cabinet_db),
 ):
     """Get complete dashboard statistics for admin panel."""
     try:
-        # Get nodes status from RemnaWave
-        nodes_data = await _get_nodes_overview()
-
-        # Get subscription statistics
-        sub_stats = await get_subscriptions_statistics(db)
-
-        # Get financial statistics
-        now = datetime.now(UTC)
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        trans_stats = await get_transactions_statistics(db, month_start, now)
-
-        # Get revenue chart data (last 30 days)
-        revenue_data = await get_revenue_by_period(db, days=30)
-
-        # Get server statistics
-        server_stats = await get_server_statistics(db)
-
-        # Get tariff statistics
-        tariff_stats = await _get_tariff_stats(db)
+        # Shared cached snapshot: blocks are computed concurrently, one computation for all admins
+        snapshot = await dashboard_stats_service.get_snapshot()
+        nodes_data = _build_nodes_overview(snapshot.nodes)
+        sub_stats = snapshot.subscriptions
+        trans_stats = snapshot.transactions
+        revenue_data = snapshot.revenue
+        server_stats = snapshot.servers
+        tariff_stats = _build_tariff_stats(snapshot.tariffs)
 
         # Build response
         return DashboardStats(
@@ -356,6 +392,56 @@ async def get_system_info(
         )
 
 
+@router.get('/index-advisor', response_model=IndexAdvisorResponse)
+async def get_index_advisor_report(
+    min_table_rows: int | None = Query(None, ge=0, description='Minimum table size to flag a full scan'),
+    admin: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    """Run EXPLAIN for hot queries and flag full scans of large tables."""
+    threshold = settings.INDEX_ADVISOR_SEQ_SCAN_MIN_ROWS if min_table_rows is None else min_table_rows
+    try:
+        reports = await index_advisor.analyze(db, min_table_rows=threshold)
+    except Exception as e:
+        logger.error('Failed to run index advisor', error=e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Failed to analyze query plans',
+        )
+
+    return IndexAdvisorResponse(
+        min_table_rows=threshold,
+        flagged_count=sum(1 for report in reports if report.flagged),
+        queries=[
+            IndexAdvisorQuery(
+                name=report.name,
+                description=report.description,
+                flagged=report.flagged,
+                sequential_scans=[
+                    IndexAdvisorScan(table=scan.table, table_rows=scan.table_rows) for scan in report.sequential_scans
+                ],
+                plan=report.plan,
+                error=report.error,
+            )
+            for report in reports
+        ],
+    )
+
+
+@router.get('/cache', response_model=CacheStatsResponse)
+async def get_cache_stats(
+    admin: User = Depends(get_current_admin_user),
+):
+    """Get two-tier cache counters per namespace (for this process only)."""
+    return CacheStatsResponse(
+        redis_connected=cache.is_connected,
+        local_entries=cache.local_entries,
+        namespaces=[
+            CacheNamespaceStatsItem(namespace=namespace, **stats) for namespace, stats in cache.get_stats().items()
+        ],
+    )
+
+
 @router.get('/nodes', response_model=NodesOverview)
 async def get_nodes_status(
     admin: User = Depends(get_current_admin_user),
@@ -441,154 +527,65 @@ async def _get_nodes_overview() -> NodesOverview:
     try:
         service = RemnaWaveService()
         nodes = await service.get_all_nodes()
-
-        total = len(nodes)
-        online = sum(1 for n in nodes if n.get('is_connected') and not n.get('is_disabled'))
-        disabled = sum(1 for n in nodes if n.get('is_disabled'))
-        offline = total - online - disabled
-        total_users_online = sum(n.get('users_online', 0) or 0 for n in nodes)
-
-        node_statuses = [
-            NodeStatus(
-                uuid=n.get('uuid', ''),
-                name=n.get('name', 'Unknown'),
-                address=n.get('address', ''),
-                is_connected=n.get('is_connected', False),
-                is_disabled=n.get('is_disabled', False),
-                users_online=n.get('users_online', 0) or 0,
-                traffic_used_bytes=n.get('traffic_used_bytes'),
-                uptime=n.get('uptime'),
-                xray_version=n.get('xray_version'),
-                node_version=n.get('node_version'),
-                last_status_message=n.get('last_status_message'),
-                xray_uptime=n.get('xray_uptime'),
-                is_xray_running=n.get('is_xray_running'),
-                cpu_count=n.get('cpu_count'),
-                cpu_model=n.get('cpu_model'),
-                total_ram=n.get('total_ram'),
-                country_code=n.get('country_code'),
-            )
-            for n in nodes
-        ]
-
-        return NodesOverview(
-            total=total,
-            online=online,
-            offline=offline,
-            disabled=disabled,
-            total_users_online=total_users_online,
-            nodes=node_statuses,
-        )
     except Exception as e:
         logger.warning('Failed to get nodes from RemnaWave', error=e)
         # Return empty data if RemnaWave is unavailable
-        return NodesOverview(
-            total=0,
-            online=0,
-            offline=0,
-            disabled=0,
-            total_users_online=0,
-            nodes=[],
-        )
-
-
-async def _get_tariff_stats(db: AsyncSession) -> TariffStats | None:
-    """Get statistics for all tariffs."""
-    try:
-        # Получаем ВСЕ тарифы (включая неактивные) для статистики
-        tariffs_result = await db.execute(select(Tariff).order_by(Tariff.display_order))
-        tariffs = tariffs_result.scalars().all()
-
-        if not tariffs:
-            logger.info('📊 Нет тарифов в системе, пропускаем статистику')
-            return None
-
-        now = datetime.now(UTC)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-
-        tariff_items = []
-        total_tariff_subscriptions = 0
-
-        for tariff in tariffs:
-            # Активные подписки на этом тарифе
-            active_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id, Subscription.status == SubscriptionStatus.ACTIVE.value
-                )
-            )
-            active_count = active_result.scalar() or 0
-
-            # Триальные подписки на этом тарифе
-            trial_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.status == SubscriptionStatus.ACTIVE.value,
-                    Subscription.is_trial == True,
-                )
-            )
-            trial_count = trial_result.scalar() or 0
-
-            # Куплено сегодня (не триальные)
-            today_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= today_start,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_today = today_result.scalar() or 0
-
-            # Куплено за неделю
-            week_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= week_ago,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_week = week_result.scalar() or 0
-
-            # Куплено за месяц
-            month_result = await db.execute(
-                select(func.count(Subscription.id)).where(
-                    Subscription.tariff_id == tariff.id,
-                    Subscription.created_at >= month_ago,
-                    Subscription.is_trial == False,
-                )
-            )
-            purchased_month = month_result.scalar() or 0
-
-            logger.info(
-                '📊 Тариф активных=, триал', tariff_name=tariff.name, active_count=active_count, trial_count=trial_count
-            )
-
-            tariff_items.append(
-                TariffStatItem(
-                    tariff_id=tariff.id,
-                    tariff_name=tariff.name,
-                    active_subscriptions=active_count,
-                    trial_subscriptions=trial_count,
-                    purchased_today=purchased_today,
-                    purchased_week=purchased_week,
-                    purchased_month=purchased_month,
-                )
-            )
-
-            total_tariff_subscriptions += active_count
-
-        logger.info('📊 Всего подписок по тарифам', total_tariff_subscriptions=total_tariff_subscriptions)
-
-        return TariffStats(
-            tariffs=tariff_items,
-            total_tariff_subscriptions=total_tariff_subscriptions,
-        )
-
-    except Exception as e:
-        logger.error('Failed to get tariff stats', error=e, exc_info=True)
+        nodes = []
+    return _build_nodes_overview(nodes)
+
+
+def _build_nodes_overview(nodes: list[dict]) -> NodesOverview:
+    """Build nodes overview from panel nodes."""
+    total = len(nodes)
+    online = sum(1 for n in nodes if n.get('is_connected') and not n.get('is_disabled'))
+    disabled = sum(1 for n in nodes if n.get('is_disabled'))
+    offline = total - online - disabled
+    total_users_online = sum(n.get('users_online', 0) or 0 for n in nodes)
+
+    node_statuses = [
+        NodeStatus(
+            uuid=n.get('uuid', ''),
+            name=n.get('name', 'Unknown'),
+            address=n.get('address', ''),
+            is_connected=n.get('is_connected', False),
+            is_disabled=n.get('is_disabled', False),
+            users_online=n.get('users_online', 0) or 0,
+            traffic_used_bytes=n.get('traffic_used_bytes'),
+            uptime=n.get('uptime'),
+            xray_version=n.get('xray_version'),
+            node_version=n.get('node_version'),
+            last_status_message=n.get('last_status_message'),
+            xray_uptime=n.get('xray_uptime'),
+            is_xray_running=n.get('is_xray_running'),
+            cpu_count=n.get('cpu_count'),
+            cpu_model=n.get('cpu_model'),
+            total_ram=n.get('total_ram'),
+            country_code=n.get('country_code'),
+        )
+        for n in nodes
+    ]
+
+    return NodesOverview(
+        total=total,
+        online=online,
+        offline=offline,
+        disabled=disabled,
+        total_users_online=total_users_online,
+        nodes=node_statuses,
+    )
+
+
+def _build_tariff_stats(tariffs: list[dict] | None) -> TariffStats | None:
+    """Build statistics for all tariffs."""
+    if not tariffs:
         return None
 
+    tariff_items = [TariffStatItem(**item) for item in tariffs]
+    return TariffStats(
+        tariffs=tariff_items,
+        total_tariff_subscriptions=sum(item.active_subscriptions for item in tariff_items),
+    )
+
 
 # ============ Extended Stats Routes ============
 
@@ -18,6 +18,7 @@ from app.database.crud.tariff import (
     update_tariff,
 )
 from app.database.models import PromoGroup, Subscription, Tariff, Transaction, TransactionType, User
+from app.utils.cache import PRICING_CATALOG_NAMESPACE, cache
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
 from ..schemas.tariffs import (
@@ -167,6 +168,7 @@ async def update_tariff_order(
     """Update the display order of tariffs."""
     await reorder_tariffs(db, request.tariff_ids)
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info('Admin updated tariff order', admin_id=admin.id, tariff_ids=request.tariff_ids)
 
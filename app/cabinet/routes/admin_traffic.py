@@ -19,6 +19,7 @@ from sqlalchemy.orm import selectinload
 from app.config import settings
 from app.database.models import Subscription, Transaction, TransactionType, User
 from app.services.remnawave_service import RemnaWaveService
+from app.services.traffic_warehouse_service import traffic_warehouse_service
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
 from ..schemas.traffic import (
@@ -37,12 +38,6 @@ logger = structlog.get_logger(__name__)
 router = APIRouter(prefix='/admin/traffic', tags=['Admin Traffic'])
 
 _ALLOWED_PERIODS = frozenset({1, 3, 7, 14, 30})
-_CONCURRENCY_LIMIT = 5  # Max parallel API calls to avoid rate limiting
-
-# In-memory cache: {(start_str, end_str): (timestamp, aggregated_data, nodes_info)}
-_traffic_cache: dict[tuple[str, str], tuple[float, dict[str, dict[str, int]], list[TrafficNodeInfo]]] = {}
-_CACHE_TTL = 300  # 5 minutes
-_cache_lock = asyncio.Lock()
 
 # Valid sort fields for the GET endpoint
 _SORT_FIELDS = frozenset({'total_bytes', 'full_name', 'tariff_name', 'device_limit', 'traffic_limit_gb'})
@@ -63,82 +58,36 @@ def _validate_period(period: int) -> None:
 
 
 async def _aggregate_traffic(
-    start_str: str, end_str: str, user_uuids: list[str]
+    db: AsyncSession, start_str: str, end_str: str, user_uuids: list[str]
 ) -> tuple[dict[str, dict[str, int]], list[TrafficNodeInfo]]:
     """Aggregate per-user traffic across all nodes for a given date range.
 
-    Uses legacy per-node endpoint to fetch all users' traffic per node —
-    O(nodes) API calls instead of O(users). The legacy endpoint returns
-    {userUuid, nodeUuid, total} per entry (non-legacy only returns topUsers
-    without userUuid).
+    Completed days come from the local daily rollups (one grouped SQL query);
+    only the partial days at the edges of the range (including the current day)
+    and days not collected yet are fetched from the panel via the legacy
+    per-node endpoint — O(nodes) API calls per missing range.
 
     Returns (user_traffic, nodes_info) where:
       user_traffic = {remnawave_uuid: {node_uuid: total_bytes, ...}}
       nodes_info = [TrafficNodeInfo, ...]
     """
-    cache_key = (start_str, end_str)
-
-    # Quick check without lock
-    now = time.time()
-    cached = _traffic_cache.get(cache_key)
-    if cached and (now - cached[0]) < _CACHE_TTL:
-        return cached[1], cached[2]
-
-    # Acquire lock for the slow path
-    async with _cache_lock:
-        # Re-check after acquiring lock
-        now = time.time()
-        cached = _traffic_cache.get(cache_key)
-        if cached and (now - cached[0]) < _CACHE_TTL:
-            return cached[1], cached[2]
-
-        service = RemnaWaveService()
-        if not service.is_configured:
-            return {}, []
+    start_dt = datetime.strptime(start_str, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=UTC)
+    end_dt = datetime.strptime(end_str, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=UTC)
+    report = await traffic_warehouse_service.get_traffic(db, start_dt, end_dt)
 
-        user_uuids_set = set(user_uuids)
+    user_uuids_set = set(user_uuids)
+    user_traffic = {uid: traffic for uid, traffic in report.user_traffic.items() if uid in user_uuids_set}
 
-        async with service.get_api_client() as api:
-            nodes = await api.get_all_nodes()
-
-            # Fetch per-node user stats — O(nodes) calls instead of O(users)
-            semaphore = asyncio.Semaphore(_CONCURRENCY_LIMIT)
-
-            async def fetch_node_users(node):
-                async with semaphore:
-                    try:
-                        stats = await api.get_bandwidth_stats_node_users_legacy(node.uuid, start_str, end_str)
-                        return node.uuid, stats
-                    except Exception:
-                        logger.warning('Failed to get traffic for node', node_name=node.name, exc_info=True)
-                        return node.uuid, None
-
-            results = await asyncio.gather(*(fetch_node_users(n) for n in nodes))
-
-        nodes_info: list[TrafficNodeInfo] = [
-            TrafficNodeInfo(node_uuid=node.uuid, node_name=node.name, country_code=node.country_code) for node in nodes
-        ]
-        nodes_info.sort(key=lambda n: n.node_name)
-
-        # Legacy response: [{userUuid, username, nodeUuid, total, date}, ...]
-        user_traffic: dict[str, dict[str, int]] = {}
-        for node_uuid, entries in results:
-            if not isinstance(entries, list):
-                continue
-            for entry in entries:
-                uid = entry.get('userUuid', '')
-                total = int(entry.get('total', 0))
-                if uid and total > 0 and uid in user_uuids_set:
-                    user_traffic.setdefault(uid, {})[node_uuid] = user_traffic.get(uid, {}).get(node_uuid, 0) + total
-
-        _traffic_cache[cache_key] = (now, user_traffic, nodes_info)
-
-        # Evict expired entries to prevent unbounded growth
-        expired = [k for k, (ts, _, _) in _traffic_cache.items() if (now - ts) >= _CACHE_TTL]
-        for k in expired:
-            del _traffic_cache[k]
+    nodes_info = [
+        TrafficNodeInfo(node_uuid=node.uuid, node_name=node.name, country_code=node.country_code)
+        for node in report.nodes
+    ]
+    # Nodes removed from the panel still have traffic in stored days
+    known_nodes = {node.node_uuid for node in nodes_info}
+    for node_uuid in sorted({node for traffic in user_traffic.values() for node in traffic} - known_nodes):
+        nodes_info.append(TrafficNodeInfo(node_uuid=node_uuid, node_name=node_uuid[:8], country_code=''))
 
-        return user_traffic, nodes_info
+    return user_traffic, nodes_info
 
 
 def _compute_date_range(period_days: int) -> tuple[str, str]:
@@ -297,7 +246,7 @@ async def get_traffic_usage(
         effective_period = period
 
     user_map = await _load_user_map(db)
-    user_traffic, nodes_info = await _aggregate_traffic(start_str, end_str, list(user_map.keys()))
+    user_traffic, nodes_info = await _aggregate_traffic(db, start_str, end_str, list(user_map.keys()))
 
     # Collect all available tariff names (before filtering)
     available_tariffs = sorted(
@@ -560,7 +509,7 @@ async def export_traffic_csv(
         period_label = f'{request.period}d'
 
     user_map = await _load_user_map(db)
-    user_traffic, nodes_info = await _aggregate_traffic(start_str, end_str, list(user_map.keys()))
+    user_traffic, nodes_info = await _aggregate_traffic(db, start_str, end_str, list(user_map.keys()))
     enrichment = await _build_enrichment(db, user_map)
 
     # Parse filters
@@ -20,10 +20,13 @@ from app.database.crud.user import (
     get_user_by_telegram_id,
     get_users_count,
     get_users_list,
+    get_users_page,
     get_users_spending_stats,
     get_users_statistics,
     subtract_user_balance,
 )
+from app.database.crud.user_search import search_users
+from app.database.crud.user_spending_stats import rebuild_user_spending_stats
 from app.database.models import (
     PromoGroup,
     Subscription,
@@ -35,6 +38,7 @@ from app.database.models import (
     User,
     UserStatus,
 )
+from app.utils.pagination import InvalidCursorError, count_rows
 from app.utils.timezone import panel_datetime_to_utc
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
@@ -56,6 +60,7 @@ from ..schemas.users import (
     ResetTrialRequest,
     ResetTrialResponse,
     SortByEnum,
+    SpendingStatsRebuildResponse,
     SyncFromPanelRequest,
     SyncFromPanelResponse,
     SyncToPanelRequest,
@@ -351,13 +356,15 @@ async def list_users(
     email: str | None = Query(None, max_length=255),
     status: UserStatusEnum | None = Query(None),
     sort_by: SortByEnum = Query(SortByEnum.CREATED_AT),
+    cursor: str | None = Query(None, max_length=512),
     admin: User = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
     """
     Get paginated list of users with filtering and sorting.
 
-    - **offset**: Pagination offset
+    - **offset**: Pagination offset (ignored when **cursor** is given)
+    - **cursor**: Keyset cursor from `next_cursor`/`prev_cursor` (sort_by=created_at only)
     - **limit**: Number of users per page (max 200)
     - **search**: Search by telegram_id, username, first_name, last_name
     - **email**: Search by email
@@ -369,6 +376,48 @@ async def list_users(
     if status:
         user_status = UserStatus(status.value)
 
+    # Free-text search: ranked results and the total from a single indexed query
+    if search and not email and sort_by == SortByEnum.CREATED_AT and not cursor:
+        users, total = await search_users(db, search, limit=limit, offset=offset, status=user_status)
+        user_ids = [u.id for u in users]
+        spending_stats = await get_users_spending_stats(db, user_ids) if user_ids else {}
+
+        return UsersListResponse(
+            users=[_build_user_list_item(u, spending_stats) for u in users],
+            total=total,
+            offset=offset,
+            limit=limit,
+        )
+
+    # Default ordering is served by keyset pagination: page N costs the same as page 1
+    if sort_by == SortByEnum.CREATED_AT and (cursor or offset == 0):
+        try:
+            page = await get_users_page(db, limit=limit, cursor=cursor, search=search, email=email, status=user_status)
+        except InvalidCursorError:
+            # The `status` query parameter shadows fastapi.status here
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+
+        if search or email or user_status:
+            total, total_is_estimate = (
+                await get_users_count(db=db, status=user_status, search=search, email=email),
+                False,
+            )
+        else:
+            total, total_is_estimate = await count_rows(db, select(User), estimate_table='users')
+
+        user_ids = [u.id for u in page.items]
+        spending_stats = await get_users_spending_stats(db, user_ids) if user_ids else {}
+
+        return UsersListResponse(
+            users=[_build_user_list_item(u, spending_stats) for u in page.items],
+            total=total,
+            offset=0,
+            limit=limit,
+            next_cursor=page.next_cursor,
+            prev_cursor=page.prev_cursor,
+            total_is_estimate=total_is_estimate,
+        )
+
     # Map sort options
     order_by_balance = sort_by == SortByEnum.BALANCE
     order_by_traffic = sort_by == SortByEnum.TRAFFIC
@@ -503,6 +552,17 @@ async def get_users_stats(
     )
 
 
+@router.post('/spending-stats/rebuild', response_model=SpendingStatsRebuildResponse)
+async def rebuild_spending_stats(
+    admin: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    """Recalculate total spent and purchase counts of all users from transactions."""
+    users_with_purchases = await rebuild_user_spending_stats(db)
+    logger.info('Admin rebuilt users spending stats', admin_id=admin.id, users=users_with_purchases)
+    return SpendingStatsRebuildResponse(success=True, users_with_purchases=users_with_purchases)
+
+
 # === User Detail ===
 
 
@@ -1,13 +1,12 @@
 """Subscription management routes for cabinet."""
 
 import base64
-import json
 import re
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -23,6 +22,14 @@ from app.database.crud.tariff import get_tariff_by_id, get_tariffs_for_user
 from app.database.crud.transaction import create_transaction
 from app.database.crud.user import subtract_user_balance
 from app.database.models import ServerSquad, Subscription, Tariff, TransactionType, User
+from app.services.app_config_provider import (
+    SOURCE_REMNAWAVE,
+    AppConfigSnapshot,
+    app_config_provider,
+    etag_matches,
+    get_remnawave_config_uuid,
+    make_etag,
+)
 from app.services.notification_delivery_service import (
     NotificationType,
     notification_delivery_service,
@@ -34,7 +41,6 @@ from app.services.subscription_purchase_service import (
     PurchaseValidationError,
 )
 from app.services.subscription_service import SubscriptionService
-from app.services.system_settings_service import bot_configuration_service
 from app.services.user_cart_service import user_cart_service
 from app.utils.cache import RateLimitCache, cache, cache_key
 from app.utils.pricing_utils import format_period_description
@@ -2681,24 +2687,9 @@ async def get_device_price(
 
 
 def _load_app_config_from_file() -> dict[str, Any]:
-    """Load app-config.json file."""
-    try:
-        config_path = settings.get_app_config_path()
-        with open(config_path, encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-    except Exception as e:
-        logger.error('Failed to load app-config.json', error=e)
-    return {}
-
-
-def _get_remnawave_config_uuid() -> str | None:
-    """Get RemnaWave config UUID from system settings or env."""
-    try:
-        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
-    except Exception:
-        return settings.CABINET_REMNA_SUB_CONFIG
+    """Load app-config.json file (cached until the file changes)."""
+    snapshot = app_config_provider.get_file_config()
+    return snapshot.copy_data() if snapshot else {}
 
 
 def _is_subscription_link_template(url: str) -> bool:
@@ -2976,30 +2967,15 @@ def _convert_remnawave_config_to_cabinet(config: dict[str, Any]) -> dict[str, An
     }
 
 
-async def _load_app_config_async() -> dict[str, Any]:
+async def _load_app_config_async() -> AppConfigSnapshot | None:
     """Load app config from RemnaWave (if configured) or local file.
 
-    When config comes from RemnaWave, returns the original format with
-    ``_isRemnawave`` flag so the caller can serve it as-is (enriched with
-    deep links) instead of converting to the legacy step-based format.
+    The provider keeps the config in memory and refreshes it in the
+    background; a RemnaWave snapshot (``source == 'remnawave'``) is served in
+    its original format enriched with deep links instead of being converted
+    to the legacy step-based format.
     """
-    remnawave_uuid = _get_remnawave_config_uuid()
-
-    if remnawave_uuid:
-        try:
-            service = RemnaWaveService()
-            async with service.get_api_client() as api:
-                config = await api.get_subscription_page_config(remnawave_uuid)
-                if config and config.config:
-                    logger.debug('Loaded app config from RemnaWave', remnawave_uuid=remnawave_uuid)
-                    raw = dict(config.config)
-                    raw['_isRemnawave'] = True
-                    return raw
-        except Exception as e:
-            logger.warning('Failed to load RemnaWave config, falling back to file', error=e)
-
-    # Fallback to local file
-    return _load_app_config_from_file()
+    return await app_config_provider.get_cabinet_config(get_remnawave_config_uuid())
 
 
 def _load_app_config() -> dict[str, Any]:
@@ -3409,10 +3385,16 @@ def _resolve_button_url(
 
 @router.get('/app-config')
 async def get_app_config(
+    request: Request,
+    response: Response,
     user: User = Depends(get_current_cabinet_user),
     db: AsyncSession = Depends(get_cabinet_db),
 ) -> dict[str, Any]:
-    """Get app configuration for connection with deep links."""
+    """Get app configuration for connection with deep links.
+
+    The ETag covers the config version and the user's links, so an unchanged
+    response is answered with 304 without rebuilding it.
+    """
     await db.refresh(user, ['subscription'])
 
     subscription_url = None
@@ -3422,11 +3404,17 @@ async def get_app_config(
         subscription_crypto_link = user.subscription.subscription_crypto_link
 
     # Load config from RemnaWave (if configured) or local file
-    config = await _load_app_config_async()
-
-    is_remnawave = config.pop('_isRemnawave', False)
+    snapshot = await _load_app_config_async()
     hide_link = settings.should_hide_subscription_link()
 
+    etag = make_etag(snapshot.etag if snapshot else None, subscription_url, subscription_crypto_link, str(hide_link))
+    if etag_matches(etag, request.headers.get('If-None-Match')):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+
+    config = snapshot.copy_data() if snapshot else {}
+    is_remnawave = snapshot is not None and snapshot.source == SOURCE_REMNAWAVE
+
     # Строим platformNames из displayName каждой платформы RemnaWave
     platform_names: dict[str, Any] = {}
     for pk, pd in config.get('platforms', {}).items():
@@ -12,6 +12,8 @@ from app.cabinet.auth.jwt_handler import get_token_payload
 from app.config import settings
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
+from app.services.websocket_relay_service import CABINET_ADMINS_KIND, CABINET_USER_KIND, websocket_relay
+from app.utils.websocket_outbox import WebSocketOutbox
 
 
 logger = structlog.get_logger(__name__)
@@ -20,26 +22,30 @@ router = APIRouter()
 
 
 class CabinetConnectionManager:
-    """Менеджер WebSocket подключений для кабинета."""
+    """Менеджер WebSocket подключений для кабинета.
+
+    Каждое подключение получает свою исходящую очередь: рассылка сериализует
+    сообщение один раз и раскладывает его по очередям, не дожидаясь отправки.
+    Сообщения дублируются в канал ретрансляции, чтобы дойти до сокетов,
+    подключённых к другим репликам.
+    """
 
     def __init__(self):
-        # user_id -> set of websocket connections
-        self._user_connections: dict[int, set[WebSocket]] = {}
-        # admin user_ids -> set of websocket connections
-        self._admin_connections: dict[int, set[WebSocket]] = {}
+        # user_id -> {websocket: outbox}
+        self._user_connections: dict[int, dict[WebSocket, WebSocketOutbox]] = {}
+        # admin user_ids -> {websocket: outbox}
+        self._admin_connections: dict[int, dict[WebSocket, WebSocketOutbox]] = {}
         self._lock = asyncio.Lock()
 
-    async def connect(self, websocket: WebSocket, user_id: int, is_admin: bool) -> None:
-        """Зарегистрировать подключение."""
-        async with self._lock:
-            if user_id not in self._user_connections:
-                self._user_connections[user_id] = set()
-            self._user_connections[user_id].add(websocket)
+    async def connect(self, websocket: WebSocket, user_id: int, is_admin: bool) -> WebSocketOutbox:
+        """Зарегистрировать подключение и запустить его исходящую очередь."""
+        outbox = WebSocketOutbox(websocket)
+        outbox.start()
 
+        async with self._lock:
+            self._user_connections.setdefault(user_id, {})[websocket] = outbox
             if is_admin:
-                if user_id not in self._admin_connections:
-                    self._admin_connections[user_id] = set()
-                self._admin_connections[user_id].add(websocket)
+                self._admin_connections.setdefault(user_id, {})[websocket] = outbox
 
         logger.debug(
             'Cabinet WS connected: user_id is_admin total_users',
@@ -47,81 +53,69 @@ class CabinetConnectionManager:
             is_admin=is_admin,
             user_connections_count=len(self._user_connections),
         )
+        return outbox
 
     async def disconnect(self, websocket: WebSocket, user_id: int) -> None:
         """Отменить регистрацию подключения."""
+        outbox = None
         async with self._lock:
-            if user_id in self._user_connections:
-                self._user_connections[user_id].discard(websocket)
-                if not self._user_connections[user_id]:
-                    del self._user_connections[user_id]
+            for registry in (self._user_connections, self._admin_connections):
+                connections = registry.get(user_id)
+                if connections is None:
+                    continue
+                outbox = connections.pop(websocket, None) or outbox
+                if not connections:
+                    del registry[user_id]
 
-            if user_id in self._admin_connections:
-                self._admin_connections[user_id].discard(websocket)
-                if not self._admin_connections[user_id]:
-                    del self._admin_connections[user_id]
+        if outbox is not None:
+            outbox.close(close_socket=False)
 
         logger.debug('Cabinet WS disconnected: user_id', user_id=user_id)
 
-    async def send_to_user(self, user_id: int, message: dict) -> None:
-        """Отправить сообщение конкретному пользователю."""
-        # Snapshot connections under the lock to avoid mutation during iteration
+    async def deliver_to_user(self, user_id: int, data: str) -> int:
+        """Положить сериализованное сообщение в очереди подключений пользователя на этой реплике."""
         async with self._lock:
-            connections = list(self._user_connections.get(user_id, set()))
+            outboxes = list(self._user_connections.get(user_id, {}).values())
 
-        if not connections:
-            return
+        return sum(1 for outbox in outboxes if outbox.offer(data))
 
-        disconnected = set()
-        data = json.dumps(message, default=str, ensure_ascii=False)
+    async def deliver_to_admins(self, data: str) -> int:
+        """Положить сериализованное сообщение в очереди админских подключений на этой реплике."""
+        async with self._lock:
+            outboxes = [outbox for connections in self._admin_connections.values() for outbox in connections.values()]
 
-        for ws in connections:
-            try:
-                await ws.send_text(data)
-            except Exception as e:
-                logger.warning('Failed to send to user', user_id=user_id, e=e)
-                disconnected.add(ws)
+        return sum(1 for outbox in outboxes if outbox.offer(data))
 
-        # Cleanup disconnected
-        if disconnected:
-            async with self._lock:
-                for ws in disconnected:
-                    self._user_connections.get(user_id, set()).discard(ws)
+    async def send_to_user(self, user_id: int, message: dict) -> None:
+        """Отправить сообщение конкретному пользователю."""
+        data = json.dumps(message, default=str, ensure_ascii=False)
+        await self.deliver_to_user(user_id, data)
+        await websocket_relay.publish(CABINET_USER_KIND, data, target=user_id)
 
     async def send_to_admins(self, message: dict) -> None:
         """Отправить сообщение всем админам."""
-        # Snapshot connections under the lock to avoid mutation during iteration
-        async with self._lock:
-            if not self._admin_connections:
-                return
-            # Create a snapshot: list of (user_id, list of websockets)
-            admin_snapshot = [(user_id, list(connections)) for user_id, connections in self._admin_connections.items()]
-
         data = json.dumps(message, default=str, ensure_ascii=False)
-        disconnected_by_user: dict[int, set[WebSocket]] = {}
-
-        for user_id, connections in admin_snapshot:
-            for ws in connections:
-                try:
-                    await ws.send_text(data)
-                except Exception as e:
-                    logger.warning('Failed to send to admin', user_id=user_id, e=e)
-                    if user_id not in disconnected_by_user:
-                        disconnected_by_user[user_id] = set()
-                    disconnected_by_user[user_id].add(ws)
-
-        # Cleanup disconnected
-        if disconnected_by_user:
-            async with self._lock:
-                for user_id, ws_set in disconnected_by_user.items():
-                    for ws in ws_set:
-                        self._admin_connections.get(user_id, set()).discard(ws)
+        await self.deliver_to_admins(data)
+        await websocket_relay.publish(CABINET_ADMINS_KIND, data)
 
 
 # Глобальный менеджер подключений
 cabinet_ws_manager = CabinetConnectionManager()
 
 
+async def _deliver_relayed_to_user(user_id: int | None, data: str) -> None:
+    if user_id is not None:
+        await cabinet_ws_manager.deliver_to_user(user_id, data)
+
+
+async def _deliver_relayed_to_admins(_target: int | None, data: str) -> None:
+    await cabinet_ws_manager.deliver_to_admins(data)
+
+
+websocket_relay.register(CABINET_USER_KIND, _deliver_relayed_to_user)
+websocket_relay.register(CABINET_ADMINS_KIND, _deliver_relayed_to_admins)
+
+
 async def verify_cabinet_ws_token(token: str) -> tuple[int | None, bool]:
     """
     Проверить JWT токен для WebSocket.
@@ -189,17 +183,19 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
         logger.error('Cabinet WS: Failed to accept from', client_host=client_host, e=e)
         return
 
-    # Регистрируем подключение
-    await cabinet_ws_manager.connect(websocket, user_id, is_admin)
+    # Регистрируем подключение; дальше все исходящие сообщения идут через очередь
+    outbox = await cabinet_ws_manager.connect(websocket, user_id, is_admin)
 
     try:
         # Приветственное сообщение
-        await websocket.send_json(
-            {
-                'type': 'connected',
-                'user_id': user_id,
-                'is_admin': is_admin,
-            }
+        outbox.offer(
+            json.dumps(
+                {
+                    'type': 'connected',
+                    'user_id': user_id,
+                    'is_admin': is_admin,
+                }
+            )
         )
 
         # Обрабатываем входящие сообщения
@@ -210,7 +206,7 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
 
                 # Ping/pong для keepalive
                 if message.get('type') == 'ping':
-                    await websocket.send_json({'type': 'pong'})
+                    outbox.offer(json.dumps({'type': 'pong'}))
 
             except json.JSONDecodeError:
                 logger.warning('Cabinet WS: Invalid JSON from user', user_id=user_id)
@@ -123,6 +123,10 @@ class UsersListResponse(BaseModel):
     total: int
     offset: int = 0
     limit: int = 50
+    # Keyset-пагинация (сортировка по дате регистрации): передайте next_cursor в параметр cursor
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    total_is_estimate: bool = False
 
 
 # === User Detail ===
@@ -462,6 +466,13 @@ class UsersStatsResponse(BaseModel):
     active_month: int = 0
 
 
+class SpendingStatsRebuildResponse(BaseModel):
+    """Result of rebuilding the users spending rollup."""
+
+    success: bool
+    users_with_purchases: int
+
+
 # === Search ===
 
 
@@ -4,7 +4,9 @@ import html
 import math
 import os
 import re
+from bisect import bisect_left
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import time
 from pathlib import Path
 from urllib.parse import urlparse
@@ -26,6 +28,56 @@ USER_TAG_PATTERN = re.compile(r'^[A-Z0-9_]{1,16}$')
 logger = structlog.get_logger(__name__)
 
 
+# Поля, из которых строится DerivedSettings: изменение любого из них сбрасывает снимок
+DERIVED_SETTINGS_SOURCE_FIELDS: frozenset[str] = frozenset(
+    {
+        'ADMIN_IDS',
+        'ADMIN_EMAILS',
+        'AUTOPAY_WARNING_DAYS',
+        'TRAFFIC_PACKAGES_CONFIG',
+        'TRAFFIC_TOPUP_PACKAGES_CONFIG',
+        'PRICE_TRAFFIC_5GB',
+        'PRICE_TRAFFIC_10GB',
+        'PRICE_TRAFFIC_25GB',
+        'PRICE_TRAFFIC_50GB',
+        'PRICE_TRAFFIC_100GB',
+        'PRICE_TRAFFIC_250GB',
+        'PRICE_TRAFFIC_500GB',
+        'PRICE_TRAFFIC_1000GB',
+        'PRICE_TRAFFIC_UNLIMITED',
+    }
+)
+
+
+@dataclass(frozen=True, slots=True)
+class DerivedSettings:
+    """Снимок разобранных значений настроек для горячих путей.
+
+    Строится один раз из строковых полей Settings и заменяется целиком
+    при изменении любого поля из DERIVED_SETTINGS_SOURCE_FIELDS.
+    """
+
+    admin_ids: tuple[int, ...]
+    admin_id_set: frozenset[int]
+    admin_emails: tuple[str, ...]
+    admin_email_set: frozenset[str]
+    autopay_warning_days: tuple[int, ...]
+    traffic_packages: tuple[dict, ...]
+    traffic_prices: dict[int, int]
+    traffic_finite_sizes: tuple[int, ...]
+    traffic_topup_packages: tuple[dict, ...]
+    traffic_topup_prices: dict[int, int]
+
+
+def _build_price_lookup(packages: tuple[dict, ...]) -> dict[int, int]:
+    """Цены включённых пакетов по объёму (при дублях побеждает первый пакет)."""
+    prices: dict[int, int] = {}
+    for package in packages:
+        if package['enabled']:
+            prices.setdefault(package['gb'], package['price'])
+    return prices
+
+
 class Settings(BaseSettings):
     BOT_TOKEN: str
     BOT_USERNAME: str | None = None
@@ -60,6 +112,9 @@ class Settings(BaseSettings):
     NALOGO_QUEUE_CHECK_INTERVAL: int = 300  # Интервал проверки очереди (секунды)
     NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Задержка между отправкой чеков (секунды)
     NALOGO_QUEUE_MAX_ATTEMPTS: int = 10  # Максимум попыток отправки чека
+    NALOGO_QUEUE_CONCURRENCY: int = 2  # Сколько чеков отправлять одновременно
+    NALOGO_QUEUE_VISIBILITY_TIMEOUT: int = 600  # Через сколько секунд незавершённый чек вернётся в очередь
+    NALOGO_QUEUE_MAX_RETRY_DELAY: int = 21600  # Максимальная пауза между повторами чека (секунды)
 
     ADMIN_REPORTS_ENABLED: bool = False
     ADMIN_REPORTS_CHAT_ID: str | None = None
@@ -86,9 +141,25 @@ class Settings(BaseSettings):
     TIMEZONE: str = Field(default_factory=lambda: os.getenv('TZ', 'UTC'))
 
     DATABASE_MODE: str = 'auto'
+    # Пропуск универсальной миграции, если схема и код миграции не менялись с прошлого запуска
+    UNIVERSAL_MIGRATION_FINGERPRINT_ENABLED: bool = True
+    # Советник по индексам: последовательное чтение таблицы больше этого числа строк считается проблемой
+    INDEX_ADVISOR_SEQ_SCAN_MIN_ROWS: int = 10000
+    # Кеш статистики админского дашборда: свежий снимок и сколько ещё отдавать устаревший во время пересчёта
+    DASHBOARD_STATS_CACHE_TTL_SECONDS: int = 60
+    DASHBOARD_STATS_STALE_SECONDS: int = 300
 
     REDIS_URL: str = 'redis://localhost:6379/0'
+    # Локальный уровень кеша (LRU в памяти процесса перед Redis): размер и время жизни записи/версии
+    CACHE_LOCAL_MAX_ENTRIES: int = 2000
+    CACHE_LOCAL_TTL_SECONDS: int = 10
     CART_TTL_SECONDS: int = 3600  # Время жизни корзины пользователя в Redis (1 час)
+    # Шина инвалидации кешей между процессами (Redis pub/sub, без Redis работает локально)
+    CACHE_INVALIDATION_BUS_ENABLED: bool = True
+    CACHE_INVALIDATION_CHANNEL: str = 'bedolaga:cache-invalidation'
+    # Ретрансляция WebSocket-уведомлений кабинета и API между репликами
+    WEBSOCKET_RELAY_ENABLED: bool = True
+    WEBSOCKET_RELAY_CHANNEL: str = 'bedolaga:ws-relay'
 
     REMNAWAVE_API_URL: str | None = None
     REMNAWAVE_API_KEY: str | None = None
@@ -153,6 +224,9 @@ class Settings(BaseSettings):
     SERVER_STATUS_METRICS_VERIFY_SSL: bool = True
     SERVER_STATUS_REQUEST_TIMEOUT: int = 10
     SERVER_STATUS_ITEMS_PER_PAGE: int = 10
+    SERVER_STATUS_POLL_INTERVAL_SECONDS: int = 30
+    SERVER_STATUS_STALE_SECONDS: int = 300
+    SERVER_STATUS_HISTORY_SIZE: int = 20
 
     BASE_SUBSCRIPTION_PRICE: int = 50000
     AVAILABLE_SUBSCRIPTION_PERIODS: str = '14,30,60,90,180,360'
@@ -290,9 +364,16 @@ class Settings(BaseSettings):
     TRAFFIC_CHECK_CONCURRENCY: int = 10  # Параллельных запросов
     TRAFFIC_NOTIFICATION_COOLDOWN_MINUTES: int = 60  # Кулдаун уведомлений (минуты)
     TRAFFIC_SNAPSHOT_TTL_HOURS: int = 24  # TTL для snapshot трафика в Redis (часы)
+    # Локальное хранилище суточного трафика для админской аналитики
+    TRAFFIC_WAREHOUSE_ENABLED: bool = True
+    TRAFFIC_WAREHOUSE_INTERVAL_MINUTES: int = 60  # Как часто проверять несобранные сутки
+    TRAFFIC_WAREHOUSE_BACKFILL_DAYS: int = 31  # Сколько прошедших суток догружать при первом запуске
+    TRAFFIC_WAREHOUSE_RETENTION_DAYS: int = 400  # Сколько суток хранить (0 — без очистки)
     # Настройки суточных подписок
     DAILY_SUBSCRIPTIONS_ENABLED: bool = True  # Включить автоматическое списание для суточных тарифов
     DAILY_SUBSCRIPTIONS_CHECK_INTERVAL_MINUTES: int = 30  # Интервал проверки в минутах
+    DAILY_BILLING_BATCH_SIZE: int = 100  # Подписок в одной пачке суточных списаний
+    DAILY_BILLING_CONCURRENCY: int = 5  # Одновременных списаний (запросы к панели и уведомления)
 
     AUTOPAY_WARNING_DAYS: str = '3,1'
 
@@ -301,6 +382,9 @@ class Settings(BaseSettings):
     DEFAULT_AUTOPAY_ENABLED: bool = False
     DEFAULT_AUTOPAY_DAYS_BEFORE: int = 3
     MIN_BALANCE_FOR_AUTOPAY_KOPEKS: int = 10000
+    # Автоплатёж захватывает подписки пачками; захват истекает, если обработчик не завершил работу
+    AUTOPAY_BATCH_SIZE: int = 50
+    AUTOPAY_CLAIM_LEASE_SECONDS: int = 900
     SUBSCRIPTION_RENEWAL_BALANCE_THRESHOLD_KOPEKS: int = 20000
 
     MONITORING_INTERVAL: int = 60
@@ -346,6 +430,14 @@ class Settings(BaseSettings):
     PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED: bool = False
     PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES: int = 10
 
+    PAYMENT_WEBHOOK_INBOX_ENABLED: bool = True
+    PAYMENT_WEBHOOK_INBOX_POLL_SECONDS: int = 5
+    PAYMENT_WEBHOOK_INBOX_BATCH_SIZE: int = 20
+    PAYMENT_WEBHOOK_INBOX_CONCURRENCY: int = 4
+    PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS: int = 8
+    PAYMENT_WEBHOOK_INBOX_LEASE_SECONDS: int = 300
+    PAYMENT_WEBHOOK_INBOX_RETENTION_DAYS: int = 30
+
     NALOGO_ENABLED: bool = False
     NALOGO_INN: str | None = None
     NALOGO_PASSWORD: str | None = None
@@ -517,6 +609,8 @@ class Settings(BaseSettings):
     KASSA_AI_PAYMENT_SYSTEM_ID: int = 44
 
     MAIN_MENU_MODE: str = 'default'  # 'default' | 'cabinet'
+    # Время жизни пользовательских фрагментов главного меню (тестовый доступ, рефералы)
+    MAIN_MENU_USER_CACHE_SECONDS: int = 30
     # Стиль кнопок Cabinet: primary (синий), success (зелёный), danger (красный), '' (по умолчанию для каждой секции)
     CABINET_BUTTON_STYLE: str = ''
     CONNECT_BUTTON_MODE: str = 'miniapp_subscription'
@@ -527,6 +621,10 @@ class Settings(BaseSettings):
     MINIAPP_SERVICE_NAME_RU: str = 'Bedolaga VPN'
     MINIAPP_SERVICE_DESCRIPTION_EN: str = 'Secure & Fast Connection'
     MINIAPP_SERVICE_DESCRIPTION_RU: str = 'Безопасное и быстрое подключение'
+    # Как часто экран подписки мини-приложения обновляет трафик из RemnaWave (в фоне)
+    MINIAPP_USAGE_SYNC_INTERVAL_SECONDS: int = 60
+    # Время жизни кеша FAQ, документов и промогрупп на экране подписки
+    MINIAPP_CONTENT_CACHE_SECONDS: int = 300
     CONNECT_BUTTON_HAPP_DOWNLOAD_ENABLED: bool = False
     HAPP_CRYPTOLINK_REDIRECT_TEMPLATE: str | None = None
     HAPP_DOWNLOAD_LINK_IOS: str | None = None
@@ -658,6 +756,15 @@ class Settings(BaseSettings):
     WEBHOOK_WORKERS: int = 4
     WEBHOOK_ENQUEUE_TIMEOUT: float = 0.1
     WEBHOOK_WORKER_SHUTDOWN_TIMEOUT: float = 30.0
+    # memory — очередь в памяти процесса, redis_stream — потоки Redis с consumer group
+    WEBHOOK_INGRESS_MODE: str = 'memory'
+    WEBHOOK_STREAM_PREFIX: str = 'bedolaga:telegram-updates'
+    WEBHOOK_STREAM_GROUP: str = 'bot-workers'
+    WEBHOOK_STREAM_PARTITIONS: int = 8
+    WEBHOOK_STREAM_CONSUMERS: int = 1
+    WEBHOOK_STREAM_CONSUMER_INDEX: int = 0
+    WEBHOOK_STREAM_MAXLEN: int = 100000
+    WEBHOOK_STREAM_CLAIM_IDLE_SECONDS: float = 60.0
     BOT_RUN_MODE: str = 'polling'
 
     WEB_API_ENABLED: bool = False
@@ -676,6 +783,7 @@ class Settings(BaseSettings):
     APP_CONFIG_PATH: str = 'app-config.json'
     ENABLE_DEEP_LINKS: bool = True
     APP_CONFIG_CACHE_TTL: int = 3600
+    APP_CONFIG_REFRESH_SECONDS: int = 60
 
     VERSION_CHECK_ENABLED: bool = True
     VERSION_CHECK_REPO: str = 'fr1ngg/remnawave-bedolaga-telegram-bot'
@@ -867,6 +975,42 @@ class Settings(BaseSettings):
         """Проверяет, используется ли SQLite"""
         return 'sqlite' in self.get_database_url()
 
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if name in DERIVED_SETTINGS_SOURCE_FIELDS:
+            object.__setattr__(self, '_derived_settings', None)
+
+    @property
+    def derived(self) -> DerivedSettings:
+        """Актуальный снимок разобранных настроек (строится лениво)."""
+        snapshot = self.__dict__.get('_derived_settings')
+        if snapshot is None:
+            snapshot = self.refresh_derived()
+        return snapshot
+
+    def refresh_derived(self) -> DerivedSettings:
+        """Пересобирает снимок разобранных настроек и атомарно подменяет его."""
+        admin_ids = tuple(self._parse_admin_ids())
+        admin_emails = tuple(self._parse_admin_emails())
+        traffic_packages = tuple(self._parse_traffic_packages())
+        traffic_topup_packages = tuple(self._parse_traffic_topup_packages(traffic_packages))
+        traffic_prices = _build_price_lookup(traffic_packages)
+
+        snapshot = DerivedSettings(
+            admin_ids=admin_ids,
+            admin_id_set=frozenset(admin_ids),
+            admin_emails=admin_emails,
+            admin_email_set=frozenset(admin_emails),
+            autopay_warning_days=tuple(self._parse_autopay_warning_days()),
+            traffic_packages=traffic_packages,
+            traffic_prices=traffic_prices,
+            traffic_finite_sizes=tuple(sorted(gb for gb in traffic_prices if gb > 0)),
+            traffic_topup_packages=traffic_topup_packages,
+            traffic_topup_prices=_build_price_lookup(traffic_topup_packages),
+        )
+        object.__setattr__(self, '_derived_settings', snapshot)
+        return snapshot
+
     def is_admin(self, telegram_id: int | None = None, email: str | None = None) -> bool:
         """
         Check if user is admin by telegram_id or email.
@@ -878,13 +1022,17 @@ class Settings(BaseSettings):
         Returns:
             True if user is admin
         """
-        if telegram_id and telegram_id in self.get_admin_ids():
+        derived = self.derived
+        if telegram_id and telegram_id in derived.admin_id_set:
             return True
-        if email and email.lower() in [e.lower() for e in self.get_admin_emails()]:
+        if email and email.lower() in derived.admin_email_set:
             return True
         return False
 
     def get_admin_ids(self) -> list[int]:
+        return list(self.derived.admin_ids)
+
+    def _parse_admin_ids(self) -> list[int]:
         try:
             admin_ids = self.ADMIN_IDS
 
@@ -900,6 +1048,9 @@ class Settings(BaseSettings):
 
     def get_admin_emails(self) -> list[str]:
         """Get list of admin emails for email-only users."""
+        return list(self.derived.admin_emails)
+
+    def _parse_admin_emails(self) -> list[str]:
         try:
             admin_emails = self.ADMIN_EMAILS
 
@@ -1174,6 +1325,9 @@ class Settings(BaseSettings):
         return unique
 
     def get_autopay_warning_days(self) -> list[int]:
+        return list(self.derived.autopay_warning_days)
+
+    def _parse_autopay_warning_days(self) -> list[int]:
         try:
             days = self.AUTOPAY_WARNING_DAYS
             if isinstance(days, str):
@@ -1184,6 +1338,12 @@ class Settings(BaseSettings):
         except (ValueError, AttributeError):
             return [3, 1]
 
+    def get_autopay_batch_size(self) -> int:
+        return max(1, self.AUTOPAY_BATCH_SIZE)
+
+    def get_autopay_claim_lease_seconds(self) -> int:
+        return max(60, self.AUTOPAY_CLAIM_LEASE_SECONDS)
+
     def is_autopay_enabled_by_default(self) -> bool:
         value = getattr(self, 'DEFAULT_AUTOPAY_ENABLED', True)
 
@@ -1421,6 +1581,9 @@ class Settings(BaseSettings):
     def get_app_config_cache_ttl(self) -> int:
         return self.APP_CONFIG_CACHE_TTL
 
+    def get_app_config_refresh_seconds(self) -> int:
+        return max(10, self.APP_CONFIG_REFRESH_SECONDS)
+
     def build_external_admin_token(self, bot_username: str) -> str:
         """Генерирует детерминированный и криптографически стойкий токен внешней админки."""
         normalized = (bot_username or '').strip().lstrip('@').lower()
@@ -1471,11 +1634,14 @@ class Settings(BaseSettings):
 
     def get_traffic_topup_packages(self) -> list[dict]:
         """Возвращает пакеты для докупки трафика. Если не настроены - использует TRAFFIC_PACKAGES_CONFIG."""
+        return [dict(package) for package in self.derived.traffic_topup_packages]
+
+    def _parse_traffic_topup_packages(self, traffic_packages: tuple[dict, ...]) -> list[dict]:
         config_str = self.TRAFFIC_TOPUP_PACKAGES_CONFIG.strip()
 
         if not config_str:
             # Если не настроены отдельные пакеты для докупки - используем основные
-            return self.get_traffic_packages()
+            return [dict(package) for package in traffic_packages]
 
         packages = []
         for package_config in config_str.split(','):
@@ -1493,23 +1659,12 @@ class Settings(BaseSettings):
                 except (ValueError, IndexError):
                     continue
 
-        return packages if packages else self.get_traffic_packages()
+        return packages if packages else [dict(package) for package in traffic_packages]
 
     def get_traffic_topup_price(self, gb: int | None) -> int:
         """Возвращает цену докупки для указанного количества ГБ."""
-        packages = self.get_traffic_topup_packages()
-        enabled_packages = [pkg for pkg in packages if pkg['enabled']]
-
-        if not enabled_packages:
-            return 0
-
-        # Ищем точное совпадение
-        for pkg in enabled_packages:
-            if pkg['gb'] == gb:
-                return pkg['price']
-
-        # Если не нашли - возвращаем 0
-        return 0
+        # Ищем точное совпадение, если не нашли - возвращаем 0
+        return self.derived.traffic_topup_prices.get(gb, 0)
 
     def get_traffic_reset_price_mode(self) -> str:
         return self.TRAFFIC_RESET_PRICE_MODE.lower()
@@ -1790,6 +1945,24 @@ class Settings(BaseSettings):
 
         return minutes
 
+    def is_payment_webhook_inbox_enabled(self) -> bool:
+        return self.PAYMENT_WEBHOOK_INBOX_ENABLED
+
+    def get_payment_webhook_inbox_poll_seconds(self) -> int:
+        return max(1, self.PAYMENT_WEBHOOK_INBOX_POLL_SECONDS)
+
+    def get_payment_webhook_inbox_batch_size(self) -> int:
+        return max(1, self.PAYMENT_WEBHOOK_INBOX_BATCH_SIZE)
+
+    def get_payment_webhook_inbox_concurrency(self) -> int:
+        return max(1, self.PAYMENT_WEBHOOK_INBOX_CONCURRENCY)
+
+    def get_payment_webhook_inbox_max_attempts(self) -> int:
+        return max(1, self.PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS)
+
+    def get_payment_webhook_inbox_lease_seconds(self) -> int:
+        return max(30, self.PAYMENT_WEBHOOK_INBOX_LEASE_SECONDS)
+
     def get_cryptobot_base_url(self) -> str:
         if self.CRYPTOBOT_TESTNET:
             return 'https://testnet-pay.crypt.bot'
@@ -2138,6 +2311,9 @@ class Settings(BaseSettings):
         return self.REFERRAL_NOTIFICATIONS_ENABLED
 
     def get_traffic_packages(self) -> list[dict]:
+        return [dict(package) for package in self.derived.traffic_packages]
+
+    def _parse_traffic_packages(self) -> list[dict]:
         try:
             packages = []
             config_str = self.TRAFFIC_PACKAGES_CONFIG.strip()
@@ -2218,41 +2394,34 @@ class Settings(BaseSettings):
         ]
 
     def get_traffic_price(self, gb: int | None) -> int:
-        packages = self.get_traffic_packages()
-        enabled_packages = [pkg for pkg in packages if pkg['enabled']]
+        derived = self.derived
+        prices = derived.traffic_prices
 
-        if not enabled_packages:
+        if not prices:
             return 0
 
         if gb is None:
             gb = 0
 
-        for package in enabled_packages:
-            if package['gb'] == gb:
-                return package['price']
+        price = prices.get(gb)
+        if price is not None:
+            return price
 
-        unlimited_package = next((pkg for pkg in enabled_packages if pkg['gb'] == 0), None)
+        unlimited_price = prices.get(0)
 
         if gb <= 0:
-            return unlimited_package['price'] if unlimited_package else 0
-
-        finite_packages = [pkg for pkg in enabled_packages if pkg['gb'] > 0]
+            return unlimited_price if unlimited_price is not None else 0
 
-        if not finite_packages:
-            return unlimited_package['price'] if unlimited_package else 0
+        finite_sizes = derived.traffic_finite_sizes
 
-        max_package = max(finite_packages, key=lambda x: x['gb'])
+        if not finite_sizes:
+            return unlimited_price if unlimited_price is not None else 0
 
-        if gb >= max_package['gb']:
-            return unlimited_package['price'] if unlimited_package else max_package['price']
+        if gb >= finite_sizes[-1]:
+            return unlimited_price if unlimited_price is not None else prices[finite_sizes[-1]]
 
-        suitable_packages = [pkg for pkg in finite_packages if pkg['gb'] >= gb]
-
-        if suitable_packages:
-            nearest_package = min(suitable_packages, key=lambda x: x['gb'])
-            return nearest_package['price']
-
-        return unlimited_package['price'] if unlimited_package else 0
+        # Ближайший пакет, не меньший запрошенного объёма
+        return prices[finite_sizes[bisect_left(finite_sizes, gb)]]
 
     def _clean_support_contact(self) -> str:
         return (self.SUPPORT_USERNAME or '').strip()
@@ -2342,6 +2511,15 @@ class Settings(BaseSettings):
     def get_server_status_request_timeout(self) -> int:
         return max(1, self.SERVER_STATUS_REQUEST_TIMEOUT)
 
+    def get_server_status_poll_interval(self) -> int:
+        return max(5, self.SERVER_STATUS_POLL_INTERVAL_SECONDS)
+
+    def get_server_status_stale_seconds(self) -> int:
+        return max(self.get_server_status_poll_interval(), self.SERVER_STATUS_STALE_SECONDS)
+
+    def get_server_status_history_size(self) -> int:
+        return max(1, self.SERVER_STATUS_HISTORY_SIZE)
+
     def is_web_api_enabled(self) -> bool:
         return bool(self.WEB_API_ENABLED)
 
@@ -2426,6 +2604,33 @@ class Settings(BaseSettings):
             timeout = 30.0
         return max(1.0, timeout)
 
+    def get_webhook_ingress_mode(self) -> str:
+        mode = (self.WEBHOOK_INGRESS_MODE or 'memory').strip().lower()
+        if mode not in {'memory', 'redis_stream'}:
+            return 'memory'
+        return mode
+
+    def get_webhook_stream_partitions(self) -> int:
+        try:
+            partitions = int(self.WEBHOOK_STREAM_PARTITIONS)
+        except (TypeError, ValueError):
+            partitions = 8
+        return max(1, partitions)
+
+    def get_webhook_stream_consumers(self) -> int:
+        try:
+            consumers = int(self.WEBHOOK_STREAM_CONSUMERS)
+        except (TypeError, ValueError):
+            consumers = 1
+        return max(1, consumers)
+
+    def get_webhook_stream_maxlen(self) -> int:
+        try:
+            maxlen = int(self.WEBHOOK_STREAM_MAXLEN)
+        except (TypeError, ValueError):
+            maxlen = 100000
+        return max(1000, maxlen)
+
     def get_telegram_webhook_url(self) -> str | None:
         base_url = (self.WEBHOOK_URL or '').strip()
         if not base_url:
@@ -0,0 +1,16 @@
+"""Условная агрегация: несколько счётчиков одним проходом по таблице.
+
+``SUM(CASE WHEN ... THEN 1 ELSE 0 END)`` вместо отдельного ``COUNT`` с ``WHERE``
+на каждый показатель; работает одинаково в PostgreSQL, SQLite и MySQL.
+"""
+
+from sqlalchemy import case, func
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def count_where(condition: ColumnElement) -> ColumnElement:
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def sum_where(value: ColumnElement, condition: ColumnElement) -> ColumnElement:
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
@@ -0,0 +1,198 @@
+"""Очередь входящих webhook платёжных провайдеров.
+
+Webhook сохраняется в ``payment_webhook_events`` с ключом идемпотентности
+провайдера и обрабатывается в фоне. Обработчики захватывают события пачками
+(``FOR UPDATE SKIP LOCKED`` + аренда ``locked_until``), поэтому несколько
+реплик не обрабатывают одно событие одновременно, а событие упавшего
+обработчика возвращается в очередь по истечении аренды.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import PaymentWebhookEvent, PaymentWebhookEventStatus
+
+
+_LAST_ERROR_MAX_LENGTH = 1000
+
+
+def _due_condition(now: datetime):
+    return or_(
+        and_(
+            PaymentWebhookEvent.status == PaymentWebhookEventStatus.PENDING.value,
+            PaymentWebhookEvent.next_attempt_at <= now,
+        ),
+        # Обработчик упал, не закрыв событие
+        and_(
+            PaymentWebhookEvent.status == PaymentWebhookEventStatus.PROCESSING.value,
+            PaymentWebhookEvent.locked_until < now,
+        ),
+    )
+
+
+async def enqueue_payment_webhook_event(
+    db: AsyncSession,
+    *,
+    provider: str,
+    event_key: str,
+    handler: str,
+    payload: dict[str, Any],
+    now: datetime,
+) -> tuple[PaymentWebhookEvent, bool]:
+    """Сохранить webhook в очередь. Возвращает событие и признак, что оно новое.
+
+    Повторная доставка уже принятого события не создаёт запись; окончательно
+    не обработанное событие при повторной доставке снова ставится в очередь.
+    """
+    event = PaymentWebhookEvent(
+        provider=provider,
+        event_key=event_key,
+        handler=handler,
+        payload=payload,
+        status=PaymentWebhookEventStatus.PENDING.value,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(event)
+    try:
+        await db.commit()
+        return event, True
+    except IntegrityError:
+        await db.rollback()
+
+    existing = await db.scalar(
+        select(PaymentWebhookEvent).where(
+            PaymentWebhookEvent.provider == provider,
+            PaymentWebhookEvent.event_key == event_key,
+        )
+    )
+    if existing is None:  # pragma: no cover - запись удалили между вставкой и чтением
+        raise LookupError(f'payment webhook event {provider}:{event_key} disappeared')
+
+    if existing.status == PaymentWebhookEventStatus.FAILED.value:
+        existing.status = PaymentWebhookEventStatus.PENDING.value
+        existing.handler = handler
+        existing.payload = payload
+        existing.attempts = 0
+        existing.next_attempt_at = now
+        existing.locked_until = None
+        await db.commit()
+
+    return existing, False
+
+
+async def claim_payment_webhook_events(
+    db: AsyncSession,
+    *,
+    now: datetime,
+    batch_size: int,
+    lease_seconds: int,
+) -> list[int]:
+    """Захватить пачку готовых к обработке событий и зафиксировать захват."""
+    locked_until = now + timedelta(seconds=lease_seconds)
+
+    result = await db.execute(
+        select(PaymentWebhookEvent.id)
+        .where(_due_condition(now))
+        .order_by(PaymentWebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    candidate_ids = list(result.scalars().all())
+    if not candidate_ids:
+        await db.commit()
+        return []
+
+    # Повторная проверка в UPDATE защищает СУБД без SKIP LOCKED от двойного захвата
+    await db.execute(
+        update(PaymentWebhookEvent)
+        .where(PaymentWebhookEvent.id.in_(candidate_ids), _due_condition(now))
+        .values(
+            status=PaymentWebhookEventStatus.PROCESSING.value,
+            locked_until=locked_until,
+            attempts=PaymentWebhookEvent.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(
+        select(PaymentWebhookEvent.id).where(
+            PaymentWebhookEvent.id.in_(candidate_ids),
+            PaymentWebhookEvent.status == PaymentWebhookEventStatus.PROCESSING.value,
+            PaymentWebhookEvent.locked_until == locked_until,
+        )
+    )
+    claimed_ids = set(result.scalars().all())
+    await db.commit()
+    return [event_id for event_id in candidate_ids if event_id in claimed_ids]
+
+
+async def get_payment_webhook_event(db: AsyncSession, event_id: int) -> PaymentWebhookEvent | None:
+    return await db.get(PaymentWebhookEvent, event_id, populate_existing=True)
+
+
+async def mark_payment_webhook_event_processed(db: AsyncSession, event_id: int, *, now: datetime) -> None:
+    await db.execute(
+        update(PaymentWebhookEvent)
+        .where(PaymentWebhookEvent.id == event_id)
+        .values(
+            status=PaymentWebhookEventStatus.PROCESSED.value,
+            processed_at=now,
+            locked_until=None,
+            last_error=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def mark_payment_webhook_event_failed(
+    db: AsyncSession,
+    event_id: int,
+    *,
+    error: str,
+    retry_at: datetime | None,
+) -> None:
+    """Записать неудачную попытку: вернуть событие в очередь к ``retry_at`` или закрыть как failed."""
+    values: dict[str, Any] = {'locked_until': None, 'last_error': error[:_LAST_ERROR_MAX_LENGTH]}
+    if retry_at is None:
+        values['status'] = PaymentWebhookEventStatus.FAILED.value
+    else:
+        values['status'] = PaymentWebhookEventStatus.PENDING.value
+        values['next_attempt_at'] = retry_at
+
+    await db.execute(
+        update(PaymentWebhookEvent)
+        .where(PaymentWebhookEvent.id == event_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def get_payment_webhook_event_counts(db: AsyncSession) -> dict[str, int]:
+    """Число событий по статусам (для health-эндпоинта)."""
+    result = await db.execute(
+        select(PaymentWebhookEvent.status, func.count(PaymentWebhookEvent.id)).group_by(PaymentWebhookEvent.status)
+    )
+    counts = {status.value: 0 for status in PaymentWebhookEventStatus}
+    counts.update({status: int(count) for status, count in result.all()})
+    return counts
+
+
+async def delete_processed_payment_webhook_events(db: AsyncSession, *, before: datetime) -> int:
+    """Удалить обработанные события старше ``before``."""
+    result = await db.execute(
+        delete(PaymentWebhookEvent).where(
+            PaymentWebhookEvent.status == PaymentWebhookEventStatus.PROCESSED.value,
+            PaymentWebhookEvent.processed_at < before,
+        )
+    )
+    await db.commit()
+    return result.rowcount or 0
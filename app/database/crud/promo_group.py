@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, User, UserPromoGroup
+from app.utils.cache import PROMO_GROUPS_NAMESPACE, cache
 
 
 def _normalize_period_discounts(period_discounts: dict[int, int] | None) -> dict[int, int]:
@@ -123,6 +124,7 @@ async def create_promo_group(
         await db.execute(update(PromoGroup).where(PromoGroup.id != promo_group.id).values(is_default=False))
 
     await db.commit()
+    await cache.invalidate(PROMO_GROUPS_NAMESPACE)
     await db.refresh(promo_group)
 
     logger.info(
@@ -191,6 +193,7 @@ async def update_promo_group(
                 group.is_default = True
 
     await db.commit()
+    await cache.invalidate(PROMO_GROUPS_NAMESPACE)
     await db.refresh(group)
 
     logger.info("Обновлена промогруппа '' (id=)", group_name=group.name, group_id=group.id)
@@ -239,6 +242,7 @@ async def delete_promo_group(db: AsyncSession, group: PromoGroup) -> bool:
 
     await db.delete(group)
     await db.commit()
+    await cache.invalidate(PROMO_GROUPS_NAMESPACE)
 
     logger.info(
         "Промогруппа '' (id=) удалена, пользователи переведены в ''",
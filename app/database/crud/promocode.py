@@ -1,7 +1,7 @@
 from datetime import UTC, datetime
 
 import structlog
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -84,20 +84,62 @@ async def create_promocode(
     return promocode
 
 
+async def reserve_promocode_use(db: AsyncSession, promocode_id: int) -> int | None:
+    """
+    Атомарно занимает одно использование промокода.
+
+    Счётчик увеличивается условным UPDATE ... RETURNING без чтения строки в
+    Python, поэтому одновременные активации не теряют инкременты и не
+    превышают max_uses. Возвращает новое значение current_uses или None, если
+    промокод исчерпан, выключен или не действует. Загруженный в сессию объект
+    PromoCode не обновляется. Коммит — на вызывающем.
+    """
+    now = datetime.now(UTC)
+    result = await db.execute(
+        update(PromoCode)
+        .where(
+            PromoCode.id == promocode_id,
+            PromoCode.is_active.is_(True),
+            PromoCode.current_uses < PromoCode.max_uses,
+            PromoCode.valid_from <= now,
+            or_(PromoCode.valid_until.is_(None), PromoCode.valid_until >= now),
+        )
+        .values(current_uses=PromoCode.current_uses + 1, updated_at=now)
+        .returning(PromoCode.current_uses)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def release_promocode_use(db: AsyncSession, promocode_id: int) -> int | None:
+    """Атомарно возвращает занятое использование промокода. Коммит — на вызывающем."""
+    result = await db.execute(
+        update(PromoCode)
+        .where(PromoCode.id == promocode_id, PromoCode.current_uses > 0)
+        .values(current_uses=PromoCode.current_uses - 1, updated_at=datetime.now(UTC))
+        .returning(PromoCode.current_uses)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
 async def use_promocode(db: AsyncSession, promocode_id: int, user_id: int) -> bool:
     try:
-        promocode = await get_promocode_by_id(db, promocode_id)
-        if not promocode:
+        current_uses = await reserve_promocode_use(db, promocode_id)
+        if current_uses is None:
             return False
 
         usage = PromoCodeUse(promocode_id=promocode_id, user_id=user_id)
         db.add(usage)
 
-        promocode.current_uses += 1
-
         await db.commit()
 
-        logger.info('✅ Промокод использован пользователем', code=promocode.code, user_id=user_id)
+        logger.info(
+            '✅ Промокод использован пользователем',
+            promocode_id=promocode_id,
+            user_id=user_id,
+            current_uses=current_uses,
+        )
         return True
 
     except Exception as e:
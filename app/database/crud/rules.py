@@ -5,6 +5,7 @@ from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models import ServiceRule
+from app.utils.cache import LEGAL_CONTENT_NAMESPACE, cache
 
 
 logger = structlog.get_logger(__name__)
@@ -36,6 +37,7 @@ async def create_or_update_rules(
 
     db.add(new_rules)
     await db.commit()
+    await cache.invalidate(LEGAL_CONTENT_NAMESPACE)
     await db.refresh(new_rules)
 
     logger.info('✅ Правила для языка обновлены (ID: )', language=language, new_rules_id=new_rules.id)
@@ -51,6 +53,7 @@ async def clear_all_rules(db: AsyncSession, language: str = 'ru') -> bool:
         )
 
         await db.commit()
+        await cache.invalidate(LEGAL_CONTENT_NAMESPACE)
 
         rows_affected = result.rowcount
         logger.info(
@@ -119,6 +122,7 @@ async def restore_rules_version(db: AsyncSession, rule_id: int, language: str =
 
         db.add(restored_rule)
         await db.commit()
+        await cache.invalidate(LEGAL_CONTENT_NAMESPACE)
         await db.refresh(restored_rule)
 
         logger.info(
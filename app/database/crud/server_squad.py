@@ -9,6 +9,7 @@ from sqlalchemy import (
     cast,
     delete,
     func,
+    literal,
     or_,
     select,
     text,
@@ -17,6 +18,7 @@ from sqlalchemy import (
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database.aggregates import count_where
 from app.database.models import (
     PromoGroup,
     ServerSquad,
@@ -26,6 +28,7 @@ from app.database.models import (
     Tariff,
     User,
 )
+from app.utils.cache import PRICING_CATALOG_NAMESPACE, cache
 
 
 logger = structlog.get_logger(__name__)
@@ -83,6 +86,7 @@ async def create_server_squad(
     db.add(server_squad)
     await db.commit()
     await db.refresh(server_squad)
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info('✅ Создан сервер (UUID: )', display_name=display_name, squad_uuid=squad_uuid)
     return server_squad
@@ -224,6 +228,7 @@ async def update_server_squad_promo_groups(
     server.allowed_promo_groups = promo_groups
     await db.commit()
     await db.refresh(server)
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info(
         'Обновлены промогруппы сервера %s (ID: %s): %s',
@@ -256,6 +261,7 @@ async def update_server_squad(db: AsyncSession, server_id: int, **updates) -> Se
     await db.execute(update(ServerSquad).where(ServerSquad.id == server_id).values(**filtered_updates))
 
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     return await get_server_squad_by_id(db, server_id)
 
@@ -276,6 +282,7 @@ async def delete_server_squad(db: AsyncSession, server_id: int) -> bool:
 
     await db.execute(delete(ServerSquad).where(ServerSquad.id == server_id))
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info('🗑️ Удален сервер (ID: )', server_id=server_id)
     return True
@@ -392,6 +399,7 @@ async def sync_with_remnawave(db: AsyncSession, remnawave_squads: list[dict]) ->
             logger.info('🧹 Обновлены тарифы после удаления серверов', cleaned_tariffs=cleaned_tariffs)
 
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info('🔄 Синхронизация завершена: + ~', created=created, updated=updated, removed=removed)
     return created, updated, removed
@@ -696,29 +704,26 @@ def _extract_country_code(original_name: str) -> str | None:
 
 
 async def get_server_statistics(db: AsyncSession) -> dict:
-    total_result = await db.execute(select(func.count(ServerSquad.id)))
-    total_servers = total_result.scalar()
-
-    available_result = await db.execute(select(func.count(ServerSquad.id)).where(ServerSquad.is_available == True))
-    available_servers = available_result.scalar()
-
-    servers_with_connections = 0
-    all_servers_result = await db.execute(select(ServerSquad.squad_uuid))
-    all_server_uuids = [row[0] for row in all_servers_result.fetchall()]
-
-    for squad_uuid in all_server_uuids:
-        count_result = await db.execute(
-            text("""
-                SELECT COUNT(s.id)
-                FROM subscriptions s
-                WHERE s.status IN ('active', 'trial')
-                AND s.connected_squads::text LIKE :uuid_pattern
-            """),
-            {'uuid_pattern': f'%"{squad_uuid}"%'},
+    # Сервер «с подключениями», если его squad_uuid есть в connected_squads хотя бы одной активной подписки.
+    # Считается в БД одним запросом: подписки не выгружаются в Python
+    has_connections = (
+        select(Subscription.id)
+        .where(
+            Subscription.status.in_([SubscriptionStatus.ACTIVE.value, SubscriptionStatus.TRIAL.value]),
+            cast(Subscription.connected_squads, String).like(
+                literal('%"').concat(ServerSquad.squad_uuid).concat(literal('"%'))
+            ),
+        )
+        .exists()
+    )
+    servers_result = await db.execute(
+        select(
+            func.count(ServerSquad.id),
+            count_where(ServerSquad.is_available == True),
+            count_where(has_connections),
         )
-        user_count = count_result.scalar() or 0
-        if user_count > 0:
-            servers_with_connections += 1
+    )
+    total_servers, available_servers, servers_with_connections = servers_result.one()
 
     revenue_result = await db.execute(select(func.coalesce(func.sum(SubscriptionServer.paid_price_kopeks), 0)))
     total_revenue_kopeks = revenue_result.scalar()
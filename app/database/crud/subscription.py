@@ -3,18 +3,20 @@ from datetime import UTC, datetime, timedelta
 from typing import Optional
 
 import structlog
-from sqlalchemy import and_, delete, func, select
+from sqlalchemy import and_, delete, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.exc import StaleDataError
 
 from app.config import settings
+from app.database.aggregates import count_where
 from app.database.crud.notification import clear_notifications
 from app.database.models import (
     PromoGroup,
     Subscription,
     SubscriptionServer,
     SubscriptionStatus,
+    Tariff,
     User,
     UserPromoGroup,
 )
@@ -26,6 +28,9 @@ logger = structlog.get_logger(__name__)
 
 _WEBHOOK_GUARD_SECONDS = 60
 
+# Глобальный автоплатёж списывает не раньше чем за столько суток до окончания
+AUTOPAY_MAX_DAYS_BEFORE = 3
+
 
 def is_recently_updated_by_webhook(subscription: Subscription) -> bool:
     """Return True if subscription was updated by webhook within guard window."""
@@ -759,81 +764,161 @@ async def get_expired_subscriptions(db: AsyncSession) -> list[Subscription]:
     return result.scalars().all()
 
 
-async def get_subscriptions_for_autopay(db: AsyncSession) -> list[Subscription]:
-    current_time = datetime.now(UTC)
+def autopay_window_condition(now: datetime):
+    """Подписка в окне автоплатежа: ``(end_date - now).days <= min(autopay_days_before, 3)``.
+
+    Для каждого значения ``autopay_days_before`` это диапазон по ``end_date``,
+    поэтому выборку обслуживает частичный индекс ``ix_subscriptions_autopay_end_date``.
+    """
+    days_before = func.coalesce(Subscription.autopay_days_before, AUTOPAY_MAX_DAYS_BEFORE)
+    conditions = [
+        and_(
+            days_before >= AUTOPAY_MAX_DAYS_BEFORE,
+            Subscription.end_date < now + timedelta(days=AUTOPAY_MAX_DAYS_BEFORE + 1),
+        )
+    ]
+    for days in range(AUTOPAY_MAX_DAYS_BEFORE - 1, 0, -1):
+        conditions.append(and_(days_before == days, Subscription.end_date < now + timedelta(days=days + 1)))
+    conditions.append(and_(days_before <= 0, Subscription.end_date < now + timedelta(days=1)))
+    return and_(Subscription.end_date < now + timedelta(days=AUTOPAY_MAX_DAYS_BEFORE + 1), or_(*conditions))
+
+
+def _autopay_candidates_query(now: datetime):
+    # Суточные подписки продлевает DailySubscriptionService, глобальный автоплатёж их не трогает
+    return (
+        select(Subscription.id)
+        .outerjoin(Tariff, Subscription.tariff_id == Tariff.id)
+        .where(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.autopay_enabled == True,
+            Subscription.is_trial == False,
+            or_(Tariff.id.is_(None), Tariff.is_daily == False),
+            autopay_window_condition(now),
+        )
+    )
 
+
+async def get_subscriptions_for_autopay(db: AsyncSession, now: datetime | None = None) -> list[Subscription]:
+    """Подписки, которые сейчас спишет автоплатёж (без учёта захваченных обработчиками)."""
+    now = now or datetime.now(UTC)
     result = await db.execute(
         select(Subscription)
         .options(
             selectinload(Subscription.user),
             selectinload(Subscription.tariff),
         )
-        .where(
-            and_(
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.autopay_enabled == True,
-                Subscription.is_trial == False,
-            )
-        )
+        .where(Subscription.id.in_(_autopay_candidates_query(now)))
+        .order_by(Subscription.end_date, Subscription.id)
     )
-    all_autopay_subscriptions = result.scalars().all()
-
-    ready_for_autopay = []
-    for subscription in all_autopay_subscriptions:
-        # Суточные подписки имеют свой механизм продления (DailySubscriptionService),
-        # глобальный autopay на них не распространяется
-        if subscription.tariff and getattr(subscription.tariff, 'is_daily', False):
-            continue
-
-        days_until_expiry = (subscription.end_date - current_time).days
-
-        if days_until_expiry <= subscription.autopay_days_before and subscription.end_date > current_time:
-            ready_for_autopay.append(subscription)
+    return list(result.scalars().all())
 
-    return ready_for_autopay
 
+async def claim_autopay_subscriptions(
+    db: AsyncSession,
+    *,
+    now: datetime,
+    batch_size: int,
+    lease_seconds: int,
+) -> list[int]:
+    """Захватить пачку подписок из окна автоплатежа и зафиксировать захват.
 
-async def get_subscriptions_statistics(db: AsyncSession) -> dict:
-    total_result = await db.execute(select(func.count(Subscription.id)))
-    total_subscriptions = total_result.scalar()
+    Строки выбираются с ``FOR UPDATE SKIP LOCKED``, поэтому параллельные
+    обработчики получают разные пачки. Захват хранится в
+    ``autopay_claimed_until`` и переживает коммиты во время списаний; если
+    обработчик упал, подписка вернётся в очередь по истечении аренды.
+    """
+    claimed_until = now + timedelta(seconds=lease_seconds)
+    is_free = or_(Subscription.autopay_claimed_until.is_(None), Subscription.autopay_claimed_until < now)
 
-    active_result = await db.execute(
-        select(func.count(Subscription.id)).where(Subscription.status == SubscriptionStatus.ACTIVE.value)
+    result = await db.execute(
+        _autopay_candidates_query(now)
+        .where(is_free)
+        .order_by(Subscription.end_date, Subscription.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True, of=Subscription)
     )
-    active_subscriptions = active_result.scalar()
-
-    trial_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.is_trial == True, Subscription.status == SubscriptionStatus.ACTIVE.value)
+    candidate_ids = list(result.scalars().all())
+    if not candidate_ids:
+        await db.commit()
+        return []
+
+    # Повторная проверка в UPDATE защищает СУБД без SKIP LOCKED от двойного захвата
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(candidate_ids), is_free)
+        .values(autopay_claimed_until=claimed_until, updated_at=Subscription.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(
+        select(Subscription.id).where(
+            Subscription.id.in_(candidate_ids),
+            Subscription.autopay_claimed_until == claimed_until,
         )
     )
-    trial_subscriptions = trial_result.scalar()
+    claimed_ids = set(result.scalars().all())
+    await db.commit()
+    return [subscription_id for subscription_id in candidate_ids if subscription_id in claimed_ids]
 
-    paid_subscriptions = active_subscriptions - trial_subscriptions
 
-    today = datetime.now(UTC).date()
-    today_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= today, Subscription.is_trial == False)
-        )
+async def release_autopay_claims(db: AsyncSession, subscription_ids: Iterable[int]) -> None:
+    subscription_ids = list(subscription_ids)
+    if not subscription_ids:
+        return
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(subscription_ids))
+        .values(autopay_claimed_until=None, updated_at=Subscription.updated_at)
+        .execution_options(synchronize_session=False)
     )
-    purchased_today = today_result.scalar()
+    await db.commit()
 
-    week_ago = datetime.now(UTC) - timedelta(days=7)
-    week_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= week_ago, Subscription.is_trial == False)
+
+async def get_subscriptions_for_autopay_charge(db: AsyncSession, subscription_ids: list[int]) -> list[Subscription]:
+    """Захваченные подписки с пользователем, промогруппами и тарифом для расчёта списания."""
+    if not subscription_ids:
+        return []
+    result = await db.execute(
+        select(Subscription)
+        .options(
+            selectinload(Subscription.user).options(
+                selectinload(User.promo_group),
+                selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+            ),
+            selectinload(Subscription.tariff),
         )
+        .where(Subscription.id.in_(subscription_ids))
+        .order_by(Subscription.end_date, Subscription.id)
+        .execution_options(populate_existing=True)
     )
-    purchased_week = week_result.scalar()
+    return list(result.scalars().all())
 
-    month_ago = datetime.now(UTC) - timedelta(days=30)
-    month_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            and_(Subscription.created_at >= month_ago, Subscription.is_trial == False)
+
+async def get_subscriptions_statistics(db: AsyncSession) -> dict:
+    now = datetime.now(UTC)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    is_active = Subscription.status == SubscriptionStatus.ACTIVE.value
+    is_purchase = Subscription.is_trial == False
+
+    result = await db.execute(
+        select(
+            func.count(Subscription.id),
+            count_where(is_active),
+            count_where(and_(is_active, Subscription.is_trial == True)),
+            count_where(and_(is_purchase, Subscription.created_at >= today)),
+            count_where(and_(is_purchase, Subscription.created_at >= now - timedelta(days=7))),
+            count_where(and_(is_purchase, Subscription.created_at >= now - timedelta(days=30))),
         )
     )
-    purchased_month = month_result.scalar()
+    (
+        total_subscriptions,
+        active_subscriptions,
+        trial_subscriptions,
+        purchased_today,
+        purchased_week,
+        purchased_month,
+    ) = (int(value or 0) for value in result.one())
+
+    paid_subscriptions = active_subscriptions - trial_subscriptions
 
     try:
         from app.database.crud.subscription_conversion import get_conversion_statistics
@@ -879,6 +964,38 @@ async def get_subscriptions_statistics(db: AsyncSession) -> dict:
     }
 
 
+async def get_tariff_subscriptions_statistics(db: AsyncSession) -> dict[int, dict[str, int]]:
+    """Счётчики подписок по тарифам одним GROUP BY: {tariff_id: {...}}."""
+    now = datetime.now(UTC)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    is_active = Subscription.status == SubscriptionStatus.ACTIVE.value
+    is_purchase = Subscription.is_trial == False
+
+    result = await db.execute(
+        select(
+            Subscription.tariff_id,
+            count_where(is_active),
+            count_where(and_(is_active, Subscription.is_trial == True)),
+            count_where(and_(is_purchase, Subscription.created_at >= today)),
+            count_where(and_(is_purchase, Subscription.created_at >= now - timedelta(days=7))),
+            count_where(and_(is_purchase, Subscription.created_at >= now - timedelta(days=30))),
+        )
+        .where(Subscription.tariff_id.is_not(None))
+        .group_by(Subscription.tariff_id)
+    )
+
+    return {
+        tariff_id: {
+            'active_subscriptions': int(active or 0),
+            'trial_subscriptions': int(trial or 0),
+            'purchased_today': int(today_count or 0),
+            'purchased_week': int(week_count or 0),
+            'purchased_month': int(month_count or 0),
+        }
+        for tariff_id, active, trial, today_count, week_count, month_count in result.all()
+    }
+
+
 async def get_trial_statistics(db: AsyncSession) -> dict:
     now = datetime.now(UTC)
 
@@ -1902,47 +2019,80 @@ async def activate_pending_trial_subscription(
 # ==================== СУТОЧНЫЕ ПОДПИСКИ ====================
 
 
-async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscription]:
-    """
-    Получает все суточные подписки, которые нужно обработать для списания.
+def _daily_charge_due_condition(now: datetime):
+    """Суточная подписка ждёт списания.
 
     Критерии:
-    - Тариф подписки суточный (is_daily=True)
-    - Подписка активна
-    - Подписка не приостановлена пользователем
+    - Тариф подписки суточный (is_daily=True) и активный
+    - Подписка активна, не приостановлена пользователем и не триальная
     - Прошло более 24 часов с последнего списания (или списания ещё не было)
     """
-    from app.database.models import Tariff
-
-    now = datetime.now(UTC)
     one_day_ago = now - timedelta(hours=24)
+    return and_(
+        Tariff.is_daily.is_(True),
+        Tariff.is_active.is_(True),
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.is_daily_paused.is_(False),
+        Subscription.is_trial.is_(False),
+        or_(Subscription.last_daily_charge_at.is_(None), Subscription.last_daily_charge_at < one_day_ago),
+    )
 
-    query = (
+
+def daily_billing_key(subscription: Subscription) -> str:
+    """Ключ идемпотентности суточного списания (пишется в ``transactions.external_id``).
+
+    Период задаётся предыдущим списанием (``last_daily_charge_at``), а если его нет —
+    текущим ``end_date``: оба меняются только вместе со списанием или сменой тарифа,
+    поэтому повторный запуск после сбоя получает тот же ключ. Ключ по календарной дате
+    пропускал бы списание за новый тариф, когда смена тарифа сбрасывает
+    ``last_daily_charge_at`` в тот же день. Уникальность ключа держит частичный
+    индекс ``uq_transactions_daily_billing_key``.
+    """
+    period_start = subscription.last_daily_charge_at or subscription.end_date
+    return f'daily:{subscription.id}:{period_start.isoformat()}'
+
+
+async def get_due_daily_subscription_ids(
+    db: AsyncSession,
+    *,
+    now: datetime,
+    after_id: int = 0,
+    limit: int = 100,
+) -> list[int]:
+    """Следующая пачка id суточных подписок к списанию (keyset по id)."""
+    result = await db.execute(
+        select(Subscription.id)
+        .join(Tariff, Subscription.tariff_id == Tariff.id)
+        .where(_daily_charge_due_condition(now), Subscription.id > after_id)
+        .order_by(Subscription.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def claim_daily_subscription_for_charge(
+    db: AsyncSession,
+    subscription_id: int,
+    *,
+    now: datetime,
+) -> Subscription | None:
+    """Заблокировать подписку для списания в текущей транзакции.
+
+    ``FOR UPDATE SKIP LOCKED`` и повторная проверка условий: подписку, которую
+    обрабатывает другой процесс или которая уже списана, возвращает как None.
+    """
+    result = await db.execute(
         select(Subscription)
         .join(Tariff, Subscription.tariff_id == Tariff.id)
         .options(
             selectinload(Subscription.user),
             selectinload(Subscription.tariff),
         )
-        .where(
-            and_(
-                Tariff.is_daily.is_(True),
-                Tariff.is_active.is_(True),
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_daily_paused.is_(False),
-                Subscription.is_trial.is_(False),  # Не списываем с триальных подписок
-                # Списания ещё не было ИЛИ прошло более 24 часов
-                ((Subscription.last_daily_charge_at.is_(None)) | (Subscription.last_daily_charge_at < one_day_ago)),
-            )
-        )
+        .where(Subscription.id == subscription_id, _daily_charge_due_condition(now))
+        .with_for_update(skip_locked=True, of=Subscription)
+        .execution_options(populate_existing=True)
     )
-
-    result = await db.execute(query)
-    subscriptions = result.scalars().all()
-
-    logger.info('🔍 Найдено суточных подписок для списания', subscriptions_count=len(subscriptions))
-
-    return list(subscriptions)
+    return result.scalar_one_or_none()
 
 
 async def get_disabled_daily_subscriptions_for_resume(
@@ -2038,13 +2188,8 @@ async def resume_daily_subscription(
     return subscription
 
 
-async def update_daily_charge_time(
-    db: AsyncSession,
-    subscription: Subscription,
-    charge_time: datetime = None,
-) -> Subscription:
-    """Обновляет время последнего суточного списания и продлевает подписку на 1 день."""
-    now = charge_time or datetime.now(UTC)
+def apply_daily_charge_time(subscription: Subscription, now: datetime) -> None:
+    """Отметить суточное списание и продлить подписку на 1 день без коммита."""
     subscription.last_daily_charge_at = now
 
     # Продлеваем подписку на 1 день от текущего момента
@@ -2053,6 +2198,15 @@ async def update_daily_charge_time(
         subscription.end_date = new_end_date
         logger.info('📅 Продлена подписка до', subscription_id=subscription.id, new_end_date=new_end_date)
 
+
+async def update_daily_charge_time(
+    db: AsyncSession,
+    subscription: Subscription,
+    charge_time: datetime = None,
+) -> Subscription:
+    """Обновляет время последнего суточного списания и продлевает подписку на 1 день."""
+    apply_daily_charge_time(subscription, charge_time or datetime.now(UTC))
+
     await db.commit()
     await db.refresh(subscription)
 
@@ -4,6 +4,7 @@ import structlog
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.aggregates import count_where
 from app.database.models import SubscriptionConversion, User
 
 
@@ -56,9 +57,22 @@ async def get_conversion_by_user_id(db: AsyncSession, user_id: int) -> Subscript
 async def get_conversion_statistics(db: AsyncSession) -> dict:
     from app.database.models import Subscription
 
-    # Получаем количество записей о конверсиях в таблице
-    total_conversions_result = await db.execute(select(func.count(SubscriptionConversion.id)))
-    total_conversions = total_conversions_result.scalar() or 0
+    month_ago = datetime.now(UTC) - timedelta(days=30)
+
+    # Счётчики и средние по таблице конверсий — одним проходом
+    conversions_result = await db.execute(
+        select(
+            func.count(SubscriptionConversion.id),
+            func.avg(SubscriptionConversion.trial_duration_days),
+            func.avg(SubscriptionConversion.first_payment_amount_kopeks),
+            count_where(SubscriptionConversion.converted_at >= month_ago),
+        )
+    )
+    total_conversions, avg_trial_duration, avg_first_payment, month_conversions = conversions_result.one()
+    total_conversions = total_conversions or 0
+    avg_trial_duration = avg_trial_duration or 0
+    avg_first_payment = avg_first_payment or 0
+    month_conversions = int(month_conversions or 0)
 
     # Подсчитываем пользователей с платными подписками
     users_with_paid_result = await db.execute(select(func.count(User.id)).where(User.has_had_paid_subscription == True))
@@ -76,18 +90,6 @@ async def get_conversion_statistics(db: AsyncSession) -> dict:
     else:
         conversion_rate = 0.0
 
-    avg_trial_duration_result = await db.execute(select(func.avg(SubscriptionConversion.trial_duration_days)))
-    avg_trial_duration = avg_trial_duration_result.scalar() or 0
-
-    avg_first_payment_result = await db.execute(select(func.avg(SubscriptionConversion.first_payment_amount_kopeks)))
-    avg_first_payment = avg_first_payment_result.scalar() or 0
-
-    month_ago = datetime.now(UTC) - timedelta(days=30)
-    month_conversions_result = await db.execute(
-        select(func.count(SubscriptionConversion.id)).where(SubscriptionConversion.converted_at >= month_ago)
-    )
-    month_conversions = month_conversions_result.scalar() or 0
-
     logger.info('📊 Статистика конверсий:')
     logger.info('Всего пользователей с подписками', total_users_with_subscriptions=total_users_with_subscriptions)
     logger.info('Оплативших подписку', users_with_paid=users_with_paid)
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, Subscription, Tariff
+from app.utils.cache import PRICING_CATALOG_NAMESPACE, cache
 
 
 logger = structlog.get_logger(__name__)
@@ -109,6 +110,7 @@ async def set_trial_tariff(db: AsyncSession, tariff_id: int) -> Tariff | None:
         tariff.is_trial_available = True
         await db.commit()
         await db.refresh(tariff)
+        await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     return tariff
 
@@ -117,6 +119,7 @@ async def clear_trial_tariff(db: AsyncSession) -> None:
     """Снимает флаг триала со всех тарифов."""
     await db.execute(Tariff.__table__.update().values(is_trial_available=False))
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
 
 async def get_tariffs_for_user(
@@ -238,6 +241,7 @@ async def create_tariff(
 
     await db.commit()
     await db.refresh(tariff)
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info(
         "Создан тариф '' (id tier traffic=GB, devices prices=)",
@@ -363,6 +367,7 @@ async def update_tariff(
 
     await db.commit()
     await db.refresh(tariff)
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info("Обновлен тариф '' (id=)", tariff_name=tariff.name, tariff_id=tariff.id)
 
@@ -386,6 +391,7 @@ async def delete_tariff(db: AsyncSession, tariff: Tariff) -> bool:
     # Удаляем тариф (FK с ondelete=SET NULL автоматически обнулит tariff_id в подписках)
     await db.delete(tariff)
     await db.commit()
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     logger.info(
         "Удален тариф '' (id=), затронуто подписок",
@@ -418,6 +424,7 @@ async def set_tariff_promo_groups(
 
     await db.commit()
     await db.refresh(tariff)
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     return tariff
 
@@ -435,6 +442,7 @@ async def add_promo_group_to_tariff(
     if promo_group not in tariff.allowed_promo_groups:
         tariff.allowed_promo_groups.append(promo_group)
         await db.commit()
+        await cache.invalidate(PRICING_CATALOG_NAMESPACE)
 
     return True
 
@@ -449,6 +457,7 @@ async def remove_promo_group_from_tariff(
         if pg.id == promo_group_id:
             tariff.allowed_promo_groups.remove(pg)
             await db.commit()
+            await cache.invalidate(PRICING_CATALOG_NAMESPACE)
             return True
     return False
 
@@ -540,6 +549,7 @@ async def sync_default_tariff_from_config(db: AsyncSession) -> Tariff | None:
         db.add(new_tariff)
         await db.commit()
         await db.refresh(new_tariff)
+        await cache.invalidate(PRICING_CATALOG_NAMESPACE)
         logger.info("Создан дефолтный тариф 'Стандартный' из конфига", period_prices=period_prices)
         return new_tariff
 
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import UTC, date, datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import TrafficDailyCollection, TrafficDailyUsage
+
+
+async def replace_traffic_day(
+    db: AsyncSession,
+    day: date,
+    totals: dict[tuple[str, str], int],
+) -> TrafficDailyCollection:
+    """Перезаписать статистику за сутки и отметить их собранными.
+
+    ``totals`` — {(user_uuid, node_uuid): bytes}. Выполняется одной транзакцией,
+    поэтому читатели видят либо старые, либо новые данные за сутки целиком.
+    """
+    await db.execute(delete(TrafficDailyUsage).where(TrafficDailyUsage.day == day))
+
+    rows = [
+        {'day': day, 'user_uuid': user_uuid, 'node_uuid': node_uuid, 'total_bytes': total}
+        for (user_uuid, node_uuid), total in totals.items()
+        if total > 0
+    ]
+    if rows:
+        await db.execute(TrafficDailyUsage.__table__.insert(), rows)
+
+    collection = await db.get(TrafficDailyCollection, day)
+    if collection is None:
+        collection = TrafficDailyCollection(day=day)
+        db.add(collection)
+    collection.rows_count = len(rows)
+    collection.total_bytes = sum(row['total_bytes'] for row in rows)
+    collection.collected_at = datetime.now(UTC)
+
+    await db.commit()
+    return collection
+
+
+async def get_collected_traffic_days(db: AsyncSession, start_day: date, end_day: date) -> dict[date, datetime | None]:
+    """Собранные сутки в диапазоне [start_day, end_day]: {day: collected_at}."""
+    result = await db.execute(
+        select(TrafficDailyCollection.day, TrafficDailyCollection.collected_at).where(
+            TrafficDailyCollection.day >= start_day,
+            TrafficDailyCollection.day <= end_day,
+        )
+    )
+    return {day: collected_at for day, collected_at in result.all()}
+
+
+async def get_traffic_totals(
+    db: AsyncSession,
+    days: Iterable[date],
+    user_uuids: Iterable[str] | None = None,
+) -> dict[str, dict[str, int]]:
+    """Суммарный трафик за указанные сутки: {user_uuid: {node_uuid: bytes}}."""
+    days = sorted(set(days))
+    if not days:
+        return {}
+
+    query = (
+        select(
+            TrafficDailyUsage.user_uuid,
+            TrafficDailyUsage.node_uuid,
+            func.sum(TrafficDailyUsage.total_bytes),
+        )
+        .where(TrafficDailyUsage.day.in_(days))
+        .group_by(TrafficDailyUsage.user_uuid, TrafficDailyUsage.node_uuid)
+    )
+    if user_uuids is not None:
+        query = query.where(TrafficDailyUsage.user_uuid.in_(list(user_uuids)))
+
+    result = await db.execute(query)
+
+    totals: dict[str, dict[str, int]] = {}
+    for user_uuid, node_uuid, total in result.all():
+        if total:
+            totals.setdefault(user_uuid, {})[node_uuid] = int(total)
+    return totals
+
+
+async def delete_traffic_days_before(db: AsyncSession, day: date) -> int:
+    """Удалить статистику старше указанных суток."""
+    result = await db.execute(delete(TrafficDailyUsage).where(TrafficDailyUsage.day < day))
+    await db.execute(delete(TrafficDailyCollection).where(TrafficDailyCollection.day < day))
+    await db.commit()
+    return result.rowcount or 0
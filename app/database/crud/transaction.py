@@ -5,7 +5,8 @@ from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database.models import PaymentMethod, Transaction, TransactionType, User
+from app.database.aggregates import count_where, sum_where
+from app.database.models import PaymentMethod, Transaction, TransactionType, User, UserSpendingStats
 
 
 logger = structlog.get_logger(__name__)
@@ -149,16 +150,9 @@ async def get_user_transactions_count(
 
 
 async def get_user_total_spent_kopeks(db: AsyncSession, user_id: int) -> int:
-    result = await db.execute(
-        select(func.coalesce(func.sum(func.abs(Transaction.amount_kopeks)), 0)).where(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.is_completed.is_(True),
-                Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
-            )
-        )
-    )
-    return int(result.scalar_one())
+    # Свёртка user_spending_stats обновляется при записи транзакций — чтение по первичному ключу
+    result = await db.execute(select(UserSpendingStats.total_spent_kopeks).where(UserSpendingStats.user_id == user_id))
+    return int(result.scalar_one_or_none() or 0)
 
 
 async def complete_transaction(db: AsyncSession, transaction: Transaction) -> Transaction:
@@ -202,103 +196,62 @@ async def get_transactions_statistics(
     if not end_date:
         end_date = datetime.now(UTC)
 
-    # Доход считаем только по реальным платежам (исключаем колесо, промокоды, админские пополнения)
-    income_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.DEPOSIT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-                Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
-            )
-        )
+    today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    in_period = and_(Transaction.created_at >= start_date, Transaction.created_at <= end_date)
+    is_today = Transaction.created_at >= today
+    # Нижняя граница прохода покрывает и период, и сегодняшний день
+    scan_from = min(start_date, today if start_date.tzinfo else today.replace(tzinfo=None))
+    is_real_income = and_(
+        Transaction.type == TransactionType.DEPOSIT.value,
+        Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
     )
-    total_income = income_result.scalar()
 
-    expenses_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.WITHDRAWAL.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-            )
-        )
+    # Доход считаем только по реальным платежам (исключаем колесо, промокоды, админские пополнения).
+    # Итоги за период и за сегодня — одним проходом по завершённым транзакциям
+    totals_result = await db.execute(
+        select(
+            sum_where(Transaction.amount_kopeks, and_(in_period, is_real_income)),
+            sum_where(
+                Transaction.amount_kopeks,
+                and_(in_period, Transaction.type == TransactionType.WITHDRAWAL.value),
+            ),
+            sum_where(
+                func.abs(Transaction.amount_kopeks),
+                and_(in_period, Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value),
+            ),
+            count_where(is_today),
+            sum_where(Transaction.amount_kopeks, and_(is_today, is_real_income)),
+        ).where(Transaction.is_completed == True, Transaction.created_at >= scan_from)
     )
-    total_expenses = expenses_result.scalar()
-
-    subscription_income_result = await db.execute(
-        select(func.coalesce(func.sum(func.abs(Transaction.amount_kopeks)), 0)).where(
-            and_(
-                Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-            )
-        )
+    total_income, total_expenses, subscription_income, transactions_today, income_today = (
+        int(value or 0) for value in totals_result.one()
     )
-    subscription_income = subscription_income_result.scalar()
 
-    transactions_count_result = await db.execute(
+    # Разбивки по типам и по способам оплаты пополнений — из одной группировки
+    breakdown_result = await db.execute(
         select(
             Transaction.type,
-            func.count(Transaction.id).label('count'),
-            func.coalesce(func.sum(Transaction.amount_kopeks), 0).label('total_amount'),
-        )
-        .where(
-            and_(
-                Transaction.is_completed == True,
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-            )
-        )
-        .group_by(Transaction.type)
-    )
-    transactions_by_type = {
-        row.type: {'count': row.count, 'amount': row.total_amount} for row in transactions_count_result
-    }
-
-    payment_methods_result = await db.execute(
-        select(
             Transaction.payment_method,
             func.count(Transaction.id).label('count'),
             func.coalesce(func.sum(Transaction.amount_kopeks), 0).label('total_amount'),
         )
         .where(
             and_(
-                Transaction.type == TransactionType.DEPOSIT.value,
                 Transaction.is_completed == True,
                 Transaction.created_at >= start_date,
                 Transaction.created_at <= end_date,
             )
         )
-        .group_by(Transaction.payment_method)
-    )
-    payment_methods = {
-        row.payment_method: {'count': row.count, 'amount': row.total_amount} for row in payment_methods_result
-    }
-
-    today = datetime.now(UTC).date()
-    today_result = await db.execute(
-        select(func.count(Transaction.id)).where(
-            and_(Transaction.is_completed == True, Transaction.created_at >= today)
-        )
-    )
-    transactions_today = today_result.scalar()
-
-    # Доход за сегодня - только реальные платежи
-    today_income_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(
-                Transaction.type == TransactionType.DEPOSIT.value,
-                Transaction.is_completed == True,
-                Transaction.created_at >= today,
-                Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
-            )
-        )
+        .group_by(Transaction.type, Transaction.payment_method)
     )
-    income_today = today_income_result.scalar()
+    transactions_by_type: dict[str, dict[str, int]] = {}
+    payment_methods: dict[str | None, dict[str, int]] = {}
+    for row in breakdown_result:
+        type_totals = transactions_by_type.setdefault(row.type, {'count': 0, 'amount': 0})
+        type_totals['count'] += row.count
+        type_totals['amount'] += row.total_amount
+        if row.type == TransactionType.DEPOSIT.value:
+            payment_methods[row.payment_method] = {'count': row.count, 'amount': row.total_amount}
 
     return {
         'period': {'start_date': start_date, 'end_date': end_date},
@@ -3,25 +3,28 @@ import string
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from sqlalchemy import and_, case, func, nullslast, or_, select, text
+from sqlalchemy import and_, func, nullslast, or_, select, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database.aggregates import count_where
 from app.database.crud.discount_offer import get_latest_claimed_offer_for_user
 from app.database.crud.promo_group import get_default_promo_group
 from app.database.crud.promo_offer_log import log_promo_offer_action
+from app.database.crud.user_search import build_user_search_condition, build_user_search_rank, get_dialect_name
 from app.database.models import (
     PaymentMethod,
     PromoGroup,
     Subscription,
     SubscriptionStatus,
-    Transaction,
     TransactionType,
     User,
     UserPromoGroup,
+    UserSpendingStats,
     UserStatus,
 )
+from app.utils.pagination import KeysetColumn, KeysetCursor, KeysetPage, paginate_keyset
 from app.utils.validators import sanitize_telegram_name
 
 
@@ -35,47 +38,6 @@ def _normalize_language_code(language: str | None, fallback: str = 'ru') -> str:
     return normalized or fallback
 
 
-def _build_spending_stats_select():
-    """
-    Возвращает базовый SELECT для статистики трат пользователей.
-
-    Используется в:
-    - get_users_list() для сортировки по тратам/покупкам
-    - get_users_spending_stats() для получения статистики
-
-    Returns:
-        Tuple колонок (user_id, total_spent, purchase_count)
-    """
-
-    return (
-        Transaction.user_id.label('user_id'),
-        func.coalesce(
-            func.sum(
-                case(
-                    (
-                        Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
-                        Transaction.amount_kopeks,
-                    ),
-                    else_=0,
-                )
-            ),
-            0,
-        ).label('total_spent'),
-        func.coalesce(
-            func.sum(
-                case(
-                    (
-                        Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
-                        1,
-                    ),
-                    else_=0,
-                )
-            ),
-            0,
-        ).label('purchase_count'),
-    )
-
-
 def generate_referral_code() -> str:
     alphabet = string.ascii_letters + string.digits
     code_suffix = ''.join(secrets.choice(alphabet) for _ in range(8))
@@ -705,6 +667,23 @@ async def cleanup_expired_promo_offer_discounts(db: AsyncSession) -> int:
     return len(users)
 
 
+def _apply_users_filters(
+    query, *, search: str | None, email: str | None, status: UserStatus | None, dialect: str = 'postgresql'
+):
+    if status:
+        query = query.where(User.status == status.value)
+
+    if search:
+        condition = build_user_search_condition(search, dialect)
+        if condition is not None:
+            query = query.where(condition)
+
+    if email:
+        query = query.where(User.email.ilike(f'%{email}%'))
+
+    return query
+
+
 async def get_users_list(
     db: AsyncSession,
     offset: int = 0,
@@ -724,31 +703,7 @@ async def get_users_list(
         selectinload(User.referrer),
     )
 
-    if status:
-        query = query.where(User.status == status.value)
-
-    if search:
-        search_term = f'%{search}%'
-        conditions = [
-            User.first_name.ilike(search_term),
-            User.last_name.ilike(search_term),
-            User.username.ilike(search_term),
-        ]
-
-        if search.isdigit():
-            try:
-                search_int = int(search)
-                # Добавляем условие поиска по telegram_id, который является BigInteger
-                # и может содержать большие значения, в отличие от User.id (INTEGER)
-                conditions.append(User.telegram_id == search_int)
-            except ValueError:
-                # Если не удалось преобразовать в int, просто ищем по текстовым полям
-                pass
-
-        query = query.where(or_(*conditions))
-
-    if email:
-        query = query.where(User.email.ilike(f'%{email}%'))
+    query = _apply_users_filters(query, search=search, email=email, status=status, dialect=get_dialect_name(db))
 
     sort_flags = [
         order_by_balance,
@@ -762,32 +717,23 @@ async def get_users_list(
             'Выбрано несколько сортировок пользователей — применяется приоритет: трафик > траты > покупки > баланс > активность'
         )
 
-    transactions_stats = None
     if order_by_total_spent or order_by_purchase_count:
-        from app.database.models import Transaction
-
-        transactions_stats = (
-            select(*_build_spending_stats_select())
-            .where(Transaction.is_completed.is_(True))
-            .group_by(Transaction.user_id)
-            .subquery()
-        )
-        query = query.outerjoin(transactions_stats, transactions_stats.c.user_id == User.id)
+        query = query.outerjoin(UserSpendingStats, UserSpendingStats.user_id == User.id)
 
     if order_by_traffic:
         traffic_sort = func.coalesce(Subscription.traffic_used_gb, 0.0)
         query = query.outerjoin(Subscription, Subscription.user_id == User.id)
         query = query.order_by(traffic_sort.desc(), User.created_at.desc())
     elif order_by_total_spent:
-        order_column = func.coalesce(transactions_stats.c.total_spent, 0)
-        query = query.order_by(order_column.desc(), User.created_at.desc())
+        query = query.order_by(nullslast(UserSpendingStats.total_spent_kopeks.desc()), User.created_at.desc())
     elif order_by_purchase_count:
-        order_column = func.coalesce(transactions_stats.c.purchase_count, 0)
-        query = query.order_by(order_column.desc(), User.created_at.desc())
+        query = query.order_by(nullslast(UserSpendingStats.purchase_count.desc()), User.created_at.desc())
     elif order_by_balance:
         query = query.order_by(User.balance_kopeks.desc(), User.created_at.desc())
     elif order_by_last_activity:
         query = query.order_by(nullslast(User.last_activity.desc()), User.created_at.desc())
+    elif search:
+        query = query.order_by(build_user_search_rank(search, get_dialect_name(db)), User.created_at.desc())
     else:
         query = query.order_by(User.created_at.desc())
 
@@ -805,36 +751,35 @@ async def get_users_list(
     return users
 
 
+# Новые сверху: id выдаётся по порядку регистрации и, в отличие от created_at, уникален и NOT NULL
+USERS_KEYSET_ORDER = [KeysetColumn(User.id, descending=True)]
+
+
+async def get_users_page(
+    db: AsyncSession,
+    *,
+    limit: int = 50,
+    cursor: KeysetCursor | str | None = None,
+    search: str | None = None,
+    email: str | None = None,
+    status: UserStatus | None = None,
+) -> KeysetPage[User]:
+    """Страница пользователей (новые сверху) по курсору — без OFFSET, глубина страницы не влияет на скорость."""
+    query = select(User).options(
+        selectinload(User.subscription).selectinload(Subscription.tariff),
+        selectinload(User.promo_group),
+        selectinload(User.referrer),
+    )
+    query = _apply_users_filters(query, search=search, email=email, status=status, dialect=get_dialect_name(db))
+    return await paginate_keyset(db, query, USERS_KEYSET_ORDER, limit=limit, cursor=cursor)
+
+
 async def get_users_count(
     db: AsyncSession, status: UserStatus | None = None, search: str | None = None, email: str | None = None
 ) -> int:
     query = select(func.count(User.id))
 
-    if status:
-        query = query.where(User.status == status.value)
-
-    if search:
-        search_term = f'%{search}%'
-        conditions = [
-            User.first_name.ilike(search_term),
-            User.last_name.ilike(search_term),
-            User.username.ilike(search_term),
-        ]
-
-        if search.isdigit():
-            try:
-                search_int = int(search)
-                # Добавляем условие поиска по telegram_id, который является BigInteger
-                # и может содержать большие значения, в отличие от User.id (INTEGER)
-                conditions.append(User.telegram_id == search_int)
-            except ValueError:
-                # Если не удалось преобразовать в int, просто ищем по текстовым полям
-                pass
-
-        query = query.where(or_(*conditions))
-
-    if email:
-        query = query.where(User.email.ilike(f'%{email}%'))
+    query = _apply_users_filters(query, search=search, email=email, status=status, dialect=get_dialect_name(db))
 
     result = await db.execute(query)
     return result.scalar()
@@ -854,24 +799,20 @@ async def get_users_spending_stats(db: AsyncSession, user_ids: list[int]) -> dic
     if not user_ids:
         return {}
 
-    stats_query = (
-        select(*_build_spending_stats_select())
-        .where(
-            Transaction.user_id.in_(user_ids),
-            Transaction.is_completed.is_(True),
-        )
-        .group_by(Transaction.user_id)
+    result = await db.execute(
+        select(
+            UserSpendingStats.user_id,
+            UserSpendingStats.total_spent_kopeks,
+            UserSpendingStats.purchase_count,
+        ).where(UserSpendingStats.user_id.in_(user_ids))
     )
 
-    result = await db.execute(stats_query)
-    rows = result.all()
-
     return {
-        row.user_id: {
-            'total_spent': int(row.total_spent or 0),
-            'purchase_count': int(row.purchase_count or 0),
+        user_id: {
+            'total_spent': int(total_spent or 0),
+            'purchase_count': int(purchase_count or 0),
         }
-        for row in rows
+        for user_id, total_spent, purchase_count in result.all()
     }
 
 
@@ -995,29 +936,20 @@ async def delete_user(db: AsyncSession, user: User) -> bool:
 
 
 async def get_users_statistics(db: AsyncSession) -> dict:
-    total_result = await db.execute(select(func.count(User.id)))
-    total_users = total_result.scalar()
-
-    active_result = await db.execute(select(func.count(User.id)).where(User.status == UserStatus.ACTIVE.value))
-    active_users = active_result.scalar()
-
-    today = datetime.now(UTC).date()
-    today_result = await db.execute(
-        select(func.count(User.id)).where(and_(User.created_at >= today, User.status == UserStatus.ACTIVE.value))
-    )
-    new_today = today_result.scalar()
-
-    week_ago = datetime.now(UTC) - timedelta(days=7)
-    week_result = await db.execute(
-        select(func.count(User.id)).where(and_(User.created_at >= week_ago, User.status == UserStatus.ACTIVE.value))
-    )
-    new_week = week_result.scalar()
+    now = datetime.now(UTC)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    is_active = User.status == UserStatus.ACTIVE.value
 
-    month_ago = datetime.now(UTC) - timedelta(days=30)
-    month_result = await db.execute(
-        select(func.count(User.id)).where(and_(User.created_at >= month_ago, User.status == UserStatus.ACTIVE.value))
+    result = await db.execute(
+        select(
+            func.count(User.id),
+            count_where(is_active),
+            count_where(and_(is_active, User.created_at >= today)),
+            count_where(and_(is_active, User.created_at >= now - timedelta(days=7))),
+            count_where(and_(is_active, User.created_at >= now - timedelta(days=30))),
+        )
     )
-    new_month = month_result.scalar()
+    total_users, active_users, new_today, new_week, new_month = (int(value or 0) for value in result.one())
 
     return {
         'total_users': total_users,
@@ -5,13 +5,19 @@ import structlog
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.database import AsyncSessionLocal
 from app.database.models import User, UserMessage
+from app.utils.cache import USER_MESSAGES_NAMESPACE, cache
 from app.utils.validators import sanitize_html, validate_html_tags
 
 
 logger = structlog.get_logger(__name__)
 
 
+# Список сбрасывается при изменении сообщений; срок жизни страхует от правок в обход CRUD
+ACTIVE_MESSAGES_CACHE_SECONDS = 3600
+
+
 async def create_user_message(
     db: AsyncSession, message_text: str, created_by: int | None = None, is_active: bool = True, sort_order: int = 0
 ) -> UserMessage:
@@ -35,6 +41,7 @@ async def create_user_message(
     db.add(message)
     await db.commit()
     await db.refresh(message)
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
 
     logger.info('✅ Создано сообщение ID пользователем', message_id=message.id, created_by=created_by)
     return message
@@ -54,14 +61,26 @@ async def get_active_user_messages(db: AsyncSession) -> list[UserMessage]:
     return result.scalars().all()
 
 
+async def _load_active_message_texts() -> list[str]:
+    # Загрузка переживает отмену вызвавшего запроса и делится между ожидающими,
+    # поэтому работает в собственной сессии, а не в сессии запроса
+    async with AsyncSessionLocal() as db:
+        messages = await get_active_user_messages(db)
+    return [sanitize_html(message.message_text) for message in messages]
+
+
 async def get_random_active_message(db: AsyncSession) -> str | None:
-    active_messages = await get_active_user_messages(db)
+    active_messages = await cache.get_or_load(
+        USER_MESSAGES_NAMESPACE,
+        'active',
+        _load_active_message_texts,
+        expire=ACTIVE_MESSAGES_CACHE_SECONDS,
+    )
 
     if not active_messages:
         return None
 
-    random_message = random.choice(active_messages)
-    return sanitize_html(random_message.message_text)
+    return random.choice(active_messages)
 
 
 async def get_all_user_messages(
@@ -115,6 +134,7 @@ async def update_user_message(
 
     await db.commit()
     await db.refresh(message)
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
 
     logger.info('📝 Обновлено сообщение ID', message_id=message_id)
     return message
@@ -131,6 +151,7 @@ async def toggle_user_message_status(db: AsyncSession, message_id: int) -> UserM
 
     await db.commit()
     await db.refresh(message)
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
 
     status_text = 'активировано' if message.is_active else 'деактивировано'
     logger.info('🔄 Сообщение ID', message_id=message_id, status_text=status_text)
@@ -146,6 +167,7 @@ async def delete_user_message(db: AsyncSession, message_id: int) -> bool:
 
     await db.delete(message)
     await db.commit()
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
 
     logger.info('🗑️ Удалено сообщение ID', message_id=message_id)
     return True
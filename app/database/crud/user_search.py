@@ -0,0 +1,121 @@
+"""Поиск пользователей для админки.
+
+PostgreSQL: подстрочный поиск ``ILIKE '%term%'`` по имени, фамилии, username
+и email обслуживается GIN-индексами ``pg_trgm``, результаты ранжируются по
+``similarity``. Другие СУБД: поиск по префиксу слова в нормализованной колонке
+``users.search_text`` (нижний регистр, поля через пробел) с обычным индексом.
+Числовой запрос ищется только по ``telegram_id``/``id`` — по первичным индексам.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import and_, case, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.database.models import Subscription, User, UserStatus
+
+
+# Короче трёх символов триграммы не помогают — такие запросы ищем по префиксу
+TRIGRAM_MIN_LENGTH = 3
+_MAX_INT32 = 2**31 - 1
+
+_SEARCH_COLUMNS = (User.first_name, User.last_name, User.username, User.email)
+
+
+def normalize_search_term(term: str) -> str:
+    normalized = ' '.join(term.strip().lower().split())
+    return normalized.removeprefix('@')
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_numeric_search(term: str) -> int | None:
+    candidate = term.strip()
+    if candidate.isdigit():
+        return int(candidate)
+    return None
+
+
+def build_user_search_condition(term: str, dialect: str):
+    """Условие WHERE для поискового запроса (None — пустой запрос)."""
+    numeric = parse_numeric_search(term)
+    if numeric is not None:
+        conditions = [User.telegram_id == numeric]
+        if numeric <= _MAX_INT32:
+            conditions.append(User.id == numeric)
+        return or_(*conditions)
+
+    normalized = normalize_search_term(term)
+    if not normalized:
+        return None
+    escaped = _escape_like(normalized)
+
+    if dialect == 'postgresql':
+        pattern = f'%{escaped}%' if len(normalized) >= TRIGRAM_MIN_LENGTH else f'{escaped}%'
+        return or_(*(column.ilike(pattern, escape='\\') for column in _SEARCH_COLUMNS))
+
+    # Префикс любого слова: начало строки или после пробела
+    return or_(
+        User.search_text.like(f'{escaped}%', escape='\\'),
+        User.search_text.like(f'% {escaped}%', escape='\\'),
+    )
+
+
+def build_user_search_rank(term: str, dialect: str):
+    """Выражение для ORDER BY: чем меньше, тем релевантнее."""
+    if parse_numeric_search(term) is not None:
+        return literal(0)
+
+    normalized = normalize_search_term(term)
+    if dialect == 'postgresql':
+        similarity = func.greatest(
+            *(func.similarity(func.coalesce(column, ''), normalized) for column in _SEARCH_COLUMNS)
+        )
+        return -similarity
+
+    return case((User.search_text.like(f'{_escape_like(normalized)}%', escape='\\'), 0), else_=1)
+
+
+def get_dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+async def search_users(
+    db: AsyncSession,
+    term: str,
+    *,
+    limit: int = 20,
+    offset: int = 0,
+    status: UserStatus | None = None,
+) -> tuple[list[User], int]:
+    """Ранжированная страница результатов и общее число совпадений одним запросом."""
+    dialect = get_dialect_name(db)
+    condition = build_user_search_condition(term, dialect)
+    if condition is None:
+        return [], 0
+
+    total_column = func.count().over().label('total_count')
+    query = select(User, total_column).options(
+        selectinload(User.subscription).selectinload(Subscription.tariff),
+        selectinload(User.promo_group),
+    )
+    if status:
+        condition = and_(condition, User.status == status.value)
+    query = query.where(condition)
+
+    query = query.order_by(build_user_search_rank(term, dialect), User.created_at.desc(), User.id.desc())
+    result = await db.execute(query.offset(offset).limit(limit))
+    rows = result.all()
+
+    if rows:
+        return [row[0] for row in rows], int(rows[0][1])
+
+    if offset == 0:
+        return [], 0
+
+    # Страница за пределами выборки: окно не вернуло строк, считаем отдельно
+    total = await db.scalar(select(func.count(User.id)).where(condition))
+    return [], int(total or 0)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import UTC, datetime
+
+import structlog
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Transaction, TransactionType, UserSpendingStats
+
+
+logger = structlog.get_logger(__name__)
+
+
+async def get_user_spending_stats(db: AsyncSession, user_id: int) -> UserSpendingStats | None:
+    return await db.get(UserSpendingStats, user_id)
+
+
+async def reset_user_spending_stats(db: AsyncSession, user_id: int) -> None:
+    """Сбросить свёртку трат пользователя (вместе с массовым удалением его транзакций)."""
+    await db.execute(delete(UserSpendingStats).where(UserSpendingStats.user_id == user_id))
+
+
+async def rebuild_user_spending_stats(db: AsyncSession, user_ids: Iterable[int] | None = None) -> int:
+    """Пересчитать свёртку трат из ``transactions``: для всех пользователей или только для указанных.
+
+    Возвращает число пользователей с тратами после пересчёта.
+    """
+    purchase_filter = [
+        Transaction.is_completed.is_(True),
+        Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
+    ]
+    clear_query = delete(UserSpendingStats)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        purchase_filter.append(Transaction.user_id.in_(user_ids))
+        clear_query = clear_query.where(UserSpendingStats.user_id.in_(user_ids))
+
+    rollup = (
+        select(
+            Transaction.user_id,
+            func.coalesce(func.sum(func.abs(Transaction.amount_kopeks)), 0),
+            func.count(Transaction.id),
+            func.max(func.coalesce(Transaction.completed_at, Transaction.created_at)),
+            literal(datetime.now(UTC), UserSpendingStats.updated_at.type),
+        )
+        .where(*purchase_filter)
+        .group_by(Transaction.user_id)
+    )
+
+    await db.execute(clear_query)
+    await db.execute(
+        UserSpendingStats.__table__.insert().from_select(
+            ['user_id', 'total_spent_kopeks', 'purchase_count', 'last_purchase_at', 'updated_at'],
+            rollup,
+        )
+    )
+    await db.commit()
+
+    count_query = select(func.count()).select_from(UserSpendingStats)
+    if user_ids is not None:
+        count_query = count_query.where(UserSpendingStats.user_id.in_(user_ids))
+    rebuilt = int(await db.scalar(count_query) or 0)
+    logger.info('Свёртка трат пользователей пересчитана', users=rebuilt, partial=user_ids is not None)
+    return rebuilt
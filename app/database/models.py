@@ -17,7 +17,14 @@ from sqlalchemy import (
     Text,
     Time,
     UniqueConstraint,
+    event,
+    inspect,
+    select,
+    text,
 )
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -981,6 +988,9 @@ class User(Base):
     last_activity = Column(DateTime(timezone=True), default=func.now())
     remnawave_uuid = Column(String(255), nullable=True, unique=True)
 
+    # Нормализованные имя/username/email для поиска без pg_trgm (см. crud/user_search.py)
+    search_text = Column(String(1024), nullable=True)
+
     # Cabinet authentication fields
     email = Column(String(255), unique=True, nullable=True, index=True)
     email_verified = Column(Boolean, default=False, nullable=False)
@@ -1104,8 +1114,30 @@ class User(Base):
         return False
 
 
+def build_user_search_text(*parts: str | None) -> str:
+    """Нормализованная строка для поиска: непустые поля в нижнем регистре через пробел."""
+    return ' '.join(part.strip().lower() for part in parts if part and part.strip())
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def _refresh_user_search_text(_mapper, _connection, target: User) -> None:
+    target.search_text = build_user_search_text(target.first_name, target.last_name, target.username, target.email)
+
+
 class Subscription(Base):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # Проверки истечения и уведомления: WHERE status = ... AND end_date < ...
+        Index('ix_subscriptions_status_end_date', 'status', 'end_date'),
+        # Автоплатёж выбирает только подписки с включённым автопродлением
+        Index(
+            'ix_subscriptions_autopay_end_date',
+            'end_date',
+            postgresql_where=text('autopay_enabled = true'),
+            sqlite_where=text('autopay_enabled = 1'),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, unique=True)
@@ -1133,6 +1165,8 @@ class Subscription(Base):
 
     autopay_enabled = Column(Boolean, default=False)
     autopay_days_before = Column(Integer, default=3)
+    # Аренда обработчика автоплатежа: пока не истекла, подписку не захватывают другие
+    autopay_claimed_until = Column(DateTime(timezone=True), nullable=True)
 
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
@@ -1334,8 +1368,52 @@ class TrafficPurchase(Base):
         return datetime.now(UTC) >= self.expires_at
 
 
+class TrafficDailyUsage(Base):
+    """Суточный трафик пользователя на ноде (локальная копия статистики панели)."""
+
+    __tablename__ = 'traffic_daily_usage'
+    __table_args__ = (
+        UniqueConstraint('day', 'user_uuid', 'node_uuid', name='uq_traffic_daily_usage_day_user_node'),
+        Index('ix_traffic_daily_usage_user_day', 'user_uuid', 'day'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)  # Сутки по UTC
+    user_uuid = Column(String(64), nullable=False)
+    node_uuid = Column(String(64), nullable=False)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+
+
+class TrafficDailyCollection(Base):
+    """Отметка о том, что статистика за сутки собрана полностью."""
+
+    __tablename__ = 'traffic_daily_collections'
+
+    day = Column(Date, primary_key=True)
+    rows_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    collected_at = Column(DateTime(timezone=True), default=func.now())
+
+
 class Transaction(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # История и траты пользователя, суммы пополнений кампаний и промогрупп
+        Index('ix_transactions_user_created', 'user_id', 'created_at'),
+        # Статистика дохода: WHERE type = ... AND is_completed AND created_at BETWEEN ...
+        Index('ix_transactions_type_completed_created', 'type', 'is_completed', 'created_at'),
+        Index('ix_transactions_payment_method', 'payment_method'),
+        # Поиск по id платежа
+        Index('ix_transactions_external_id', 'external_id'),
+        # Одно суточное списание на период; id платежей провайдеров могут повторяться, поэтому индекс частичный
+        Index(
+            'uq_transactions_daily_billing_key',
+            'external_id',
+            unique=True,
+            postgresql_where=text("external_id LIKE 'daily:%'"),
+            sqlite_where=text("external_id LIKE 'daily:%'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -1363,6 +1441,154 @@ class Transaction(Base):
         return self.amount_kopeks / 100
 
 
+class UserSpendingStats(Base):
+    """Накопленные траты пользователя на подписки (свёртка завершённых транзакций)."""
+
+    __tablename__ = 'user_spending_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_spent_kopeks = Column(BigInteger, nullable=False, default=0, index=True)
+    purchase_count = Column(Integer, nullable=False, default=0, index=True)
+    last_purchase_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+
+def _spending_contribution(type_value: str | None, amount_kopeks: int | None, is_completed: bool | None):
+    """Вклад транзакции в свёртку: (сумма, число покупок). Учитываются завершённые оплаты подписок."""
+    if is_completed and type_value == TransactionType.SUBSCRIPTION_PAYMENT.value:
+        return abs(amount_kopeks or 0), 1
+    return 0, 0
+
+
+_SPENDING_ATTRIBUTES = ('user_id', 'type', 'amount_kopeks', 'is_completed')
+
+
+def _spending_state(connection, target: Transaction) -> tuple[dict, dict]:
+    """Значения полей транзакции до и после изменения.
+
+    Если старое значение не загружено (объект истёк после commit), оно читается
+    из строки в БД тем же соединением — без ленивой загрузки через сессию.
+    """
+    state = inspect(target)
+    old: dict = {}
+    new: dict = {}
+    unknown = False
+    for name in _SPENDING_ATTRIBUTES:
+        history = state.attrs[name].history
+        if history.deleted:
+            old[name] = history.deleted[0]
+        elif history.unchanged:
+            old[name] = history.unchanged[0]
+        else:
+            unknown = True
+        if history.added:
+            new[name] = history.added[0]
+
+    if unknown:
+        table = Transaction.__table__
+        row = connection.execute(
+            select(*(table.c[name] for name in _SPENDING_ATTRIBUTES)).where(table.c.id == target.id)
+        ).one()
+        for name, value in zip(_SPENDING_ATTRIBUTES, row, strict=True):
+            old.setdefault(name, value)
+
+    return old, {name: new.get(name, old[name]) for name in _SPENDING_ATTRIBUTES}
+
+
+def _apply_spending_delta(connection, user_id: int, amount_delta: int, count_delta: int, purchased_at) -> None:
+    """Изменить свёртку трат в транзакции текущего flush (upsert по user_id)."""
+    values = {
+        'user_id': user_id,
+        'total_spent_kopeks': amount_delta,
+        'purchase_count': count_delta,
+        'last_purchase_at': purchased_at if count_delta > 0 else None,
+        'updated_at': datetime.now(UTC),
+    }
+    table = UserSpendingStats.__table__
+    updates = {
+        'total_spent_kopeks': table.c.total_spent_kopeks + amount_delta,
+        'purchase_count': table.c.purchase_count + count_delta,
+        'last_purchase_at': values['last_purchase_at'] if count_delta > 0 else table.c.last_purchase_at,
+        'updated_at': values['updated_at'],
+    }
+
+    dialect_name = connection.dialect.name
+    if dialect_name == 'mysql':
+        statement = mysql_insert(table).values(**values).on_duplicate_key_update(**updates)
+    else:
+        dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+        statement = (
+            dialect_insert(table).values(**values).on_conflict_do_update(index_elements=['user_id'], set_=updates)
+        )
+    connection.execute(statement)
+
+
+@event.listens_for(Transaction, 'after_insert')
+def _add_transaction_to_spending(_mapper, connection, target: Transaction) -> None:
+    amount, count = _spending_contribution(target.type, target.amount_kopeks, target.is_completed)
+    if count:
+        _apply_spending_delta(connection, target.user_id, amount, count, target.completed_at or datetime.now(UTC))
+
+
+@event.listens_for(Transaction, 'before_update')
+def _update_transaction_spending(_mapper, connection, target: Transaction) -> None:
+    old, new = _spending_state(connection, target)
+    old_amount, old_count = _spending_contribution(old['type'], old['amount_kopeks'], old['is_completed'])
+    new_amount, new_count = _spending_contribution(new['type'], new['amount_kopeks'], new['is_completed'])
+    if old['user_id'] != new['user_id']:
+        if old_count:
+            _apply_spending_delta(connection, old['user_id'], -old_amount, -old_count, None)
+        old_amount, old_count = 0, 0
+    if (old_amount, old_count) != (new_amount, new_count):
+        _apply_spending_delta(
+            connection,
+            new['user_id'],
+            new_amount - old_amount,
+            new_count - old_count,
+            inspect(target).dict.get('completed_at') or datetime.now(UTC),
+        )
+
+
+@event.listens_for(Transaction, 'before_delete')
+def _remove_transaction_from_spending(_mapper, connection, target: Transaction) -> None:
+    old, _ = _spending_state(connection, target)
+    amount, count = _spending_contribution(old['type'], old['amount_kopeks'], old['is_completed'])
+    if count:
+        _apply_spending_delta(connection, old['user_id'], -amount, -count, None)
+
+
+class PaymentWebhookEventStatus(Enum):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+
+
+class PaymentWebhookEvent(Base):
+    """Входящий webhook платёжного провайдера, принятый в очередь на обработку."""
+
+    __tablename__ = 'payment_webhook_events'
+    __table_args__ = (
+        # Повторная доставка того же события провайдером не создаёт новую запись
+        UniqueConstraint('provider', 'event_key', name='uq_payment_webhook_events_provider_key'),
+        # Выборка обработчиком: WHERE status IN (...) AND next_attempt_at <= now ORDER BY id
+        Index('ix_payment_webhook_events_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(32), nullable=False)
+    event_key = Column(String(255), nullable=False)
+    handler = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(16), nullable=False, default=PaymentWebhookEventStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+
 class SubscriptionConversion(Base):
     __tablename__ = 'subscription_conversions'
 
@@ -0,0 +1,251 @@
+"""Снимок схемы БД для быстрых проверок при запуске.
+
+Универсальная миграция выполняет сотни проверок вида «есть ли таблица /
+колонка / индекс». Вместо отдельного запроса к каталогу на каждую проверку
+схема загружается несколькими запросами и проверки отвечают из памяти.
+Положительные ответы берутся из снимка, отрицательные перепроверяются живым
+запросом, а после DDL с DROP/RENAME снимок перечитывается перед следующей
+проверкой.
+
+Отпечаток схемы (хеш кода миграции и содержимого снимка) сохраняется в
+``system_settings``: при совпадении отпечатка проход миграции можно пропустить.
+"""
+
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import structlog
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+logger = structlog.get_logger(__name__)
+
+
+SCHEMA_FINGERPRINT_SETTING_KEY = 'UNIVERSAL_MIGRATION_FINGERPRINT'
+
+_DESTRUCTIVE_DDL_RE = re.compile(r'^\s*(DROP\b|ALTER\b.*\b(DROP|RENAME)\b)', re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class SchemaSnapshot:
+    """Таблицы, колонки, индексы и ограничения схемы на момент загрузки."""
+
+    dialect: str
+    tables: set[str] = field(default_factory=set)
+    columns: dict[str, dict[str, str]] = field(default_factory=dict)
+    indexes: dict[str, set[str]] = field(default_factory=dict)
+    # None означает, что ограничения для диалекта не загружались
+    constraints: dict[str, set[str]] | None = None
+    load_seconds: float = 0.0
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name in self.tables
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        return column_name in self.columns.get(table_name, {})
+
+    def has_index(self, table_name: str, index_name: str) -> bool:
+        return index_name in self.indexes.get(table_name, ())
+
+    def has_constraint(self, table_name: str, constraint_name: str) -> bool | None:
+        if self.constraints is None:
+            return None
+        return constraint_name in self.constraints.get(table_name, ())
+
+    def canonical_lines(self) -> list[str]:
+        lines = [f'dialect:{self.dialect}']
+        for table in sorted(self.tables):
+            lines.append(f'table:{table}')
+            lines.extend(
+                f'column:{table}.{column}:{data_type}'
+                for column, data_type in sorted(self.columns.get(table, {}).items())
+            )
+            lines.extend(f'index:{table}.{index}' for index in sorted(self.indexes.get(table, ())))
+            if self.constraints is not None:
+                lines.extend(f'constraint:{table}.{name}' for name in sorted(self.constraints.get(table, ())))
+        return lines
+
+
+async def _load_postgresql(conn: AsyncConnection, snapshot: SchemaSnapshot) -> None:
+    result = await conn.execute(text("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"))
+    snapshot.tables = {row[0] for row in result}
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            """
+        )
+    )
+    for table_name, column_name, data_type in result:
+        snapshot.columns.setdefault(table_name, {})[column_name] = str(data_type)
+
+    result = await conn.execute(text("SELECT tablename, indexname FROM pg_indexes WHERE schemaname = 'public'"))
+    for table_name, index_name in result:
+        snapshot.indexes.setdefault(table_name, set()).add(index_name)
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT table_name, constraint_name
+            FROM information_schema.table_constraints
+            WHERE table_schema = 'public'
+            """
+        )
+    )
+    snapshot.constraints = {}
+    for table_name, constraint_name in result:
+        snapshot.constraints.setdefault(table_name, set()).add(constraint_name)
+
+
+async def _load_mysql(conn: AsyncConnection, snapshot: SchemaSnapshot) -> None:
+    result = await conn.execute(
+        text('SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()')
+    )
+    snapshot.tables = {row[0] for row in result}
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            """
+        )
+    )
+    for table_name, column_name, data_type in result:
+        snapshot.columns.setdefault(table_name, {})[column_name] = str(data_type)
+
+    result = await conn.execute(
+        text('SELECT table_name, index_name FROM information_schema.statistics WHERE table_schema = DATABASE()')
+    )
+    for table_name, index_name in result:
+        snapshot.indexes.setdefault(table_name, set()).add(index_name)
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT table_name, constraint_name
+            FROM information_schema.table_constraints
+            WHERE table_schema = DATABASE()
+            """
+        )
+    )
+    snapshot.constraints = {}
+    for table_name, constraint_name in result:
+        snapshot.constraints.setdefault(table_name, set()).add(constraint_name)
+
+
+async def _load_sqlite(conn: AsyncConnection, snapshot: SchemaSnapshot) -> None:
+    result = await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+    snapshot.tables = {row[0] for row in result}
+
+    for table_name in snapshot.tables:
+        quoted = table_name.replace('"', '""')
+        result = await conn.execute(text(f'PRAGMA table_info("{quoted}")'))
+        snapshot.columns[table_name] = {row[1]: str(row[2]) for row in result}
+
+        result = await conn.execute(text(f'PRAGMA index_list("{quoted}")'))
+        snapshot.indexes[table_name] = {row[1] for row in result}
+
+
+_LOADERS = {
+    'postgresql': _load_postgresql,
+    'mysql': _load_mysql,
+    'sqlite': _load_sqlite,
+}
+
+
+async def load_schema_snapshot(engine: AsyncEngine) -> SchemaSnapshot:
+    """Загрузить снимок схемы несколькими запросами к каталогу."""
+    dialect = engine.dialect.name
+    snapshot = SchemaSnapshot(dialect=dialect)
+    loader = _LOADERS.get(dialect)
+
+    started_at = time.perf_counter()
+    if loader is not None:
+        async with engine.connect() as conn:
+            await loader(conn, snapshot)
+    snapshot.load_seconds = time.perf_counter() - started_at
+    return snapshot
+
+
+def compute_schema_fingerprint(snapshot: SchemaSnapshot, migration_source: Path) -> str:
+    """Хеш кода миграции и содержимого схемы."""
+    digest = hashlib.sha256()
+    digest.update(migration_source.read_bytes())
+    for line in snapshot.canonical_lines():
+        digest.update(line.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class SchemaSnapshotTracker:
+    """Активный снимок схемы на время прохода миграции.
+
+    Следит за DDL на движке: после DROP/RENAME снимок помечается устаревшим
+    и перечитывается при следующей проверке.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self._engine = engine
+        self._snapshot: SchemaSnapshot | None = None
+        self._stale = False
+        self._listening = False
+        self.snapshot_hits = 0
+        self.live_queries = 0
+        self.reloads = 0
+        self.load_seconds = 0.0
+
+    @property
+    def is_active(self) -> bool:
+        return self._snapshot is not None
+
+    async def activate(self) -> SchemaSnapshot:
+        self.snapshot_hits = 0
+        self.live_queries = 0
+        self.reloads = 0
+        self.load_seconds = 0.0
+        snapshot = await self.reload()
+        if not self._listening:
+            event.listen(self._engine.sync_engine, 'before_cursor_execute', self._on_before_cursor_execute)
+            self._listening = True
+        return snapshot
+
+    def deactivate(self) -> None:
+        if self._listening:
+            event.remove(self._engine.sync_engine, 'before_cursor_execute', self._on_before_cursor_execute)
+            self._listening = False
+        self._snapshot = None
+        self._stale = False
+
+    async def get(self) -> SchemaSnapshot | None:
+        if self._snapshot is None:
+            return None
+        if self._stale:
+            await self.reload()
+            self.reloads += 1
+        return self._snapshot
+
+    def record_hit(self) -> None:
+        self.snapshot_hits += 1
+
+    def record_live_query(self) -> None:
+        self.live_queries += 1
+
+    async def reload(self) -> SchemaSnapshot:
+        snapshot = await load_schema_snapshot(self._engine)
+        self.load_seconds += snapshot.load_seconds
+        self._snapshot = snapshot
+        self._stale = False
+        return snapshot
+
+    def _on_before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self._snapshot is not None and isinstance(statement, str) and _DESTRUCTIVE_DDL_RE.match(statement):
+            self._stale = True
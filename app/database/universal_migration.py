@@ -1,17 +1,60 @@
+import time
+from dataclasses import dataclass
 from datetime import UTC, datetime
+from pathlib import Path
 
 import structlog
 from sqlalchemy import select, text
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal, engine
-from app.database.models import WebApiToken
+from app.database.models import (
+    PaymentWebhookEvent,
+    Subscription,
+    SystemSetting,
+    Transaction,
+    UserSpendingStats,
+    WebApiToken,
+)
+from app.database.schema_snapshot import (
+    SCHEMA_FINGERPRINT_SETTING_KEY,
+    SchemaSnapshotTracker,
+    compute_schema_fingerprint,
+)
 from app.utils.security import hash_api_token
 
 
 logger = structlog.get_logger(__name__)
 
 
+_schema_tracker = SchemaSnapshotTracker(engine)
+
+# Маркер того, что свёртка трат однажды заполнена из истории транзакций
+SPENDING_STATS_INITIALIZED_SETTING_KEY = 'SPENDING_STATS_INITIALIZED'
+
+
+@dataclass
+class MigrationReport:
+    """Итоги последнего запуска универсальной миграции."""
+
+    skipped: bool = False
+    success: bool = False
+    snapshot_seconds: float = 0.0
+    fingerprint_seconds: float = 0.0
+    pass_seconds: float = 0.0
+    snapshot_hits: int = 0
+    live_queries: int = 0
+    snapshot_reloads: int = 0
+    fingerprint: str | None = None
+
+
+_last_migration_report: MigrationReport | None = None
+
+
+def get_last_migration_report() -> MigrationReport | None:
+    return _last_migration_report
+
+
 async def get_database_type():
     return engine.dialect.name
 
@@ -102,6 +145,13 @@ async def sync_postgres_sequences() -> bool:
 
 
 async def check_table_exists(table_name: str) -> bool:
+    snapshot = await _schema_tracker.get()
+    if snapshot is not None:
+        if snapshot.has_table(table_name):
+            _schema_tracker.record_hit()
+            return True
+        _schema_tracker.record_live_query()
+
     try:
         async with engine.begin() as conn:
             db_type = await get_database_type()
@@ -143,6 +193,13 @@ async def check_table_exists(table_name: str) -> bool:
 
 
 async def check_column_exists(table_name: str, column_name: str) -> bool:
+    snapshot = await _schema_tracker.get()
+    if snapshot is not None:
+        if snapshot.has_column(table_name, column_name):
+            _schema_tracker.record_hit()
+            return True
+        _schema_tracker.record_live_query()
+
     try:
         async with engine.begin() as conn:
             db_type = await get_database_type()
@@ -184,6 +241,13 @@ async def check_column_exists(table_name: str, column_name: str) -> bool:
 
 
 async def check_constraint_exists(table_name: str, constraint_name: str) -> bool:
+    snapshot = await _schema_tracker.get()
+    if snapshot is not None:
+        if snapshot.has_constraint(table_name, constraint_name):
+            _schema_tracker.record_hit()
+            return True
+        _schema_tracker.record_live_query()
+
     try:
         async with engine.begin() as conn:
             db_type = await get_database_type()
@@ -236,6 +300,13 @@ async def check_constraint_exists(table_name: str, constraint_name: str) -> bool
 
 
 async def check_index_exists(table_name: str, index_name: str) -> bool:
+    snapshot = await _schema_tracker.get()
+    if snapshot is not None:
+        if snapshot.has_index(table_name, index_name):
+            _schema_tracker.record_hit()
+            return True
+        _schema_tracker.record_live_query()
+
     try:
         async with engine.begin() as conn:
             db_type = await get_database_type()
@@ -5313,6 +5384,218 @@ async def create_traffic_purchases_table() -> bool:
         return False
 
 
+async def ensure_user_search_indexes() -> bool:
+    """Индексы поиска пользователей: pg_trgm GIN для PostgreSQL, search_text для остальных СУБД."""
+    try:
+        db_type = await get_database_type()
+
+        if not await check_column_exists('users', 'search_text'):
+            async with engine.begin() as conn:
+                await conn.execute(text('ALTER TABLE users ADD COLUMN search_text VARCHAR(1024) NULL'))
+            logger.info('✅ Добавлена колонка users.search_text')
+
+        # Заполняем колонку для пользователей, созданных до её появления
+        if db_type == 'sqlite':
+            parts = " || ' ' || ".join(
+                f"COALESCE({column}, '')" for column in ('first_name', 'last_name', 'username', 'email')
+            )
+            search_text_sql = f'LOWER(TRIM({parts}))'
+        else:
+            search_text_sql = "LOWER(CONCAT_WS(' ', first_name, last_name, username, email))"
+        async with engine.begin() as conn:
+            await conn.execute(text(f'UPDATE users SET search_text = {search_text_sql} WHERE search_text IS NULL'))
+
+        if db_type == 'postgresql':
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            except Exception as error:
+                logger.warning(
+                    '⚠️ Расширение pg_trgm недоступно, поиск пользователей без триграммных индексов', error=error
+                )
+                return True
+
+            for column in ('first_name', 'last_name', 'username', 'email'):
+                index_name = f'ix_users_{column}_trgm'
+                if await check_index_exists('users', index_name):
+                    continue
+                async with engine.begin() as conn:
+                    await conn.execute(text(f'CREATE INDEX {index_name} ON users USING gin ({column} gin_trgm_ops)'))
+                logger.info('✅ Создан триграммный индекс', index_name=index_name)
+        elif not await check_index_exists('users', 'ix_users_search_text'):
+            async with engine.begin() as conn:
+                await conn.execute(text('CREATE INDEX ix_users_search_text ON users(search_text)'))
+            logger.info('✅ Создан индекс ix_users_search_text')
+
+        return True
+    except Exception as error:
+        logger.error('❌ Ошибка создания индексов поиска пользователей', error=error)
+        return False
+
+
+HOT_PATH_INDEXES = (
+    'ix_transactions_user_created',
+    'ix_transactions_type_completed_created',
+    'ix_transactions_payment_method',
+    'ix_transactions_external_id',
+    'ix_subscriptions_status_end_date',
+    'ix_subscriptions_autopay_end_date',
+    # Последним: при дублях суточных списаний в старых данных остальные индексы уже созданы
+    'uq_transactions_daily_billing_key',
+)
+
+
+async def ensure_hot_path_indexes() -> bool:
+    """Составные и частичные индексы для статистики транзакций и проверок истечения подписок."""
+    indexes = {
+        index.name: index
+        for table in (Transaction.__table__, Subscription.__table__)
+        for index in table.indexes
+        if index.name in HOT_PATH_INDEXES
+    }
+    try:
+        for index_name in HOT_PATH_INDEXES:
+            index = indexes[index_name]
+            if await check_index_exists(index.table.name, index_name):
+                continue
+            # DDL строится из модели: частичные условия применяются только там, где СУБД их поддерживает
+            async with engine.begin() as conn:
+                await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+            logger.info('✅ Создан индекс', index_name=index_name, table=index.table.name)
+        return True
+    except Exception as error:
+        logger.error('❌ Ошибка создания индексов горячих запросов', error=error)
+        return False
+
+
+async def create_traffic_daily_usage_tables() -> bool:
+    """Создаёт таблицы локального хранилища суточного трафика."""
+    try:
+        db_type = await get_database_type()
+
+        if not await check_table_exists('traffic_daily_usage'):
+            if db_type == 'sqlite':
+                id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+            elif db_type == 'postgresql':
+                id_column = 'id SERIAL PRIMARY KEY'
+            else:
+                id_column = 'id INT AUTO_INCREMENT PRIMARY KEY'
+
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        f"""
+                        CREATE TABLE traffic_daily_usage (
+                            {id_column},
+                            day DATE NOT NULL,
+                            user_uuid VARCHAR(64) NOT NULL,
+                            node_uuid VARCHAR(64) NOT NULL,
+                            total_bytes BIGINT NOT NULL DEFAULT 0,
+                            CONSTRAINT uq_traffic_daily_usage_day_user_node UNIQUE (day, user_uuid, node_uuid)
+                        )
+                        """
+                    )
+                )
+                await conn.execute(text('CREATE INDEX ix_traffic_daily_usage_day ON traffic_daily_usage(day)'))
+                await conn.execute(
+                    text('CREATE INDEX ix_traffic_daily_usage_user_day ON traffic_daily_usage(user_uuid, day)')
+                )
+            logger.info('✅ Таблица traffic_daily_usage создана')
+        else:
+            logger.info('ℹ️ Таблица traffic_daily_usage уже существует')
+
+        if not await check_table_exists('traffic_daily_collections'):
+            collected_at_type = 'TIMESTAMP WITH TIME ZONE' if db_type == 'postgresql' else 'DATETIME'
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        f"""
+                        CREATE TABLE traffic_daily_collections (
+                            day DATE PRIMARY KEY,
+                            rows_count INTEGER NOT NULL DEFAULT 0,
+                            total_bytes BIGINT NOT NULL DEFAULT 0,
+                            collected_at {collected_at_type} NULL
+                        )
+                        """
+                    )
+                )
+            logger.info('✅ Таблица traffic_daily_collections создана')
+
+        return True
+    except Exception as error:
+        logger.error('❌ Ошибка создания таблиц суточного трафика', error=error)
+        return False
+
+
+async def create_user_spending_stats_table() -> bool:
+    """Создаёт свёртку трат пользователей и заполняет её из истории транзакций.
+
+    Таблицу обычно уже создаёт ``init_db`` (пустой), поэтому заполнение не
+    зависит от того, кто её создал: оно выполняется, пока не выставлен маркер
+    ``SPENDING_STATS_INITIALIZED`` или свёртка пуста.
+    """
+    try:
+        if await check_table_exists('user_spending_stats'):
+            logger.info('ℹ️ Таблица user_spending_stats уже существует')
+        else:
+            db_type = await get_database_type()
+            timestamp_type = 'TIMESTAMP WITH TIME ZONE' if db_type == 'postgresql' else 'DATETIME'
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        f"""
+                        CREATE TABLE user_spending_stats (
+                            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                            total_spent_kopeks BIGINT NOT NULL DEFAULT 0,
+                            purchase_count INTEGER NOT NULL DEFAULT 0,
+                            last_purchase_at {timestamp_type} NULL,
+                            updated_at {timestamp_type} NULL
+                        )
+                        """
+                    )
+                )
+                await conn.execute(
+                    text(
+                        'CREATE INDEX ix_user_spending_stats_total_spent_kopeks '
+                        'ON user_spending_stats(total_spent_kopeks)'
+                    )
+                )
+                await conn.execute(
+                    text('CREATE INDEX ix_user_spending_stats_purchase_count ON user_spending_stats(purchase_count)')
+                )
+            logger.info('✅ Таблица user_spending_stats создана')
+
+        return await _backfill_user_spending_stats()
+    except Exception as error:
+        logger.error('❌ Ошибка создания таблицы user_spending_stats', error=error)
+        return False
+
+
+async def _backfill_user_spending_stats() -> bool:
+    from app.database.crud.system_setting import upsert_system_setting
+    from app.database.crud.user_spending_stats import rebuild_user_spending_stats
+
+    async with AsyncSessionLocal() as session:
+        marker = await session.scalar(
+            select(SystemSetting.value).where(SystemSetting.key == SPENDING_STATS_INITIALIZED_SETTING_KEY)
+        )
+        has_rows = await session.scalar(select(UserSpendingStats.user_id).limit(1)) is not None
+        if marker and has_rows:
+            return True
+
+        users_count = await rebuild_user_spending_stats(session)
+        await upsert_system_setting(
+            session,
+            SPENDING_STATS_INITIALIZED_SETTING_KEY,
+            datetime.now(UTC).isoformat(),
+            description='Свёртка трат пользователей заполнена из истории транзакций',
+        )
+        await session.commit()
+
+    logger.info('✅ Свёртка трат заполнена из истории транзакций', users=users_count)
+    return True
+
+
 # =============================================================================
 # МИГРАЦИИ ДЛЯ РЕЖИМА ТАРИФОВ
 # =============================================================================
@@ -5474,6 +5757,51 @@ async def ensure_tariff_max_device_limit_column() -> bool:
         return False
 
 
+async def create_payment_webhook_events_table() -> bool:
+    """Создаёт очередь входящих webhook платёжных провайдеров."""
+    try:
+        if await check_table_exists('payment_webhook_events'):
+            logger.info('ℹ️ Таблица payment_webhook_events уже существует')
+            return True
+
+        # DDL строится из модели: уникальный ключ и индекс очереди создаются вместе с таблицей
+        table = PaymentWebhookEvent.__table__
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda sync_conn: table.create(sync_conn, checkfirst=True))
+        logger.info('✅ Таблица payment_webhook_events создана')
+        return True
+    except Exception as error:
+        logger.error('❌ Ошибка создания таблицы payment_webhook_events', error=error)
+        return False
+
+
+async def add_subscription_autopay_claim_column() -> bool:
+    """Добавляет колонку autopay_claimed_until (аренда обработчика автоплатежа) в subscriptions."""
+    try:
+        if await check_column_exists('subscriptions', 'autopay_claimed_until'):
+            logger.info('ℹ️ Колонка autopay_claimed_until уже существует в subscriptions')
+            return True
+
+        async with engine.begin() as conn:
+            db_type = await get_database_type()
+
+            if db_type == 'postgresql':
+                await conn.execute(
+                    text('ALTER TABLE subscriptions ADD COLUMN autopay_claimed_until TIMESTAMP WITH TIME ZONE NULL')
+                )
+            elif db_type == 'sqlite':
+                await conn.execute(text('ALTER TABLE subscriptions ADD COLUMN autopay_claimed_until DATETIME NULL'))
+            else:  # MySQL
+                await conn.execute(text('ALTER TABLE subscriptions ADD COLUMN autopay_claimed_until DATETIME NULL'))
+
+            logger.info('✅ Колонка autopay_claimed_until добавлена в subscriptions')
+            return True
+
+    except Exception as error:
+        logger.error('❌ Ошибка добавления колонки autopay_claimed_until', error=error)
+        return False
+
+
 async def add_subscription_tariff_id_column() -> bool:
     """Добавляет колонку tariff_id в таблицу subscriptions."""
     try:
@@ -6511,7 +6839,122 @@ async def migrate_datetime_to_timestamptz() -> bool:
         return False
 
 
-async def run_universal_migration():
+async def _load_schema_fingerprint() -> str | None:
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(SystemSetting.value).where(SystemSetting.key == SCHEMA_FINGERPRINT_SETTING_KEY)
+            )
+            return result.scalar_one_or_none()
+    except Exception as error:
+        # Таблицы system_settings может ещё не быть
+        logger.debug('Не удалось прочитать отпечаток схемы', error=error)
+        return None
+
+
+async def _store_schema_fingerprint(fingerprint: str) -> None:
+    from app.database.crud.system_setting import upsert_system_setting
+
+    try:
+        async with AsyncSessionLocal() as session:
+            await upsert_system_setting(
+                session,
+                SCHEMA_FINGERPRINT_SETTING_KEY,
+                fingerprint,
+                description='Отпечаток схемы после универсальной миграции',
+            )
+            await session.commit()
+    except Exception as error:
+        logger.warning('Не удалось сохранить отпечаток схемы', error=error)
+
+
+async def _run_data_steps() -> bool:
+    """Шаги полного прохода, которые зависят от настроек и данных, а не от схемы.
+
+    Выполняются и тогда, когда проход пропущен по отпечатку: иначе изменение
+    ``WEB_API_DEFAULT_TOKEN`` или появившиеся данные не учитывались бы до
+    следующего изменения схемы. Порядок повторяет полный проход.
+    """
+    steps = (
+        ('web_api_token', ensure_default_web_api_token),
+        ('discount_offer_effect_types', migrate_discount_offer_effect_types),
+        ('discount_offer_bonuses', reset_discount_offer_bonuses),
+        ('user_promo_groups_data', migrate_existing_user_promo_groups_data),
+        ('promo_groups', ensure_promo_groups_setup),
+        ('server_promo_groups', ensure_server_promo_groups_setup),
+        ('user_spending_stats', _backfill_user_spending_stats),
+        ('subscription_duplicates', fix_subscription_duplicates_universal),
+    )
+
+    success = True
+    for name, step in steps:
+        try:
+            result = await step()
+        except Exception as error:
+            logger.error('❌ Ошибка шага миграции данных', step=name, error=error)
+            success = False
+            continue
+        if result is False:
+            logger.warning('⚠️ Шаг миграции данных завершился с ошибкой', step=name)
+            success = False
+    return success
+
+
+async def run_universal_migration() -> bool:
+    """Выполнить универсальную миграцию с кешированной интроспекцией схемы.
+
+    Если отпечаток схемы и кода миграции совпадает с сохранённым после
+    прошлого успешного прохода, проход по схеме пропускается; шаги, зависящие
+    от настроек и данных (``_run_data_steps``), выполняются всегда.
+    """
+    global _last_migration_report
+
+    report = MigrationReport()
+    _last_migration_report = report
+    migration_source = Path(__file__)
+
+    try:
+        snapshot = await _schema_tracker.activate()
+        report.snapshot_seconds = snapshot.load_seconds
+
+        if settings.UNIVERSAL_MIGRATION_FINGERPRINT_ENABLED:
+            started_at = time.perf_counter()
+            current_fingerprint = compute_schema_fingerprint(snapshot, migration_source)
+            stored_fingerprint = await _load_schema_fingerprint()
+            report.fingerprint_seconds = time.perf_counter() - started_at
+
+            if stored_fingerprint and stored_fingerprint == current_fingerprint:
+                logger.info('Схема БД не изменилась с последней миграции, проход пропущен')
+                report.skipped = True
+                report.fingerprint = current_fingerprint
+                if engine.dialect.name == 'postgresql':
+                    await sync_postgres_sequences()
+                report.success = await _run_data_steps()
+                if not report.success:
+                    logger.error('❌ Проход схемы пропущен, но шаги миграции данных завершились с ошибками')
+                return report.success
+
+        started_at = time.perf_counter()
+        try:
+            report.success = bool(await _run_migration_pass())
+        finally:
+            report.pass_seconds = time.perf_counter() - started_at
+
+        if report.success and settings.UNIVERSAL_MIGRATION_FINGERPRINT_ENABLED:
+            final_snapshot = await _schema_tracker.reload()
+            report.fingerprint = compute_schema_fingerprint(final_snapshot, migration_source)
+            await _store_schema_fingerprint(report.fingerprint)
+
+        return report.success
+    finally:
+        report.snapshot_seconds = _schema_tracker.load_seconds
+        report.snapshot_hits = _schema_tracker.snapshot_hits
+        report.live_queries = _schema_tracker.live_queries
+        report.snapshot_reloads = _schema_tracker.reloads
+        _schema_tracker.deactivate()
+
+
+async def _run_migration_pass():
     logger.info('=== НАЧАЛО УНИВЕРСАЛЬНОЙ МИГРАЦИИ ===')
 
     try:
@@ -7019,6 +7462,46 @@ async def run_universal_migration():
         else:
             logger.warning('⚠️ Проблемы с таблицей traffic_purchases')
 
+        logger.info('=== СОЗДАНИЕ ТАБЛИЦ СУТОЧНОГО ТРАФИКА ===')
+        traffic_daily_ready = await create_traffic_daily_usage_tables()
+        if traffic_daily_ready:
+            logger.info('✅ Таблицы суточного трафика готовы')
+        else:
+            logger.warning('⚠️ Проблемы с таблицами суточного трафика')
+
+        logger.info('=== ИНДЕКСЫ ПОИСКА ПОЛЬЗОВАТЕЛЕЙ ===')
+        user_search_ready = await ensure_user_search_indexes()
+        if user_search_ready:
+            logger.info('✅ Индексы поиска пользователей готовы')
+        else:
+            logger.warning('⚠️ Проблемы с индексами поиска пользователей')
+
+        logger.info('=== СВЁРТКА ТРАТ ПОЛЬЗОВАТЕЛЕЙ ===')
+        spending_stats_ready = await create_user_spending_stats_table()
+        if spending_stats_ready:
+            logger.info('✅ Таблица user_spending_stats готова')
+        else:
+            logger.warning('⚠️ Проблемы с таблицей user_spending_stats')
+
+        logger.info('=== ИНДЕКСЫ ГОРЯЧИХ ЗАПРОСОВ ===')
+        hot_path_indexes_ready = await ensure_hot_path_indexes()
+        if hot_path_indexes_ready:
+            logger.info('✅ Индексы транзакций и подписок готовы')
+        else:
+            logger.warning('⚠️ Проблемы с индексами транзакций и подписок')
+
+        autopay_claim_ready = await add_subscription_autopay_claim_column()
+        if autopay_claim_ready:
+            logger.info('✅ Колонка autopay_claimed_until в subscriptions готова')
+        else:
+            logger.warning('⚠️ Проблемы с колонкой autopay_claimed_until в subscriptions')
+
+        webhook_inbox_ready = await create_payment_webhook_events_table()
+        if webhook_inbox_ready:
+            logger.info('✅ Таблица payment_webhook_events готова')
+        else:
+            logger.warning('⚠️ Проблемы с таблицей payment_webhook_events')
+
         logger.info('=== СОЗДАНИЕ ТАБЛИЦ ДЛЯ РЕЖИМА ТАРИФОВ ===')
         tariffs_table_ready = await create_tariffs_table()
         if tariffs_table_ready:
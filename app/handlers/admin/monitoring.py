@@ -1,5 +1,6 @@
 import asyncio
 from datetime import datetime, timedelta
+from math import ceil
 
 import structlog
 from aiogram import F, Router
@@ -20,7 +21,7 @@ from app.services.traffic_monitoring_service import (
 )
 from app.states import AdminStates
 from app.utils.decorators import admin_required
-from app.utils.pagination import paginate_list
+from app.utils.pagination import keyset_page_callback, parse_keyset_page_callback
 
 
 logger = structlog.get_logger(__name__)
@@ -782,25 +783,31 @@ async def traffic_check_callback(callback: CallbackQuery):
 @admin_required
 async def monitoring_logs_callback(callback: CallbackQuery):
     try:
-        page = 1
-        if '_page_' in callback.data:
-            page = int(callback.data.split('_page_')[1])
+        page, cursor = parse_keyset_page_callback(callback.data)
+        if cursor is None:
+            page = 1
+        per_page = 8
 
         async with AsyncSessionLocal() as db:
-            all_logs = await monitoring_service.get_monitoring_logs(db, limit=1000)
+            logs_page = await monitoring_service.get_monitoring_logs_page(db, limit=per_page, cursor=cursor)
+            if cursor is not None and not logs_page.items:
+                # Логи очищены или курсор устарел — показываем начало
+                page = 1
+                logs_page = await monitoring_service.get_monitoring_logs_page(db, limit=per_page)
 
-            if not all_logs:
+            if not logs_page.items:
                 text = '📋 <b>Логи мониторинга пусты</b>\n\nСистема еще не выполнила проверки.'
                 keyboard = get_monitoring_logs_back_keyboard()
                 await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard)
                 return
 
-            per_page = 8
-            paginated_logs = paginate_list(all_logs, page=page, per_page=per_page)
+            summary = await monitoring_service.get_monitoring_logs_summary(db)
+            total_pages = max(1, ceil(summary['total'] / per_page))
+            page = min(page, total_pages)
 
-            text = f'📋 <b>Логи мониторинга</b> (стр. {page}/{paginated_logs.total_pages})\n\n'
+            text = f'📋 <b>Логи мониторинга</b> (стр. {page}/{total_pages})\n\n'
 
-            for log in paginated_logs.items:
+            for log in logs_page.items:
                 icon = '✅' if log['is_success'] else '❌'
                 time_str = log['created_at'].strftime('%m-%d %H:%M')
                 event_type = log['event_type'].replace('_', ' ').title()
@@ -812,17 +819,26 @@ async def monitoring_logs_callback(callback: CallbackQuery):
                 text += f'{icon} <code>{time_str}</code> {event_type}\n'
                 text += f'   📄 {message}\n\n'
 
-            total_success = sum(1 for log in all_logs if log['is_success'])
-            total_failed = len(all_logs) - total_success
-            success_rate = round(total_success / len(all_logs) * 100, 1) if all_logs else 0
+            total_success = summary['success']
+            total_failed = summary['total'] - total_success
+            success_rate = round(total_success / summary['total'] * 100, 1) if summary['total'] else 0
 
             text += '📊 <b>Общая статистика:</b>\n'
-            text += f'• Всего событий: {len(all_logs)}\n'
+            text += f'• Всего событий: {summary["total"]}\n'
             text += f'• Успешных: {total_success}\n'
             text += f'• Ошибок: {total_failed}\n'
             text += f'• Успешность: {success_rate}%'
 
-            keyboard = get_monitoring_logs_keyboard(page, paginated_logs.total_pages)
+            prev_callback = None
+            next_callback = None
+            if logs_page.has_prev and page > 1:
+                prev_callback = keyset_page_callback(
+                    'admin_mon_logs', page - 1, logs_page.items[0]['id'], backwards=True
+                )
+            if logs_page.has_next:
+                next_callback = keyset_page_callback('admin_mon_logs', page + 1, logs_page.items[-1]['id'])
+
+            keyboard = get_monitoring_logs_keyboard(page, total_pages, prev_callback, next_callback)
             await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard)
 
     except Exception as e:
@@ -935,6 +951,12 @@ async def monitoring_statistics_callback(callback: CallbackQuery):
 • В очереди: {queue_len} чек(ов)"""
                 if queue_len > 0:
                     nalogo_section += f'\n• На сумму: {total_amount:,.2f} ₽'
+                    queue_metrics = nalogo_status.get('queue_metrics') or {}
+                    oldest_age = queue_metrics.get('oldest_age_seconds')
+                    if oldest_age is not None:
+                        nalogo_section += f'\n• Старейший чек ждёт: {oldest_age // 60} мин'
+                    if queue_metrics.get('delayed'):
+                        nalogo_section += f'\n• Ждут повтора: {queue_metrics["delayed"]}'
                 if pending_count > 0:
                     nalogo_section += f'\n⚠️ <b>Требуют проверки: {pending_count} ({pending_amount:,.2f} ₽)</b>'
                 text += nalogo_section
@@ -1582,21 +1604,26 @@ async def receipts_reconcile_logs_details_callback(callback: CallbackQuery):
         await callback.answer(f'❌ Ошибка: {e!s}', show_alert=True)
 
 
-def get_monitoring_logs_keyboard(current_page: int, total_pages: int):
+def get_monitoring_logs_keyboard(
+    current_page: int,
+    total_pages: int,
+    prev_callback: str | None = None,
+    next_callback: str | None = None,
+):
     from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
     keyboard = []
 
-    if total_pages > 1:
+    if prev_callback or next_callback:
         nav_row = []
 
-        if current_page > 1:
-            nav_row.append(InlineKeyboardButton(text='⬅️', callback_data=f'admin_mon_logs_page_{current_page - 1}'))
+        if prev_callback:
+            nav_row.append(InlineKeyboardButton(text='⬅️', callback_data=prev_callback))
 
         nav_row.append(InlineKeyboardButton(text=f'{current_page}/{total_pages}', callback_data='current_page'))
 
-        if current_page < total_pages:
-            nav_row.append(InlineKeyboardButton(text='➡️', callback_data=f'admin_mon_logs_page_{current_page + 1}'))
+        if next_callback:
+            nav_row.append(InlineKeyboardButton(text='➡️', callback_data=next_callback))
 
         keyboard.append(nav_row)
 
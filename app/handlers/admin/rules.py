@@ -220,9 +220,10 @@ async def save_rules(callback: types.CallbackQuery, db_user: User, state: FSMCon
 
         clear_rules_cache()
 
-        from app.localization.texts import refresh_rules_cache
+        from app.localization.texts import broadcast_rules_changed, refresh_rules_cache
 
         await refresh_rules_cache(db_user.language)
+        await broadcast_rules_changed()
 
         await callback.message.edit_text(
             '✅ <b>Правила сервиса успешно обновлены!</b>\n\n'
@@ -283,9 +284,10 @@ async def confirm_clear_rules(callback: types.CallbackQuery, db_user: User, db:
     try:
         await clear_all_rules(db, db_user.language)
 
-        from app.localization.texts import clear_rules_cache
+        from app.localization.texts import broadcast_rules_changed, clear_rules_cache
 
         clear_rules_cache()
+        await broadcast_rules_changed()
 
         await callback.message.edit_text(
             '✅ <b>Правила успешно очищены!</b>\n\n'
@@ -20,7 +20,7 @@ from app.database.crud.server_squad import (
 from app.database.models import User
 from app.services.remnawave_service import RemnaWaveService
 from app.states import AdminStates
-from app.utils.cache import cache
+from app.utils.cache import AVAILABLE_COUNTRIES_NAMESPACE, cache
 from app.utils.decorators import admin_required, error_handler
 
 
@@ -236,7 +236,7 @@ async def sync_servers_with_remnawave(callback: types.CallbackQuery, db_user: Us
 
         created, updated, removed = await sync_with_remnawave(db, squads)
 
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
         text = f"""
 ✅ <b>Синхронизация завершена</b>
@@ -433,7 +433,7 @@ async def toggle_server_availability(callback: types.CallbackQuery, db_user: Use
     new_status = not server.is_available
     await update_server_squad(db, server_id, is_available=new_status)
 
-    await cache.delete_pattern('available_countries*')
+    await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
     status_text = 'включен' if new_status else 'отключен'
     await callback.answer(f'✅ Сервер {status_text}!')
@@ -521,7 +521,7 @@ async def process_server_price_edit(message: types.Message, state: FSMContext, d
         if server:
             await state.clear()
 
-            await cache.delete_pattern('available_countries*')
+            await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
             price_text = f'{int(price_rubles)} ₽' if price_kopeks > 0 else 'Бесплатно'
             await message.answer(
@@ -592,7 +592,7 @@ async def process_server_name_edit(message: types.Message, state: FSMContext, db
     if server:
         await state.clear()
 
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
         await message.answer(
             f'✅ Название сервера изменено на: <b>{new_name}</b>',
@@ -655,7 +655,7 @@ async def delete_server_execute(callback: types.CallbackQuery, db_user: User, db
     success = await delete_server_squad(db, server_id)
 
     if success:
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
         await callback.message.edit_text(
             f'✅ Сервер <b>{server.display_name}</b> успешно удален!',
@@ -771,7 +771,7 @@ async def process_server_country_edit(message: types.Message, state: FSMContext,
     if server:
         await state.clear()
 
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
 
         country_text = new_country or 'Удален'
         await message.answer(
@@ -912,7 +912,7 @@ async def process_server_description_edit(message: types.Message, state: FSMCont
         await state.clear()
 
         desc_text = new_description or 'Удалено'
-        await cache.delete_pattern('available_countries*')
+        await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
         await message.answer(
             f'✅ Описание сервера изменено:\n\n<i>{desc_text}</i>',
             reply_markup=types.InlineKeyboardMarkup(
@@ -1049,7 +1049,7 @@ async def save_server_promo_groups(
         await callback.answer('❌ Сервер не найден', show_alert=True)
         return
 
-    await cache.delete_pattern('available_countries*')
+    await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
     await state.clear()
 
     text, keyboard = _build_server_edit_view(server)
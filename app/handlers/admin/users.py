@@ -47,6 +47,7 @@ from app.services.user_service import UserService
 from app.states import AdminStates
 from app.utils.decorators import admin_required, error_handler
 from app.utils.formatters import format_datetime, format_time_ago
+from app.utils.pagination import KeysetCursor, keyset_page_callback, parse_keyset_page_callback
 from app.utils.subscription_utils import (
     resolve_hwid_device_limit_for_payload,
 )
@@ -290,13 +291,22 @@ async def show_users_filters(callback: types.CallbackQuery, db_user: User, state
 @admin_required
 @error_handler
 async def show_users_list(
-    callback: types.CallbackQuery, db_user: User, db: AsyncSession, state: FSMContext, page: int = 1
+    callback: types.CallbackQuery,
+    db_user: User,
+    db: AsyncSession,
+    state: FSMContext,
+    page: int = 1,
+    cursor: KeysetCursor | None = None,
 ):
     # Сбрасываем состояние, так как мы в обычном списке
     await state.set_state(None)
 
     user_service = UserService()
-    users_data = await user_service.get_users_page(db, page=page, limit=10)
+    users_data = await user_service.get_users_page(db, page=page, limit=10, cursor=cursor)
+    if cursor is not None and not users_data['users']:
+        # Пользователи удалены или курсор устарел — показываем начало списка
+        page = 1
+        users_data = await user_service.get_users_page(db, page=page, limit=10)
 
     if not users_data['users']:
         await callback.message.edit_text(
@@ -347,10 +357,28 @@ async def show_users_list(
 
         keyboard.append([types.InlineKeyboardButton(text=button_text, callback_data=f'admin_user_manage_{user.id}')])
 
-    if users_data['total_pages'] > 1:
-        pagination_row = get_admin_pagination_keyboard(
-            users_data['current_page'], users_data['total_pages'], 'admin_users_list', 'admin_users', db_user.language
-        ).inline_keyboard[0]
+    # Переход по страницам — курсором по id крайнего пользователя, без OFFSET
+    users = users_data['users']
+    pagination_row = []
+    if users_data['has_prev']:
+        pagination_row.append(
+            types.InlineKeyboardButton(
+                text='⬅️', callback_data=keyset_page_callback('admin_users_list', page - 1, users[0].id, backwards=True)
+            )
+        )
+    if pagination_row or users_data['has_next']:
+        pagination_row.append(
+            types.InlineKeyboardButton(
+                text=f'{page}/{max(page, users_data["total_pages"])}', callback_data='current_page'
+            )
+        )
+    if users_data['has_next']:
+        pagination_row.append(
+            types.InlineKeyboardButton(
+                text='➡️', callback_data=keyset_page_callback('admin_users_list', page + 1, users[-1].id)
+            )
+        )
+    if pagination_row:
         keyboard.append(pagination_row)
 
     keyboard.extend(
@@ -641,12 +669,11 @@ async def handle_users_list_pagination_fixed(
     callback: types.CallbackQuery, db_user: User, db: AsyncSession, state: FSMContext
 ):
     try:
-        callback_parts = callback.data.split('_')
-        page = int(callback_parts[-1])
-        await show_users_list(callback, db_user, db, state, page)
-    except (ValueError, IndexError) as e:
+        page, cursor = parse_keyset_page_callback(callback.data)
+    except ValueError as e:
         logger.error('Ошибка парсинга номера страницы', error=e)
-        await show_users_list(callback, db_user, db, state, 1)
+        page, cursor = 1, None
+    await show_users_list(callback, db_user, db, state, page, cursor)
 
 
 @admin_required
@@ -16,6 +16,7 @@ from app.database.crud.promo_group import (
 from app.database.crud.transaction import get_user_total_spent_kopeks
 from app.database.crud.user import update_user
 from app.database.crud.user_message import get_random_active_message
+from app.database.database import AsyncSessionLocal
 from app.database.models import PromoGroup, User
 from app.handlers.subscription.traffic import add_traffic, handle_add_traffic
 from app.keyboards.inline import (
@@ -34,12 +35,15 @@ from app.services.subscription_checkout_service import (
 )
 from app.services.support_settings_service import SupportSettingsService
 from app.services.user_cart_service import user_cart_service
+from app.utils.cache import MAIN_MENU_NAMESPACE, cache, cache_key
 from app.utils.photo_message import edit_or_answer_photo
 from app.utils.pricing_utils import format_period_description
 from app.utils.promo_offer import (
     build_promo_offer_hint,
-    build_test_access_hint,
+    load_test_access_state,
+    render_test_access_hint,
 )
+from app.utils.section_timings import SectionTimings, gather_sections
 from app.utils.timezone import format_local_datetime
 
 
@@ -144,6 +148,75 @@ def _build_group_discount_lines(group: PromoGroup, texts, language: str) -> list
     return lines
 
 
+async def _has_saved_cart(user_id: int) -> bool:
+    # Проверяем наличие сохраненной корзины в Redis
+    try:
+        return await user_cart_service.has_user_cart(user_id)
+    except Exception as e:
+        logger.error('Ошибка проверки сохраненной корзины для пользователя', db_user_id=user_id, error=e)
+        return False
+
+
+async def _build_main_menu(db_user: User, texts, db: AsyncSession) -> tuple[str, types.InlineKeyboardMarkup]:
+    """Текст и клавиатура главного меню.
+
+    Запросы к Redis (черновик оформления, корзина) выполняются параллельно с
+    построением текста; обращения к БД идут последовательно в одной сессии и
+    в основном попадают в кеш (тариф, случайное сообщение, раскладка, кнопки).
+    """
+    timings = SectionTimings('Главное меню: время сборки')
+
+    has_active_subscription = bool(db_user.subscription and db_user.subscription.is_active)
+    subscription_is_active = False
+
+    if db_user.subscription:
+        subscription_is_active = db_user.subscription.is_active
+
+    menu_text, draft_exists, has_saved_cart = await gather_sections(
+        timings.run('text', get_main_menu_text(db_user, texts, db)),
+        timings.run('checkout_draft', has_subscription_checkout_draft(db_user.id)),
+        timings.run('cart', _has_saved_cart(db_user.id)),
+    )
+    show_resume_checkout = should_offer_checkout_resume(db_user, draft_exists)
+
+    is_admin = settings.is_admin(db_user.telegram_id)
+    is_moderator = (not is_admin) and SupportSettingsService.is_moderator(db_user.telegram_id)
+
+    custom_buttons = []
+    if not settings.is_text_main_menu_mode():
+        custom_buttons = await timings.run(
+            'buttons',
+            MainMenuButtonService.get_buttons_for_user(
+                db,
+                is_admin=is_admin,
+                has_active_subscription=has_active_subscription,
+                subscription_is_active=subscription_is_active,
+            ),
+        )
+
+    keyboard = await timings.run(
+        'keyboard',
+        get_main_menu_keyboard_async(
+            db=db,
+            user=db_user,
+            language=db_user.language,
+            is_admin=is_admin,
+            is_moderator=is_moderator,
+            has_had_paid_subscription=db_user.has_had_paid_subscription,
+            has_active_subscription=has_active_subscription,
+            subscription_is_active=subscription_is_active,
+            balance_kopeks=db_user.balance_kopeks,
+            subscription=db_user.subscription,
+            show_resume_checkout=show_resume_checkout,
+            has_saved_cart=has_saved_cart,
+            custom_buttons=custom_buttons,
+        ),
+    )
+
+    timings.log(user_id=db_user.id)
+    return menu_text, keyboard
+
+
 async def show_main_menu(
     callback: types.CallbackQuery,
     db_user: User,
@@ -168,51 +241,7 @@ async def show_main_menu(
     db_user.last_activity = datetime.now(UTC)
     await db.commit()
 
-    has_active_subscription = bool(db_user.subscription and db_user.subscription.is_active)
-    subscription_is_active = False
-
-    if db_user.subscription:
-        subscription_is_active = db_user.subscription.is_active
-
-    menu_text = await get_main_menu_text(db_user, texts, db)
-
-    draft_exists = await has_subscription_checkout_draft(db_user.id)
-    show_resume_checkout = should_offer_checkout_resume(db_user, draft_exists)
-
-    # Проверяем наличие сохраненной корзины в Redis
-    try:
-        has_saved_cart = await user_cart_service.has_user_cart(db_user.id)
-    except Exception as e:
-        logger.error('Ошибка проверки сохраненной корзины для пользователя', db_user_id=db_user.id, error=e)
-        has_saved_cart = False
-
-    is_admin = settings.is_admin(db_user.telegram_id)
-    is_moderator = (not is_admin) and SupportSettingsService.is_moderator(db_user.telegram_id)
-
-    custom_buttons = []
-    if not settings.is_text_main_menu_mode():
-        custom_buttons = await MainMenuButtonService.get_buttons_for_user(
-            db,
-            is_admin=is_admin,
-            has_active_subscription=has_active_subscription,
-            subscription_is_active=subscription_is_active,
-        )
-
-    keyboard = await get_main_menu_keyboard_async(
-        db=db,
-        user=db_user,
-        language=db_user.language,
-        is_admin=is_admin,
-        is_moderator=is_moderator,
-        has_had_paid_subscription=db_user.has_had_paid_subscription,
-        has_active_subscription=has_active_subscription,
-        subscription_is_active=subscription_is_active,
-        balance_kopeks=db_user.balance_kopeks,
-        subscription=db_user.subscription,
-        show_resume_checkout=show_resume_checkout,
-        has_saved_cart=has_saved_cart,
-        custom_buttons=custom_buttons,
-    )
+    menu_text, keyboard = await _build_main_menu(db_user, texts, db)
 
     await edit_or_answer_photo(
         callback=callback,
@@ -1014,51 +1043,7 @@ async def handle_back_to_menu(callback: types.CallbackQuery, state: FSMContext,
 
     texts = get_texts(db_user.language)
 
-    has_active_subscription = bool(db_user.subscription and db_user.subscription.is_active)
-    subscription_is_active = False
-
-    if db_user.subscription:
-        subscription_is_active = db_user.subscription.is_active
-
-    menu_text = await get_main_menu_text(db_user, texts, db)
-
-    draft_exists = await has_subscription_checkout_draft(db_user.id)
-    show_resume_checkout = should_offer_checkout_resume(db_user, draft_exists)
-
-    # Проверяем наличие сохраненной корзины в Redis
-    try:
-        has_saved_cart = await user_cart_service.has_user_cart(db_user.id)
-    except Exception as e:
-        logger.error('Ошибка проверки сохраненной корзины для пользователя', db_user_id=db_user.id, error=e)
-        has_saved_cart = False
-
-    is_admin = settings.is_admin(db_user.telegram_id)
-    is_moderator = (not is_admin) and SupportSettingsService.is_moderator(db_user.telegram_id)
-
-    custom_buttons = []
-    if not settings.is_text_main_menu_mode():
-        custom_buttons = await MainMenuButtonService.get_buttons_for_user(
-            db,
-            is_admin=is_admin,
-            has_active_subscription=has_active_subscription,
-            subscription_is_active=subscription_is_active,
-        )
-
-    keyboard = await get_main_menu_keyboard_async(
-        db=db,
-        user=db_user,
-        language=db_user.language,
-        is_admin=is_admin,
-        is_moderator=is_moderator,
-        has_had_paid_subscription=db_user.has_had_paid_subscription,
-        has_active_subscription=has_active_subscription,
-        subscription_is_active=subscription_is_active,
-        balance_kopeks=db_user.balance_kopeks,
-        subscription=db_user.subscription,
-        show_resume_checkout=show_resume_checkout,
-        has_saved_cart=has_saved_cart,
-        custom_buttons=custom_buttons,
-    )
+    menu_text, keyboard = await _build_main_menu(db_user, texts, db)
 
     await edit_or_answer_photo(
         callback=callback,
@@ -1163,6 +1148,25 @@ def _insert_random_message(base_text: str, random_message: str, action_prompt: s
     return f'{base_text}\n\n{random_message}'
 
 
+async def _get_test_access_state(db: AsyncSession, user) -> dict | None:
+    subscription_id = getattr(getattr(user, 'subscription', None), 'id', None)
+    if not subscription_id:
+        return None
+
+    async def load() -> dict:
+        # Собственная сессия: загрузка может пережить запрос, который её запустил
+        async with AsyncSessionLocal() as session:
+            # Пустой словарь вместо None, чтобы кешировалось и отсутствие тестового доступа
+            return await load_test_access_state(session, subscription_id) or {}
+
+    return await cache.get_or_load(
+        MAIN_MENU_NAMESPACE,
+        cache_key('test_access', subscription_id),
+        load,
+        expire=settings.MAIN_MENU_USER_CACHE_SECONDS,
+    )
+
+
 async def get_main_menu_text(user, texts, db: AsyncSession):
     from app.config import settings
 
@@ -1174,9 +1178,9 @@ async def get_main_menu_text(user, texts, db: AsyncSession):
     subscription = getattr(user, 'subscription', None)
     if settings.is_tariffs_mode() and subscription and subscription.tariff_id:
         try:
-            from app.database.crud.tariff import get_tariff_by_id
+            from app.services.pricing_catalog import pricing_catalog
 
-            tariff = await get_tariff_by_id(db, subscription.tariff_id)
+            tariff = (await pricing_catalog.get(db)).get_tariff(subscription.tariff_id)
             if tariff:
                 is_daily_tariff = getattr(tariff, 'is_daily', False)
                 # Формируем краткий блок информации о тарифе для главного меню
@@ -1210,7 +1214,7 @@ async def get_main_menu_text(user, texts, db: AsyncSession):
         )
 
     try:
-        test_access_hint = await build_test_access_hint(db, user, texts)
+        test_access_hint = render_test_access_hint(await _get_test_access_state(db, user), texts)
         if test_access_hint:
             info_sections.append(test_access_hint.strip())
     except Exception as test_error:
@@ -10,14 +10,13 @@ from app.localization.texts import get_texts
 from app.services.server_status_service import (
     ServerStatusEntry,
     ServerStatusError,
-    ServerStatusService,
+    ServerStatusTrend,
+    server_status_service,
 )
 
 
 logger = structlog.get_logger(__name__)
 
-_status_service = ServerStatusService()
-
 
 async def show_server_status(callback: types.CallbackQuery, db_user: User) -> None:
     await _render_server_status(callback, db_user, page=1)
@@ -45,7 +44,7 @@ async def _render_server_status(
         return
 
     try:
-        servers = await _status_service.get_servers()
+        snapshot = await server_status_service.get_snapshot()
     except ServerStatusError as error:
         logger.warning('Server status error', error=error)
         await callback.answer(
@@ -61,7 +60,13 @@ async def _render_server_status(
         )
         return
 
-    message, total_pages, current_page = _build_status_message(servers, texts, page)
+    message, total_pages, current_page = _build_status_message(
+        snapshot.servers,
+        texts,
+        page,
+        updated_at=snapshot.fetched_at,
+        trends=server_status_service.get_trends(),
+    )
     keyboard = get_server_status_keyboard(db_user.language, current_page, total_pages)
 
     await callback.message.edit_text(
@@ -76,6 +81,9 @@ def _build_status_message(
     servers: list[ServerStatusEntry],
     texts,
     page: int,
+    *,
+    updated_at: datetime | None = None,
+    trends: dict[str, ServerStatusTrend] | None = None,
 ) -> tuple[str, int, int]:
     total_servers = len(servers)
     online_servers = [server for server in servers if server.is_online]
@@ -106,25 +114,25 @@ def _build_status_message(
         offline=len(offline_servers),
     )
 
-    updated_at = datetime.now(UTC).strftime('%H:%M:%S')
+    updated_at_text = (updated_at or datetime.now(UTC)).strftime('%H:%M:%S')
 
     lines.extend(
         [
             '',
             summary,
-            texts.t('SERVER_STATUS_UPDATED_AT', '⏱ Обновлено: {time}').format(time=updated_at),
+            texts.t('SERVER_STATUS_UPDATED_AT', '⏱ Обновлено: {time}').format(time=updated_at_text),
             '',
         ]
     )
 
     if current_online:
         lines.append(texts.t('SERVER_STATUS_AVAILABLE', '✅ <b>Доступны</b>'))
-        lines.extend(_format_server_lines(current_online, texts, online=True))
+        lines.extend(_format_server_lines(current_online, texts, online=True, trends=trends))
         lines.append('')
 
     if current_offline:
         lines.append(texts.t('SERVER_STATUS_UNAVAILABLE', '❌ <b>Недоступны</b>'))
-        lines.extend(_format_server_lines(current_offline, texts, online=False))
+        lines.extend(_format_server_lines(current_offline, texts, online=False, trends=trends))
         lines.append('')
 
     if total_pages > 1:
@@ -177,8 +185,10 @@ def _format_server_lines(
     texts,
     *,
     online: bool,
+    trends: dict[str, ServerStatusTrend] | None = None,
 ) -> list[str]:
     lines: list[str] = []
+    trends = trends or {}
     for server in servers:
         latency_text: str
         if online:
@@ -192,6 +202,10 @@ def _format_server_lines(
         name = server.display_name or server.name
         flag_prefix = f'{server.flag} ' if server.flag else ''
         server_line = f'{flag_prefix}{name} — {latency_text}'
+        trend = trends.get(server.key)
+        if trend is not None:
+            uptime_text = texts.t('SERVER_STATUS_UPTIME', '{percent}% в сети').format(percent=trend.uptime_percent)
+            server_line = f'{server_line} · {uptime_text}'
         lines.append(f'<blockquote>{server_line}</blockquote>')
 
     return lines
@@ -20,6 +20,7 @@ from app.database.crud.user import (
     get_user_by_telegram_id,
 )
 from app.database.crud.user_message import get_random_active_message
+from app.database.crud.user_spending_stats import reset_user_spending_stats
 from app.database.models import PinnedMessage, SubscriptionStatus, UserStatus
 from app.keyboards.inline import (
     get_back_keyboard,
@@ -579,6 +580,7 @@ async def cmd_start(message: types.Message, state: FSMContext, db: AsyncSession,
                 )
 
             await db.execute(delete(Transaction).where(Transaction.user_id == user.id))
+            await reset_user_spending_stats(db, user.id)
 
             user.status = UserStatus.ACTIVE.value
             user.balance_kopeks = 0
@@ -1,5 +1,4 @@
 import base64
-import json
 from datetime import datetime
 from typing import Any
 from urllib.parse import quote
@@ -153,20 +152,15 @@ def validate_traffic_price(gb: int) -> bool:
 
 
 def load_app_config() -> dict[str, Any]:
-    try:
-        from app.config import settings
-
-        config_path = settings.get_app_config_path()
+    from app.services.app_config_provider import app_config_provider
 
-        with open(config_path, encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-            logger.error('Некорректный формат app-config.json: ожидается объект')
+    try:
+        snapshot = app_config_provider.get_file_config()
     except Exception as e:
         logger.error('Ошибка загрузки конфига приложений', error=e)
+        return {}
 
-    return {}
+    return snapshot.copy_data() if snapshot else {}
 
 
 def get_localized_value(values: Any, language: str, default_language: str = 'en') -> str:
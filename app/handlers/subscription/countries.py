@@ -547,15 +547,29 @@ async def countries_continue(callback: types.CallbackQuery, state: FSMContext, d
     await callback.answer()
 
 
+_FALLBACK_COUNTRY_UUID = 'default-free'
+
+
 async def _get_available_countries(promo_group_id: int | None = None):
+    from app.utils.cache import AVAILABLE_COUNTRIES_NAMESPACE, cache
+
+    def expire(countries: list[dict]) -> int:
+        # Пустой список и заглушка при ошибке живут минуту, чтобы быстро восстановиться
+        if not countries or countries[0]['uuid'] == _FALLBACK_COUNTRY_UUID:
+            return 60
+        return 300
+
+    return await cache.get_or_load(
+        AVAILABLE_COUNTRIES_NAMESPACE,
+        promo_group_id or 'all',
+        lambda: _load_available_countries(promo_group_id),
+        expire=expire,
+    )
+
+
+async def _load_available_countries(promo_group_id: int | None) -> list[dict]:
     from app.database.crud.server_squad import get_available_server_squads
     from app.database.database import AsyncSessionLocal
-    from app.utils.cache import cache, cache_key
-
-    cache_key_value = cache_key('available_countries', promo_group_id or 'all')
-    cached_countries = await cache.get(cache_key_value)
-    if cached_countries:
-        return cached_countries
 
     try:
         async with AsyncSessionLocal() as db:
@@ -565,7 +579,6 @@ async def _get_available_countries(promo_group_id: int | None = None):
             logger.info(
                 'Промогруппа не имеет доступных серверов, возврат пустого списка', promo_group_id=promo_group_id
             )
-            await cache.set(cache_key_value, [], 60)
             return []
 
         countries = []
@@ -614,22 +627,19 @@ async def _get_available_countries(promo_group_id: int | None = None):
                     }
                 )
 
-        await cache.set(cache_key_value, countries, 300)
         return countries
 
     except Exception as e:
         logger.error('Ошибка получения списка стран', error=e)
         fallback_countries = [
             {
-                'uuid': 'default-free',
+                'uuid': _FALLBACK_COUNTRY_UUID,
                 'name': '🆓 Бесплатный сервер',
                 'price_kopeks': 0,
                 'is_available': True,
                 'description': '',
             },
         ]
-
-        await cache.set(cache_key_value, fallback_countries, 60)
         return fallback_countries
 
 
@@ -6,9 +6,11 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import PERIOD_PRICES, settings
+from app.database.database import AsyncSessionLocal
 from app.database.models import User
 from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts
+from app.utils.cache import MAIN_MENU_NAMESPACE, cache, cache_key
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
 from app.utils.price_display import PriceInfo, format_price_button
 from app.utils.pricing_utils import (
@@ -24,6 +26,26 @@ from app.utils.subscription_utils import (
 logger = structlog.get_logger(__name__)
 
 
+async def _get_menu_referral_stats(db: AsyncSession, user_id: int) -> dict[str, int]:
+    from app.database.crud.referral import get_user_referral_stats
+
+    async def load() -> dict[str, int]:
+        # Сессия запроса может закрыться раньше, чем завершится общая загрузка
+        async with AsyncSessionLocal() as session:
+            stats = await get_user_referral_stats(session, user_id) or {}
+        return {
+            'invited_count': stats.get('invited_count', 0),
+            'total_earned_kopeks': stats.get('total_earned_kopeks', 0),
+        }
+
+    return await cache.get_or_load(
+        MAIN_MENU_NAMESPACE,
+        cache_key('referrals', user_id),
+        load,
+        expire=settings.MAIN_MENU_USER_CACHE_SECONDS,
+    )
+
+
 async def get_main_menu_keyboard_async(
     db: AsyncSession,
     language: str = DEFAULT_LANGUAGE,
@@ -100,12 +122,10 @@ async def get_main_menu_keyboard_async(
             if hasattr(user, 'promo_group_id'):
                 promo_group_id = user.promo_group_id
 
-        # Получаем данные о рефералах из БД (если нужно)
+        # Получаем данные о рефералах (кешируются ненадолго: меню открывают часто)
         try:
-            from app.database.crud.referral import get_user_referral_stats
-
             if user and hasattr(user, 'id'):
-                referral_data = await get_user_referral_stats(db, user.id)
+                referral_data = await _get_menu_referral_stats(db, user.id)
                 if referral_data:
                     referral_count = referral_data.get('invited_count', 0)
                     referral_earnings_kopeks = referral_data.get('total_earned_kopeks', 0)
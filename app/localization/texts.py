@@ -11,6 +11,7 @@ from app.localization.loader import (
     clear_locale_cache,
     load_locale,
 )
+from app.services.cache_invalidation_service import LOCALES_TOPIC, RULES_TOPIC, cache_invalidation_bus
 
 
 _logger = structlog.get_logger(__name__)
@@ -287,5 +288,23 @@ def clear_rules_cache() -> None:
     _cached_rules.clear()
 
 
+async def broadcast_rules_changed(language: str | None = None) -> None:
+    """Сообщить остальным процессам, что правила изменились."""
+    await cache_invalidation_bus.publish(RULES_TOPIC, {'language': language} if language else None)
+
+
+def _on_rules_invalidated(payload: dict[str, Any] | None) -> None:
+    language = (payload or {}).get('language')
+    if language:
+        _cached_rules.pop(language, None)
+    else:
+        _cached_rules.clear()
+
+
 def reload_locales() -> None:
     clear_locale_cache()
+    cache_invalidation_bus.publish_nowait(LOCALES_TOPIC)
+
+
+cache_invalidation_bus.register(RULES_TOPIC, _on_rules_invalidated)
+cache_invalidation_bus.register(LOCALES_TOPIC, lambda _payload: clear_locale_cache())
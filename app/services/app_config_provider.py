@@ -0,0 +1,251 @@
+"""Конфигурация приложений (app-config) для мини-приложения, кабинета и бота.
+
+Конфиг загружается один раз и хранится в памяти вместе с готовым JSON-телом
+и ETag. Файл перечитывается только при изменении mtime или размера. Конфиг
+RemnaWave обновляется фоновым опросом, а неизменившееся содержимое не
+пересобирается. Если панель недоступна, отдаётся последняя успешно
+загруженная копия.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+SOURCE_FILE = 'file'
+SOURCE_REMNAWAVE = 'remnawave'
+
+
+@dataclass(slots=True, frozen=True)
+class AppConfigSnapshot:
+    data: dict[str, Any]
+    body: bytes
+    etag: str
+    source: str
+
+    @classmethod
+    def build(cls, data: dict[str, Any], source: str) -> AppConfigSnapshot:
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return cls(data=data, body=body, etag=make_etag(body), source=source)
+
+    def copy_data(self) -> dict[str, Any]:
+        """Изменяемая копия конфига (обработчики дописывают в неё ссылки пользователя)."""
+        return json.loads(self.body)
+
+
+def make_etag(*parts: bytes | str | None) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part or b'')
+        digest.update(b'\x00')
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Проверка заголовка If-None-Match (список значений, ``*`` и слабые ETag)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def get_remnawave_config_uuid() -> str | None:
+    """UUID конфига страницы подписки RemnaWave из системных настроек или env."""
+    from app.services.system_settings_service import bot_configuration_service
+
+    try:
+        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
+    except Exception:
+        return settings.CABINET_REMNA_SUB_CONFIG
+
+
+@dataclass(slots=True)
+class _FileEntry:
+    mtime_ns: int
+    size: int
+    snapshot: AppConfigSnapshot
+
+
+@dataclass(slots=True)
+class _RemnaWaveEntry:
+    config_uuid: str
+    # None — в панели нет такого конфига (или он пуст), используется файл
+    snapshot: AppConfigSnapshot | None
+    checked_at: float
+
+
+class AppConfigProvider:
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._files: dict[Path, _FileEntry] = {}
+        self._remnawave: _RemnaWaveEntry | None = None
+        self._refresh_task: asyncio.Task[AppConfigSnapshot | None] | None = None
+        self._refresh_uuid: str | None = None
+        self._poll_task: asyncio.Task | None = None
+        self.remnawave_fetches = 0
+
+    def get_file_config(self, candidates: Sequence[Path] | None = None) -> AppConfigSnapshot | None:
+        """Первый из файлов-кандидатов, содержащий JSON-объект.
+
+        Файл разбирается повторно, только если изменились mtime или размер.
+        Если изменённый файл не читается (например, записан не до конца),
+        отдаётся его последняя корректная версия.
+        """
+        if candidates is None:
+            candidates = (Path(settings.get_app_config_path()),)
+
+        for path in candidates:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            entry = self._files.get(path)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                return entry.snapshot
+
+            try:
+                with path.open('r', encoding='utf-8') as file:
+                    data = json.load(file)
+            except (OSError, json.JSONDecodeError) as error:
+                if entry is not None:
+                    logger.warning('app-config не читается, используется предыдущая версия', path=path, error=error)
+                    return entry.snapshot
+                logger.warning('Не удалось загрузить app-config', path=path, error=error)
+                continue
+
+            if not isinstance(data, dict):
+                logger.warning('Некорректный формат app-config: ожидается объект', path=path)
+                continue
+
+            snapshot = AppConfigSnapshot.build(data, SOURCE_FILE)
+            self._files[path] = _FileEntry(mtime_ns=stat.st_mtime_ns, size=stat.st_size, snapshot=snapshot)
+            logger.debug('app-config загружен из файла', path=path)
+            return snapshot
+
+        return None
+
+    async def get_cabinet_config(self, remnawave_uuid: str | None) -> AppConfigSnapshot | None:
+        """Конфиг RemnaWave, если он задан и доступен, иначе файл ``APP_CONFIG_PATH``."""
+        if remnawave_uuid:
+            snapshot = await self.get_remnawave_config(remnawave_uuid)
+            if snapshot is not None:
+                return snapshot
+        return self.get_file_config()
+
+    async def get_remnawave_config(self, config_uuid: str) -> AppConfigSnapshot | None:
+        entry = self._remnawave
+        if entry is not None and entry.config_uuid == config_uuid:
+            if self._clock() - entry.checked_at < settings.get_app_config_refresh_seconds():
+                return entry.snapshot
+
+        try:
+            return await self.refresh_remnawave(config_uuid)
+        except Exception as error:
+            if entry is not None and entry.config_uuid == config_uuid:
+                # Панель недоступна: отдаём последнюю копию и не повторяем запрос до следующего интервала
+                entry.checked_at = self._clock()
+                logger.warning('Конфиг RemnaWave не обновлён, используется последняя копия', error=error)
+                return entry.snapshot
+            logger.warning('Не удалось загрузить конфиг RemnaWave, используется файл', error=error)
+            return None
+
+    async def refresh_remnawave(self, config_uuid: str) -> AppConfigSnapshot | None:
+        """Загрузить конфиг из панели; одновременные вызовы ждут один общий запрос."""
+        if self._refresh_task is None or self._refresh_task.done() or self._refresh_uuid != config_uuid:
+            self._refresh_uuid = config_uuid
+            self._refresh_task = asyncio.create_task(self._refresh_remnawave(config_uuid))
+            self._refresh_task.add_done_callback(_consume_task_error)
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh_remnawave(self, config_uuid: str) -> AppConfigSnapshot | None:
+        data = await self._fetch_remnawave_config(config_uuid)
+        self.remnawave_fetches += 1
+        checked_at = self._clock()
+
+        previous = self._remnawave
+        snapshot = None
+        if data:
+            snapshot = AppConfigSnapshot.build(data, SOURCE_REMNAWAVE)
+            if (
+                previous is not None
+                and previous.config_uuid == config_uuid
+                and previous.snapshot is not None
+                and previous.snapshot.etag == snapshot.etag
+            ):
+                # Содержимое не изменилось — сохраняем прежний снимок и его ETag
+                snapshot = previous.snapshot
+            else:
+                logger.info('Конфиг RemnaWave загружен', config_uuid=config_uuid)
+
+        self._remnawave = _RemnaWaveEntry(config_uuid=config_uuid, snapshot=snapshot, checked_at=checked_at)
+        return snapshot
+
+    async def _fetch_remnawave_config(self, config_uuid: str) -> dict[str, Any] | None:
+        from app.services.remnawave_service import RemnaWaveService
+
+        service = RemnaWaveService()
+        async with service.get_api_client() as api:
+            config = await api.get_subscription_page_config(config_uuid)
+        if config and config.config:
+            return dict(config.config)
+        return None
+
+    def is_running(self) -> bool:
+        return self._poll_task is not None and not self._poll_task.done()
+
+    async def start(self) -> None:
+        await self.stop()
+        self._poll_task = asyncio.create_task(self._poll_loop())
+        logger.info('Фоновое обновление app-config запущено', interval=settings.get_app_config_refresh_seconds())
+
+    async def stop(self) -> None:
+        for task in (self._poll_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._poll_task = None
+        self._refresh_task = None
+
+    async def _poll_loop(self) -> None:
+        while True:
+            config_uuid = get_remnawave_config_uuid()
+            if config_uuid:
+                try:
+                    await self.refresh_remnawave(config_uuid)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    logger.warning('Не удалось обновить конфиг RemnaWave', error=error)
+            await asyncio.sleep(settings.get_app_config_refresh_seconds())
+
+
+def _consume_task_error(task: asyncio.Task) -> None:
+    # Ошибку загрузки получают ожидающие вызовы или поллер; помечаем её как полученную
+    if not task.cancelled():
+        task.exception()
+
+
+app_config_provider = AppConfigProvider()
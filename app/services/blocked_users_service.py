@@ -18,6 +18,7 @@ from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database.crud.user_spending_stats import reset_user_spending_stats
 from app.database.models import (
     AdvertisingCampaignRegistration,
     ButtonClickLog,
@@ -318,6 +319,7 @@ class BlockedUsersService:
 
             # 2. Транзакции (после платежей)
             await db.execute(delete(Transaction).where(Transaction.user_id == user.id))
+            await reset_user_spending_stats(db, user.id)
 
             # 3. Подписки
             if user.subscription:
@@ -0,0 +1,279 @@
+"""Шина инвалидации внутрипроцессных кешей между репликами.
+
+Настройки из БД, конструктор меню, кнопки главного меню, правила и локали
+кешируются в памяти каждого процесса. Когда бот и веб-API запущены отдельными
+репликами, изменение на одном узле должно сбрасывать кеши на остальных.
+
+Процесс, изменивший данные, обновляет своё состояние сам и вызывает
+``publish``: шина увеличивает версию темы в Redis и рассылает событие через
+pub/sub. Остальные процессы применяют только события с версией новее уже
+применённой для того же ключа payload (``key``): события разных ключей одной
+темы могут прийти в любом порядке, а полная инвалидация темы перекрывает
+более старые события всех ключей. После переподключения процессы сверяют
+версии и делают полную инвалидацию тем, события которых могли пропустить. Без Redis шина работает
+в локальном режиме: публикация ничего не рассылает, а обработчики остаются
+зарегистрированными.
+"""
+
+import asyncio
+import inspect
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+SYSTEM_SETTINGS_TOPIC = 'system_settings'
+MENU_LAYOUT_TOPIC = 'menu_layout'
+MAIN_MENU_BUTTONS_TOPIC = 'main_menu_buttons'
+RULES_TOPIC = 'rules'
+LOCALES_TOPIC = 'locales'
+
+VERSION_KEY_PREFIX = 'bedolaga:cache-version:'
+
+# Обработчик получает payload события; None означает полную инвалидацию темы
+InvalidationHandler = Callable[[dict[str, Any] | None], Awaitable[None] | None]
+
+
+class CacheInvalidationBus:
+    """Версионированная рассылка инвалидаций через Redis pub/sub."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[InvalidationHandler]] = {}
+        self._applied_versions: dict[str, int] = {}
+        # Версии по (тема, ключ payload); ключ None — полная инвалидация темы
+        self._scope_versions: dict[tuple[str, str | None], int] = {}
+        self._local_versions: dict[str, int] = {}
+        self._instance_id = uuid.uuid4().hex
+        self._redis: redis.Redis | None = None
+        self._task: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+        self._running = False
+        self._reconnect_delay = 5.0
+
+    @property
+    def instance_id(self) -> str:
+        return self._instance_id
+
+    @property
+    def channel(self) -> str:
+        return settings.CACHE_INVALIDATION_CHANNEL
+
+    def is_distributed(self) -> bool:
+        """Подключена ли шина к Redis (иначе работает только локально)."""
+        return self._redis is not None
+
+    def is_running(self) -> bool:
+        return self._running and self._task is not None and not self._task.done()
+
+    def register(self, topic: str, handler: InvalidationHandler) -> None:
+        """Зарегистрировать обработчик инвалидации для темы."""
+        handlers = self._handlers.setdefault(topic, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def get_applied_version(self, topic: str) -> int:
+        return self._applied_versions.get(topic, 0)
+
+    async def start(self) -> None:
+        """Подключиться к Redis и запустить прослушивание канала."""
+        if self.is_running():
+            return
+
+        if not settings.CACHE_INVALIDATION_BUS_ENABLED:
+            logger.info('Шина инвалидации кешей отключена, используется локальный режим')
+            return
+
+        try:
+            client = redis.from_url(settings.REDIS_URL)
+            await client.ping()
+            if not hasattr(client, 'pubsub'):
+                raise RuntimeError('Redis client does not support pub/sub')
+        except Exception as error:
+            logger.warning('Шина инвалидации кешей работает локально: Redis недоступен', error=error)
+            return
+
+        self._redis = client
+        self._running = True
+        self._task = asyncio.create_task(self._listen_loop())
+        logger.info('Шина инвалидации кешей запущена', channel=self.channel, instance_id=self._instance_id)
+
+    async def stop(self) -> None:
+        """Остановить прослушивание и закрыть соединение."""
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        if self._redis is not None:
+            try:
+                await self._redis.close()
+            except Exception as error:
+                logger.debug('Ошибка закрытия соединения шины инвалидации', error=error)
+            self._redis = None
+
+    async def publish(self, topic: str, payload: dict[str, Any] | None = None) -> int:
+        """Разослать инвалидацию темы остальным процессам.
+
+        Текущий процесс должен обновить своё состояние самостоятельно.
+        Возвращает версию события.
+        """
+        version = await self._next_version(topic)
+        self._applied_versions[topic] = max(version, self._applied_versions.get(topic, 0))
+        scope = (topic, _payload_key(payload))
+        self._scope_versions[scope] = max(version, self._scope_versions.get(scope, 0))
+
+        if self._redis is None:
+            return version
+
+        message = json.dumps(
+            {
+                'origin': self._instance_id,
+                'topic': topic,
+                'version': version,
+                'payload': payload,
+            },
+            default=str,
+        )
+        try:
+            await self._redis.publish(self.channel, message)
+        except Exception as error:
+            logger.warning('Не удалось разослать инвалидацию кеша', topic=topic, error=error)
+        return version
+
+    def publish_nowait(self, topic: str, payload: dict[str, Any] | None = None) -> None:
+        """Запланировать публикацию из синхронного кода (если есть event loop)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        task = loop.create_task(self.publish(topic, payload))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def handle_message(self, raw_message: bytes | str) -> bool:
+        """Применить входящее событие. Возвращает True, если обработчики вызывались."""
+        try:
+            data = json.loads(raw_message)
+            topic = str(data['topic'])
+            version = int(data.get('version') or 0)
+        except (ValueError, TypeError, KeyError) as error:
+            logger.warning('Некорректное событие инвалидации кеша', error=error)
+            return False
+
+        if data.get('origin') == self._instance_id:
+            return False
+
+        payload = data.get('payload')
+        if not isinstance(payload, dict):
+            payload = None
+        scope = (topic, _payload_key(payload))
+
+        if version:
+            applied = self._scope_versions.get((topic, None), 0)
+            if scope[1] is not None:
+                applied = max(applied, self._scope_versions.get(scope, 0))
+            if version <= applied:
+                return False
+
+            self._scope_versions[scope] = version
+            self._applied_versions[topic] = max(version, self._applied_versions.get(topic, 0))
+
+        await self._dispatch(topic, payload)
+        return True
+
+    async def resync_versions(self) -> list[str]:
+        """Сверить версии тем с Redis и полностью инвалидировать отставшие.
+
+        Возвращает список тем, для которых выполнена инвалидация.
+        """
+        if self._redis is None:
+            return []
+
+        refreshed: list[str] = []
+        for topic in list(self._handlers):
+            try:
+                raw_version = await self._redis.get(f'{VERSION_KEY_PREFIX}{topic}')
+            except Exception as error:
+                logger.warning('Не удалось получить версию темы кеша', topic=topic, error=error)
+                continue
+
+            remote_version = int(raw_version or 0)
+            known_version = self._applied_versions.get(topic)
+            self._applied_versions[topic] = max(remote_version, known_version or 0)
+            self._scope_versions[(topic, None)] = self._applied_versions[topic]
+
+            # При первом подключении состояние только что загружено из БД
+            if known_version is not None and remote_version > known_version:
+                await self._dispatch(topic, None)
+                refreshed.append(topic)
+
+        return refreshed
+
+    async def _next_version(self, topic: str) -> int:
+        if self._redis is not None:
+            try:
+                return int(await self._redis.incr(f'{VERSION_KEY_PREFIX}{topic}'))
+            except Exception as error:
+                logger.warning('Не удалось увеличить версию темы кеша', topic=topic, error=error)
+
+        version = self._local_versions.get(topic, self._applied_versions.get(topic, 0)) + 1
+        self._local_versions[topic] = version
+        return version
+
+    async def _dispatch(self, topic: str, payload: dict[str, Any] | None) -> None:
+        for handler in list(self._handlers.get(topic, ())):
+            try:
+                result = handler(payload)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as error:
+                logger.error('Ошибка применения инвалидации кеша', topic=topic, error=error)
+
+    async def _listen_loop(self) -> None:
+        while self._running:
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                await self.resync_versions()
+
+                while self._running:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        await self.handle_message(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Ошибка прослушивания шины инвалидации кешей', error=error)
+                await asyncio.sleep(self._reconnect_delay)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+
+def _payload_key(payload: dict[str, Any] | None) -> str | None:
+    key = (payload or {}).get('key')
+    return str(key) if key else None
+
+
+cache_invalidation_bus = CacheInvalidationBus()
@@ -5,23 +5,28 @@
 """
 
 import asyncio
+import time
+from dataclasses import dataclass
 from datetime import UTC, datetime
 
 import structlog
 from aiogram import Bot
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.subscription import (
-    get_daily_subscriptions_for_charge,
+    apply_daily_charge_time,
+    claim_daily_subscription_for_charge,
+    daily_billing_key,
+    get_due_daily_subscription_ids,
     suspend_daily_subscription_insufficient_balance,
-    update_daily_charge_time,
 )
 from app.database.crud.transaction import create_transaction
-from app.database.crud.user import get_user_by_id, subtract_user_balance
-from app.database.database import AsyncSessionLocal
-from app.database.models import PaymentMethod, Subscription, TransactionType, User
+from app.database.crud.user import get_user_by_id
+from app.database.database import IS_SQLITE, AsyncSessionLocal
+from app.database.models import PaymentMethod, Subscription, Transaction, TransactionType, User
 from app.localization.texts import get_texts
 from app.services.notification_delivery_service import (
     NotificationType,
@@ -32,6 +37,51 @@ from app.services.notification_delivery_service import (
 logger = structlog.get_logger(__name__)
 
 
+@dataclass
+class DailyBillingRunStats:
+    """Итоги одного прогона суточных списаний."""
+
+    started_at: datetime | None = None
+    batches: int = 0
+    checked: int = 0
+    charged: int = 0
+    suspended: int = 0
+    skipped: int = 0
+    errors: int = 0
+    duration_seconds: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.started_at is None:
+            self.started_at = datetime.now(UTC)
+
+    def record(self, outcome: str) -> None:
+        if outcome == 'charged':
+            self.charged += 1
+        elif outcome == 'suspended':
+            self.suspended += 1
+        elif outcome == 'skipped':
+            self.skipped += 1
+        else:
+            self.errors += 1
+
+    @property
+    def throughput_per_second(self) -> float:
+        return self.checked / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'started_at': self.started_at.isoformat(),
+            'batches': self.batches,
+            'checked': self.checked,
+            'charged': self.charged,
+            'suspended': self.suspended,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'duration_seconds': round(self.duration_seconds, 3),
+            'throughput_per_second': round(self.throughput_per_second, 2),
+        }
+
+
 class DailySubscriptionService:
     """
     Сервис автоматического списания для суточных подписок.
@@ -41,6 +91,7 @@ class DailySubscriptionService:
         self._running = False
         self._bot: Bot | None = None
         self._check_interval_minutes = 30  # Проверка каждые 30 минут
+        self.last_run: DailyBillingRunStats | None = None
 
     def set_bot(self, bot: Bot):
         """Устанавливает бота для отправки уведомлений."""
@@ -54,76 +105,121 @@ class DailySubscriptionService:
         """Возвращает интервал проверки в минутах."""
         return getattr(settings, 'DAILY_SUBSCRIPTIONS_CHECK_INTERVAL_MINUTES', 30)
 
+    def get_batch_size(self) -> int:
+        return max(1, settings.DAILY_BILLING_BATCH_SIZE)
+
+    def get_concurrency(self) -> int:
+        # SQLite не переносит параллельные пишущие транзакции
+        if IS_SQLITE:
+            return 1
+        return max(1, settings.DAILY_BILLING_CONCURRENCY)
+
     async def process_daily_charges(self) -> dict:
         """
         Обрабатывает суточные списания.
 
+        Подписки к списанию выбираются пачками, каждая списывается в своей
+        сессии и короткой транзакции, не более ``DAILY_BILLING_CONCURRENCY``
+        одновременно. Подписку, которую уже обрабатывает другой процесс,
+        пропускаем (``SKIP LOCKED``); повтор за те же сутки отсекает ключ
+        идемпотентности.
+
         Returns:
             dict: Статистика обработки
         """
-        stats = {
-            'checked': 0,
-            'charged': 0,
-            'suspended': 0,
-            'errors': 0,
-        }
+        run = DailyBillingRunStats()
+        started = time.perf_counter()
+        now = datetime.now(UTC)
+        batch_size = self.get_batch_size()
+        semaphore = asyncio.Semaphore(self.get_concurrency())
+        after_id = 0
 
         try:
-            async with AsyncSessionLocal() as db:
-                try:
-                    subscriptions = await get_daily_subscriptions_for_charge(db)
-                    stats['checked'] = len(subscriptions)
+            while True:
+                async with AsyncSessionLocal() as db:
+                    subscription_ids = await get_due_daily_subscription_ids(
+                        db, now=now, after_id=after_id, limit=batch_size
+                    )
+                if not subscription_ids:
+                    break
 
-                    for subscription in subscriptions:
-                        try:
-                            result = await self._process_single_charge(db, subscription)
-                            if result == 'charged':
-                                stats['charged'] += 1
-                            elif result == 'suspended':
-                                stats['suspended'] += 1
-                            elif result == 'error':
-                                stats['errors'] += 1
-                        except Exception as e:
-                            logger.error(
-                                'Ошибка обработки суточной подписки',
-                                subscription_id=subscription.id,
-                                error=e,
-                                exc_info=True,
-                            )
-                            stats['errors'] += 1
-                    await db.commit()
-                except Exception as e:
-                    logger.error('Ошибка при обработке подписок', error=e, exc_info=True)
-                    await db.rollback()
+                after_id = subscription_ids[-1]
+                run.batches += 1
+                run.checked += len(subscription_ids)
+
+                outcomes = await asyncio.gather(
+                    *(self._charge_with_limit(semaphore, subscription_id, now) for subscription_id in subscription_ids)
+                )
+                for outcome in outcomes:
+                    run.record(outcome)
+
+                if len(subscription_ids) < batch_size:
+                    break
 
         except Exception as e:
             logger.error('Ошибка при получении подписок для списания', error=e, exc_info=True)
 
-        return stats
+        run.duration_seconds = time.perf_counter() - started
+        self.last_run = run
+        return run.as_dict()
+
+    async def _charge_with_limit(self, semaphore: asyncio.Semaphore, subscription_id: int, now: datetime) -> str:
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as db:
+                    return await self._process_single_charge(db, subscription_id, now)
+            except Exception as e:
+                logger.error(
+                    'Ошибка обработки суточной подписки',
+                    subscription_id=subscription_id,
+                    error=e,
+                    exc_info=True,
+                )
+                return 'error'
 
-    async def _process_single_charge(self, db, subscription) -> str:
+    async def _process_single_charge(self, db: AsyncSession, subscription_id: int, now: datetime) -> str:
         """
-        Обрабатывает списание для одной подписки.
+        Обрабатывает списание для одной подписки в отдельной транзакции.
 
         Returns:
             str: "charged", "suspended", "error", "skipped"
         """
-        user = subscription.user
-        if not user:
-            user = await get_user_by_id(db, subscription.user_id)
-
-        if not user:
-            logger.warning('Пользователь не найден для подписки', subscription_id=subscription.id)
-            return 'error'
+        subscription = await claim_daily_subscription_for_charge(db, subscription_id, now=now)
+        if subscription is None:
+            # Подписку обрабатывает другой процесс или она уже не требует списания
+            await db.rollback()
+            return 'skipped'
 
         tariff = subscription.tariff
         if not tariff:
             logger.warning('Тариф не найден для подписки', subscription_id=subscription.id)
+            await db.rollback()
             return 'error'
 
         daily_price = tariff.daily_price_kopeks
         if daily_price <= 0:
             logger.warning('Некорректная суточная цена для тарифа', tariff_id=tariff.id)
+            await db.rollback()
+            return 'error'
+
+        # Ключ по периоду, а не по дате: после смены тарифа отметка сброшена и списание в тот же день законно
+        billing_key = daily_billing_key(subscription)
+        already_charged = await db.scalar(select(Transaction.id).where(Transaction.external_id == billing_key).limit(1))
+        if already_charged:
+            logger.info('Суточное списание за этот период уже проведено', subscription_id=subscription.id)
+            await db.rollback()
+            return 'skipped'
+
+        # Блокируем строку пользователя, чтобы параллельные списания не разошлись с балансом
+        user = await db.scalar(
+            select(User)
+            .where(User.id == subscription.user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        if not user:
+            logger.warning('Пользователь не найден для подписки', subscription_id=subscription.id)
+            await db.rollback()
             return 'error'
 
         # Проверяем баланс
@@ -143,22 +239,13 @@ class DailySubscriptionService:
             )
             return 'suspended'
 
-        # Списываем средства
+        # Списание, транзакция и продление фиксируются одним коммитом внутри create_transaction
         description = f'Суточная оплата тарифа «{tariff.name}»'
+        user.balance_kopeks -= daily_price
+        user.updated_at = now
+        apply_daily_charge_time(subscription, now)
 
         try:
-            deducted = await subtract_user_balance(
-                db,
-                user,
-                daily_price,
-                description,
-            )
-
-            if not deducted:
-                logger.warning('Не удалось списать средства для подписки', subscription_id=subscription.id)
-                return 'error'
-
-            # Создаём транзакцию
             await create_transaction(
                 db=db,
                 user_id=user.id,
@@ -166,45 +253,48 @@ class DailySubscriptionService:
                 amount_kopeks=daily_price,
                 description=description,
                 payment_method=PaymentMethod.MANUAL,
+                external_id=billing_key,
             )
-
-            # Обновляем время последнего списания и продлеваем подписку
-            subscription = await update_daily_charge_time(db, subscription)
-
-            user_id_display = user.telegram_id or user.email or f'#{user.id}'
-            logger.info(
-                '✅ Суточное списание: подписка сумма коп., пользователь',
-                subscription_id=subscription.id,
-                daily_price=daily_price,
-                user_id_display=user_id_display,
-            )
-
-            # Синхронизируем с Remnawave (обновляем срок подписки)
-            try:
-                from app.services.subscription_service import SubscriptionService
-
-                subscription_service = SubscriptionService()
-                await subscription_service.create_remnawave_user(
-                    db,
-                    subscription,
-                    reset_traffic=False,
-                    reset_reason=None,
-                )
-            except Exception as e:
-                logger.warning('Не удалось обновить Remnawave', error=e)
-
-            # Уведомляем пользователя
-            if self._bot:
-                await self._notify_daily_charge(user, subscription, daily_price)
-
-            return 'charged'
-
+        except IntegrityError:
+            # Параллельный запуск уже записал списание с этим ключом — уникальный индекс отклонил дубль
+            logger.info('Суточное списание за этот период уже проведено', subscription_id=subscription.id)
+            await db.rollback()
+            return 'skipped'
         except Exception as e:
             logger.error(
                 'Ошибка при списании средств для подписки', subscription_id=subscription.id, error=e, exc_info=True
             )
+            await db.rollback()
             return 'error'
 
+        user_id_display = user.telegram_id or user.email or f'#{user.id}'
+        logger.info(
+            '✅ Суточное списание: подписка сумма коп., пользователь',
+            subscription_id=subscription.id,
+            daily_price=daily_price,
+            user_id_display=user_id_display,
+        )
+
+        # Синхронизируем с Remnawave (обновляем срок подписки)
+        try:
+            from app.services.subscription_service import SubscriptionService
+
+            subscription_service = SubscriptionService()
+            await subscription_service.create_remnawave_user(
+                db,
+                subscription,
+                reset_traffic=False,
+                reset_reason=None,
+            )
+        except Exception as e:
+            logger.warning('Не удалось обновить Remnawave', error=e)
+
+        # Уведомляем пользователя
+        if self._bot:
+            await self._notify_daily_charge(user, subscription, daily_price)
+
+        return 'charged'
+
     async def _notify_daily_charge(self, user, subscription, amount_kopeks: int):
         """Уведомляет пользователя о суточном списании."""
         get_texts(getattr(user, 'language', 'ru'))
@@ -488,14 +578,8 @@ class DailySubscriptionService:
                 # Обработка суточных списаний
                 stats = await self.process_daily_charges()
 
-                if stats['charged'] > 0 or stats['suspended'] > 0:
-                    logger.info(
-                        '📊 Суточные списания: проверено=, списано=, приостановлено=, ошибок',
-                        stats=stats['checked'],
-                        stats_2=stats['charged'],
-                        stats_3=stats['suspended'],
-                        stats_4=stats['errors'],
-                    )
+                if stats['charged'] > 0 or stats['suspended'] > 0 or stats['errors'] > 0:
+                    logger.info('📊 Суточные списания', **stats)
 
                 # Обработка сброса докупленного трафика
                 traffic_stats = await self.process_traffic_resets()
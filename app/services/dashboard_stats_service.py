@@ -0,0 +1,162 @@
+"""Статистика админского дашборда с общим кешем.
+
+Блоки дашборда (подписки, финансы, график дохода, серверы, тарифы, ноды панели)
+считаются параллельно, каждый на своём соединении с БД. Ошибка нод панели или
+тарифов не роняет дашборд: блок приходит пустым, как и до кеширования. Результат кешируется на
+короткое время; после истечения TTL устаревший снимок ещё какое-то время
+отдаётся сразу, а пересчёт идёт в фоне. Одновременные запросы админов ждут
+одного и того же пересчёта.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.crud.server_squad import get_server_statistics
+from app.database.crud.subscription import get_subscriptions_statistics, get_tariff_subscriptions_statistics
+from app.database.crud.transaction import get_revenue_by_period, get_transactions_statistics
+from app.database.database import AsyncSessionLocal
+from app.database.models import Tariff
+from app.services.remnawave_service import RemnaWaveService
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class DashboardSnapshot:
+    nodes: list[dict[str, Any]]
+    subscriptions: dict[str, Any]
+    transactions: dict[str, Any]
+    revenue: list[dict[str, Any]]
+    servers: dict[str, Any]
+    tariffs: list[dict[str, Any]] | None
+    computed_at: datetime
+
+
+async def _get_tariff_statistics(db: AsyncSession) -> list[dict[str, Any]]:
+    # Все тарифы (включая неактивные) и счётчики подписок по ним одним GROUP BY
+    tariffs_result = await db.execute(select(Tariff.id, Tariff.name).order_by(Tariff.display_order))
+    counters = await get_tariff_subscriptions_statistics(db)
+
+    empty = {
+        'active_subscriptions': 0,
+        'trial_subscriptions': 0,
+        'purchased_today': 0,
+        'purchased_week': 0,
+        'purchased_month': 0,
+    }
+    return [
+        {'tariff_id': tariff_id, 'tariff_name': name, **counters.get(tariff_id, empty)}
+        for tariff_id, name in tariffs_result.all()
+    ]
+
+
+class DashboardStatsService:
+    """Кеш статистики дашборда: TTL, stale-while-revalidate и один пересчёт на всех."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._snapshot: DashboardSnapshot | None = None
+        self._computed_at = 0.0
+        self._refresh_task: asyncio.Task[DashboardSnapshot] | None = None
+
+    async def get_snapshot(self, *, force: bool = False) -> DashboardSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not force:
+            age = self._clock() - self._computed_at
+            ttl = settings.DASHBOARD_STATS_CACHE_TTL_SECONDS
+            if age < ttl:
+                return snapshot
+            if age < ttl + settings.DASHBOARD_STATS_STALE_SECONDS:
+                # Отдаём устаревший снимок сразу, обновляем в фоне
+                self._start_refresh()
+                return snapshot
+
+        # shield: отмена запроса одного админа не прерывает пересчёт для остальных
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def _start_refresh(self) -> asyncio.Task[DashboardSnapshot]:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(_consume_task_error)
+        return self._refresh_task
+
+    async def _refresh(self) -> DashboardSnapshot:
+        started = time.perf_counter()
+        try:
+            snapshot = await self._compute()
+        except Exception as error:
+            logger.error('Ошибка расчёта статистики дашборда', error=error)
+            raise
+        self._snapshot = snapshot
+        self._computed_at = self._clock()
+        logger.debug('Статистика дашборда пересчитана', duration_ms=round((time.perf_counter() - started) * 1000))
+        return snapshot
+
+    async def _compute(self) -> DashboardSnapshot:
+        now = datetime.now(UTC)
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        nodes, subscriptions, transactions, revenue, servers, tariffs = await asyncio.gather(
+            self._fetch_nodes(),
+            self._with_session(get_subscriptions_statistics),
+            self._with_session(lambda db: get_transactions_statistics(db, month_start, now)),
+            self._with_session(lambda db: get_revenue_by_period(db, days=30)),
+            self._with_session(get_server_statistics),
+            self._fetch_tariffs(),
+        )
+        return DashboardSnapshot(
+            nodes=nodes,
+            subscriptions=subscriptions,
+            transactions=transactions,
+            revenue=revenue,
+            servers=servers,
+            tariffs=tariffs,
+            computed_at=now,
+        )
+
+    @staticmethod
+    async def _with_session(query: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        # Отдельная сессия на блок: запросы идут параллельно на разных соединениях
+        async with AsyncSessionLocal() as db:
+            return await query(db)
+
+    @classmethod
+    async def _fetch_tariffs(cls) -> list[dict[str, Any]] | None:
+        # Блок тарифов необязательный: его ошибка не должна ронять весь дашборд
+        try:
+            return await cls._with_session(_get_tariff_statistics)
+        except Exception as error:
+            logger.error('Не удалось получить статистику тарифов для дашборда', error=error, exc_info=True)
+            return None
+
+    @staticmethod
+    async def _fetch_nodes() -> list[dict[str, Any]]:
+        try:
+            return await RemnaWaveService().get_all_nodes()
+        except Exception as error:
+            logger.warning('Не удалось получить ноды панели для дашборда', error=error)
+            return []
+
+
+def _consume_task_error(task: asyncio.Task) -> None:
+    # Ошибка фонового пересчёта уже залогирована; помечаем её как полученную
+    if not task.cancelled():
+        task.exception()
+
+
+dashboard_stats_service = DashboardStatsService()
@@ -10,6 +10,8 @@ import structlog
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.webhook_service import webhook_service
+from app.services.websocket_relay_service import EVENTS_BROADCAST_KIND, websocket_relay
+from app.utils.websocket_outbox import WebSocketOutbox
 
 
 logger = structlog.get_logger(__name__)
@@ -20,7 +22,9 @@ class EventEmitter:
 
     def __init__(self) -> None:
         self._listeners: dict[str, list[Callable]] = {}
-        self._websocket_connections: set[Any] = set()
+        # websocket -> исходящая очередь подключения
+        self._websocket_connections: dict[Any, WebSocketOutbox] = {}
+        websocket_relay.register(EVENTS_BROADCAST_KIND, self._deliver_relayed)
 
     def on(self, event_type: str, callback: Callable) -> None:
         """Подписаться на событие."""
@@ -36,16 +40,21 @@ class EventEmitter:
             except ValueError:
                 pass
 
-    def register_websocket(self, websocket: Any) -> None:
-        """Зарегистрировать WebSocket подключение."""
-        self._websocket_connections.add(websocket)
+    def register_websocket(self, websocket: Any) -> WebSocketOutbox:
+        """Зарегистрировать WebSocket подключение и запустить его исходящую очередь."""
+        outbox = WebSocketOutbox(websocket)
+        outbox.start()
+        self._websocket_connections[websocket] = outbox
         logger.debug(
             'WebSocket connection registered. Total', websocket_connections_count=len(self._websocket_connections)
         )
+        return outbox
 
     def unregister_websocket(self, websocket: Any) -> None:
         """Отменить регистрацию WebSocket подключения."""
-        self._websocket_connections.discard(websocket)
+        outbox = self._websocket_connections.pop(websocket, None)
+        if outbox is not None:
+            outbox.close(close_socket=False)
         logger.debug(
             'WebSocket connection unregistered. Total', websocket_connections_count=len(self._websocket_connections)
         )
@@ -82,23 +91,28 @@ class EventEmitter:
             await webhook_service.send_webhook(db, event_type, payload)
 
     async def _broadcast_to_websockets(self, event_data: dict[str, Any]) -> None:
-        """Отправить событие всем подключенным WebSocket клиентам."""
-        if not self._websocket_connections:
-            return
-
-        disconnected = set()
+        """Отправить событие всем WebSocket клиентам, в том числе подключённым к другим репликам."""
         message = json.dumps(event_data, default=str, ensure_ascii=False)
-
-        for ws in self._websocket_connections:
-            try:
-                await ws.send_text(message)
-            except Exception as error:
-                logger.warning('Failed to send WebSocket message', error=error)
-                disconnected.add(ws)
+        self._deliver_locally(message)
+        await websocket_relay.publish(EVENTS_BROADCAST_KIND, message)
+
+    def _deliver_locally(self, message: str) -> int:
+        """Разложить сериализованное событие по очередям подключений этой реплики."""
+        delivered = 0
+        closed = []
+        for ws, outbox in self._websocket_connections.items():
+            if outbox.offer(message):
+                delivered += 1
+            else:
+                closed.append(ws)
 
         # Удаляем отключенные соединения
-        for ws in disconnected:
+        for ws in closed:
             self.unregister_websocket(ws)
+        return delivered
+
+    def _deliver_relayed(self, _target: int | None, message: str) -> None:
+        self._deliver_locally(message)
 
 
 # Глобальный экземпляр event emitter
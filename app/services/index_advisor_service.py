@@ -0,0 +1,250 @@
+"""Советник по индексам для горячих запросов.
+
+Горячие запросы (статистика дохода, траты пользователей, суммы кампаний,
+проверки истечения подписок) регистрируются здесь построителями SQLAlchemy.
+Советник выполняет для каждого EXPLAIN в текущей СУБД и отмечает
+последовательное чтение таблиц, размер которых превышает порог.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.database.crud.transaction import REAL_PAYMENT_METHODS
+from app.database.models import (
+    AdvertisingCampaignRegistration,
+    Subscription,
+    SubscriptionStatus,
+    Transaction,
+    TransactionType,
+)
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class HotQuery:
+    name: str
+    description: str
+    build: Callable[[], Select]
+
+
+@dataclass(slots=True)
+class SequentialScan:
+    table: str
+    table_rows: int
+
+
+@dataclass(slots=True)
+class HotQueryReport:
+    name: str
+    description: str
+    plan: list[str] = field(default_factory=list)
+    sequential_scans: list[SequentialScan] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.sequential_scans)
+
+
+# ---------------------------------------------------------------- горячие запросы
+
+
+def _income_statistics_query() -> Select:
+    start_date = datetime.now(UTC) - timedelta(days=30)
+    return select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
+        Transaction.type == TransactionType.DEPOSIT.value,
+        Transaction.is_completed == True,
+        Transaction.created_at >= start_date,
+        Transaction.payment_method.in_(REAL_PAYMENT_METHODS),
+    )
+
+
+def _revenue_by_period_query() -> Select:
+    start_date = datetime.now(UTC) - timedelta(days=30)
+    day = func.date(Transaction.created_at)
+    return (
+        select(day, func.coalesce(func.sum(Transaction.amount_kopeks), 0))
+        .where(
+            Transaction.type == TransactionType.DEPOSIT.value,
+            Transaction.is_completed == True,
+            Transaction.created_at >= start_date,
+        )
+        .group_by(day)
+    )
+
+
+def _payment_method_breakdown_query() -> Select:
+    return (
+        select(Transaction.payment_method, func.count(Transaction.id))
+        .where(Transaction.payment_method.is_not(None))
+        .group_by(Transaction.payment_method)
+    )
+
+
+def _users_spending_query() -> Select:
+    return (
+        select(Transaction.user_id, func.sum(Transaction.amount_kopeks))
+        .where(Transaction.user_id.in_([1, 2, 3]), Transaction.is_completed.is_(True))
+        .group_by(Transaction.user_id)
+    )
+
+
+def _campaign_deposits_query() -> Select:
+    registrations = select(AdvertisingCampaignRegistration.user_id).where(
+        AdvertisingCampaignRegistration.campaign_id == 1
+    )
+    return select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
+        Transaction.user_id.in_(registrations),
+        Transaction.type == TransactionType.DEPOSIT.value,
+        Transaction.is_completed.is_(True),
+    )
+
+
+def _expiring_subscriptions_query() -> Select:
+    now = datetime.now(UTC)
+    return select(Subscription.id).where(
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.end_date > now,
+        Subscription.end_date <= now + timedelta(days=3),
+    )
+
+
+def _autopay_subscriptions_query() -> Select:
+    return select(Subscription.id).where(
+        Subscription.autopay_enabled == True,
+        Subscription.end_date <= datetime.now(UTC) + timedelta(days=7),
+    )
+
+
+class IndexAdvisor:
+    """Реестр горячих запросов и проверка их планов выполнения."""
+
+    def __init__(self) -> None:
+        self._queries: dict[str, HotQuery] = {}
+
+    def register(self, name: str, description: str, build: Callable[[], Select]) -> None:
+        self._queries[name] = HotQuery(name=name, description=description, build=build)
+
+    @property
+    def queries(self) -> list[HotQuery]:
+        return list(self._queries.values())
+
+    async def analyze(self, db: AsyncSession, min_table_rows: int | None = None) -> list[HotQueryReport]:
+        """EXPLAIN всех зарегистрированных запросов; отчёт с найденными последовательными чтениями."""
+        threshold = settings.INDEX_ADVISOR_SEQ_SCAN_MIN_ROWS if min_table_rows is None else min_table_rows
+        dialect = db.get_bind().dialect
+        connection = await db.connection()
+
+        reports: list[HotQueryReport] = []
+        table_rows: dict[str, int] = {}
+        for query in self._queries.values():
+            report = HotQueryReport(name=query.name, description=query.description)
+            reports.append(report)
+            try:
+                sql = str(query.build().compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+                plan, scanned_tables = await self._explain(connection, dialect.name, sql)
+            except Exception as error:
+                logger.warning('Не удалось получить план запроса', query=query.name, error=error)
+                report.error = str(error)
+                continue
+
+            report.plan = plan
+            for table in scanned_tables:
+                if table not in table_rows:
+                    table_rows[table] = await self._count_table_rows(connection, dialect.name, table)
+                if table_rows[table] >= threshold:
+                    report.sequential_scans.append(SequentialScan(table=table, table_rows=table_rows[table]))
+
+        flagged = [report.name for report in reports if report.flagged]
+        if flagged:
+            logger.warning('Горячие запросы читают большие таблицы целиком', queries=flagged)
+        return reports
+
+    async def _explain(self, connection: Any, dialect_name: str, sql: str) -> tuple[list[str], list[str]]:
+        """План запроса построчно и таблицы, которые читаются целиком."""
+        if dialect_name == 'postgresql':
+            result = await connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}')
+            raw_plan = result.scalar()
+            if isinstance(raw_plan, str):
+                raw_plan = json.loads(raw_plan)
+            plan: list[str] = []
+            scanned: list[str] = []
+            _walk_postgres_plan(raw_plan[0]['Plan'], plan, scanned, depth=0)
+            return plan, scanned
+
+        if dialect_name == 'sqlite':
+            result = await connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [str(row[-1]) for row in result.all()]
+            scanned = []
+            for detail in plan:
+                # «SCAN table» без «USING INDEX» — полный проход по таблице
+                parts = detail.split()
+                if len(parts) >= 2 and parts[0] == 'SCAN' and 'USING' not in parts:
+                    scanned.append(parts[1])
+            return plan, scanned
+
+        if dialect_name == 'mysql':
+            result = await connection.exec_driver_sql(f'EXPLAIN {sql}')
+            rows = result.mappings().all()
+            plan = [f'{row.get("table")}: type={row.get("type")} key={row.get("key")}' for row in rows]
+            scanned = [str(row['table']) for row in rows if row.get('type') == 'ALL' and row.get('table')]
+            return plan, scanned
+
+        return [], []
+
+    async def _count_table_rows(self, connection: Any, dialect_name: str, table: str) -> int:
+        # Для PostgreSQL и MySQL берём оценку из статистики, чтобы не считать большие таблицы
+        if dialect_name == 'postgresql':
+            result = await connection.execute(
+                text('SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = :table'), {'table': table}
+            )
+        elif dialect_name == 'mysql':
+            result = await connection.execute(
+                text(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = :table'
+                ),
+                {'table': table},
+            )
+        else:
+            result = await connection.exec_driver_sql(f'SELECT COUNT(*) FROM "{table}"')
+        return int(result.scalar() or 0)
+
+
+def _walk_postgres_plan(node: dict, plan: list[str], scanned: list[str], depth: int) -> None:
+    node_type = node.get('Node Type', '')
+    relation = node.get('Relation Name')
+    index_name = node.get('Index Name')
+    line = '  ' * depth + node_type
+    if relation:
+        line += f' on {relation}'
+    if index_name:
+        line += f' using {index_name}'
+    plan.append(line)
+    if node_type == 'Seq Scan' and relation:
+        scanned.append(relation)
+    for child in node.get('Plans', []):
+        _walk_postgres_plan(child, plan, scanned, depth + 1)
+
+
+index_advisor = IndexAdvisor()
+index_advisor.register('income_statistics', 'Доход за период по реальным платежам', _income_statistics_query)
+index_advisor.register('revenue_by_period', 'Доход по дням', _revenue_by_period_query)
+index_advisor.register('payment_methods', 'Разбивка транзакций по способам оплаты', _payment_method_breakdown_query)
+index_advisor.register('users_spending', 'Траты пользователей в списке админки', _users_spending_query)
+index_advisor.register('campaign_deposits', 'Сумма пополнений пользователей кампании', _campaign_deposits_query)
+index_advisor.register('expiring_subscriptions', 'Подписки, истекающие в ближайшие дни', _expiring_subscriptions_query)
+index_advisor.register('autopay_subscriptions', 'Подписки с автопродлением к списанию', _autopay_subscriptions_query)
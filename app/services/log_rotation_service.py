@@ -23,6 +23,7 @@ from aiogram import Bot
 from aiogram.types import FSInputFile
 
 from app.config import settings
+from app.services.referral_click_index import get_referral_click_index
 from app.utils.timezone import get_local_timezone
 
 
@@ -182,6 +183,9 @@ class LogRotationService:
             archive_path = await self._create_archive(files_to_archive, yesterday)
 
             if archive_path:
+                # Индекс реф-кликов дочитывает bot.log до очистки
+                await self._sync_referral_click_index()
+
                 # Очищаем текущие лог-файлы
                 for log_path, _ in files_to_archive:
                     log_path.write_text('')
@@ -205,6 +209,15 @@ class LogRotationService:
             logger.error(message, exc_info=True)
             return False, message
 
+    async def _sync_referral_click_index(self) -> None:
+        bot_log = self.log_files['bot']
+        if not bot_log.exists():
+            return
+        try:
+            await asyncio.to_thread(get_referral_click_index(bot_log).sync)
+        except Exception as error:
+            logger.warning('Не удалось обновить индекс реф-кликов перед ротацией', error=error)
+
     async def _create_archive(
         self,
         files: list[tuple[Path, str]],
@@ -14,6 +14,7 @@ from app.database.models import (
     MainMenuButtonActionType,
     MainMenuButtonVisibility,
 )
+from app.services.cache_invalidation_service import MAIN_MENU_BUTTONS_TOPIC, cache_invalidation_bus
 
 
 @dataclass(frozen=True)
@@ -34,6 +35,12 @@ class MainMenuButtonService:
     def invalidate_cache(cls) -> None:
         cls._cache = None
 
+    @classmethod
+    async def invalidate_cache_everywhere(cls) -> None:
+        """Сбросить кеш кнопок в текущем процессе и на остальных репликах."""
+        cls.invalidate_cache()
+        await cache_invalidation_bus.publish(MAIN_MENU_BUTTONS_TOPIC)
+
     @classmethod
     async def _load_cache(cls, db: AsyncSession) -> list[_MainMenuButtonData]:
         if cls._cache is not None:
@@ -133,3 +140,6 @@ class MainMenuButtonService:
             )
 
         return None
+
+
+cache_invalidation_bus.register(MAIN_MENU_BUTTONS_TOPIC, lambda _payload: MainMenuButtonService.invalidate_cache())
@@ -18,6 +18,7 @@ from app.config import settings
 from app.database.crud.system_setting import upsert_system_setting
 from app.database.models import SystemSetting
 from app.localization.texts import get_texts
+from app.services.cache_invalidation_service import MENU_LAYOUT_TOPIC, cache_invalidation_bus
 
 from .constants import (
     AVAILABLE_CALLBACKS,
@@ -258,6 +259,7 @@ class MenuLayoutService:
         )
         await db.commit()
         cls.invalidate_cache()
+        await cache_invalidation_bus.publish(MENU_LAYOUT_TOPIC)
 
     @classmethod
     async def reset_to_default(cls, db: AsyncSession) -> dict[str, Any]:
@@ -1365,3 +1367,6 @@ class MenuLayoutService:
     ) -> list[dict[str, Any]]:
         """Получить последовательности кликов пользователя."""
         return await MenuLayoutStatsService.get_click_sequences(db, user_id, limit)
+
+
+cache_invalidation_bus.register(MENU_LAYOUT_TOPIC, lambda _payload: MenuLayoutService.invalidate_cache())
@@ -1,4 +1,6 @@
 import asyncio
+import time
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
@@ -23,11 +25,14 @@ from app.database.crud.notification import (
 )
 from app.database.crud.promo_offer_log import log_promo_offer_action
 from app.database.crud.subscription import (
+    claim_autopay_subscriptions,
     deactivate_subscription,
     extend_subscription,
     get_expired_subscriptions,
     get_expiring_subscriptions,
     get_subscriptions_for_autopay,
+    get_subscriptions_for_autopay_charge,
+    release_autopay_claims,
 )
 from app.database.crud.user import (
     cleanup_expired_promo_offer_discounts,
@@ -61,6 +66,7 @@ from app.services.promo_offer_service import promo_offer_service
 from app.services.subscription_service import SubscriptionService
 from app.utils.cache import cache
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
+from app.utils.pagination import KeysetColumn, KeysetCursor, KeysetPage, paginate_keyset
 from app.utils.pricing_utils import apply_percentage_discount
 from app.utils.subscription_utils import (
     resolve_hwid_device_limit_for_payload,
@@ -71,6 +77,13 @@ from app.utils.timezone import format_local_datetime
 # Кулдаун между повторными уведомлениями об автоплатеже с недостаточным балансом (6 часов)
 AUTOPAY_INSUFFICIENT_BALANCE_COOLDOWN_SECONDS: int = 21600
 
+# Результаты обработки одной подписки автоплатежом (совпадают с полями AutopayRunStats)
+AUTOPAY_CHARGED = 'charged'
+AUTOPAY_INSUFFICIENT_BALANCE = 'insufficient_balance'
+AUTOPAY_FAILED = 'failed'
+AUTOPAY_SKIPPED = 'skipped'
+AUTOPAY_ERROR = 'errors'
+
 
 logger = structlog.get_logger(__name__)
 
@@ -78,12 +91,53 @@ logger = structlog.get_logger(__name__)
 LOGO_PATH = Path(settings.LOGO_FILE)
 
 
+@dataclass
+class AutopayRunStats:
+    """Итоги одного прогона автоплатежей."""
+
+    started_at: datetime | None = None
+    batches: int = 0
+    claimed: int = 0
+    charged: int = 0
+    insufficient_balance: int = 0
+    failed: int = 0
+    skipped: int = 0
+    errors: int = 0
+    duration_seconds: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.started_at is None:
+            self.started_at = datetime.now(UTC)
+
+    def record(self, outcome: str) -> None:
+        setattr(self, outcome, getattr(self, outcome) + 1)
+
+    @property
+    def throughput_per_second(self) -> float:
+        return self.claimed / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'started_at': self.started_at.isoformat(),
+            'batches': self.batches,
+            'claimed': self.claimed,
+            'charged': self.charged,
+            'insufficient_balance': self.insufficient_balance,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'duration_seconds': round(self.duration_seconds, 3),
+            'throughput_per_second': round(self.throughput_per_second, 2),
+        }
+
+
 class MonitoringService:
     def __init__(self, bot=None):
         self.is_running = False
         self.subscription_service = SubscriptionService()
         self.bot = bot
         self._notified_users: set[str] = set()
+        self.last_autopay_run: AutopayRunStats | None = None
         self._last_cleanup = datetime.now(UTC)
         self._sla_task = None
 
@@ -937,182 +991,203 @@ class MonitoringService:
                 )
 
     async def _process_autopayments(self, db: AsyncSession):
-        try:
-            current_time = datetime.now(UTC)
+        """Списать автоплатежи по подпискам из окна, захватывая их пачками.
 
-            result = await db.execute(
-                select(Subscription)
-                .options(
-                    selectinload(Subscription.user).options(
-                        selectinload(User.promo_group),
-                        selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
-                    ),
-                    selectinload(Subscription.tariff),
-                )
-                .where(
-                    and_(
-                        Subscription.status == SubscriptionStatus.ACTIVE.value,
-                        Subscription.autopay_enabled == True,
-                        Subscription.is_trial == False,
-                    )
-                )
-            )
-            all_autopay_subscriptions = result.scalars().all()
+        Окно отбирается в SQL, захват через ``FOR UPDATE SKIP LOCKED`` и аренду
+        ``autopay_claimed_until`` позволяет нескольким репликам обрабатывать
+        разные пачки без двойного списания. Захваты освобождаются в конце прогона.
+        """
+        run = AutopayRunStats()
+        started = time.perf_counter()
+        batch_size = settings.get_autopay_batch_size()
+        claimed_ids: list[int] = []
 
-            autopay_subscriptions = []
-            for sub in all_autopay_subscriptions:
-                # Суточные подписки имеют свой собственный механизм продления
-                # (DailySubscriptionService), глобальный autopay на них не распространяется
-                if sub.tariff and getattr(sub.tariff, 'is_daily', False):
-                    logger.debug(
-                        'Пропускаем суточную подписку (тариф) в глобальном autopay', sub_id=sub.id, name=sub.tariff.name
-                    )
-                    continue
+        try:
+            while True:
+                batch_ids = await claim_autopay_subscriptions(
+                    db,
+                    now=datetime.now(UTC),
+                    batch_size=batch_size,
+                    lease_seconds=settings.get_autopay_claim_lease_seconds(),
+                )
+                if not batch_ids:
+                    break
 
-                days_before_expiry = (sub.end_date - current_time).days
-                if days_before_expiry <= min(sub.autopay_days_before, 3):
-                    autopay_subscriptions.append(sub)
+                claimed_ids.extend(batch_ids)
+                run.batches += 1
+                run.claimed += len(batch_ids)
 
-            processed_count = 0
-            failed_count = 0
+                for subscription_id in batch_ids:
+                    run.record(await self._charge_claimed_subscription(subscription_id))
 
-            for subscription in autopay_subscriptions:
-                from app.database.crud.subscription import is_recently_updated_by_webhook
+                if len(batch_ids) < batch_size:
+                    break
 
-                if is_recently_updated_by_webhook(subscription):
-                    logger.debug(
-                        'Пропуск автоплатежа подписки : обновлена вебхуком недавно', subscription_id=subscription.id
-                    )
-                    continue
+        except Exception as e:
+            logger.error('Ошибка обработки автоплатежей', error=e)
+            await db.rollback()
+        finally:
+            if claimed_ids:
+                try:
+                    await release_autopay_claims(db, claimed_ids)
+                except Exception as release_error:
+                    # Захваты освободятся сами по истечении аренды
+                    logger.warning('Не удалось освободить захваты автоплатежа', release_error=release_error)
 
-                user = subscription.user
-                if not user:
-                    continue
+        run.duration_seconds = time.perf_counter() - started
+        self.last_autopay_run = run
 
-                user_identifier = user.telegram_id or f'email:{user.id}'
+        if run.claimed:
+            logger.info('💳 Прогон автоплатежей завершён', **run.as_dict())
+        if run.charged or run.failed or run.insufficient_balance or run.errors:
+            await self._log_monitoring_event(
+                db,
+                'autopayments_processed',
+                f'Автоплатежи: успешно {run.charged}, неудачно {run.failed + run.insufficient_balance + run.errors}',
+                {
+                    'processed': run.charged,
+                    'failed': run.failed + run.insufficient_balance + run.errors,
+                    'run': run.as_dict(),
+                },
+                is_success=run.errors == 0,
+            )
 
-                # Правильный расчет стоимости продления с учетом всех параметров подписки
-                renewal_cost = await self.subscription_service.calculate_renewal_price(subscription, 30, db, user=user)
-                promo_discount_percent = self._get_user_promo_offer_discount_percent(user)
-                charge_amount = renewal_cost
-                promo_discount_value = 0
+    async def _charge_claimed_subscription(self, subscription_id: int) -> str:
+        """Списать одну захваченную подписку в собственной сессии.
 
-                if renewal_cost > 0 and promo_discount_percent > 0:
-                    charge_amount, promo_discount_value = apply_percentage_discount(
-                        renewal_cost,
-                        promo_discount_percent,
-                    )
+        Откат после ошибки затрагивает только эту сессию: объекты остальных
+        подписок пачки не протухают и списываются в этом же прогоне.
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                subscriptions = await get_subscriptions_for_autopay_charge(db, [subscription_id])
+                if not subscriptions:
+                    return AUTOPAY_SKIPPED
+                return await self._charge_autopay_subscription(db, subscriptions[0])
+            except Exception as error:
+                logger.error('Ошибка автоплатежа подписки', subscription_id=subscription_id, error=error, exc_info=True)
+                await db.rollback()
+                return AUTOPAY_ERROR
 
-                autopay_key = f'autopay_{user.id}_{subscription.id}'
-                if autopay_key in self._notified_users:
-                    continue
+    async def _charge_autopay_subscription(self, db: AsyncSession, subscription: Subscription) -> str:
+        from app.database.crud.subscription import is_recently_updated_by_webhook
 
-                if user.balance_kopeks >= charge_amount:
-                    success = await subtract_user_balance(db, user, charge_amount, 'Автопродление подписки')
+        if is_recently_updated_by_webhook(subscription):
+            logger.debug('Пропуск автоплатежа подписки : обновлена вебхуком недавно', subscription_id=subscription.id)
+            return AUTOPAY_SKIPPED
 
-                    if success:
-                        await extend_subscription(db, subscription, 30)
-                        await self.subscription_service.update_remnawave_user(
-                            db,
-                            subscription,
-                            reset_traffic=settings.RESET_TRAFFIC_ON_PAYMENT,
-                            reset_reason='автопродление подписки',
-                        )
+        user = subscription.user
+        if not user:
+            return AUTOPAY_SKIPPED
 
-                        if promo_discount_value > 0:
-                            await self._consume_user_promo_offer_discount(db, user)
-
-                        # Send notification via appropriate channel
-                        if user.telegram_id and self.bot:
-                            await self._send_autopay_success_notification(user, charge_amount, 30)
-                        elif not user.telegram_id:
-                            # Email-only user - use notification delivery service
-                            await notification_delivery_service.notify_autopay_success(
-                                user=user,
-                                amount_kopeks=charge_amount,
-                                new_expires_at=subscription.end_date,
-                            )
+        user_identifier = user.telegram_id or f'email:{user.id}'
 
-                        processed_count += 1
-                        self._notified_users.add(autopay_key)
-                        logger.info(
-                            '💳 Автопродление подписки пользователя успешно (списано , скидка %)',
-                            user_identifier=user_identifier,
-                            charge_amount=charge_amount,
-                            promo_discount_percent=promo_discount_percent,
-                        )
-                    else:
-                        failed_count += 1
-                        if user.telegram_id and self.bot:
-                            await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
-                        elif not user.telegram_id:
-                            await notification_delivery_service.notify_autopay_failed(
-                                user=user,
-                                reason='Ошибка списания средств',
-                            )
-                        logger.warning(
-                            '💳 Ошибка списания средств для автопродления пользователя', user_identifier=user_identifier
-                        )
-                else:
-                    failed_count += 1
+        # Правильный расчет стоимости продления с учетом всех параметров подписки
+        renewal_cost = await self.subscription_service.calculate_renewal_price(subscription, 30, db, user=user)
+        promo_discount_percent = self._get_user_promo_offer_discount_percent(user)
+        charge_amount = renewal_cost
+        promo_discount_value = 0
 
-                    # Проверяем кулдаун уведомления через Redis, чтобы не спамить
-                    # при каждом срабатывании мониторинга
-                    cooldown_key = f'autopay_insufficient_balance_notified:{user.id}'
-                    should_notify = True
+        if renewal_cost > 0 and promo_discount_percent > 0:
+            charge_amount, promo_discount_value = apply_percentage_discount(
+                renewal_cost,
+                promo_discount_percent,
+            )
 
-                    try:
-                        if await cache.exists(cooldown_key):
-                            should_notify = False
-                            logger.debug(
-                                '💳 Пропуск уведомления о недостаточном балансе для пользователя — кулдаун активен',
-                                user_identifier=user_identifier,
-                            )
-                    except Exception as redis_err:
-                        # Fallback: если Redis недоступен — отправляем уведомление
-                        logger.warning(
-                            '⚠️ Ошибка проверки кулдауна в Redis для пользователя : . Отправляем уведомление.',
-                            user_identifier=user_identifier,
-                            redis_err=redis_err,
-                        )
+        autopay_key = f'autopay_{user.id}_{subscription.id}'
+        if autopay_key in self._notified_users:
+            return AUTOPAY_SKIPPED
 
-                    if should_notify:
-                        if user.telegram_id and self.bot:
-                            await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
-                        elif not user.telegram_id:
-                            await notification_delivery_service.notify_autopay_failed(
-                                user=user,
-                                reason='Недостаточно средств на балансе',
-                            )
+        if user.balance_kopeks >= charge_amount:
+            success = await subtract_user_balance(db, user, charge_amount, 'Автопродление подписки')
 
-                        # Ставим ключ кулдауна после отправки
-                        try:
-                            await cache.set(
-                                cooldown_key,
-                                1,
-                                expire=AUTOPAY_INSUFFICIENT_BALANCE_COOLDOWN_SECONDS,
-                            )
-                        except Exception as redis_err:
-                            logger.warning(
-                                '⚠️ Не удалось установить кулдаун в Redis для пользователя',
-                                user_identifier=user_identifier,
-                                redis_err=redis_err,
-                            )
+            if success:
+                await extend_subscription(db, subscription, 30)
+                await self.subscription_service.update_remnawave_user(
+                    db,
+                    subscription,
+                    reset_traffic=settings.RESET_TRAFFIC_ON_PAYMENT,
+                    reset_reason='автопродление подписки',
+                )
 
-                    logger.warning(
-                        '💳 Недостаточно средств для автопродления у пользователя', user_identifier=user_identifier
+                if promo_discount_value > 0:
+                    await self._consume_user_promo_offer_discount(db, user)
+
+                # Send notification via appropriate channel
+                if user.telegram_id and self.bot:
+                    await self._send_autopay_success_notification(user, charge_amount, 30)
+                elif not user.telegram_id:
+                    # Email-only user - use notification delivery service
+                    await notification_delivery_service.notify_autopay_success(
+                        user=user,
+                        amount_kopeks=charge_amount,
+                        new_expires_at=subscription.end_date,
                     )
 
-            if processed_count > 0 or failed_count > 0:
-                await self._log_monitoring_event(
-                    db,
-                    'autopayments_processed',
-                    f'Автоплатежи: успешно {processed_count}, неудачно {failed_count}',
-                    {'processed': processed_count, 'failed': failed_count},
+                self._notified_users.add(autopay_key)
+                logger.info(
+                    '💳 Автопродление подписки пользователя успешно (списано , скидка %)',
+                    user_identifier=user_identifier,
+                    charge_amount=charge_amount,
+                    promo_discount_percent=promo_discount_percent,
+                )
+                return AUTOPAY_CHARGED
+
+            if user.telegram_id and self.bot:
+                await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
+            elif not user.telegram_id:
+                await notification_delivery_service.notify_autopay_failed(
+                    user=user,
+                    reason='Ошибка списания средств',
                 )
+            logger.warning('💳 Ошибка списания средств для автопродления пользователя', user_identifier=user_identifier)
+            return AUTOPAY_FAILED
 
-        except Exception as e:
-            logger.error('Ошибка обработки автоплатежей', error=e)
+        # Проверяем кулдаун уведомления через Redis, чтобы не спамить
+        # при каждом срабатывании мониторинга
+        cooldown_key = f'autopay_insufficient_balance_notified:{user.id}'
+        should_notify = True
+
+        try:
+            if await cache.exists(cooldown_key):
+                should_notify = False
+                logger.debug(
+                    '💳 Пропуск уведомления о недостаточном балансе для пользователя — кулдаун активен',
+                    user_identifier=user_identifier,
+                )
+        except Exception as redis_err:
+            # Fallback: если Redis недоступен — отправляем уведомление
+            logger.warning(
+                '⚠️ Ошибка проверки кулдауна в Redis для пользователя : . Отправляем уведомление.',
+                user_identifier=user_identifier,
+                redis_err=redis_err,
+            )
+
+        if should_notify:
+            if user.telegram_id and self.bot:
+                await self._send_autopay_failed_notification(user, user.balance_kopeks, charge_amount)
+            elif not user.telegram_id:
+                await notification_delivery_service.notify_autopay_failed(
+                    user=user,
+                    reason='Недостаточно средств на балансе',
+                )
+
+            # Ставим ключ кулдауна после отправки
+            try:
+                await cache.set(
+                    cooldown_key,
+                    1,
+                    expire=AUTOPAY_INSUFFICIENT_BALANCE_COOLDOWN_SECONDS,
+                )
+            except Exception as redis_err:
+                logger.warning(
+                    '⚠️ Не удалось установить кулдаун в Redis для пользователя',
+                    user_identifier=user_identifier,
+                    redis_err=redis_err,
+                )
+
+        logger.warning('💳 Недостаточно средств для автопродления у пользователя', user_identifier=user_identifier)
+        return AUTOPAY_INSUFFICIENT_BALANCE
 
     async def _send_subscription_expired_notification(self, user: User) -> bool:
         try:
@@ -1790,6 +1865,7 @@ class MonitoringService:
                     'failed': failed_events,
                     'success_rate': round(successful_events / len(events_24h) * 100, 1) if events_24h else 0,
                 },
+                'last_autopay_run': self.last_autopay_run.as_dict() if self.last_autopay_run else None,
             }
 
         except Exception as e:
@@ -1877,6 +1953,45 @@ class MonitoringService:
             logger.error('Ошибка получения логов мониторинга', error=e)
             return []
 
+    async def get_monitoring_logs_page(
+        self,
+        db: AsyncSession,
+        *,
+        limit: int = 20,
+        cursor: KeysetCursor | str | None = None,
+        event_type: str | None = None,
+    ) -> KeysetPage[dict[str, Any]]:
+        """Страница логов по курсору (новые сверху), без OFFSET."""
+        query = select(MonitoringLog)
+        if event_type:
+            query = query.where(MonitoringLog.event_type == event_type)
+
+        page = await paginate_keyset(
+            db, query, [KeysetColumn(MonitoringLog.id, descending=True)], limit=limit, cursor=cursor
+        )
+        page.items = [
+            {
+                'id': log.id,
+                'event_type': log.event_type,
+                'message': log.message,
+                'data': log.data,
+                'is_success': log.is_success,
+                'created_at': log.created_at,
+            }
+            for log in page.items
+        ]
+        return page
+
+    async def get_monitoring_logs_summary(self, db: AsyncSession) -> dict[str, int]:
+        """Общее число событий и число успешных — одним агрегирующим запросом."""
+        from sqlalchemy import Integer, cast, func
+
+        result = await db.execute(
+            select(func.count(MonitoringLog.id), func.coalesce(func.sum(cast(MonitoringLog.is_success, Integer)), 0))
+        )
+        total, success = result.one()
+        return {'total': int(total or 0), 'success': int(success or 0)}
+
     async def get_monitoring_logs_count(self, db: AsyncSession, event_type: str | None = None) -> int:
         try:
             from sqlalchemy import func, select
@@ -1,7 +1,9 @@
 """Фоновый сервис для обработки очереди чеков NaloGO.
 
 При временной недоступности сервиса nalog.ru (503), чеки сохраняются в Redis
-и отправляются позже этим сервисом.
+и отправляются позже этим сервисом. Чек удаляется из очереди только после
+успешной отправки; неудачный повторяется с экспоненциальной паузой
+(см. ``app.services.nalogo_receipt_queue``).
 """
 
 import asyncio
@@ -12,6 +14,7 @@ from aiogram import Bot
 from dateutil.parser import isoparse
 
 from app.config import settings
+from app.services.nalogo_receipt_queue import ClaimedReceipt, nalogo_receipt_queue
 from app.services.nalogo_service import NaloGoService
 from app.utils.cache import cache
 
@@ -55,9 +58,24 @@ class NalogoQueueService:
 
     @property
     def _max_attempts(self) -> int:
-        """Максимальное количество попыток отправки чека."""
+        """Число попыток, после которого о чеке пишется предупреждение (чек не удаляется)."""
         return getattr(settings, 'NALOGO_QUEUE_MAX_ATTEMPTS', 10)
 
+    @property
+    def _concurrency(self) -> int:
+        """Сколько чеков отправлять одновременно."""
+        return max(1, getattr(settings, 'NALOGO_QUEUE_CONCURRENCY', 2))
+
+    @property
+    def _visibility_timeout(self) -> int:
+        """Через сколько секунд захваченный, но не подтверждённый чек возвращается в очередь."""
+        return max(60, getattr(settings, 'NALOGO_QUEUE_VISIBILITY_TIMEOUT', 600))
+
+    def _retry_delay(self, attempts: int) -> int:
+        """Пауза перед следующей попыткой: интервал проверки, удваивается с каждой неудачей."""
+        max_delay = getattr(settings, 'NALOGO_QUEUE_MAX_RETRY_DELAY', 6 * 3600)
+        return min(self._check_interval * 2 ** max(attempts - 1, 0), max_delay)
+
     async def start(self) -> None:
         """Запустить фоновую обработку очереди."""
         if not self._nalogo_service or not self._nalogo_service.configured:
@@ -130,122 +148,43 @@ class NalogoQueueService:
             await asyncio.sleep(self._check_interval)
 
     async def _process_pending_receipts(self) -> None:
-        """Обработать все ожидающие чеки в очереди."""
+        """Отправить чеки, время повтора которых наступило."""
         if not self._nalogo_service:
             return
 
+        await nalogo_receipt_queue.migrate_legacy()
+
         queue_length = await self._nalogo_service.get_queue_length()
         if queue_length == 0:
             return
 
-        logger.info('Начинаем обработку очереди чеков: шт.', queue_length=queue_length)
         self._had_pending_receipts = True
 
         processed = 0
         failed = 0
-        skipped = 0
         total_processed_amount = 0.0
         service_unavailable = False
+        semaphore = asyncio.Semaphore(self._concurrency)
 
-        while True:
-            receipt_data = await self._nalogo_service.pop_receipt_from_queue()
-            if not receipt_data:
+        while not service_unavailable:
+            claimed = await nalogo_receipt_queue.claim(self._concurrency, self._visibility_timeout)
+            if not claimed:
                 break
 
-            attempts = receipt_data.get('attempts', 0)
-            payment_id = receipt_data.get('payment_id', 'unknown')
-            amount = receipt_data.get('amount', 0)
-
-            # Логируем количество попыток (чек никогда не удаляется из очереди)
-            if attempts >= 10:
-                logger.warning('Чек уже попыток, продолжаем пытаться...', payment_id=payment_id, attempts=attempts)
-
-            # Пытаемся отправить чек
-            try:
-                # Восстанавливаем описание из сохранённых данных
-                telegram_user_id = receipt_data.get('telegram_user_id')
-                amount_kopeks = receipt_data.get('amount_kopeks')
-
-                # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
-                operation_time = None
-                created_at_str = receipt_data.get('created_at')
-                if created_at_str:
-                    try:
-                        operation_time = isoparse(created_at_str)
-                        if operation_time.tzinfo is None:
-                            operation_time = operation_time.replace(tzinfo=UTC)
-                    except (ValueError, TypeError) as parse_error:
-                        logger.warning(
-                            'Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error
-                        )
-
-                # Формируем описание заново из настроек (если есть данные)
-                if amount_kopeks is not None:
-                    receipt_name = settings.get_balance_payment_description(amount_kopeks, telegram_user_id)
-                else:
-                    # Fallback на сохранённое имя
-                    receipt_name = receipt_data.get(
-                        'name', settings.get_balance_payment_description(int(amount * 100), telegram_user_id)
-                    )
+            logger.info('Отправка чеков из очереди', claimed=len(claimed), queue_length=queue_length)
+            results = await asyncio.gather(*(self._send_with_limit(semaphore, receipt) for receipt in claimed))
 
-                receipt_uuid = await self._nalogo_service.create_receipt(
-                    name=receipt_name,
-                    amount=amount,
-                    quantity=receipt_data.get('quantity', 1),
-                    client_info=receipt_data.get('client_info'),
-                    payment_id=payment_id,
-                    queue_on_failure=False,  # Не добавлять в очередь повторно автоматически
-                    telegram_user_id=telegram_user_id,
-                    amount_kopeks=amount_kopeks,
-                    operation_time=operation_time,  # Время оплаты, а не отправки
-                )
-
-                if receipt_uuid:
+            for receipt, sent in zip(claimed, results, strict=True):
+                if sent:
                     processed += 1
-                    total_processed_amount += amount
-
-                    # Удаляем метку "в очереди" (чек создан успешно)
-                    if payment_id:
-                        queued_key = f'nalogo:queued:{payment_id}'
-                        await cache.delete(queued_key)
-
-                    logger.info(
-                        'Чек из очереди успешно создан: (payment_id=, попытка )',
-                        receipt_uuid=receipt_uuid,
-                        payment_id=payment_id,
-                        attempts=attempts + 1,
-                    )
+                    total_processed_amount += receipt.data.get('amount', 0)
                 else:
-                    # Вернуть в очередь с увеличенным счетчиком попыток
-                    await self._nalogo_service.requeue_receipt(receipt_data)
                     failed += 1
+                    # Сервис недоступен — остальные чеки ждут своей паузы
                     service_unavailable = True
-                    logger.warning(
-                        'Не удалось создать чек из очереди (payment_id=), возвращен в очередь (попытка /)',
-                        payment_id=payment_id,
-                        attempts=attempts + 1,
-                        _max_attempts=self._max_attempts,
-                    )
-                    # Если сервис недоступен, прекращаем попытки до следующего цикла
-                    break
-
-            except Exception as error:
-                await self._nalogo_service.requeue_receipt(receipt_data)
-                failed += 1
-                logger.error('Ошибка при создании чека из очереди (payment_id=)', payment_id=payment_id, error=error)
-                # Прекращаем попытки при ошибке
-                break
-
-            # Задержка между чеками чтобы не долбить API
-            await asyncio.sleep(self._receipt_delay)
 
-        if processed > 0 or failed > 0 or skipped > 0:
-            logger.info(
-                'Обработка очереди завершена: успешно=, неудачно=, пропущено',
-                processed=processed,
-                failed=failed,
-                skipped=skipped,
-            )
+        if processed > 0 or failed > 0:
+            logger.info('Обработка очереди завершена: успешно=, неудачно=', processed=processed, failed=failed)
 
         # Проверяем остаток в очереди
         remaining = await self._nalogo_service.get_queue_length()
@@ -276,6 +215,89 @@ class NalogoQueueService:
             )
             await self._send_admin_notification(message, skip_cooldown=True)
 
+    async def _send_with_limit(self, semaphore: asyncio.Semaphore, receipt: ClaimedReceipt) -> bool:
+        async with semaphore:
+            sent = await self._send_queued_receipt(receipt)
+            # Задержка между чеками чтобы не долбить API
+            await asyncio.sleep(self._receipt_delay)
+            return sent
+
+    async def _send_queued_receipt(self, receipt: ClaimedReceipt) -> bool:
+        """Отправить один захваченный чек: подтвердить при успехе или отложить повтор."""
+        receipt_data = receipt.data
+        attempts = receipt_data.get('attempts', 0)
+        payment_id = receipt_data.get('payment_id', 'unknown')
+        amount = receipt_data.get('amount', 0)
+
+        if attempts >= self._max_attempts:
+            logger.warning('Чек уже попыток, продолжаем пытаться...', payment_id=payment_id, attempts=attempts)
+
+        try:
+            telegram_user_id = receipt_data.get('telegram_user_id')
+            amount_kopeks = receipt_data.get('amount_kopeks')
+
+            # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
+            operation_time = None
+            created_at_str = receipt_data.get('created_at')
+            if created_at_str:
+                try:
+                    operation_time = isoparse(created_at_str)
+                    if operation_time.tzinfo is None:
+                        operation_time = operation_time.replace(tzinfo=UTC)
+                except (ValueError, TypeError) as parse_error:
+                    logger.warning(
+                        'Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error
+                    )
+
+            # Формируем описание заново из настроек (если есть данные)
+            if amount_kopeks is not None:
+                receipt_name = settings.get_balance_payment_description(amount_kopeks, telegram_user_id)
+            else:
+                # Fallback на сохранённое имя
+                receipt_name = receipt_data.get(
+                    'name', settings.get_balance_payment_description(int(amount * 100), telegram_user_id)
+                )
+
+            receipt_uuid = await self._nalogo_service.create_receipt(
+                name=receipt_name,
+                amount=amount,
+                quantity=receipt_data.get('quantity', 1),
+                client_info=receipt_data.get('client_info'),
+                payment_id=payment_id,
+                queue_on_failure=False,  # Повтор планирует очередь
+                telegram_user_id=telegram_user_id,
+                amount_kopeks=amount_kopeks,
+                operation_time=operation_time,  # Время оплаты, а не отправки
+            )
+        except Exception as error:
+            logger.error('Ошибка при создании чека из очереди (payment_id=)', payment_id=payment_id, error=error)
+            receipt_uuid = None
+
+        if receipt_uuid:
+            await nalogo_receipt_queue.ack(receipt.receipt_id)
+            # Удаляем метку "в очереди" (чек создан успешно)
+            if payment_id:
+                await cache.delete(f'nalogo:queued:{payment_id}')
+            logger.info(
+                'Чек из очереди успешно создан: (payment_id=, попытка )',
+                receipt_uuid=receipt_uuid,
+                payment_id=payment_id,
+                attempts=attempts + 1,
+            )
+            return True
+
+        receipt_data['attempts'] = attempts + 1
+        delay = self._retry_delay(attempts + 1)
+        await nalogo_receipt_queue.retry(receipt.receipt_id, receipt_data, delay)
+        logger.warning(
+            'Не удалось создать чек из очереди (payment_id=), повтор через с (попытка /)',
+            payment_id=payment_id,
+            retry_in_seconds=delay,
+            attempts=attempts + 1,
+            _max_attempts=self._max_attempts,
+        )
+        return False
+
     async def force_process(self) -> dict:
         """Принудительно обработать очередь (для ручного запуска)."""
         if not self._nalogo_service:
@@ -304,6 +326,8 @@ class NalogoQueueService:
         pending_verification_amount = 0.0
         pending_verification_receipts = []
 
+        metrics = await nalogo_receipt_queue.get_metrics()
+
         if self._nalogo_service:
             queue_length = await self._nalogo_service.get_queue_length()
             if queue_length > 0:
@@ -323,6 +347,10 @@ class NalogoQueueService:
             'queue_length': queue_length,
             'total_amount': total_amount,
             'max_attempts': self._max_attempts,
+            'concurrency': self._concurrency,
+            'visibility_timeout_seconds': self._visibility_timeout,
+            # Глубина и возраст очереди: готовые к отправке, ждущие паузы повтора, в обработке
+            'queue_metrics': metrics.as_dict(),
             'queued_receipts': queued_receipts[:10],
             # Чеки требующие ручной проверки (таймаут после успешной авторизации)
             'pending_verification_count': pending_verification_count,
@@ -0,0 +1,276 @@
+"""Надёжная очередь чеков NaloGO в Redis.
+
+Данные чеков лежат в хеше ``nalogo:receipts``, расписание — в двух sorted set:
+
+* ``nalogo:receipts:scheduled`` — чеки к отправке, score = время следующей
+  попытки (отложенные повторы с экспоненциальной паузой);
+* ``nalogo:receipts:in_flight`` — захваченные обработчиком, score = срок
+  видимости. Если обработчик упал, не подтвердив чек, по истечении срока чек
+  возвращается в расписание, а не теряется.
+
+Перенос между множествами выполняется Lua-скриптами — атомарно, поэтому
+несколько обработчиков не захватят один чек.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+from app.utils.cache import CacheService, cache
+
+
+logger = structlog.get_logger(__name__)
+
+
+RECEIPTS_KEY = 'nalogo:receipts'
+SCHEDULED_KEY = 'nalogo:receipts:scheduled'
+IN_FLIGHT_KEY = 'nalogo:receipts:in_flight'
+ENQUEUED_KEY = 'nalogo:receipts:enqueued'
+# Список, в котором чеки хранились раньше (RPOP без подтверждения)
+LEGACY_QUEUE_KEY = 'nalogo:receipt_queue'
+
+# KEYS: receipts, scheduled, enqueued; ARGV: id, payload, now
+ENQUEUE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+  return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return 1
+"""
+
+# KEYS: scheduled, in_flight, receipts; ARGV: now, limit, visible_until
+CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+  redis.call('ZREM', KEYS[2], id)
+  redis.call('ZADD', KEYS[1], ARGV[1], id)
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local result = {}
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[1], id)
+  local payload = redis.call('HGET', KEYS[3], id)
+  if payload then
+    redis.call('ZADD', KEYS[2], ARGV[3], id)
+    table.insert(result, id)
+    table.insert(result, payload)
+  end
+end
+return result
+"""
+
+# KEYS: in_flight, scheduled, receipts, enqueued; ARGV: id
+ACK_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+return redis.call('HDEL', KEYS[3], ARGV[1])
+"""
+
+# KEYS: in_flight, scheduled, receipts; ARGV: id, payload, retry_at
+RETRY_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+  return 0
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+return 1
+"""
+
+# KEYS: legacy list, receipts, scheduled, enqueued; ARGV: now
+MIGRATE_LEGACY_SCRIPT = """
+local moved = 0
+local item = redis.call('RPOP', KEYS[1])
+while item do
+  local id = redis.sha1hex(item)
+  if redis.call('HSETNX', KEYS[2], id, item) == 1 then
+    redis.call('ZADD', KEYS[3], ARGV[1], id)
+    redis.call('ZADD', KEYS[4], ARGV[1], id)
+    moved = moved + 1
+  end
+  item = redis.call('RPOP', KEYS[1])
+end
+return moved
+"""
+
+
+def _decode(value: Any) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+@dataclass(slots=True)
+class ClaimedReceipt:
+    receipt_id: str
+    data: dict[str, Any]
+
+
+@dataclass(slots=True)
+class ReceiptQueueMetrics:
+    depth: int = 0
+    ready: int = 0
+    delayed: int = 0
+    in_flight: int = 0
+    oldest_age_seconds: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'depth': self.depth,
+            'ready': self.ready,
+            'delayed': self.delayed,
+            'in_flight': self.in_flight,
+            'oldest_age_seconds': round(self.oldest_age_seconds) if self.oldest_age_seconds is not None else None,
+        }
+
+
+class NalogoReceiptQueue:
+    """Очередь чеков с подтверждением, сроком видимости и отложенными повторами."""
+
+    def __init__(self, cache_service: CacheService = cache, clock: Callable[[], float] = time.time) -> None:
+        self._cache = cache_service
+        self._clock = clock
+
+    @property
+    def _redis(self):
+        if not self._cache.is_connected or self._cache.redis_client is None:
+            return None
+        return self._cache.redis_client
+
+    async def enqueue(self, receipt_id: str, data: dict[str, Any]) -> bool:
+        """Поставить чек в очередь. False — чек с таким id уже в очереди или Redis недоступен."""
+        redis_client = self._redis
+        if redis_client is None:
+            return False
+        try:
+            created = await redis_client.eval(
+                ENQUEUE_SCRIPT,
+                3,
+                RECEIPTS_KEY,
+                SCHEDULED_KEY,
+                ENQUEUED_KEY,
+                receipt_id,
+                json.dumps(data, default=str),
+                self._clock(),
+            )
+            return bool(created)
+        except Exception as error:
+            logger.error('Ошибка добавления чека в очередь', receipt_id=receipt_id, error=error)
+            return False
+
+    async def claim(self, limit: int, visibility_timeout: int) -> list[ClaimedReceipt]:
+        """Захватить до ``limit`` готовых к отправке чеков.
+
+        Чеки с истёкшим сроком видимости сначала возвращаются в расписание.
+        """
+        redis_client = self._redis
+        if redis_client is None:
+            return []
+        now = self._clock()
+        raw = await redis_client.eval(
+            CLAIM_SCRIPT,
+            3,
+            SCHEDULED_KEY,
+            IN_FLIGHT_KEY,
+            RECEIPTS_KEY,
+            now,
+            limit,
+            now + visibility_timeout,
+        )
+        claimed = []
+        for receipt_id, payload in zip(raw[::2], raw[1::2], strict=True):
+            claimed.append(ClaimedReceipt(_decode(receipt_id), json.loads(payload)))
+        return claimed
+
+    async def ack(self, receipt_id: str) -> None:
+        """Чек отправлен — удалить его из очереди."""
+        redis_client = self._redis
+        if redis_client is None:
+            return
+        await redis_client.eval(ACK_SCRIPT, 4, IN_FLIGHT_KEY, SCHEDULED_KEY, RECEIPTS_KEY, ENQUEUED_KEY, receipt_id)
+
+    async def retry(self, receipt_id: str, data: dict[str, Any], delay_seconds: float) -> bool:
+        """Вернуть захваченный чек в расписание через ``delay_seconds``.
+
+        False — захват уже истёк и чек вернулся в очередь без нас.
+        """
+        redis_client = self._redis
+        if redis_client is None:
+            return False
+        retried = await redis_client.eval(
+            RETRY_SCRIPT,
+            3,
+            IN_FLIGHT_KEY,
+            SCHEDULED_KEY,
+            RECEIPTS_KEY,
+            receipt_id,
+            json.dumps(data, default=str),
+            self._clock() + delay_seconds,
+        )
+        return bool(retried)
+
+    async def migrate_legacy(self) -> int:
+        """Перенести чеки из старого списка ``nalogo:receipt_queue``."""
+        redis_client = self._redis
+        if redis_client is None:
+            return 0
+        moved = int(
+            await redis_client.eval(
+                MIGRATE_LEGACY_SCRIPT, 4, LEGACY_QUEUE_KEY, RECEIPTS_KEY, SCHEDULED_KEY, ENQUEUED_KEY, self._clock()
+            )
+        )
+        if moved:
+            logger.info('Чеки из старой очереди перенесены', moved=moved)
+        return moved
+
+    async def depth(self) -> int:
+        redis_client = self._redis
+        if redis_client is None:
+            return 0
+        try:
+            return int(await redis_client.hlen(RECEIPTS_KEY)) + int(await redis_client.llen(LEGACY_QUEUE_KEY))
+        except Exception as error:
+            logger.error('Ошибка получения длины очереди чеков', error=error)
+            return 0
+
+    async def list_receipts(self) -> list[dict[str, Any]]:
+        redis_client = self._redis
+        if redis_client is None:
+            return []
+        try:
+            values = await redis_client.hvals(RECEIPTS_KEY)
+        except Exception as error:
+            logger.error('Ошибка чтения очереди чеков', error=error)
+            return []
+        return [json.loads(value) for value in values]
+
+    async def get_metrics(self) -> ReceiptQueueMetrics:
+        redis_client = self._redis
+        if redis_client is None:
+            return ReceiptQueueMetrics()
+
+        now = self._clock()
+        try:
+            scheduled = int(await redis_client.zcard(SCHEDULED_KEY))
+            ready = int(await redis_client.zcount(SCHEDULED_KEY, '-inf', now))
+            in_flight = int(await redis_client.zcard(IN_FLIGHT_KEY))
+            oldest = await redis_client.zrange(ENQUEUED_KEY, 0, 0, withscores=True)
+        except Exception as error:
+            logger.error('Ошибка получения метрик очереди чеков', error=error)
+            return ReceiptQueueMetrics()
+
+        return ReceiptQueueMetrics(
+            depth=scheduled + in_flight,
+            ready=ready,
+            delayed=scheduled - ready,
+            in_flight=in_flight,
+            oldest_age_seconds=max(0.0, now - float(oldest[0][1])) if oldest else None,
+        )
+
+
+nalogo_receipt_queue = NalogoReceiptQueue()
@@ -1,3 +1,4 @@
+import uuid
 from datetime import UTC, date, datetime, timedelta
 from decimal import Decimal
 from typing import Any
@@ -9,12 +10,12 @@ from app.config import settings
 # Используем локальную исправленную версию библиотеки
 from app.lib.nalogo import Client
 from app.lib.nalogo.dto.income import IncomeClient, IncomeType
+from app.services.nalogo_receipt_queue import nalogo_receipt_queue
 from app.utils.cache import cache
 
 
 logger = structlog.get_logger(__name__)
 
-NALOGO_QUEUE_KEY = 'nalogo:receipt_queue'
 NALOGO_PENDING_VERIFICATION_KEY = 'nalogo:pending_verification'
 
 
@@ -120,9 +121,9 @@ class NaloGoService:
             'created_at': datetime.now(UTC).isoformat(),
             'attempts': 0,
         }
-        success = await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        success = await nalogo_receipt_queue.enqueue(payment_id or uuid.uuid4().hex, receipt_data)
         if success:
-            queue_len = await cache.llen(NALOGO_QUEUE_KEY)
+            queue_len = await nalogo_receipt_queue.depth()
             logger.info(
                 'Чек добавлен в очередь (payment_id=, сумма=₽, в очереди: )',
                 payment_id=payment_id,
@@ -423,20 +424,11 @@ class NaloGoService:
 
     async def get_queue_length(self) -> int:
         """Получить количество чеков в очереди."""
-        return await cache.llen(NALOGO_QUEUE_KEY)
+        return await nalogo_receipt_queue.depth()
 
     async def get_queued_receipts(self) -> list:
         """Получить список чеков в очереди (без удаления)."""
-        return await cache.lrange(NALOGO_QUEUE_KEY)
-
-    async def pop_receipt_from_queue(self) -> dict[str, Any] | None:
-        """Извлечь следующий чек из очереди."""
-        return await cache.rpop(NALOGO_QUEUE_KEY)
-
-    async def requeue_receipt(self, receipt_data: dict[str, Any]) -> bool:
-        """Вернуть чек обратно в очередь (при неудачной отправке)."""
-        receipt_data['attempts'] = receipt_data.get('attempts', 0) + 1
-        return await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        return await nalogo_receipt_queue.list_receipts()
 
     async def find_duplicate_receipt(
         self,
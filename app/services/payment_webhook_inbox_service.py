@@ -0,0 +1,292 @@
+"""Фоновая обработка webhook платёжных провайдеров.
+
+Эндпоинт провайдера проверяет подпись, сохраняет событие в очередь
+(``payment_webhook_events``) и сразу отвечает 200. Зачисление, реферальные
+начисления, запросы к панели и уведомления выполняет обработчик очереди:
+с повторами по растущей паузе и без двойной обработки повторных доставок.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+import structlog
+
+from app.config import settings
+from app.database.crud.payment_webhook_event import (
+    claim_payment_webhook_events,
+    delete_processed_payment_webhook_events,
+    enqueue_payment_webhook_event,
+    get_payment_webhook_event,
+    get_payment_webhook_event_counts,
+    mark_payment_webhook_event_failed,
+    mark_payment_webhook_event_processed,
+)
+from app.database.database import IS_SQLITE, AsyncSessionLocal
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from app.services.payment_service import PaymentService
+
+
+logger = structlog.get_logger(__name__)
+
+
+# Обработчики, принимающие параметры webhook именованными аргументами
+KEYWORD_HANDLERS = frozenset({'process_freekassa_webhook', 'process_kassa_ai_webhook'})
+
+RETRY_BASE_DELAY_SECONDS = 15
+RETRY_MAX_DELAY_SECONDS = 3600
+CLEANUP_INTERVAL_SECONDS = 3600
+_EVENT_KEY_MAX_LENGTH = 255
+
+
+def build_webhook_event_key(payload: Any, reference: Any = None, *, event_id: Any = None) -> str:
+    """Ключ идемпотентности события.
+
+    ``event_id`` — id уведомления, который провайдер сохраняет при повторной
+    доставке (CryptoBot ``update_id``, событие и платёж YooKassa). Без него
+    ключ строится по содержимому webhook: повторная доставка того же события
+    даёт тот же ключ, а смена статуса платежа — новый. ``reference`` (id
+    платежа) добавляется для поиска в БД.
+    """
+    if event_id not in (None, ''):
+        return str(event_id)[:_EVENT_KEY_MAX_LENGTH]
+
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+    if reference in (None, ''):
+        return digest
+    return f'{str(reference)[: _EVENT_KEY_MAX_LENGTH - len(digest) - 1]}:{digest}'
+
+
+def retry_delay_seconds(attempt: int) -> int:
+    return min(RETRY_BASE_DELAY_SECONDS * 2 ** max(attempt - 1, 0), RETRY_MAX_DELAY_SECONDS)
+
+
+class PaymentWebhookInboxService:
+    """Очередь webhook платёжных провайдеров и её фоновый обработчик."""
+
+    def __init__(self, session_factory=AsyncSessionLocal) -> None:
+        self._session_factory = session_factory
+        self._payment_service: PaymentService | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._wakeup = asyncio.Event()
+        self._last_cleanup_at: datetime | None = None
+        self.stats: Counter[str] = Counter()
+
+    def set_payment_service(self, payment_service: PaymentService) -> None:
+        self._payment_service = payment_service
+
+    def is_enabled(self) -> bool:
+        return settings.is_payment_webhook_inbox_enabled()
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def accepts_events(self) -> bool:
+        """Принимать webhook в очередь, только если её есть кому обрабатывать."""
+        return self.is_enabled() and self.is_running()
+
+    def get_concurrency(self) -> int:
+        # SQLite не переносит параллельные пишущие транзакции
+        if IS_SQLITE:
+            return 1
+        return settings.get_payment_webhook_inbox_concurrency()
+
+    async def start(self) -> None:
+        await self.stop()
+
+        if not self.is_enabled():
+            logger.info('Очередь webhook платёжных систем отключена настройками')
+            return
+
+        if not self._payment_service:
+            logger.warning('Очередь webhook не запущена: PaymentService не инициализирован')
+            return
+
+        self._task = asyncio.create_task(self._worker_loop())
+        logger.info(
+            '📥 Обработчик очереди webhook платёжных систем запущен',
+            poll_seconds=settings.get_payment_webhook_inbox_poll_seconds(),
+            concurrency=self.get_concurrency(),
+        )
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def enqueue(self, provider: str, handler: str, payload: dict[str, Any], event_key: str) -> bool:
+        """Сохранить webhook в очередь. False — событие уже было принято раньше."""
+        async with self._session_factory() as db:
+            event, created = await enqueue_payment_webhook_event(
+                db,
+                provider=provider,
+                event_key=event_key,
+                handler=handler,
+                payload=payload,
+                now=datetime.now(UTC),
+            )
+
+        self.stats['received' if created else 'duplicates'] += 1
+        logger.info(
+            '📥 Webhook принят в очередь' if created else '📥 Повторная доставка webhook',
+            provider=provider,
+            event_id=event.id,
+            event_key=event_key,
+        )
+        self._wakeup.set()
+        return created
+
+    async def _worker_loop(self) -> None:
+        try:
+            while True:
+                processed = 0
+                try:
+                    processed = await self.process_due()
+                    await self._cleanup_if_due()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    logger.error('Ошибка обработки очереди webhook', error=error, exc_info=True)
+
+                # Полная пачка — в очереди могут быть ещё события
+                if processed >= settings.get_payment_webhook_inbox_batch_size():
+                    continue
+
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=settings.get_payment_webhook_inbox_poll_seconds()
+                    )
+                except TimeoutError:
+                    pass
+                self._wakeup.clear()
+        except asyncio.CancelledError:
+            logger.info('Обработчик очереди webhook остановлен')
+            raise
+
+    async def process_due(self) -> int:
+        """Захватить и обработать одну пачку событий. Возвращает число захваченных событий."""
+        now = datetime.now(UTC)
+        async with self._session_factory() as db:
+            event_ids = await claim_payment_webhook_events(
+                db,
+                now=now,
+                batch_size=settings.get_payment_webhook_inbox_batch_size(),
+                lease_seconds=settings.get_payment_webhook_inbox_lease_seconds(),
+            )
+        if not event_ids:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.get_concurrency())
+
+        async def process(event_id: int) -> None:
+            async with semaphore:
+                try:
+                    await self._process_event(event_id)
+                except Exception as error:
+                    # Событие останется захваченным и вернётся в очередь по истечении аренды
+                    logger.error('Ошибка обработки webhook из очереди', event_id=event_id, error=error, exc_info=True)
+
+        await asyncio.gather(*(process(event_id) for event_id in event_ids))
+        return len(event_ids)
+
+    async def _process_event(self, event_id: int) -> None:
+        async with self._session_factory() as db:
+            event = await get_payment_webhook_event(db, event_id)
+            if event is None:
+                return
+
+            provider, handler_name, attempts = event.provider, event.handler, event.attempts
+            payload = dict(event.payload or {})
+
+            error: str | None = None
+            try:
+                success = await self._call_handler(db, handler_name, payload)
+                if not success:
+                    error = 'handler returned False'
+            except Exception as exc:
+                await db.rollback()
+                error = f'{type(exc).__name__}: {exc}'
+                logger.error(
+                    'Ошибка обработки webhook из очереди',
+                    provider=provider,
+                    event_id=event_id,
+                    error=exc,
+                    exc_info=True,
+                )
+
+            now = datetime.now(UTC)
+            if error is None:
+                await mark_payment_webhook_event_processed(db, event_id, now=now)
+                self.stats['processed'] += 1
+                return
+
+            if attempts >= settings.get_payment_webhook_inbox_max_attempts():
+                await mark_payment_webhook_event_failed(db, event_id, error=error, retry_at=None)
+                self.stats['failed'] += 1
+                logger.error(
+                    '❌ Webhook не обработан после всех попыток',
+                    provider=provider,
+                    event_id=event_id,
+                    attempts=attempts,
+                    error=error,
+                )
+                return
+
+            delay = retry_delay_seconds(attempts)
+            await mark_payment_webhook_event_failed(db, event_id, error=error, retry_at=now + timedelta(seconds=delay))
+            self.stats['retried'] += 1
+            logger.warning(
+                '⚠️ Webhook будет обработан повторно',
+                provider=provider,
+                event_id=event_id,
+                attempts=attempts,
+                retry_in_seconds=delay,
+                error=error,
+            )
+
+    async def _call_handler(self, db, handler_name: str, payload: dict[str, Any]) -> bool:
+        if not self._payment_service:
+            raise RuntimeError('PaymentService is not configured')
+
+        handler = getattr(self._payment_service, handler_name)
+        if handler_name in KEYWORD_HANDLERS:
+            return bool(await handler(db, **payload))
+        return bool(await handler(db, payload))
+
+    async def _cleanup_if_due(self) -> None:
+        now = datetime.now(UTC)
+        if self._last_cleanup_at and (now - self._last_cleanup_at).total_seconds() < CLEANUP_INTERVAL_SECONDS:
+            return
+        self._last_cleanup_at = now
+
+        before = now - timedelta(days=max(1, settings.PAYMENT_WEBHOOK_INBOX_RETENTION_DAYS))
+        async with self._session_factory() as db:
+            deleted = await delete_processed_payment_webhook_events(db, before=before)
+        if deleted:
+            logger.info('🧹 Удалены обработанные webhook из очереди', deleted=deleted)
+
+    async def get_status(self) -> dict[str, Any]:
+        async with self._session_factory() as db:
+            counts = await get_payment_webhook_event_counts(db)
+        return {
+            'enabled': self.is_enabled(),
+            'running': self.is_running(),
+            'events': counts,
+            'stats': dict(self.stats),
+        }
+
+
+payment_webhook_inbox_service = PaymentWebhookInboxService()
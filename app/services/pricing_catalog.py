@@ -0,0 +1,299 @@
+"""Каталог цен в памяти процесса: тарифы, цены серверов и скидки промогрупп.
+
+Каталог загружается одним набором запросов и пересобирается, только когда
+меняется версия пространств кеша ``pricing_catalog`` (тарифы и серверы) или
+``promo_groups``. Версии увеличивают CRUD-функции при изменениях, поэтому
+правки администратора на любой реплике доходят до остальных не позже чем
+через ``CACHE_LOCAL_TTL_SECONDS``. Цены периодов тарифов заранее рассчитаны
+для каждой промогруппы: экран покупки собирается из словарей.
+
+Занятость серверов (``is_full``, ``current_users``) меняется при каждой
+покупке и в каталог не входит.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.database.models import PromoGroup, ServerSquad, Tariff
+from app.utils.cache import PRICING_CATALOG_NAMESPACE, PROMO_GROUPS_NAMESPACE, cache
+
+
+logger = structlog.get_logger(__name__)
+
+
+_EMPTY_DISCOUNTS: Mapping[int, int] = MappingProxyType({})
+
+
+def _int_mapping(raw: Any, *, clamp_percent: bool = False) -> Mapping[int, int]:
+    if not isinstance(raw, dict):
+        return _EMPTY_DISCOUNTS
+
+    normalized: dict[int, int] = {}
+    for key, value in raw.items():
+        try:
+            number = int(value)
+            normalized[int(key)] = max(0, min(100, number)) if clamp_percent else number
+        except (TypeError, ValueError):
+            continue
+    return MappingProxyType(normalized)
+
+
+@dataclass(frozen=True, slots=True)
+class PeriodPrice:
+    days: int
+    months: int
+    original_price_kopeks: int
+    price_kopeks: int
+    discount_percent: int
+    price_per_month_kopeks: int
+
+
+def build_period_prices(
+    period_prices: Mapping[int, int], period_discounts: Mapping[int, int]
+) -> tuple[PeriodPrice, ...]:
+    """Цены периодов тарифа со скидкой промогруппы по периодам (как на экране тарифов)."""
+    prices: list[PeriodPrice] = []
+    for days in sorted(period_prices):
+        original_price_kopeks = period_prices[days]
+        discount_percent = period_discounts.get(days, 0)
+        if discount_percent > 0:
+            price_kopeks = int(original_price_kopeks * (100 - discount_percent) / 100)
+        else:
+            price_kopeks = original_price_kopeks
+
+        months = max(1, days // 30)
+        prices.append(
+            PeriodPrice(
+                days=days,
+                months=months,
+                original_price_kopeks=original_price_kopeks,
+                price_kopeks=price_kopeks,
+                discount_percent=discount_percent,
+                price_per_month_kopeks=price_kopeks // months,
+            )
+        )
+    return tuple(prices)
+
+
+@dataclass(frozen=True, slots=True)
+class PromoGroupDiscounts:
+    id: int
+    name: str
+    period_discounts: Mapping[int, int]
+    server_discount_percent: int
+    traffic_discount_percent: int
+    device_discount_percent: int
+    apply_discounts_to_addons: bool
+    is_default: bool
+
+    @classmethod
+    def from_model(cls, group: PromoGroup) -> PromoGroupDiscounts:
+        return cls(
+            id=group.id,
+            name=group.name,
+            period_discounts=_int_mapping(group.period_discounts, clamp_percent=True),
+            server_discount_percent=int(group.server_discount_percent or 0),
+            traffic_discount_percent=int(group.traffic_discount_percent or 0),
+            device_discount_percent=int(group.device_discount_percent or 0),
+            apply_discounts_to_addons=bool(group.apply_discounts_to_addons),
+            is_default=bool(group.is_default),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogServer:
+    squad_uuid: str
+    display_name: str | None
+    price_kopeks: int
+    is_available: bool
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogTariff:
+    """Неизменяемая копия тарифа; повторяет поля и методы ``Tariff``, нужные для отображения цен."""
+
+    id: int
+    name: str
+    description: str | None
+    display_order: int
+    is_active: bool
+    tier_level: int
+    traffic_limit_gb: int
+    device_limit: int
+    allowed_squads: tuple[str, ...]
+    period_prices: Mapping[int, int]
+    traffic_topup_packages: Mapping[int, int]
+    allowed_promo_group_ids: frozenset[int]
+    is_daily: bool
+    daily_price_kopeks: int
+
+    @classmethod
+    def from_model(cls, tariff: Tariff) -> CatalogTariff:
+        return cls(
+            id=tariff.id,
+            name=tariff.name,
+            description=tariff.description,
+            display_order=tariff.display_order or 0,
+            is_active=bool(tariff.is_active),
+            tier_level=tariff.tier_level,
+            traffic_limit_gb=tariff.traffic_limit_gb,
+            device_limit=tariff.device_limit,
+            allowed_squads=tuple(tariff.allowed_squads or ()),
+            period_prices=_int_mapping(tariff.period_prices),
+            traffic_topup_packages=_int_mapping(tariff.traffic_topup_packages),
+            allowed_promo_group_ids=frozenset(group.id for group in tariff.allowed_promo_groups or ()),
+            is_daily=bool(tariff.is_daily),
+            daily_price_kopeks=int(tariff.daily_price_kopeks or 0),
+        )
+
+    def get_price_for_period(self, period_days: int) -> int | None:
+        return self.period_prices.get(period_days)
+
+    def get_available_periods(self) -> list[int]:
+        return sorted(self.period_prices)
+
+    def is_available_for_promo_group(self, promo_group_id: int | None) -> bool:
+        if not self.allowed_promo_group_ids or promo_group_id is None:
+            return True
+        return promo_group_id in self.allowed_promo_group_ids
+
+
+@dataclass(slots=True)
+class PricingCatalogSnapshot:
+    tariffs: dict[int, CatalogTariff]
+    servers: dict[str, CatalogServer]
+    promo_groups: dict[int, PromoGroupDiscounts]
+    versions: tuple[int, ...] = ()
+    _period_prices: dict[tuple[int, int | None], tuple[PeriodPrice, ...]] = field(default_factory=dict)
+    _tariffs_by_group: dict[int | None, tuple[CatalogTariff, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls,
+        tariffs: Iterable[CatalogTariff],
+        servers: Iterable[CatalogServer],
+        promo_groups: Iterable[PromoGroupDiscounts],
+        versions: tuple[int, ...] = (),
+    ) -> PricingCatalogSnapshot:
+        snapshot = cls(
+            tariffs={tariff.id: tariff for tariff in sorted(tariffs, key=lambda item: (item.display_order, item.id))},
+            servers={server.squad_uuid: server for server in servers},
+            promo_groups={group.id: group for group in promo_groups},
+            versions=versions,
+        )
+        snapshot._precompute()
+        return snapshot
+
+    def _precompute(self) -> None:
+        group_ids: list[int | None] = [None, *self.promo_groups]
+        for group_id in group_ids:
+            group = self.promo_groups.get(group_id) if group_id is not None else None
+            discounts = group.period_discounts if group else _EMPTY_DISCOUNTS
+            for tariff in self.tariffs.values():
+                self._period_prices[(tariff.id, group_id)] = build_period_prices(tariff.period_prices, discounts)
+
+            # Та же выборка, что get_tariffs_for_user: без ограничений — всем, иначе только разрешённым группам
+            self._tariffs_by_group[group_id] = tuple(
+                tariff
+                for tariff in self.tariffs.values()
+                if tariff.is_active
+                and (
+                    not tariff.allowed_promo_group_ids
+                    or (group_id is not None and group_id in tariff.allowed_promo_group_ids)
+                )
+            )
+
+    def get_tariff(self, tariff_id: int | None) -> CatalogTariff | None:
+        if tariff_id is None:
+            return None
+        return self.tariffs.get(tariff_id)
+
+    def tariffs_for_promo_group(self, promo_group_id: int | None) -> tuple[CatalogTariff, ...]:
+        tariffs = self._tariffs_by_group.get(promo_group_id)
+        if tariffs is None:
+            # Промогруппа создана после загрузки каталога и ещё не видна в версии
+            tariffs = self._tariffs_by_group[None]
+        return tariffs
+
+    def period_prices(self, tariff_id: int, promo_group_id: int | None = None) -> tuple[PeriodPrice, ...]:
+        prices = self._period_prices.get((tariff_id, promo_group_id))
+        if prices is None:
+            prices = self._period_prices.get((tariff_id, None), ())
+        return prices
+
+    def server_name(self, squad_uuid: str) -> str | None:
+        server = self.servers.get(squad_uuid)
+        if server is None:
+            return None
+        return server.display_name or squad_uuid[:8]
+
+
+class PricingCatalog:
+    def __init__(self) -> None:
+        self._snapshot: PricingCatalogSnapshot | None = None
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    async def get(self, db: AsyncSession) -> PricingCatalogSnapshot:
+        """Актуальный каталог; загружается заново, если изменилась версия тарифов, серверов или промогрупп."""
+        versions = await self._current_versions()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.versions == versions:
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.versions != versions:
+                snapshot = await self._load(db, versions)
+                self._snapshot = snapshot
+                self.loads += 1
+        return snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    async def _current_versions(self) -> tuple[int, ...]:
+        return (
+            await cache.namespace_version(PRICING_CATALOG_NAMESPACE),
+            await cache.namespace_version(PROMO_GROUPS_NAMESPACE),
+        )
+
+    async def _load(self, db: AsyncSession, versions: tuple[int, ...]) -> PricingCatalogSnapshot:
+        tariffs_result = await db.execute(select(Tariff).options(selectinload(Tariff.allowed_promo_groups)))
+        servers_result = await db.execute(select(ServerSquad))
+        groups_result = await db.execute(select(PromoGroup))
+
+        snapshot = PricingCatalogSnapshot.build(
+            tariffs=[CatalogTariff.from_model(tariff) for tariff in tariffs_result.scalars().all()],
+            servers=[
+                CatalogServer(
+                    squad_uuid=server.squad_uuid,
+                    display_name=server.display_name,
+                    price_kopeks=int(server.price_kopeks or 0),
+                    is_available=bool(server.is_available),
+                )
+                for server in servers_result.scalars().unique().all()
+            ],
+            promo_groups=[PromoGroupDiscounts.from_model(group) for group in groups_result.scalars().unique().all()],
+            versions=versions,
+        )
+        logger.debug(
+            'Каталог цен загружен',
+            tariffs=len(snapshot.tariffs),
+            servers=len(snapshot.servers),
+            promo_groups=len(snapshot.promo_groups),
+        )
+        return snapshot
+
+
+pricing_catalog = PricingCatalog()
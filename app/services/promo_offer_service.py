@@ -16,6 +16,7 @@ from app.database.models import (
     User,
 )
 from app.services.subscription_service import SubscriptionService
+from app.utils.cache import MAIN_MENU_NAMESPACE, cache
 
 
 logger = structlog.get_logger(__name__)
@@ -129,6 +130,8 @@ class PromoOfferService:
             await db.commit()
             await db.refresh(subscription)
 
+        # Подсказка о тестовых серверах в главном меню должна появиться сразу
+        await cache.invalidate(MAIN_MENU_NAMESPACE)
         return True, newly_added, expires_at, 'ok'
 
     async def cleanup_expired_test_access(self, db: AsyncSession) -> int:
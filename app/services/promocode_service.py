@@ -9,6 +9,8 @@ from app.database.crud.promocode import (
     create_promocode_use,
     get_active_discount_promocode_for_user,
     get_promocode_by_code,
+    release_promocode_use,
+    reserve_promocode_use,
 )
 from app.database.crud.subscription import extend_subscription, get_subscription_by_user_id
 from app.database.crud.user import add_user_balance, get_user_by_id
@@ -36,6 +38,7 @@ class PromoCodeService:
         return f'#{user.id}'
 
     async def activate_promocode(self, db: AsyncSession, user_id: int, code: str) -> dict[str, Any]:
+        reserved_promocode_id: int | None = None
         try:
             user = await get_user_by_id(db, user_id)
             if not user:
@@ -71,12 +74,22 @@ class PromoCodeService:
                 if getattr(user, 'has_had_paid_subscription', False):
                     return {'success': False, 'error': 'not_first_purchase'}
 
+            # Занимаем использование атомарно и сразу фиксируем, чтобы строка промокода
+            # не оставалась заблокированной, пока применяются эффекты и идут запросы в RemnaWave
+            current_uses = await reserve_promocode_use(db, promocode.id)
+            if current_uses is None:
+                return {'success': False, 'error': 'used'}
+            await db.commit()
+            reserved_promocode_id = promocode.id
+
             balance_before_kopeks = user.balance_kopeks
 
             try:
                 result_description = await self._apply_promocode_effects(db, user, promocode)
             except ValueError as e:
                 if str(e) == 'active_discount_exists':
+                    await db.rollback()
+                    await self._release_promocode_use(db, reserved_promocode_id)
                     return {'success': False, 'error': 'active_discount_exists'}
                 raise
             balance_after_kopeks = user.balance_kopeks
@@ -140,9 +153,7 @@ class PromoCodeService:
                     # Don't fail the whole promocode activation if promo group assignment fails
 
             await create_promocode_use(db, promocode.id, user_id)
-
-            promocode.current_uses += 1
-            await db.commit()
+            reserved_promocode_id = None
 
             logger.info('✅ Пользователь активировал промокод', _format_user_log=self._format_user_log(user), code=code)
 
@@ -152,7 +163,7 @@ class PromoCodeService:
                 'balance_bonus_kopeks': promocode.balance_bonus_kopeks,
                 'subscription_days': promocode.subscription_days,
                 'max_uses': promocode.max_uses,
-                'current_uses': promocode.current_uses,
+                'current_uses': current_uses,
                 'valid_until': promocode.valid_until,
                 'promo_group_id': promocode.promo_group_id,
             }
@@ -168,8 +179,19 @@ class PromoCodeService:
         except Exception as e:
             logger.error('Ошибка активации промокода для пользователя', code=code, user_id=user_id, error=e)
             await db.rollback()
+            if reserved_promocode_id is not None:
+                await self._release_promocode_use(db, reserved_promocode_id)
             return {'success': False, 'error': 'server_error'}
 
+    async def _release_promocode_use(self, db: AsyncSession, promocode_id: int) -> None:
+        """Возвращает занятое использование, если активация не завершилась."""
+        try:
+            await release_promocode_use(db, promocode_id)
+            await db.commit()
+        except Exception as error:
+            logger.error('Не удалось вернуть использование промокода', promocode_id=promocode_id, error=error)
+            await db.rollback()
+
     async def _apply_promocode_effects(self, db: AsyncSession, user: User, promocode: PromoCode) -> str:
         """
         Применяет эффекты промокода к пользователю.
@@ -399,9 +421,7 @@ class PromoCodeService:
             # 2. Откатываем использование промокода (если нашли запись)
             if promocode and promo_use:
                 await db.delete(promo_use)
-                if promocode.current_uses > 0:
-                    promocode.current_uses -= 1
-                    promocode.updated_at = datetime.now(UTC)
+                await release_promocode_use(db, promocode.id)
 
                 # 3. Если промокод назначал промогруппу -- снимаем её
                 if promocode.promo_group_id:
@@ -0,0 +1,306 @@
+"""Инкрементальный индекс переходов по реферальным ссылкам из лога бота.
+
+Диагностика рефералов ищет в ``bot.log`` переходы по реф-ссылкам. Вместо
+полного перечитывания файла при каждом запуске индекс дочитывает только
+новые строки с сохранённого смещения и складывает найденные клики в
+компактный файл рядом с логом. Ротация (очистка или замена файла)
+определяется по inode, размеру и сигнатуре начала файла — в этом случае
+чтение начинается заново, а уже проиндексированные клики сохраняются.
+
+Все методы синхронные и рассчитаны на вызов через ``asyncio.to_thread``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import structlog
+
+
+logger = structlog.get_logger(__name__)
+
+
+REFERRAL_CLICK_INDEX_RETENTION_DAYS = 90
+HEAD_SIGNATURE_BYTES = 256
+_BUCKET_FORMAT = '%Y-%m-%dT%H'
+
+# Строка лога: "YYYY-MM-DD HH:MM:SS,ms - logger - LEVEL - сообщение"
+TIMESTAMP_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - .+ - .+ - (.+)$')
+# /start refXXX или /start ref_refXXX
+START_PATTERN = re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)')
+# Сохранение payload
+PAYLOAD_PATTERN = re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)")
+
+
+@dataclass
+class ReferralClick:
+    """Информация о переходе по реф-ссылке."""
+
+    timestamp: datetime
+    telegram_id: int
+    raw_code: str  # Код как в логе (может быть ref_refXXX)
+    clean_code: str  # Очищенный код (refXXX)
+    log_line: str = ''
+
+
+def clean_referral_code(raw_code: str) -> str:
+    """Убирает префикс ref_, который добавляет miniapp (ref_refXXX -> refXXX)."""
+    if raw_code.startswith('ref_ref'):
+        return raw_code[4:]
+    return raw_code
+
+
+def parse_log_line(line: str) -> tuple[datetime | None, ReferralClick | None]:
+    """Время строки лога и реф-клик, если строка его содержит."""
+    line = line.strip()
+    if not line:
+        return None, None
+
+    # Убираем Docker-префикс
+    if ' | ' in line[:50]:
+        line = line.split(' | ', 1)[-1]
+
+    match = TIMESTAMP_PATTERN.match(line)
+    if not match:
+        return None, None
+
+    timestamp_str, message = match.groups()
+    try:
+        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S').replace(tzinfo=UTC)
+    except ValueError:
+        return None, None
+
+    event_match = START_PATTERN.search(message)
+    if event_match:
+        telegram_id = int(event_match.group(1))
+        raw_code = event_match.group(2)
+    else:
+        event_match = PAYLOAD_PATTERN.search(message)
+        if not event_match:
+            return timestamp, None
+        raw_code = event_match.group(1)
+        telegram_id = int(event_match.group(2))
+
+    click = ReferralClick(
+        timestamp=timestamp,
+        telegram_id=telegram_id,
+        raw_code=raw_code,
+        clean_code=clean_referral_code(raw_code),
+        log_line=line,
+    )
+    return timestamp, click
+
+
+def scan_log_lines(
+    lines: Iterable[str],
+    start_date: datetime,
+    end_date: datetime,
+) -> tuple[list[ReferralClick], int, int]:
+    """Полный проход по строкам лога: клики за период, всего строк и строк за период."""
+    clicks: list[ReferralClick] = []
+    total_lines = 0
+    lines_in_period = 0
+
+    for line in lines:
+        total_lines += 1
+        timestamp, click = parse_log_line(line)
+        if timestamp is None or not (start_date <= timestamp < end_date):
+            continue
+        lines_in_period += 1
+        if click is not None:
+            clicks.append(click)
+
+    return clicks, total_lines, lines_in_period
+
+
+@dataclass
+class ReferralClickIndexState:
+    """Позиция индексатора в лог-файле."""
+
+    inode: int = 0
+    offset: int = 0
+    head_length: int = 0
+    head_signature: str = ''
+    total_lines: int = 0
+    # Количество строк лога по часам (UTC) для статистики периода
+    line_counts: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> ReferralClickIndexState:
+        return cls(
+            inode=int(data.get('inode', 0)),
+            offset=int(data.get('offset', 0)),
+            head_length=int(data.get('head_length', 0)),
+            head_signature=str(data.get('head_signature', '')),
+            total_lines=int(data.get('total_lines', 0)),
+            line_counts={str(key): int(value) for key, value in (data.get('line_counts') or {}).items()},
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'inode': self.inode,
+            'offset': self.offset,
+            'head_length': self.head_length,
+            'head_signature': self.head_signature,
+            'total_lines': self.total_lines,
+            'line_counts': self.line_counts,
+        }
+
+
+def _signature(data: bytes) -> str:
+    return hashlib.sha1(data, usedforsecurity=False).hexdigest()
+
+
+class ReferralClickIndex:
+    """Индекс реф-кликов одного лог-файла."""
+
+    def __init__(self, log_path: Path, retention_days: int = REFERRAL_CLICK_INDEX_RETENTION_DAYS):
+        self.log_path = Path(log_path)
+        self.index_path = self.log_path.with_name(f'.{self.log_path.name}.refclicks')
+        self.state_path = self.log_path.with_name(f'.{self.log_path.name}.refclicks.json')
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+
+    def sync(self) -> int:
+        """Дочитать новые строки лога. Возвращает количество новых кликов."""
+        with self._lock:
+            return self._sync_locked()
+
+    def query(self, start_date: datetime, end_date: datetime) -> tuple[list[ReferralClick], int, int]:
+        """Клики за период из индекса, строк в текущем файле и строк за период."""
+        with self._lock:
+            state = self._load_state()
+            clicks = [click for click in self._read_index() if start_date <= click.timestamp < end_date]
+
+        first_bucket = start_date.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+        lines_in_period = 0
+        for bucket, count in state.line_counts.items():
+            try:
+                bucket_start = datetime.strptime(bucket, _BUCKET_FORMAT).replace(tzinfo=UTC)
+            except ValueError:
+                continue
+            if first_bucket <= bucket_start < end_date:
+                lines_in_period += count
+
+        return clicks, state.total_lines, lines_in_period
+
+    def _sync_locked(self) -> int:
+        try:
+            stats = self.log_path.stat()
+        except FileNotFoundError:
+            return 0
+
+        state = self._load_state()
+
+        with self.log_path.open('rb') as handle:
+            head = handle.read(HEAD_SIGNATURE_BYTES)
+            rotated = (
+                state.inode != stats.st_ino
+                or stats.st_size < state.offset
+                or len(head) < state.head_length
+                or _signature(head[: state.head_length]) != state.head_signature
+            )
+
+            if rotated:
+                if state.offset:
+                    logger.info('Лог-файл ротирован, индекс реф-кликов читает его заново', log_path=self.log_path)
+                state.offset = 0
+                state.total_lines = 0
+                self._prune(state)
+
+            handle.seek(state.offset)
+            new_records: list[str] = []
+            for raw_line in handle:
+                # Недописанная строка будет прочитана при следующей синхронизации
+                if not raw_line.endswith(b'\n'):
+                    break
+                state.offset += len(raw_line)
+                state.total_lines += 1
+
+                timestamp, click = parse_log_line(raw_line.decode('utf-8', errors='ignore'))
+                if timestamp is None:
+                    continue
+                bucket = timestamp.strftime(_BUCKET_FORMAT)
+                state.line_counts[bucket] = state.line_counts.get(bucket, 0) + 1
+                if click is not None:
+                    new_records.append(f'{int(click.timestamp.timestamp())}\t{click.telegram_id}\t{click.raw_code}\n')
+
+        state.inode = stats.st_ino
+        state.head_length = len(head)
+        state.head_signature = _signature(head)
+
+        if new_records:
+            with self.index_path.open('a', encoding='utf-8') as index_file:
+                index_file.writelines(new_records)
+
+        self._save_state(state)
+        return len(new_records)
+
+    def _read_index(self) -> list[ReferralClick]:
+        if not self.index_path.exists():
+            return []
+
+        clicks: list[ReferralClick] = []
+        with self.index_path.open(encoding='utf-8') as index_file:
+            for line in index_file:
+                try:
+                    raw_timestamp, raw_telegram_id, raw_code = line.rstrip('\n').split('\t')
+                    click = ReferralClick(
+                        timestamp=datetime.fromtimestamp(int(raw_timestamp), tz=UTC),
+                        telegram_id=int(raw_telegram_id),
+                        raw_code=raw_code,
+                        clean_code=clean_referral_code(raw_code),
+                    )
+                except ValueError:
+                    continue
+                clicks.append(click)
+        return clicks
+
+    def _prune(self, state: ReferralClickIndexState) -> None:
+        """Удалить из индекса клики и счётчики старше срока хранения."""
+        cutoff = datetime.now(UTC) - timedelta(days=self.retention_days)
+        clicks = [click for click in self._read_index() if click.timestamp >= cutoff]
+        records = [f'{int(click.timestamp.timestamp())}\t{click.telegram_id}\t{click.raw_code}\n' for click in clicks]
+
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        tmp_path.write_text(''.join(records), encoding='utf-8')
+        tmp_path.replace(self.index_path)
+
+        cutoff_bucket = cutoff.strftime(_BUCKET_FORMAT)
+        state.line_counts = {key: value for key, value in state.line_counts.items() if key >= cutoff_bucket}
+
+    def _load_state(self) -> ReferralClickIndexState:
+        if not self.state_path.exists():
+            return ReferralClickIndexState()
+        try:
+            return ReferralClickIndexState.from_dict(json.loads(self.state_path.read_text(encoding='utf-8')))
+        except (ValueError, TypeError, AttributeError) as error:
+            logger.warning('Повреждено состояние индекса реф-кликов, индекс будет перестроен', error=error)
+            return ReferralClickIndexState()
+
+    def _save_state(self, state: ReferralClickIndexState) -> None:
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(state.to_dict()), encoding='utf-8')
+        tmp_path.replace(self.state_path)
+
+
+_indexes: dict[Path, ReferralClickIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_referral_click_index(log_path: Path) -> ReferralClickIndex:
+    """Общий экземпляр индекса для лог-файла."""
+    resolved = Path(log_path).resolve()
+    with _indexes_lock:
+        index = _indexes.get(resolved)
+        if index is None:
+            index = ReferralClickIndex(resolved)
+            _indexes[resolved] = index
+        return index
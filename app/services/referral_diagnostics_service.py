@@ -7,36 +7,31 @@
 - Выявление потерянных рефералов
 """
 
-import re
+import asyncio
 from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
 import structlog
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.referral import create_referral_earning
 from app.database.crud.user import add_user_balance
 from app.database.models import ReferralEarning, User
+from app.services.referral_click_index import (
+    ReferralClick,
+    clean_referral_code,
+    get_referral_click_index,
+    scan_log_lines,
+)
 
 
 logger = structlog.get_logger(__name__)
 
 
-@dataclass
-class ReferralClick:
-    """Информация о переходе по реф-ссылке."""
-
-    timestamp: datetime
-    telegram_id: int
-    raw_code: str  # Код как в логе (может быть ref_refXXX)
-    clean_code: str  # Очищенный код (refXXX)
-    log_line: str
-
-
 @dataclass
 class LostReferral:
     """Потерянный реферал — пришёл по ссылке, но реферер не засчитался."""
@@ -333,9 +328,7 @@ class ReferralDiagnosticsService:
         ref_refXXX -> refXXX (miniapp добавляет ref_)
         refXXX -> refXXX (без изменений)
         """
-        if raw_code.startswith('ref_ref'):
-            return raw_code[4:]  # Убираем "ref_"
-        return raw_code
+        return clean_referral_code(raw_code)
 
     async def analyze_today(self, db: AsyncSession) -> DiagnosticReport:
         """Анализирует реферальные события за сегодня."""
@@ -346,8 +339,8 @@ class ReferralDiagnosticsService:
     async def analyze_period(self, db: AsyncSession, start_date: datetime, end_date: datetime) -> DiagnosticReport:
         """Анализирует реферальные события за указанный период."""
 
-        # 1. Парсим логи — находим все переходы по реф-ссылкам
-        clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, end_date)
+        # 1. Берём переходы по реф-ссылкам из индекса (дочитывает только новые строки лога)
+        clicks, total_lines, lines_in_period = await self._load_indexed_clicks(start_date, end_date)
 
         # 2. Группируем по telegram_id (берём последний клик)
         user_clicks: dict[int, ReferralClick] = {}
@@ -390,8 +383,8 @@ class ReferralDiagnosticsService:
         self.log_path = Path(file_path)
 
         try:
-            # skip_date_filter=True — парсим ВСЕ строки без фильтра по дате
-            clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, end_date, skip_date_filter=True)
+            # Загруженный файл не индексируется — парсим его целиком
+            clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, end_date)
 
             # Группируем по telegram_id (берём последний клик)
             user_clicks: dict[int, ReferralClick] = {}
@@ -421,93 +414,51 @@ class ReferralDiagnosticsService:
             # Восстанавливаем оригинальный путь
             self.log_path = original_log_path
 
-    async def _parse_clicks(
-        self, start_date: datetime, end_date: datetime, skip_date_filter: bool = False
+    async def _load_indexed_clicks(
+        self, start_date: datetime, end_date: datetime
     ) -> tuple[list[ReferralClick], int, int]:
-        """Парсит логи и находит все переходы по реф-ссылкам."""
-
-        clicks = []
-        total_lines = 0
-        lines_in_period = 0
+        """Клики за период из инкрементального индекса лог-файла."""
 
         if not self.log_path.exists():
             logger.warning('❌ Лог-файл не найден', log_path=self.log_path)
-            return clicks, 0, 0
+            return [], 0, 0
 
-        file_size = self.log_path.stat().st_size
-        logger.info('📂 Читаю лог-файл: ( MB)', log_path=self.log_path, file_size=round(file_size / 1024 / 1024, 2))
+        index = get_referral_click_index(self.log_path)
+        try:
+            new_clicks = await asyncio.to_thread(index.sync)
+            clicks, total_lines, lines_in_period = await asyncio.to_thread(index.query, start_date, end_date)
+        except OSError as e:
+            logger.warning('Индекс реф-кликов недоступен, читаю лог целиком', log_path=self.log_path, error=e)
+            return await self._parse_clicks(start_date, end_date)
 
-        # Паттерн timestamp
-        timestamp_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - .+ - .+ - (.+)$')
+        logger.info(
+            '📊 Индекс реф-кликов: новых=, за период=, строк за период',
+            new_clicks=new_clicks,
+            clicks_count=len(clicks),
+            lines_in_period=lines_in_period,
+        )
+        return clicks, total_lines, lines_in_period
 
-        # Паттерны для поиска реф-кликов
-        # /start refXXX или /start ref_refXXX
-        start_pattern = re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)')
-        # Сохранение payload
-        payload_pattern = re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)")
+    async def _parse_clicks(self, start_date: datetime, end_date: datetime) -> tuple[list[ReferralClick], int, int]:
+        """Парсит лог-файл целиком и находит все переходы по реф-ссылкам."""
 
-        # Для быстрой фильтрации по дате (только если не пропускаем фильтр)
-        use_date_prefix = not skip_date_filter and (end_date - start_date).days <= 31
-        date_prefix = start_date.strftime('%Y-%m-%d') if use_date_prefix else None
+        if not self.log_path.exists():
+            logger.warning('❌ Лог-файл не найден', log_path=self.log_path)
+            return [], 0, 0
 
-        try:
-            with open(self.log_path, encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    total_lines += 1
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Убираем Docker-префикс
-                    if ' | ' in line[:50]:
-                        line = line.split(' | ', 1)[-1]
-
-                    # Быстрая проверка по дате (только для коротких периодов)
-                    if date_prefix and date_prefix not in line[:10]:
-                        continue
-
-                    # Парсим timestamp
-                    match = timestamp_pattern.match(line)
-                    if not match:
-                        continue
-
-                    timestamp_str, message = match.groups()
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S').replace(tzinfo=UTC)
-                    except ValueError:
-                        continue
-
-                    if not (start_date <= timestamp < end_date):
-                        continue
-
-                    lines_in_period += 1
-
-                    # Ищем реф-клики
-                    for pattern in [start_pattern, payload_pattern]:
-                        event_match = pattern.search(message)
-                        if event_match:
-                            if pattern == start_pattern:
-                                telegram_id = int(event_match.group(1))
-                                raw_code = event_match.group(2)
-                            else:
-                                raw_code = event_match.group(1)
-                                telegram_id = int(event_match.group(2))
-
-                            clean_code = self.clean_referral_code(raw_code)
-
-                            clicks.append(
-                                ReferralClick(
-                                    timestamp=timestamp,
-                                    telegram_id=telegram_id,
-                                    raw_code=raw_code,
-                                    clean_code=clean_code,
-                                    log_line=line,
-                                )
-                            )
-                            break
+        log_path = self.log_path
+        file_size = log_path.stat().st_size
+        logger.info('📂 Читаю лог-файл: ( MB)', log_path=log_path, file_size=round(file_size / 1024 / 1024, 2))
+
+        def _scan() -> tuple[list[ReferralClick], int, int]:
+            with open(log_path, encoding='utf-8', errors='ignore') as f:
+                return scan_log_lines(f, start_date, end_date)
 
+        try:
+            clicks, total_lines, lines_in_period = await asyncio.to_thread(_scan)
         except Exception as e:
             logger.error('Ошибка парсинга логов', error=e, exc_info=True)
+            return [], 0, 0
 
         logger.info(
             '📊 Парсинг: строк=, за период=, реф-кликов',
@@ -525,15 +476,22 @@ class ReferralDiagnosticsService:
 
         lost = []
         telegram_ids = [c.telegram_id for c in clicks]
+        telegram_ids_set = set(telegram_ids)
 
-        # Получаем пользователей из БД
-        result = await db.execute(select(User).where(User.telegram_id.in_(telegram_ids)))
-        users_map = {u.telegram_id: u for u in result.scalars().all()}
-
-        # Получаем всех рефереров по кодам
         codes = list({c.clean_code for c in clicks})
-        referrers_result = await db.execute(select(User).where(User.referral_code.in_(codes)))
-        referrers_map = {u.referral_code: u for u in referrers_result.scalars().all()}
+
+        # Пользователи и рефереры по кодам — одним запросом
+        result = await db.execute(
+            select(User).where(or_(User.telegram_id.in_(telegram_ids), User.referral_code.in_(codes)))
+        )
+        users_map: dict[int, User] = {}
+        referrers_map: dict[str, User] = {}
+        code_set = set(codes)
+        for u in result.scalars().all():
+            if u.telegram_id in telegram_ids_set:
+                users_map[u.telegram_id] = u
+            if u.referral_code in code_set:
+                referrers_map[u.referral_code] = u
 
         for click in clicks:
             user = users_map.get(click.telegram_id)
@@ -21,6 +21,7 @@ from app.database.crud.user import (
     create_user_no_commit,
     get_user_by_telegram_id,
 )
+from app.database.crud.user_spending_stats import reset_user_spending_stats
 from app.database.models import (
     ServerSquad,
     Subscription,
@@ -2430,6 +2431,7 @@ class RemnaWaveService:
                     logger.info('🗑️ Удалены серверы подписки для', user_id_display=user_id_display)
 
                 await db.execute(delete(Transaction).where(Transaction.user_id == user.id))
+                await reset_user_spending_stats(db, user.id)
                 logger.info('🗑️ Удалены транзакции для', user_id_display=user_id_display)
 
                 await db.execute(delete(ReferralEarning).where(ReferralEarning.user_id == user.id))
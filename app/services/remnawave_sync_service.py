@@ -14,7 +14,7 @@ from app.services.remnawave_service import (
     RemnaWaveConfigurationError,
     RemnaWaveService,
 )
-from app.utils.cache import cache
+from app.utils.cache import AVAILABLE_COUNTRIES_NAMESPACE, cache
 
 
 logger = structlog.get_logger(__name__)
@@ -245,7 +245,7 @@ class RemnaWaveAutoSyncService:
         created, updated, removed = await sync_with_remnawave(session, squads)
 
         try:
-            await cache.delete_pattern('available_countries*')
+            await cache.invalidate(AVAILABLE_COUNTRIES_NAMESPACE)
         except Exception as error:
             logger.warning('⚠️ Не удалось очистить кеш стран после автосинхронизации', error=error)
 
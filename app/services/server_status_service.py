@@ -1,7 +1,22 @@
+"""Статус серверов по метрикам xray-checker.
+
+Страница метрик опрашивается фоновым поллером, разобранный снимок хранится в
+памяти и раздаётся всем пользователям. Запрос условный (ETag/Last-Modified),
+неизменившееся тело не разбирается повторно, а обновления по требованию
+объединяются в один запрос. Для каждого сервера хранится короткая история
+задержки и доступности для отображения динамики.
+"""
+
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import re
+import time
+from collections import deque
+from collections.abc import Callable
 from dataclasses import dataclass
+from datetime import UTC, datetime
 
 import aiohttp
 import structlog
@@ -22,6 +37,31 @@ class ServerStatusEntry:
     display_name: str
     latency_ms: int | None
     is_online: bool
+    key: str = ''
+
+
+@dataclass(slots=True, frozen=True)
+class ServerStatusSample:
+    checked_at: datetime
+    latency_ms: int | None
+    is_online: bool
+
+
+@dataclass(slots=True)
+class ServerStatusTrend:
+    """Динамика сервера по последним замерам."""
+
+    samples: list[ServerStatusSample]
+    uptime_percent: int
+    avg_latency_ms: int | None
+
+
+@dataclass(slots=True)
+class ServerStatusSnapshot:
+    servers: list[ServerStatusEntry]
+    fetched_at: datetime
+    # Время последней успешной проверки по часам сервиса (monotonic)
+    checked_at: float
 
 
 class ServerStatusError(Exception):
@@ -34,19 +74,166 @@ class ServerStatusService:
     _LABEL_PATTERN = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)=\"(?P<value>(?:\\.|[^\"])*)\"')
     _FLAG_PATTERN = re.compile(r'^([\U0001F1E6-\U0001F1FF]{2})\s*(.*)$')
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._session: aiohttp.ClientSession | None = None
+        self._snapshot: ServerStatusSnapshot | None = None
+        self._refresh_task: asyncio.Task[ServerStatusSnapshot] | None = None
+        self._poll_task: asyncio.Task | None = None
+        self._running = False
+        # Валидаторы последнего ответа для условного запроса
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._body_digest: str | None = None
+        self._history: dict[str, deque[ServerStatusSample]] = {}
+        self.fetches = 0
+        self.unchanged = 0
+
+    @property
+    def snapshot(self) -> ServerStatusSnapshot | None:
+        return self._snapshot
+
+    def is_enabled(self) -> bool:
+        return settings.get_server_status_mode() == 'xray' and bool(settings.get_server_status_metrics_url())
+
+    def is_running(self) -> bool:
+        return self._running
+
+    async def start(self) -> None:
+        if self._running or not self.is_enabled():
+            return
+        self._running = True
+        self._poll_task = asyncio.create_task(self._poll_loop())
+        logger.info(
+            'Опрос метрик статуса серверов запущен',
+            interval_seconds=settings.get_server_status_poll_interval(),
+        )
+
+    async def stop(self) -> None:
+        self._running = False
+        for task in (self._poll_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, ServerStatusError):
+                    pass
+        self._poll_task = None
+        self._refresh_task = None
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _poll_loop(self) -> None:
+        while self._running:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except ServerStatusError as error:
+                logger.warning('Не удалось обновить статус серверов', error=error)
+            except Exception as error:
+                logger.error('Ошибка опроса метрик статуса серверов', error=error)
+            await asyncio.sleep(settings.get_server_status_poll_interval())
 
     async def get_servers(self) -> list[ServerStatusEntry]:
-        mode = settings.get_server_status_mode()
-        if mode != 'xray':
+        return (await self.get_snapshot()).servers
+
+    async def get_snapshot(self, *, force: bool = False) -> ServerStatusSnapshot:
+        """Снимок статуса: свежий — из памяти, устаревший — после обновления.
+
+        Если обновить не удалось, отдаётся последний снимок, пока он не старше
+        ``SERVER_STATUS_STALE_SECONDS``.
+        """
+        if settings.get_server_status_mode() != 'xray':
             raise ServerStatusError('Server status integration is not enabled')
 
+        snapshot = self._snapshot
+        if snapshot is not None and not force and self._age(snapshot) < settings.get_server_status_poll_interval():
+            return snapshot
+
+        try:
+            return await self.refresh()
+        except ServerStatusError as error:
+            if snapshot is not None and self._age(snapshot) < settings.get_server_status_stale_seconds():
+                logger.warning('Статус серверов отдан из устаревшего снимка', error=error)
+                return snapshot
+            raise
+
+    async def refresh(self) -> ServerStatusSnapshot:
+        """Обновить снимок; одновременные вызовы ждут один общий запрос."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(_consume_task_error)
+        # shield: отмена одного ожидающего не прерывает запрос для остальных
+        return await asyncio.shield(self._refresh_task)
+
+    def get_history(self, entry: ServerStatusEntry) -> list[ServerStatusSample]:
+        return list(self._history.get(entry.key, ()))
+
+    def get_trends(self) -> dict[str, ServerStatusTrend]:
+        """Динамика серверов, по которым накоплено хотя бы два замера."""
+        trends: dict[str, ServerStatusTrend] = {}
+        for key, samples in self._history.items():
+            if len(samples) < 2:
+                continue
+            online = sum(1 for sample in samples if sample.is_online)
+            latencies = [sample.latency_ms for sample in samples if sample.is_online and sample.latency_ms]
+            trends[key] = ServerStatusTrend(
+                samples=list(samples),
+                uptime_percent=round(online * 100 / len(samples)),
+                avg_latency_ms=round(sum(latencies) / len(latencies)) if latencies else None,
+            )
+        return trends
+
+    def _age(self, snapshot: ServerStatusSnapshot) -> float:
+        return self._clock() - snapshot.checked_at
+
+    async def _refresh(self) -> ServerStatusSnapshot:
         url = settings.get_server_status_metrics_url()
         if not url:
             raise ServerStatusError('Metrics URL is not configured')
 
-        timeout = aiohttp.ClientTimeout(total=settings.get_server_status_request_timeout())
+        headers: dict[str, str] = {}
+        if self._snapshot is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+
+        status, body, etag, last_modified = await self._request_metrics(url, headers)
+        self.fetches += 1
+        checked_at = self._clock()
+        fetched_at = datetime.now(UTC)
+
+        digest = hashlib.sha1(body.encode()).hexdigest() if status == 200 else None
+        snapshot = self._snapshot
+        if snapshot is not None and (status == 304 or digest == self._body_digest):
+            # Метрики не изменились: продлеваем снимок без разбора, но замер в историю пишем,
+            # иначе аптайм считался бы по сменам состояния, а не по опросам
+            self.unchanged += 1
+            if status == 200:
+                self._etag = etag
+                self._last_modified = last_modified
+            snapshot.checked_at = checked_at
+            snapshot.fetched_at = fetched_at
+            self._record_history(snapshot.servers, fetched_at)
+            return snapshot
+
+        if status != 200:
+            raise ServerStatusError('Metrics endpoint returned 304 without a cached snapshot')
+
+        servers = self._parse_metrics(body)
+        self._record_history(servers, fetched_at)
+        self._etag = etag
+        self._last_modified = last_modified
+        self._body_digest = digest
+        self._snapshot = ServerStatusSnapshot(servers=servers, fetched_at=fetched_at, checked_at=checked_at)
+        return self._snapshot
+
+    async def _request_metrics(self, url: str, headers: dict[str, str]) -> tuple[int, str, str | None, str | None]:
+        """Запрос страницы метрик: (статус, тело, ETag, Last-Modified)."""
         auth = None
         auth_credentials = settings.get_server_status_metrics_auth()
         if auth_credentials:
@@ -54,24 +241,43 @@ class ServerStatusService:
             auth = aiohttp.BasicAuth(username, password)
 
         try:
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.get(
-                    url,
-                    auth=auth,
-                    ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
-                ) as response,
-            ):
+            async with self._get_session().get(
+                url,
+                headers=headers,
+                auth=auth,
+                ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
+                timeout=aiohttp.ClientTimeout(total=settings.get_server_status_request_timeout()),
+            ) as response:
+                if response.status == 304:
+                    return 304, '', None, None
                 if response.status != 200:
                     text = await response.text()
                     raise ServerStatusError(f'Unexpected response status: {response.status} - {text[:200]}')
                 metrics_body = await response.text()
+                return 200, metrics_body, response.headers.get('ETag'), response.headers.get('Last-Modified')
         except TimeoutError as error:
             raise ServerStatusError('Request to metrics endpoint timed out') from error
         except aiohttp.ClientError as error:
             raise ServerStatusError('Failed to fetch metrics') from error
 
-        return self._parse_metrics(metrics_body)
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def _record_history(self, servers: list[ServerStatusEntry], checked_at: datetime) -> None:
+        size = settings.get_server_status_history_size()
+        current: dict[str, deque[ServerStatusSample]] = {}
+        for server in servers:
+            samples = self._history.get(server.key)
+            if samples is None or samples.maxlen != size:
+                samples = deque(samples or (), maxlen=size)
+            samples.append(
+                ServerStatusSample(checked_at=checked_at, latency_ms=server.latency_ms, is_online=server.is_online)
+            )
+            current[server.key] = samples
+        # Серверы, пропавшие из метрик, забываются вместе с историей
+        self._history = current
 
     def _parse_metrics(self, body: str) -> list[ServerStatusEntry]:
         servers: dict[tuple[str, str, str, str], ServerStatusEntry] = {}
@@ -82,6 +288,7 @@ class ServerStatusService:
             entry = servers.get(key)
             if not entry:
                 entry = self._create_entry(labels)
+                entry.key = '|'.join(key)
                 servers[key] = entry
 
             try:
@@ -96,6 +303,7 @@ class ServerStatusService:
             entry = servers.get(key)
             if not entry:
                 entry = self._create_entry(labels)
+                entry.key = '|'.join(key)
                 servers[key] = entry
 
             try:
@@ -148,3 +356,12 @@ class ServerStatusService:
             value = match.group('value').replace('\\"', '"')
             labels[key] = value
         return labels
+
+
+def _consume_task_error(task: asyncio.Task) -> None:
+    # Ошибку обновления получают ожидающие вызовы или поллер; помечаем её как полученную
+    if not task.cancelled():
+        task.exception()
+
+
+server_status_service = ServerStatusService()
@@ -0,0 +1,78 @@
+"""Фоновое обновление трафика подписок из RemnaWave для мини-приложения.
+
+Экран подписки показывает сохранённый в БД трафик сразу, а запрос к панели
+уходит в фон (stale-while-revalidate): не чаще раза в
+``MINIAPP_USAGE_SYNC_INTERVAL_SECONDS`` на подписку и не более одного
+одновременного обновления одной подписки.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import structlog
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import Subscription
+
+
+logger = structlog.get_logger(__name__)
+
+
+_MAX_TRACKED_SUBSCRIPTIONS = 50_000
+
+
+class SubscriptionUsageRefresher:
+    def __init__(self, session_factory=AsyncSessionLocal, clock: Callable[[], float] = time.monotonic) -> None:
+        self._session_factory = session_factory
+        self._clock = clock
+        self._synced_at: OrderedDict[int, float] = OrderedDict()
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    def is_fresh(self, subscription_id: int) -> bool:
+        synced_at = self._synced_at.get(subscription_id)
+        return synced_at is not None and self._clock() - synced_at < settings.MINIAPP_USAGE_SYNC_INTERVAL_SECONDS
+
+    def schedule(self, subscription_id: int) -> bool:
+        """Запустить фоновое обновление, если данные устарели. True — обновление запущено."""
+        if subscription_id in self._tasks or self.is_fresh(subscription_id):
+            return False
+
+        task = asyncio.create_task(self._refresh(subscription_id))
+        self._tasks[subscription_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(subscription_id, None))
+        return True
+
+    async def _refresh(self, subscription_id: int) -> None:
+        from app.services.subscription_service import SubscriptionService
+
+        try:
+            async with self._session_factory() as db:
+                subscription = await db.get(Subscription, subscription_id)
+                if subscription is not None:
+                    await SubscriptionService().sync_subscription_usage(db, subscription)
+        except Exception as error:
+            logger.warning('Не удалось обновить трафик подписки', subscription_id=subscription_id, error=error)
+        finally:
+            # Неудачная попытка тоже откладывает следующую, чтобы не нагружать недоступную панель
+            self._mark_synced(subscription_id)
+
+    def _mark_synced(self, subscription_id: int) -> None:
+        self._synced_at[subscription_id] = self._clock()
+        self._synced_at.move_to_end(subscription_id)
+        while len(self._synced_at) > _MAX_TRACKED_SUBSCRIPTIONS:
+            self._synced_at.popitem(last=False)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+subscription_usage_refresher = SubscriptionUsageRefresher()
@@ -8,6 +8,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import (
+    DERIVED_SETTINGS_SOURCE_FIELDS,
     ENV_OVERRIDE_KEYS,
     Settings,
     refresh_period_prices,
@@ -21,6 +22,7 @@ from app.database.crud.system_setting import (
 from app.database.database import AsyncSessionLocal
 from app.database.models import SystemSetting
 from app.database.universal_migration import ensure_default_web_api_token
+from app.services.cache_invalidation_service import SYSTEM_SETTINGS_TOPIC, cache_invalidation_bus
 
 
 logger = structlog.get_logger(__name__)
@@ -300,6 +302,7 @@ class BotConfigurationService:
         'APP_CONFIG_PATH': 'ADDITIONAL',
         'ENABLE_DEEP_LINKS': 'ADDITIONAL',
         'APP_CONFIG_CACHE_TTL': 'ADDITIONAL',
+        'APP_CONFIG_REFRESH_SECONDS': 'ADDITIONAL',
         'INACTIVE_USER_DELETE_MONTHS': 'MAINTENANCE',
         'MAINTENANCE_MESSAGE': 'MAINTENANCE',
         'MAINTENANCE_CHECK_INTERVAL': 'MAINTENANCE',
@@ -1447,6 +1450,63 @@ class BotConfigurationService:
         cls._overrides_raw.clear()
         await cls.initialize()
 
+    @classmethod
+    async def refresh_from_db(cls, keys: list[str] | None = None) -> None:
+        """Перечитать переопределения из БД, в том числе сброшенные на другом узле."""
+        cls.initialize_definitions()
+        target_keys = [key for key in (keys or cls._definitions) if key in cls._definitions]
+        if not target_keys:
+            return
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(SystemSetting).where(SystemSetting.key.in_(target_keys)))
+            rows = {row.key: row.value for row in result.scalars().all()}
+
+        for key in target_keys:
+            if cls._is_env_override(key):
+                continue
+
+            if key in rows:
+                raw_value = rows[key]
+                if key in cls._overrides_raw and cls._overrides_raw[key] == raw_value:
+                    continue
+                try:
+                    parsed_value = cls.deserialize_value(key, raw_value)
+                except Exception as error:
+                    logger.error('Не удалось применить настройку', key=key, error=error)
+                    continue
+                cls._overrides_raw[key] = raw_value
+                cls._apply_to_settings(key, parsed_value)
+            elif key in cls._overrides_raw:
+                cls._overrides_raw.pop(key, None)
+                cls._apply_to_settings(key, cls.get_original_value(key))
+
+    @classmethod
+    async def _handle_remote_invalidation(cls, payload: dict[str, Any] | None) -> None:
+        key = (payload or {}).get('key')
+        if not key:
+            await cls.refresh_from_db()
+            return
+
+        cls.initialize_definitions()
+        if key not in cls._definitions or cls._is_env_override(key):
+            return
+
+        # Значение передаётся в событии: транзакция на другом узле может быть ещё не закоммичена
+        if payload.get('reset'):
+            cls._overrides_raw.pop(key, None)
+            cls._apply_to_settings(key, cls.get_original_value(key))
+            return
+
+        raw_value = payload.get('raw_value')
+        try:
+            parsed_value = cls.deserialize_value(key, raw_value)
+        except Exception as error:
+            logger.error('Не удалось применить настройку', key=key, error=error)
+            return
+        cls._overrides_raw[key] = raw_value
+        cls._apply_to_settings(key, parsed_value)
+
     @classmethod
     def deserialize_value(cls, key: str, raw_value: str | None) -> Any:
         if raw_value is None:
@@ -1554,6 +1614,8 @@ class BotConfigurationService:
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
 
+        await cache_invalidation_bus.publish(SYSTEM_SETTINGS_TOPIC, {'key': key, 'raw_value': raw_value})
+
     @classmethod
     async def reset_value(
         cls,
@@ -1576,6 +1638,8 @@ class BotConfigurationService:
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
 
+        await cache_invalidation_bus.publish(SYSTEM_SETTINGS_TOPIC, {'key': key, 'reset': True})
+
     @classmethod
     def _apply_to_settings(cls, key: str, value: Any) -> None:
         if cls._is_env_override(key):
@@ -1583,6 +1647,8 @@ class BotConfigurationService:
             return
         try:
             setattr(settings, key, value)
+            if key in DERIVED_SETTINGS_SOURCE_FIELDS:
+                settings.refresh_derived()
             if key in {
                 'PRICE_14_DAYS',
                 'PRICE_30_DAYS',
@@ -1660,3 +1726,4 @@ class BotConfigurationService:
 
 
 bot_configuration_service = BotConfigurationService
+cache_invalidation_bus.register(SYSTEM_SETTINGS_TOPIC, BotConfigurationService._handle_remote_invalidation)
@@ -0,0 +1,348 @@
+"""Локальное хранилище суточного трафика пользователей по нодам.
+
+Фоновый сборщик раз в сутки забирает из панели трафик за прошедшие сутки
+(по одному запросу на ноду) и сохраняет его в ``traffic_daily_usage``.
+Аналитика трафика в админке суммирует собранные сутки SQL-запросом и
+запрашивает у панели только неполные сутки на краях периода (в том числе
+текущие) и ещё не собранные дни, поэтому период остаётся скользящим окном.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+import structlog
+
+from app.config import settings
+from app.database.crud.traffic_daily_usage import (
+    delete_traffic_days_before,
+    get_collected_traffic_days,
+    get_traffic_totals,
+    replace_traffic_day,
+)
+from app.database.database import AsyncSessionLocal
+from app.services.remnawave_service import RemnaWaveService
+
+
+logger = structlog.get_logger(__name__)
+
+
+_CONCURRENCY_LIMIT = 5  # Параллельных запросов к панели
+_LIVE_CACHE_TTL = 300  # Кеш живых запросов (текущие сутки), секунды
+# Сутки считаются окончательными, если собраны не раньше чем через час после их окончания
+_FINALIZE_GRACE = timedelta(hours=1)
+
+_RANGE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+@dataclass(slots=True)
+class TrafficNode:
+    uuid: str
+    name: str
+    country_code: str
+
+
+@dataclass(slots=True)
+class TrafficReport:
+    """Трафик за период: {user_uuid: {node_uuid: bytes}} и список нод."""
+
+    user_traffic: dict[str, dict[str, int]]
+    nodes: list[TrafficNode]
+    stored_days: int = 0
+    live_ranges: int = 0
+
+
+def _merge_traffic(target: dict[str, dict[str, int]], source: dict[str, dict[str, int]]) -> None:
+    for user_uuid, per_node in source.items():
+        user_nodes = target.setdefault(user_uuid, {})
+        for node_uuid, total in per_node.items():
+            user_nodes[node_uuid] = user_nodes.get(node_uuid, 0) + total
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=UTC)
+
+
+def split_range_by_days(start_dt: datetime, end_dt: datetime) -> list[date]:
+    """Сутки (UTC), которые покрывает диапазон, включая неполные первые и последние."""
+    start_day = start_dt.date()
+    end_day = end_dt.date()
+    if start_day > end_day:
+        return [end_day]
+    return [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+
+def _floor_to_live_step(moment: datetime) -> datetime:
+    # Шаг 5 минут, чтобы ключ живого кеша был стабильным между запросами
+    return moment.replace(minute=moment.minute // 5 * 5, second=0, microsecond=0)
+
+
+def _group_consecutive(days: list[date]) -> list[tuple[date, date]]:
+    runs: list[tuple[date, date]] = []
+    for day in sorted(days):
+        if runs and runs[-1][1] + timedelta(days=1) == day:
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+class TrafficWarehouseService:
+    """Сбор суточного трафика в БД и построение отчётов по нему."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._collect_lock = asyncio.Lock()
+        self._live_lock = asyncio.Lock()
+        # (start, end) -> (timestamp, user_traffic)
+        self._live_cache: dict[tuple[str, str], tuple[float, dict[str, dict[str, int]]]] = {}
+        self._nodes_cache: tuple[float, list[TrafficNode]] | None = None
+        self.last_collected_at: datetime | None = None
+
+    def is_enabled(self) -> bool:
+        return settings.TRAFFIC_WAREHOUSE_ENABLED
+
+    def is_running(self) -> bool:
+        return self._running
+
+    async def start(self) -> None:
+        if self._running or not self.is_enabled():
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._collect_loop())
+        logger.info('Сборщик суточного трафика запущен')
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _collect_loop(self) -> None:
+        interval = max(60, settings.TRAFFIC_WAREHOUSE_INTERVAL_MINUTES * 60)
+        while self._running:
+            try:
+                await self.collect_pending_days()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error('Ошибка сбора суточного трафика', error=error)
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------------------------ панель
+
+    async def _fetch_from_panel(
+        self, ranges: list[tuple[str, str]]
+    ) -> tuple[list[tuple[dict[str, dict[str, int]], bool]], list[TrafficNode]]:
+        """Запросить трафик всех нод за каждый диапазон: O(нод × диапазонов) запросов.
+
+        Для каждого диапазона возвращается (трафик, ответили ли все ноды).
+        """
+        service = RemnaWaveService()
+        if not service.is_configured:
+            return [({}, True) for _ in ranges], []
+
+        async with service.get_api_client() as api:
+            panel_nodes = await api.get_all_nodes()
+            semaphore = asyncio.Semaphore(_CONCURRENCY_LIMIT)
+
+            async def fetch(node: Any, start_str: str, end_str: str):
+                async with semaphore:
+                    try:
+                        return await api.get_bandwidth_stats_node_users_legacy(node.uuid, start_str, end_str)
+                    except Exception:
+                        logger.warning('Failed to get traffic for node', node_name=node.name, exc_info=True)
+                        return None
+
+            results = await asyncio.gather(
+                *(fetch(node, start_str, end_str) for start_str, end_str in ranges for node in panel_nodes)
+            )
+
+        nodes = sorted(
+            (TrafficNode(uuid=node.uuid, name=node.name, country_code=node.country_code) for node in panel_nodes),
+            key=lambda node: node.name,
+        )
+        self._nodes_cache = (time.time(), nodes)
+
+        reports: list[tuple[dict[str, dict[str, int]], bool]] = []
+        node_count = len(panel_nodes)
+        for range_index in range(len(ranges)):
+            node_results = results[range_index * node_count : (range_index + 1) * node_count]
+
+            # Legacy response: [{userUuid, username, nodeUuid, total, date}, ...]
+            user_traffic: dict[str, dict[str, int]] = {}
+            for node, entries in zip(panel_nodes, node_results, strict=True):
+                if not isinstance(entries, list):
+                    continue
+                for entry in entries:
+                    user_uuid = entry.get('userUuid', '')
+                    total = int(entry.get('total', 0) or 0)
+                    if user_uuid and total > 0:
+                        per_node = user_traffic.setdefault(user_uuid, {})
+                        per_node[node.uuid] = per_node.get(node.uuid, 0) + total
+            reports.append((user_traffic, all(entries is not None for entries in node_results)))
+
+        return reports, nodes
+
+    async def get_nodes(self) -> list[TrafficNode]:
+        cached = self._nodes_cache
+        if cached and time.time() - cached[0] < _LIVE_CACHE_TTL:
+            return cached[1]
+
+        service = RemnaWaveService()
+        if not service.is_configured:
+            return []
+        async with service.get_api_client() as api:
+            panel_nodes = await api.get_all_nodes()
+
+        nodes = sorted(
+            (TrafficNode(uuid=node.uuid, name=node.name, country_code=node.country_code) for node in panel_nodes),
+            key=lambda node: node.name,
+        )
+        self._nodes_cache = (time.time(), nodes)
+        return nodes
+
+    async def _fetch_live(self, ranges: list[tuple[str, str]]) -> dict[str, dict[str, int]]:
+        """Живой трафик за диапазоны с коротким кешем (для текущих и несобранных суток)."""
+        merged: dict[str, dict[str, int]] = {}
+        if not ranges:
+            return merged
+
+        async with self._live_lock:
+            now = time.time()
+            for key in [key for key, (ts, _) in self._live_cache.items() if now - ts >= _LIVE_CACHE_TTL]:
+                del self._live_cache[key]
+
+            missing = [key for key in ranges if key not in self._live_cache]
+            if missing:
+                reports, _ = await self._fetch_from_panel(missing)
+                for key, (report, complete) in zip(missing, reports, strict=True):
+                    if complete:
+                        self._live_cache[key] = (now, report)
+                    else:
+                        # Неполный ответ не кешируем, но показываем то, что есть
+                        _merge_traffic(merged, report)
+
+            for key in ranges:
+                cached = self._live_cache.get(key)
+                if cached:
+                    _merge_traffic(merged, cached[1])
+
+        return merged
+
+    # ------------------------------------------------------------------ сбор
+
+    async def collect_pending_days(self, today: date | None = None) -> list[date]:
+        """Собрать прошедшие сутки, которых ещё нет в хранилище или которые собраны до их окончания."""
+        today = today or datetime.now(UTC).date()
+        backfill_days = max(1, settings.TRAFFIC_WAREHOUSE_BACKFILL_DAYS)
+        first_day = today - timedelta(days=backfill_days)
+        last_day = today - timedelta(days=1)
+
+        async with self._collect_lock:
+            async with AsyncSessionLocal() as db:
+                collected = await get_collected_traffic_days(db, first_day, last_day)
+
+            pending: list[date] = []
+            day = first_day
+            while day <= last_day:
+                collected_at = collected.get(day)
+                if collected_at is not None and collected_at.tzinfo is None:
+                    collected_at = collected_at.replace(tzinfo=UTC)
+                if collected_at is None or collected_at < _day_start(day) + timedelta(days=1) + _FINALIZE_GRACE:
+                    pending.append(day)
+                day += timedelta(days=1)
+
+            done: list[date] = []
+            if pending:
+                done = await self._collect_days(pending)
+
+            if settings.TRAFFIC_WAREHOUSE_RETENTION_DAYS > 0:
+                async with AsyncSessionLocal() as db:
+                    removed = await delete_traffic_days_before(
+                        db, today - timedelta(days=settings.TRAFFIC_WAREHOUSE_RETENTION_DAYS)
+                    )
+                if removed:
+                    logger.info('Удалены устаревшие записи суточного трафика', removed=removed)
+
+        return done
+
+    async def _collect_days(self, days: list[date]) -> list[date]:
+        if not RemnaWaveService().is_configured:
+            return []
+
+        ranges = [
+            (_day_start(day).strftime(_RANGE_FORMAT), (_day_start(day) + timedelta(days=1)).strftime(_RANGE_FORMAT))
+            for day in days
+        ]
+        reports, _ = await self._fetch_from_panel(ranges)
+
+        done: list[date] = []
+        async with AsyncSessionLocal() as db:
+            for day, (report, complete) in zip(days, reports, strict=True):
+                if not complete:
+                    logger.warning('Трафик за сутки собран не со всех нод, повтор позже', day=day.isoformat())
+                    continue
+                totals = {
+                    (user_uuid, node_uuid): total
+                    for user_uuid, per_node in report.items()
+                    for node_uuid, total in per_node.items()
+                }
+                await replace_traffic_day(db, day, totals)
+                done.append(day)
+
+        if done:
+            self.last_collected_at = datetime.now(UTC)
+            logger.info('Суточный трафик сохранён', days=[day.isoformat() for day in done])
+        return done
+
+    # ------------------------------------------------------------------ отчёты
+
+    async def get_traffic(self, db, start_dt: datetime, end_dt: datetime) -> TrafficReport:
+        """Трафик за период: собранные сутки — из БД, остальные — из панели."""
+        days = split_range_by_days(start_dt, end_dt)
+        today = datetime.now(UTC).date()
+        # Неполные сутки на краях периода берутся из панели по границам периода, как и текущие
+        partial_days = set()
+        if start_dt > _day_start(days[0]):
+            partial_days.add(days[0])
+        if end_dt < _day_start(days[-1]) + timedelta(days=1):
+            partial_days.add(days[-1])
+
+        stored_days: list[date] = []
+        if self.is_enabled():
+            collected = await get_collected_traffic_days(db, days[0], days[-1])
+            stored_days = [day for day in days if day in collected and day < today and day not in partial_days]
+
+        live_days = [day for day in days if day not in set(stored_days)]
+        live_ranges: list[tuple[str, str]] = []
+        for first, last in _group_consecutive(live_days):
+            range_start = _day_start(first)
+            if first in partial_days and first == days[0]:
+                range_start = _floor_to_live_step(start_dt)
+            range_end = _day_start(last) + timedelta(days=1)
+            if end_dt < range_end:
+                range_end = _floor_to_live_step(end_dt)
+            live_ranges.append((range_start.strftime(_RANGE_FORMAT), range_end.strftime(_RANGE_FORMAT)))
+
+        user_traffic = await get_traffic_totals(db, stored_days)
+        _merge_traffic(user_traffic, await self._fetch_live(live_ranges))
+
+        return TrafficReport(
+            user_traffic=user_traffic,
+            nodes=await self.get_nodes(),
+            stored_days=len(stored_days),
+            live_ranges=len(live_ranges),
+        )
+
+
+traffic_warehouse_service = TrafficWarehouseService()
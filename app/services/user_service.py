@@ -21,11 +21,14 @@ from app.database.crud.user import (
     get_user_by_id,
     get_users_count,
     get_users_list,
+    get_users_page as get_users_keyset_page,
     get_users_spending_stats,
     get_users_statistics,
     subtract_user_balance,
     update_user,
 )
+from app.database.crud.user_search import search_users
+from app.database.crud.user_spending_stats import reset_user_spending_stats
 from app.database.models import (
     AdvertisingCampaign,
     AdvertisingCampaignRegistration,
@@ -60,6 +63,7 @@ from app.services.notification_delivery_service import (
     NotificationType,
     notification_delivery_service,
 )
+from app.utils.pagination import KeysetCursor
 
 
 logger = structlog.get_logger(__name__)
@@ -220,8 +224,7 @@ class UserService:
         try:
             offset = (page - 1) * limit
 
-            users = await get_users_list(db, offset=offset, limit=limit, search=query)
-            total_count = await get_users_count(db, search=query)
+            users, total_count = await search_users(db, query, limit=limit, offset=offset)
 
             total_pages = (total_count + limit - 1) // limit
 
@@ -256,8 +259,36 @@ class UserService:
         order_by_last_activity: bool = False,
         order_by_total_spent: bool = False,
         order_by_purchase_count: bool = False,
+        cursor: KeysetCursor | None = None,
     ) -> dict[str, Any]:
+        """Страница пользователей.
+
+        Порядок по умолчанию (новые сверху) отдаётся keyset-пагинацией: первая
+        страница и переход по ``cursor`` без OFFSET. Остальные сортировки и
+        переход на страницу по номеру без курсора идут через OFFSET.
+        """
         try:
+            total_count = await get_users_count(db, status=status)
+            total_pages = (total_count + limit - 1) // limit
+
+            sort_flags = (
+                order_by_balance,
+                order_by_traffic,
+                order_by_last_activity,
+                order_by_total_spent,
+                order_by_purchase_count,
+            )
+            if not any(sort_flags) and (cursor is not None or page == 1):
+                keyset_page = await get_users_keyset_page(db, limit=limit, cursor=cursor, status=status)
+                return {
+                    'users': keyset_page.items,
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'total_count': total_count,
+                    'has_next': keyset_page.has_next,
+                    'has_prev': keyset_page.has_prev and page > 1,
+                }
+
             offset = (page - 1) * limit
 
             users = await get_users_list(
@@ -271,9 +302,6 @@ class UserService:
                 order_by_total_spent=order_by_total_spent,
                 order_by_purchase_count=order_by_purchase_count,
             )
-            total_count = await get_users_count(db, status=status)
-
-            total_pages = (total_count + limit - 1) // limit
 
             return {
                 'users': users,
@@ -1051,6 +1079,7 @@ class UserService:
                 if transactions:
                     logger.info('🔄 Удаляем транзакций', transactions_count=len(transactions))
                     await db.execute(delete(Transaction).where(Transaction.user_id == user_id))
+                    await reset_user_spending_stats(db, user_id)
                     await db.flush()
             except Exception as e:
                 logger.error('❌ Ошибка удаления транзакций', error=e)
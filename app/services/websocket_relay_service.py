@@ -0,0 +1,164 @@
+"""Ретрансляция WebSocket-уведомлений между репликами через Redis pub/sub.
+
+Подключения кабинета и админки живут в памяти процесса, который их принял,
+а события (платёж, ответ в тикете) могут возникнуть в любом процессе.
+Процесс доставляет сообщение своим сокетам сам и публикует его в канал;
+остальные процессы доставляют его своим сокетам. Сообщение передаётся уже
+сериализованным, чтобы не кодировать JSON повторно на каждой реплике.
+Без Redis ретранслятор работает локально и ничего не публикует.
+"""
+
+import asyncio
+import inspect
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+CABINET_USER_KIND = 'cabinet.user'
+CABINET_ADMINS_KIND = 'cabinet.admins'
+EVENTS_BROADCAST_KIND = 'events.broadcast'
+
+# Обработчик получает адресата (или None) и сериализованное сообщение
+RelayHandler = Callable[[int | None, str], Awaitable[None] | None]
+
+
+class WebSocketRelay:
+    """Рассылка WebSocket-сообщений на другие реплики."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, RelayHandler] = {}
+        self._instance_id = uuid.uuid4().hex
+        self._redis: redis.Redis | None = None
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._reconnect_delay = 5.0
+        self.published = 0
+        self.received = 0
+
+    @property
+    def instance_id(self) -> str:
+        return self._instance_id
+
+    @property
+    def channel(self) -> str:
+        return settings.WEBSOCKET_RELAY_CHANNEL
+
+    def is_distributed(self) -> bool:
+        return self._redis is not None
+
+    def register(self, kind: str, handler: RelayHandler) -> None:
+        """Зарегистрировать локальную доставку для вида сообщений."""
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        if self._running:
+            return
+
+        if not settings.WEBSOCKET_RELAY_ENABLED:
+            logger.info('Ретрансляция WebSocket-уведомлений отключена')
+            return
+
+        try:
+            client = redis.from_url(settings.REDIS_URL)
+            await client.ping()
+            if not hasattr(client, 'pubsub'):
+                raise RuntimeError('Redis client does not support pub/sub')
+        except Exception as error:
+            logger.warning('Ретрансляция WebSocket-уведомлений работает локально: Redis недоступен', error=error)
+            return
+
+        self._redis = client
+        self._running = True
+        self._task = asyncio.create_task(self._listen_loop())
+        logger.info('Ретрансляция WebSocket-уведомлений запущена', channel=self.channel)
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        if self._redis is not None:
+            try:
+                await self._redis.close()
+            except Exception as error:
+                logger.debug('Ошибка закрытия соединения ретрансляции WebSocket', error=error)
+            self._redis = None
+
+    async def publish(self, kind: str, data: str, target: int | None = None) -> None:
+        """Отправить сообщение на остальные реплики (локальная доставка — на вызывающем)."""
+        if self._redis is None:
+            return
+
+        message = json.dumps({'origin': self._instance_id, 'kind': kind, 'target': target, 'data': data})
+        try:
+            await self._redis.publish(self.channel, message)
+            self.published += 1
+        except Exception as error:
+            logger.warning('Не удалось ретранслировать WebSocket-уведомление', kind=kind, error=error)
+
+    async def handle_message(self, raw_message: bytes | str) -> bool:
+        """Доставить входящее сообщение локальным сокетам."""
+        try:
+            message = json.loads(raw_message)
+            kind = str(message['kind'])
+            data = str(message['data'])
+            target = message.get('target')
+        except (ValueError, TypeError, KeyError) as error:
+            logger.warning('Некорректное сообщение ретрансляции WebSocket', error=error)
+            return False
+
+        if message.get('origin') == self._instance_id:
+            return False
+
+        handler = self._handlers.get(kind)
+        if handler is None:
+            return False
+
+        self.received += 1
+        try:
+            result = handler(int(target) if target is not None else None, data)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as error:
+            logger.error('Ошибка доставки ретранслированного WebSocket-уведомления', kind=kind, error=error)
+            return False
+        return True
+
+    async def _listen_loop(self) -> None:
+        while self._running:
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                while self._running:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        await self.handle_message(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Ошибка прослушивания канала ретрансляции WebSocket', error=error)
+                await asyncio.sleep(self._reconnect_delay)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+
+websocket_relay = WebSocketRelay()
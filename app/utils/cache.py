@@ -1,4 +1,20 @@
+"""Кеш приложения.
+
+Простые ``get``/``set`` работают напрямую с Redis. Для часто читаемых данных
+есть двухуровневый кеш по пространствам имён (``get_or_load``): ограниченный
+LRU в памяти процесса перед Redis. Ключи пространства содержат его версию,
+поэтому ``invalidate`` — это один ``INCR`` версии вместо поиска ключей:
+старые записи становятся недостижимыми и истекают по TTL. Версию процесс
+перечитывает из Redis не чаще раза в ``CACHE_LOCAL_TTL_SECONDS``, столько же
+живут записи локального уровня — это предел рассинхронизации реплик.
+"""
+
+import asyncio
 import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from datetime import timedelta
 from typing import Any
 
@@ -11,10 +27,118 @@ from app.config import settings
 logger = structlog.get_logger(__name__)
 
 
+NAMESPACE_VERSION_PREFIX = 'cache:version:'
+
+AVAILABLE_COUNTRIES_NAMESPACE = 'available_countries'
+# FAQ, оферта, политика и правила (экран подписки мини-приложения)
+LEGAL_CONTENT_NAMESPACE = 'legal_content'
+PROMO_GROUPS_NAMESPACE = 'promo_groups'
+# Тарифы и цены серверов (каталог цен, app/services/pricing_catalog.py)
+PRICING_CATALOG_NAMESPACE = 'pricing_catalog'
+# Активные сообщения, случайно показываемые в главном меню
+USER_MESSAGES_NAMESPACE = 'user_messages'
+# Короткоживущие пользовательские фрагменты главного меню (тестовый доступ, рефералы)
+MAIN_MENU_NAMESPACE = 'main_menu'
+
+_MISSING = object()
+
+CacheExpire = int | timedelta | Callable[[Any], int | timedelta]
+
+
+def _expire_seconds(expire: int | timedelta | None) -> int | None:
+    if isinstance(expire, timedelta):
+        return int(expire.total_seconds())
+    return expire
+
+
+@dataclass
+class CacheNamespaceStats:
+    """Счётчики пространства имён двухуровневого кеша."""
+
+    local_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    load_errors: int = 0
+    invalidations: int = 0
+    redis_seconds: float = 0.0
+    redis_requests: int = 0
+    load_seconds: float = 0.0
+    loads: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.local_hits + self.redis_hits + self.misses
+        return (self.local_hits + self.redis_hits) / total if total else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'load_errors': self.load_errors,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hit_ratio, 4),
+            'avg_redis_ms': round(self.redis_seconds * 1000 / self.redis_requests, 3) if self.redis_requests else 0.0,
+            'avg_load_ms': round(self.load_seconds * 1000 / self.loads, 3) if self.loads else 0.0,
+        }
+
+
+class LocalLRUCache:
+    """Ограниченный LRU-кеш в памяти процесса с TTL записей.
+
+    Значения отдаются теми же объектами, что были сохранены, — вызывающий код
+    не должен их изменять.
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
 class CacheService:
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
         self.redis_client: redis.Redis | None = None
         self._connected = False
+        self._clock = clock
+        self._local = LocalLRUCache(settings.CACHE_LOCAL_MAX_ENTRIES, clock=clock)
+        # namespace -> (версия, когда сверена с Redis)
+        self._versions: dict[str, tuple[int, float]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._stats: dict[str, CacheNamespaceStats] = {}
 
     async def connect(self):
         try:
@@ -94,16 +218,24 @@ class CacheService:
             return False
 
     async def delete_pattern(self, pattern: str) -> int:
+        """Удалить ключи по шаблону (SCAN, без блокировки Redis).
+
+        Для сброса кешируемых данных используйте ``invalidate`` — это O(1).
+        """
         if not self._connected:
             return 0
 
         try:
-            keys = await self.redis_client.keys(pattern)
-            if not keys:
-                return 0
-
-            deleted = await self.redis_client.delete(*keys)
-            return int(deleted)
+            deleted = 0
+            batch: list = []
+            async for key in self.redis_client.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += int(await self.redis_client.unlink(*batch))
+                    batch = []
+            if batch:
+                deleted += int(await self.redis_client.unlink(*batch))
+            return deleted
         except Exception as e:
             logger.error('Ошибка удаления ключей по шаблону', pattern=pattern, error=e)
             return 0
@@ -133,7 +265,7 @@ class CacheService:
             return []
 
         try:
-            keys = await self.redis_client.keys(pattern)
+            keys = [key async for key in self.redis_client.scan_iter(match=pattern, count=500)]
             return [key.decode() if isinstance(key, bytes) else key for key in keys]
         except Exception as e:
             logger.error('Ошибка получения ключей по паттерну', pattern=pattern, error=e)
@@ -145,6 +277,8 @@ class CacheService:
 
         try:
             await self.redis_client.flushall()
+            self._local.clear()
+            self._versions.clear()
             logger.info('🗑️ Кеш полностью очищен')
             return True
         except Exception as e:
@@ -238,6 +372,145 @@ class CacheService:
             logger.error('Ошибка чтения очереди', key=key, error=e)
             return []
 
+    # ------------------------------------------------------------ пространства имён
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    @property
+    def local_entries(self) -> int:
+        return len(self._local)
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """Счётчики попаданий, промахов и задержек по пространствам имён."""
+        return {namespace: stats.as_dict() for namespace, stats in sorted(self._stats.items())}
+
+    def _namespace_stats(self, namespace: str) -> CacheNamespaceStats:
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = CacheNamespaceStats()
+        return stats
+
+    async def namespace_version(self, namespace: str) -> int:
+        """Текущая версия пространства; из Redis перечитывается не чаще раза в локальный TTL."""
+        now = self._clock()
+        known = self._versions.get(namespace)
+        if known is not None and (not self._connected or now - known[1] < settings.CACHE_LOCAL_TTL_SECONDS):
+            return known[0]
+
+        version = known[0] if known else 0
+        if self._connected:
+            try:
+                raw_version = await self.redis_client.get(f'{NAMESPACE_VERSION_PREFIX}{namespace}')
+                version = int(raw_version or 0)
+            except Exception as e:
+                logger.warning('Не удалось получить версию пространства кеша', namespace=namespace, error=e)
+        self._versions[namespace] = (version, now)
+        return version
+
+    async def invalidate(self, namespace: str) -> int:
+        """Сбросить все ключи пространства увеличением его версии."""
+        self._namespace_stats(namespace).invalidations += 1
+        known = self._versions.get(namespace)
+        version = (known[0] if known else 0) + 1
+        if self._connected:
+            try:
+                version = int(await self.redis_client.incr(f'{NAMESPACE_VERSION_PREFIX}{namespace}'))
+            except Exception as e:
+                logger.warning('Не удалось увеличить версию пространства кеша', namespace=namespace, error=e)
+        self._versions[namespace] = (version, self._clock())
+        self._local.delete_prefix(f'{namespace}:')
+        return version
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: Any,
+        loader: Callable[[], Awaitable[Any]],
+        expire: CacheExpire = 300,
+    ) -> Any:
+        """Значение из локального уровня, затем из Redis, иначе из ``loader``.
+
+        Одновременные промахи по одному ключу ждут одну загрузку. ``None`` от
+        загрузчика не кешируется. ``expire`` может быть функцией от значения.
+        """
+        stats = self._namespace_stats(namespace)
+        version = await self.namespace_version(namespace)
+        full_key = f'{namespace}:v{version}:{key}'
+
+        value = self._local.get(full_key)
+        if value is not _MISSING:
+            stats.local_hits += 1
+            return value
+
+        task = self._inflight.get(full_key)
+        if task is not None:
+            stats.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._load(namespace, full_key, loader, expire))
+        self._inflight[full_key] = task
+        task.add_done_callback(lambda done: self._finish_load(full_key, done))
+        return await asyncio.shield(task)
+
+    def _finish_load(self, full_key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(full_key) is task:
+            del self._inflight[full_key]
+        # Ошибку загрузки получают ожидающие; помечаем её полученной, даже если все отменились
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(
+        self,
+        namespace: str,
+        full_key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire: CacheExpire,
+    ) -> Any:
+        stats = self._namespace_stats(namespace)
+        local_ttl = settings.CACHE_LOCAL_TTL_SECONDS
+
+        if self._connected:
+            started = time.perf_counter()
+            try:
+                raw_value = await self.redis_client.get(full_key)
+            except Exception as e:
+                logger.error('Ошибка получения из кеша', key=full_key, error=e)
+                raw_value = None
+            stats.redis_seconds += time.perf_counter() - started
+            stats.redis_requests += 1
+
+            if raw_value is not None:
+                try:
+                    value = json.loads(raw_value)
+                except ValueError:
+                    value = None
+                if value is not None:
+                    stats.redis_hits += 1
+                    self._local.set(full_key, value, local_ttl)
+                    return value
+
+        stats.misses += 1
+        started = time.perf_counter()
+        try:
+            value = await loader()
+        except Exception:
+            stats.load_errors += 1
+            raise
+        finally:
+            stats.load_seconds += time.perf_counter() - started
+            stats.loads += 1
+
+        if value is None:
+            return None
+
+        ttl = _expire_seconds(expire(value) if callable(expire) else expire)
+        self._local.set(full_key, value, min(local_ttl, ttl) if ttl else local_ttl)
+        if self._connected:
+            await self.set(full_key, value, ttl)
+        return value
+
 
 cache = CacheService()
 
@@ -0,0 +1,279 @@
+"""Чтение больших лог-файлов без загрузки целиком в память.
+
+Файл читается блоками с конца: хвост для предпросмотра, страницы записей
+с курсором по байтовому смещению для прокрутки назад и потоковая фильтрация
+для скачивания. Запись — строка с маркером уровня (``[error]``) вместе со
+следующими за ней строками без маркера (например, трейсбеком).
+
+Все функции синхронные и рассчитаны на вызов из пула потоков.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+DEFAULT_MAX_SCAN_BYTES = 8 * 1024 * 1024
+# UTF-8 кодирует символ максимум четырьмя байтами
+MAX_BYTES_PER_CHAR = 4
+
+LOG_LEVEL_WEIGHTS: dict[str, int] = {
+    'debug': 10,
+    'info': 20,
+    'warning': 30,
+    'warn': 30,
+    'error': 40,
+    'exception': 40,
+    'critical': 50,
+}
+
+_LEVEL_MARKER_RE = re.compile(rb'\[\s*(debug|info|warning|warn|error|exception|critical)\s*\]', re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class LogRecordEntry:
+    """Запись лога: строка с уровнем и её строки-продолжения."""
+
+    offset: int
+    level: str | None
+    text: str
+
+
+@dataclass(slots=True)
+class LogPage:
+    """Страница записей в хронологическом порядке.
+
+    ``next_cursor`` — смещение, которое нужно передать как ``before`` для
+    получения более ранних записей.
+    """
+
+    items: list[LogRecordEntry] = field(default_factory=list)
+    next_cursor: int | None = None
+    has_more: bool = False
+    scanned_bytes: int = 0
+
+
+def parse_level(line: bytes) -> str | None:
+    """Уровень записи по маркеру в строке или None для строки-продолжения."""
+    match = _LEVEL_MARKER_RE.search(line, 0, 120)
+    if match is None:
+        return None
+    return match.group(1).decode('ascii').lower()
+
+
+def normalize_min_level(level: str | None) -> int | None:
+    """Вес минимального уровня фильтра; ValueError для неизвестного уровня."""
+    if not level:
+        return None
+    weight = LOG_LEVEL_WEIGHTS.get(level.strip().lower())
+    if weight is None:
+        raise ValueError(f'Unknown log level: {level}')
+    return weight
+
+
+def read_tail_bytes(path: Path, max_bytes: int) -> tuple[bytes, int]:
+    """Последние ``max_bytes`` байт файла и его полный размер."""
+    with path.open('rb') as handle:
+        size = handle.seek(0, 2)
+        start = max(0, size - max(0, max_bytes))
+        handle.seek(start)
+        return handle.read(size - start), size
+
+
+def read_tail_text(path: Path, max_chars: int) -> tuple[str, int, bool]:
+    """Последние ``max_chars`` символов файла.
+
+    Возвращает текст, размер файла в байтах и флаг усечения.
+    """
+    data, size = read_tail_bytes(path, max(0, max_chars) * MAX_BYTES_PER_CHAR)
+    if max_chars <= 0:
+        return '', size, size > 0
+    text = data.decode('utf-8', errors='ignore')
+    truncated = len(data) < size or len(text) > max_chars
+    return text[-max_chars:], size, truncated
+
+
+def _iter_lines_reverse(
+    handle: BinaryIO, end: int, block_size: int, max_line_bytes: int | None = None
+) -> Iterator[tuple[int, bytes]]:
+    """Строки до смещения ``end`` от последней к первой вместе с их смещениями.
+
+    Строка длиннее ``max_line_bytes`` отдаётся обрезанной до своего начала:
+    в памяти держится не больше ``max_line_bytes`` байт одной строки.
+    """
+    position = end
+    # Куски текущей строки: от её конца к началу
+    parts: list[bytes] = []
+    parts_size = 0
+
+    def prepend(piece: bytes) -> None:
+        nonlocal parts_size
+        parts.append(piece)
+        parts_size += len(piece)
+        while max_line_bytes is not None and parts_size > max_line_bytes:
+            excess = parts_size - max_line_bytes
+            if len(parts[0]) <= excess:
+                parts_size -= len(parts.pop(0))
+            else:
+                parts[0] = parts[0][: len(parts[0]) - excess]
+                parts_size -= excess
+
+    def take_line() -> bytes:
+        nonlocal parts_size
+        line = b''.join(reversed(parts))
+        parts.clear()
+        parts_size = 0
+        return line
+
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        handle.seek(position)
+        pieces = handle.read(read_size).split(b'\n')
+
+        start = position + read_size
+        for piece in reversed(pieces[1:]):
+            start -= len(piece)
+            prepend(piece)
+            yield start, take_line()
+            start -= 1
+        prepend(pieces[0])
+
+    yield 0, take_line()
+
+
+def _decode_record(lines: list[bytes]) -> str:
+    return b'\n'.join(line.rstrip(b'\r') for line in lines).decode('utf-8', errors='replace')
+
+
+def _matches(level: str | None, text: str, min_weight: int | None, needle: str | None) -> bool:
+    if min_weight is not None and (level is None or LOG_LEVEL_WEIGHTS[level] < min_weight):
+        return False
+    if needle and needle not in text.lower():
+        return False
+    return True
+
+
+def read_records_before(
+    path: Path,
+    *,
+    before: int | None = None,
+    limit: int = 100,
+    min_level: str | None = None,
+    contains: str | None = None,
+    max_scan_bytes: int = DEFAULT_MAX_SCAN_BYTES,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> LogPage:
+    """Прочитать до ``limit`` записей, начинающихся раньше смещения ``before``.
+
+    Файл читается с конца блоками; просмотр прекращается после ``limit``
+    подходящих записей или ``max_scan_bytes`` просмотренных байт. Во втором
+    случае страница может быть неполной, а ``next_cursor`` указывает, откуда
+    продолжить поиск.
+    """
+    min_weight = normalize_min_level(min_level)
+    needle = contains.lower() if contains else None
+
+    with path.open('rb') as handle:
+        size = handle.seek(0, 2)
+        end = size if before is None else max(0, min(before, size))
+
+        collected: list[LogRecordEntry] = []
+        pending: list[bytes] = []
+        pending_offset = end
+        cursor = end
+
+        for offset, line in _iter_lines_reverse(handle, end, block_size, max_scan_bytes):
+            if end - offset > max_scan_bytes:
+                # Запись длиннее лимита отдаётся фрагментом, чтобы курсор сдвигался
+                if pending:
+                    pending.reverse()
+                    text = _decode_record(pending).strip('\n')
+                    cursor = pending_offset
+                    if text and _matches(None, text, min_weight, needle):
+                        collected.append(LogRecordEntry(offset=pending_offset, level=None, text=text))
+                elif cursor == end:
+                    # Одна строка длиннее лимита: отдаём её начало, иначе курсор не сдвинется
+                    level = parse_level(line)
+                    text = _decode_record([line]).strip('\n')
+                    cursor = offset
+                    if text and _matches(level, text, min_weight, needle):
+                        collected.append(LogRecordEntry(offset=offset, level=level, text=text))
+                break
+
+            level = parse_level(line)
+            if level is None and offset > 0:
+                if line.strip():
+                    pending.append(line)
+                    pending_offset = offset
+                continue
+
+            pending.append(line)
+            pending.reverse()
+            text = _decode_record(pending).strip('\n')
+            pending = []
+            cursor = offset
+
+            if text and _matches(level, text, min_weight, needle):
+                collected.append(LogRecordEntry(offset=offset, level=level, text=text))
+                if len(collected) >= limit:
+                    break
+
+    collected.reverse()
+    return LogPage(
+        items=collected,
+        next_cursor=cursor if cursor > 0 else None,
+        has_more=cursor > 0,
+        scanned_bytes=end - cursor,
+    )
+
+
+def iter_filtered_log(
+    path: Path,
+    *,
+    min_level: str | None = None,
+    contains: str | None = None,
+    chunk_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[bytes]:
+    """Потоково отдать записи файла, прошедшие фильтр, в исходном порядке."""
+    min_weight = normalize_min_level(min_level)
+    needle = contains.lower() if contains else None
+
+    buffer: list[bytes] = []
+    buffered = 0
+    record: list[bytes] = []
+    record_level: str | None = None
+
+    def flush_record() -> None:
+        nonlocal buffered
+        if not record:
+            return
+        text = b''.join(record).decode('utf-8', errors='replace')
+        if _matches(record_level, text, min_weight, needle):
+            buffer.extend(record)
+            buffered += sum(len(line) for line in record)
+
+    with path.open('rb') as handle:
+        for line in handle:
+            level = parse_level(line)
+            if level is not None:
+                flush_record()
+                record = [line]
+                record_level = level
+            else:
+                record.append(line)
+
+            if buffered >= chunk_size:
+                yield b''.join(buffer)
+                buffer.clear()
+                buffered = 0
+
+        flush_record()
+
+    if buffer:
+        yield b''.join(buffer)
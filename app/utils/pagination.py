@@ -1,6 +1,14 @@
+import base64
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+from decimal import Decimal
 from math import ceil
 from typing import Any, TypeVar
 
+from sqlalchemy import Select, and_, func, literal, or_, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
 
 T = TypeVar('T')
 
@@ -57,3 +65,221 @@ def get_page_numbers(current_page: int, total_pages: int, max_visible: int = 5)
         start_page = max(1, end_page - max_visible + 1)
 
     return list(range(start_page, end_page + 1))
+
+
+# ============================================================================
+# Keyset-пагинация
+# ============================================================================
+#
+# Страница выбирается условием «после последнего показанного ключа» вместо
+# OFFSET, поэтому N-я страница стоит столько же, сколько первая. Порядок должен
+# быть строгим: последний столбец сортировки — уникальный (обычно id), значения
+# столбцов сортировки не должны быть NULL.
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или выдан для другой сортировки."""
+
+
+class KeysetColumn:
+    """Столбец сортировки keyset-пагинации."""
+
+    def __init__(self, column: Any, *, descending: bool = False, attribute: str | None = None):
+        self.column = column
+        self.descending = descending
+        # Имя атрибута строки/ORM-объекта, из которого берётся значение ключа
+        self.attribute = attribute or column.key
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        raise InvalidCursorError('Unknown cursor value')
+    return value
+
+
+class KeysetCursor:
+    """Позиция в упорядоченном списке: значения ключа, направление и сортировка."""
+
+    def __init__(self, values: Sequence[Any], *, backwards: bool = False, ordering: str | None = None):
+        self.values = tuple(values)
+        self.backwards = backwards
+        self.ordering = ordering
+
+    def encode(self) -> str:
+        payload: dict[str, Any] = {'k': [_encode_cursor_value(value) for value in self.values]}
+        if self.backwards:
+            payload['b'] = 1
+        if self.ordering:
+            payload['o'] = self.ordering
+        raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+    @classmethod
+    def decode(cls, token: str) -> 'KeysetCursor':
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(payload, dict) or not isinstance(payload.get('k'), list):
+                raise InvalidCursorError('Invalid cursor')
+            values = [_decode_cursor_value(value) for value in payload['k']]
+        except InvalidCursorError:
+            raise
+        except (ValueError, TypeError) as error:
+            raise InvalidCursorError('Invalid cursor') from error
+        return cls(values, backwards=bool(payload.get('b')), ordering=payload.get('o'))
+
+
+def keyset_ordering_signature(order_by: Sequence['KeysetColumn']) -> str:
+    return ','.join(f'-{column.attribute}' if column.descending else column.attribute for column in order_by)
+
+
+class KeysetPage[T]:
+    def __init__(
+        self,
+        items: list[T],
+        *,
+        next_cursor: str | None,
+        prev_cursor: str | None,
+        total_count: int | None = None,
+        total_is_estimate: bool = False,
+    ):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.has_next = next_cursor is not None
+        self.has_prev = prev_cursor is not None
+        self.total_count = total_count
+        self.total_is_estimate = total_is_estimate
+
+
+def _keyset_condition(order_by: Sequence[KeysetColumn], values: Sequence[Any], backwards: bool):
+    """Условие «строго после ключа» с учётом направления каждого столбца."""
+    if len(values) != len(order_by):
+        raise InvalidCursorError('Cursor does not match ordering')
+
+    def after(column: KeysetColumn, value: Any):
+        descending = column.descending != backwards
+        return column.column < value if descending else column.column > value
+
+    directions = {column.descending for column in order_by}
+    if len(directions) == 1:
+        descending = order_by[0].descending != backwards
+        left = tuple_(*(column.column for column in order_by))
+        right = tuple_(*(literal(value) for value in values))
+        return left < right if descending else left > right
+
+    clauses = []
+    for index, column in enumerate(order_by):
+        equal_prefix = [order_by[prev].column == values[prev] for prev in range(index)]
+        clauses.append(and_(*equal_prefix, after(column, values[index])))
+    return or_(*clauses)
+
+
+def _keyset_values(item: Any, order_by: Sequence[KeysetColumn]) -> tuple[Any, ...]:
+    return tuple(getattr(item, column.attribute) for column in order_by)
+
+
+async def paginate_keyset(
+    db: AsyncSession,
+    query: Select,
+    order_by: Sequence[KeysetColumn],
+    *,
+    limit: int,
+    cursor: KeysetCursor | str | None = None,
+    scalars: bool = True,
+) -> KeysetPage:
+    """Выбрать страницу по курсору.
+
+    ``query`` — запрос без ORDER BY/LIMIT; ``scalars=False`` — строки из
+    нескольких столбцов, тогда значения ключа берутся из строки по имени.
+    """
+    signature = keyset_ordering_signature(order_by)
+    if isinstance(cursor, str):
+        cursor = KeysetCursor.decode(cursor)
+    if cursor is not None and cursor.ordering and cursor.ordering != signature:
+        raise InvalidCursorError('Cursor was issued for another ordering')
+
+    backwards = bool(cursor and cursor.backwards)
+    if cursor is not None:
+        query = query.where(_keyset_condition(order_by, cursor.values, backwards))
+
+    ordering = [column.column.desc() if column.descending != backwards else column.column.asc() for column in order_by]
+    result = await db.execute(query.order_by(*ordering).limit(limit + 1))
+    rows = list(result.scalars().unique().all() if scalars else result.all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([], next_cursor=None, prev_cursor=None)
+
+    first_key = _keyset_values(rows[0], order_by)
+    last_key = _keyset_values(rows[-1], order_by)
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=KeysetCursor(last_key, ordering=signature).encode() if has_next else None,
+        prev_cursor=KeysetCursor(first_key, backwards=True, ordering=signature).encode() if has_prev else None,
+    )
+
+
+def parse_keyset_page_callback(data: str) -> tuple[int, KeysetCursor | None]:
+    """Разобрать callback бота ``<префикс>_page_<стр>[_<a|b><id>]``: a — после id, b — до id.
+
+    Без курсора (старые кнопки) возвращается только номер страницы.
+    """
+    if '_page_' not in data:
+        return 1, None
+
+    page_part, _, cursor_part = data.rsplit('_page_', 1)[1].partition('_')
+    page = max(1, int(page_part))
+    if len(cursor_part) < 2 or cursor_part[0] not in 'ab':
+        return page, None
+    return page, KeysetCursor((int(cursor_part[1:]),), backwards=cursor_part[0] == 'b')
+
+
+def keyset_page_callback(prefix: str, page: int, item_id: int, *, backwards: bool = False) -> str:
+    """Callback кнопки перехода на страницу ``page`` после (или до) строки ``item_id``."""
+    return f'{prefix}_page_{page}_{"b" if backwards else "a"}{item_id}'
+
+
+async def count_rows(db: AsyncSession, query: Select, *, estimate_table: str | None = None) -> tuple[int, bool]:
+    """Количество строк запроса: (count, is_estimate).
+
+    Если передан ``estimate_table`` и база — PostgreSQL, берётся оценка
+    планировщика из ``pg_class`` (мгновенно даже для больших таблиц). Оценку
+    имеет смысл запрашивать только для запроса без фильтров.
+    """
+    if estimate_table and db.bind is not None and db.bind.dialect.name == 'postgresql':
+        estimate = await db.scalar(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'),
+            {'table': estimate_table},
+        )
+        if estimate is not None and estimate >= 0:
+            return int(estimate), True
+
+    total = await db.scalar(query.with_only_columns(func.count()).order_by(None))
+    return int(total or 0), False
@@ -4,6 +4,7 @@ import html
 import math
 from collections.abc import Sequence
 from datetime import UTC, datetime
+from typing import Any
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -148,19 +149,8 @@ async def build_promo_offer_hint(
     return base_hint
 
 
-async def build_test_access_hint(
-    db: AsyncSession,
-    user: User,
-    texts,
-) -> str | None:
-    subscription = getattr(user, 'subscription', None)
-    if not subscription:
-        return None
-
-    subscription_id = getattr(subscription, 'id', None)
-    if not subscription_id:
-        return None
-
+async def load_test_access_state(db: AsyncSession, subscription_id: int) -> dict[str, Any] | None:
+    """Данные подсказки о тестовых серверах без текста: их можно кешировать, таймер считается при выводе."""
     now = datetime.now(UTC)
 
     result = await db.execute(
@@ -180,9 +170,6 @@ async def build_test_access_hint(
         return None
 
     latest_expiry = max(entry.expires_at for entry in active_entries)
-    seconds_left = int((latest_expiry - now).total_seconds())
-    if seconds_left <= 0:
-        return None
 
     total_seconds: int | None = None
     for entry in active_entries:
@@ -193,12 +180,6 @@ async def build_test_access_hint(
             if total > 0 and (total_seconds is None or total > total_seconds):
                 total_seconds = total
 
-    if total_seconds is None or total_seconds <= 0:
-        total_seconds = seconds_left
-
-    bar = _build_progress_bar(seconds_left, total_seconds)
-    time_left_text = _format_time_left(seconds_left, getattr(texts, 'language', 'ru'))
-
     unique_squad_uuids: list[str] = []
     seen_squads: set[str] = set()
     for entry in active_entries:
@@ -230,6 +211,29 @@ async def build_test_access_hint(
     else:
         servers_display = str(len(active_entries))
 
+    return {
+        'expires_at': latest_expiry.isoformat(),
+        'total_seconds': total_seconds,
+        'servers': servers_display,
+    }
+
+
+def render_test_access_hint(state: dict[str, Any] | None, texts) -> str | None:
+    if not state:
+        return None
+
+    expires_at = datetime.fromisoformat(state['expires_at'])
+    seconds_left = int((expires_at - datetime.now(UTC)).total_seconds())
+    if seconds_left <= 0:
+        return None
+
+    total_seconds = state.get('total_seconds')
+    if total_seconds is None or total_seconds <= 0:
+        total_seconds = seconds_left
+
+    bar = _build_progress_bar(seconds_left, total_seconds)
+    time_left_text = _format_time_left(seconds_left, getattr(texts, 'language', 'ru'))
+
     header_template = texts.t(
         'MAIN_MENU_TEST_ACCESS_HEADER',
         '🧪 Test servers active: {servers}',
@@ -239,7 +243,23 @@ async def build_test_access_hint(
         '⏳ Access active for {time_left}\n<code>{bar}</code>',
     )
 
-    header = header_template.format(servers=_escape_format_braces(servers_display))
+    header = header_template.format(servers=_escape_format_braces(state['servers']))
     timer_line = timer_template.format(time_left=time_left_text, bar=bar)
 
     return f'{header}\n{timer_line}'
+
+
+async def build_test_access_hint(
+    db: AsyncSession,
+    user: User,
+    texts,
+) -> str | None:
+    subscription = getattr(user, 'subscription', None)
+    if not subscription:
+        return None
+
+    subscription_id = getattr(subscription, 'id', None)
+    if not subscription_id:
+        return None
+
+    return render_test_access_hint(await load_test_access_state(db, subscription_id), texts)
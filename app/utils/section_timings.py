@@ -0,0 +1,45 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import Any
+
+import structlog
+
+
+logger = structlog.get_logger(__name__)
+
+
+class SectionTimings:
+    """Время выполнения отдельных этапов запроса; пишется в debug-лог для профилирования."""
+
+    def __init__(self, event: str) -> None:
+        self.event = event
+        self._started = time.perf_counter()
+        self.sections: dict[str, float] = {}
+
+    async def run[T](self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.sections[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def log(self, **context: Any) -> None:
+        logger.debug(
+            self.event,
+            total_ms=round((time.perf_counter() - self._started) * 1000, 1),
+            **{f'{name}_ms': duration for name, duration in self.sections.items()},
+            **context,
+        )
+
+
+async def gather_sections(*awaitables: Awaitable[Any]) -> list[Any]:
+    """Выполняет этапы параллельно и пробрасывает первую ошибку, только когда завершились все.
+
+    Так сессия запроса не закрывается, пока её ещё использует другой этап.
+    """
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
@@ -159,10 +159,11 @@ class StartupTimeline:
         icon: str,
         status_label: str,
         message: str,
+        duration: float = 0.0,
     ) -> None:
         self.logger.info('┏', icon=icon, title=title)
         self.logger.info('┗ —', icon=icon, title=title, status_label=status_label, message=message)
-        self._record_step(title, icon, status_label, message, 0.0)
+        self._record_step(title, icon, status_label, message, duration)
 
     @asynccontextmanager
     async def stage(
@@ -0,0 +1,113 @@
+"""Исходящая очередь WebSocket-подключения.
+
+Рассылка кладёт уже сериализованное сообщение в очередь каждого сокета и не
+ждёт отправки: сокет отправляет сообщения своей задачей-писателем, поэтому
+медленный браузер не задерживает остальных получателей. При переполнении
+очереди отбрасываются самые старые сообщения, а подключение, которое
+слишком долго не принимает данные или отстаёт сверх лимита, закрывается.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import structlog
+
+
+logger = structlog.get_logger(__name__)
+
+
+DEFAULT_OUTBOX_SIZE = 100
+DEFAULT_SEND_TIMEOUT = 10.0
+
+
+class WebSocketOutbox:
+    """Ограниченная очередь исходящих сообщений одного сокета."""
+
+    def __init__(
+        self,
+        websocket: Any,
+        *,
+        maxsize: int = DEFAULT_OUTBOX_SIZE,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        max_dropped: int | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(1, maxsize))
+        self._send_timeout = send_timeout
+        # Сколько сообщений подряд можно потерять, прежде чем считать клиента зависшим
+        self._max_dropped = max_dropped if max_dropped is not None else max(1, maxsize) * 2
+        self._writer: asyncio.Task[None] | None = None
+        self._close_task: asyncio.Task[None] | None = None
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self._dropped_in_row = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._writer is None and not self._closed:
+            self._writer = asyncio.create_task(self._writer_loop(), name='websocket-outbox-writer')
+
+    def offer(self, data: str) -> bool:
+        """Поставить сообщение в очередь без ожидания. False — сообщение не принято."""
+        if self._closed:
+            return False
+
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Клиент отстаёт: отбрасываем самое старое сообщение в пользу нового
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:  # pragma: no cover - гонка состояния
+                pass
+            self._queue.put_nowait(data)
+            self.dropped += 1
+            self._dropped_in_row += 1
+            if self._dropped_in_row >= self._max_dropped:
+                logger.warning('WebSocket-клиент не успевает принимать сообщения, подключение закрывается')
+                self.close()
+                return False
+        return True
+
+    def close(self, *, close_socket: bool = True) -> None:
+        """Остановить писателя; неотправленные сообщения теряются.
+
+        ``close_socket=False`` — сокет уже закрыт клиентом и закрывать его не нужно.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if close_socket:
+            self._close_task = asyncio.get_running_loop().create_task(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close(code=1013, reason='Client too slow')
+        except Exception:
+            pass
+
+    async def _writer_loop(self) -> None:
+        while not self._closed:
+            data = await self._queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(data), timeout=self._send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.debug('Не удалось отправить сообщение WebSocket-клиенту', error=error)
+                self.close()
+                return
+            self.sent += 1
+            self._dropped_in_row = 0
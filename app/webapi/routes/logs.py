@@ -9,12 +9,13 @@ from typing import Any
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, Query, Security
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.ticket import TicketCRUD
 from app.services.monitoring_service import monitoring_service
+from app.utils.log_reader import iter_filtered_log, read_records_before, read_tail_bytes, read_tail_text
 
 from ..dependencies import get_db_session, require_api_token
 from ..schemas.logs import (
@@ -25,6 +26,8 @@ from ..schemas.logs import (
     SupportAuditLogEntry,
     SupportAuditLogListResponse,
     SystemLogFullResponse,
+    SystemLogLineEntry,
+    SystemLogPageResponse,
     SystemLogPreviewResponse,
 )
 
@@ -36,6 +39,10 @@ logger = structlog.get_logger(__name__)
 
 SYSTEM_LOG_PREVIEW_LIMIT_DEFAULT = 4000
 SYSTEM_LOG_PREVIEW_LIMIT_MAX = 20000
+SYSTEM_LOG_FULL_MAX_BYTES_DEFAULT = 2 * 1024 * 1024
+SYSTEM_LOG_FULL_MAX_BYTES_MAX = 20 * 1024 * 1024
+SYSTEM_LOG_PAGE_SCAN_BYTES = 8 * 1024 * 1024
+SYSTEM_LOG_LEVEL_PATTERN = '^(?i:debug|info|warning|error|critical)$'
 
 
 def _resolve_system_log_path() -> Path:
@@ -45,11 +52,10 @@ def _resolve_system_log_path() -> Path:
     return path
 
 
-async def _read_system_log(path: Path) -> tuple[str, int, float | None]:
-    def _read() -> tuple[str, int, float]:
-        content = path.read_text(encoding='utf-8', errors='ignore')
-        stats = path.stat()
-        return content, stats.st_size, stats.st_mtime
+async def _read_system_log_tail(path: Path, max_chars: int) -> tuple[str, int, bool, float]:
+    def _read() -> tuple[str, int, bool, float]:
+        text, size, truncated = read_tail_text(path, max_chars)
+        return text, size, truncated, path.stat().st_mtime
 
     return await run_in_threadpool(_read)
 
@@ -88,7 +94,7 @@ async def get_system_log_preview(
         )
 
     try:
-        content, size_bytes, mtime = await _read_system_log(log_path)
+        preview_text, size_bytes, truncated, mtime = await _read_system_log_tail(log_path, preview_limit)
     except FileNotFoundError:
         logger.warning('Лог-файл исчез во время чтения', log_path=log_path)
         return SystemLogPreviewResponse(
@@ -106,15 +112,12 @@ async def get_system_log_preview(
         logger.error('Ошибка чтения лог-файла', log_path=log_path, error=error)
         raise HTTPException(status_code=500, detail='Не удалось прочитать лог-файл') from error
 
-    preview_text = content[-preview_limit:] if preview_limit > 0 else ''
-    truncated = len(content) > len(preview_text)
-
     return SystemLogPreviewResponse(
         path=str(log_path),
         exists=True,
         updated_at=_format_timestamp(mtime),
         size_bytes=size_bytes,
-        size_chars=len(content),
+        size_chars=size_bytes if truncated else len(preview_text),
         preview=preview_text,
         preview_chars=len(preview_text),
         preview_truncated=truncated,
@@ -122,17 +125,92 @@ async def get_system_log_preview(
     )
 
 
-@router.get('/system/download')
+@router.get('/system/lines', response_model=SystemLogPageResponse)
+async def list_system_log_lines(
+    _: Any = Security(require_api_token),
+    before: int | None = Query(
+        default=None,
+        ge=0,
+        description='Байтовое смещение из next_cursor предыдущей страницы; по умолчанию конец файла',
+    ),
+    limit: int = Query(100, ge=1, le=1000, description='Количество записей на странице'),
+    level: str | None = Query(
+        default=None,
+        pattern=SYSTEM_LOG_LEVEL_PATTERN,
+        description='Минимальный уровень записей',
+    ),
+    contains: str | None = Query(
+        default=None,
+        min_length=1,
+        max_length=200,
+        description='Подстрока для поиска без учета регистра',
+    ),
+) -> SystemLogPageResponse:
+    """Получить записи системного лога страницами от конца файла к началу."""
+
+    log_path = _resolve_system_log_path()
+
+    if not log_path.exists() or not log_path.is_file():
+        raise HTTPException(status_code=404, detail='Лог-файл не найден')
+
+    def _read():
+        page = read_records_before(
+            log_path,
+            before=before,
+            limit=limit,
+            min_level=level,
+            contains=contains,
+            max_scan_bytes=SYSTEM_LOG_PAGE_SCAN_BYTES,
+        )
+        return page, log_path.stat()
+
+    try:
+        page, stats = await run_in_threadpool(_read)
+    except FileNotFoundError as error:
+        raise HTTPException(status_code=404, detail='Лог-файл не найден') from error
+    except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
+        logger.error('Ошибка чтения лог-файла', log_path=log_path, error=error)
+        raise HTTPException(status_code=500, detail='Не удалось прочитать лог-файл') from error
+
+    return SystemLogPageResponse(
+        items=[SystemLogLineEntry(offset=item.offset, level=item.level, text=item.text) for item in page.items],
+        next_cursor=page.next_cursor,
+        has_more=page.has_more,
+        scanned_bytes=page.scanned_bytes,
+        size_bytes=stats.st_size,
+        updated_at=_format_timestamp(stats.st_mtime),
+    )
+
+
+@router.get('/system/download', response_model=None)
 async def download_system_log(
     _: Any = Security(require_api_token),
-) -> FileResponse:
-    """Скачать полный лог-файл бота."""
+    level: str | None = Query(
+        default=None,
+        pattern=SYSTEM_LOG_LEVEL_PATTERN,
+        description='Минимальный уровень записей',
+    ),
+    contains: str | None = Query(
+        default=None,
+        min_length=1,
+        max_length=200,
+        description='Подстрока для поиска без учета регистра',
+    ),
+) -> FileResponse | StreamingResponse:
+    """Скачать лог-файл бота целиком или только записи, прошедшие фильтр."""
 
     log_path = _resolve_system_log_path()
 
     if not log_path.exists() or not log_path.is_file():
         raise HTTPException(status_code=404, detail='Лог-файл не найден')
 
+    if level or contains:
+        return StreamingResponse(
+            iter_filtered_log(log_path, min_level=level, contains=contains),
+            media_type='text/plain; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename="filtered-{log_path.name}"'},
+        )
+
     try:
         return FileResponse(
             log_path,
@@ -147,27 +225,46 @@ async def download_system_log(
 @router.get('/system/full', response_model=SystemLogFullResponse)
 async def get_system_log_full(
     _: Any = Security(require_api_token),
+    max_bytes: int = Query(
+        SYSTEM_LOG_FULL_MAX_BYTES_DEFAULT,
+        ge=1024,
+        le=SYSTEM_LOG_FULL_MAX_BYTES_MAX,
+        description='Максимальный объем содержимого от конца файла в байтах',
+    ),
 ) -> SystemLogFullResponse:
-    """Получить полный системный лог-файл бота."""
+    """Получить содержимое системного лог-файла бота (не больше max_bytes от конца)."""
 
     log_path = _resolve_system_log_path()
 
     if not log_path.exists() or not log_path.is_file():
         raise HTTPException(status_code=404, detail='Лог-файл не найден')
 
+    def _read() -> tuple[bytes, int, float]:
+        data, size = read_tail_bytes(log_path, max_bytes)
+        return data, size, log_path.stat().st_mtime
+
     try:
-        content, size_bytes, mtime = await _read_system_log(log_path)
+        data, size_bytes, mtime = await run_in_threadpool(_read)
     except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
         logger.error('Ошибка чтения лог-файла', log_path=log_path, error=error)
         raise HTTPException(status_code=500, detail='Не удалось прочитать лог-файл') from error
 
+    truncated = len(data) < size_bytes
+    if truncated:
+        # Начинаем с первой целой строки, чтобы не отдавать обрезанную запись
+        newline_index = data.find(b'\n')
+        if newline_index != -1:
+            data = data[newline_index + 1 :]
+    content = data.decode('utf-8', errors='ignore')
+
     return SystemLogFullResponse(
         path=str(log_path),
         exists=True,
         updated_at=_format_timestamp(mtime),
         size_bytes=size_bytes,
-        size_chars=len(content),
+        size_chars=size_bytes if truncated else len(content),
         content=content,
+        truncated=truncated,
     )
 
 
@@ -76,7 +76,7 @@ async def create_main_menu_button_endpoint(
         display_order=payload.display_order,
     )
 
-    MainMenuButtonService.invalidate_cache()
+    await MainMenuButtonService.invalidate_cache_everywhere()
     return _serialize(button)
 
 
@@ -94,7 +94,7 @@ async def update_main_menu_button_endpoint(
     update_payload = payload.dict(exclude_unset=True)
     button = await update_main_menu_button(db, button, **update_payload)
 
-    MainMenuButtonService.invalidate_cache()
+    await MainMenuButtonService.invalidate_cache_everywhere()
     return _serialize(button)
 
 
@@ -109,5 +109,5 @@ async def delete_main_menu_button_endpoint(
         raise HTTPException(status.HTTP_404_NOT_FOUND, 'Main menu button not found')
 
     await delete_main_menu_button(db, button)
-    MainMenuButtonService.invalidate_cache()
+    await MainMenuButtonService.invalidate_cache_everywhere()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
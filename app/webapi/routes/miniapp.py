@@ -1,18 +1,19 @@
 from __future__ import annotations
 
-import json
 import math
 import re
 from collections.abc import Collection
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from decimal import ROUND_FLOOR, ROUND_HALF_UP, ROUND_UP, Decimal, InvalidOperation
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 from uuid import uuid4
 
 import structlog
 from aiogram import Bot
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import ValidationError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -40,12 +41,13 @@ from app.database.crud.subscription import (
     remove_subscription_servers,
     update_subscription_autopay,
 )
-from app.database.crud.tariff import get_tariff_by_id, get_tariffs_for_user
+from app.database.crud.tariff import get_tariff_by_id
 from app.database.crud.transaction import (
     create_transaction,
     get_user_total_spent_kopeks,
 )
 from app.database.crud.user import get_user_by_telegram_id, subtract_user_balance
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
     PaymentMethod,
     PromoGroup,
@@ -56,9 +58,11 @@ from app.database.models import (
     TransactionType,
     User,
 )
+from app.services.app_config_provider import app_config_provider, etag_matches
 from app.services.faq_service import FaqService
 from app.services.maintenance_service import maintenance_service
 from app.services.payment_service import PaymentService, get_wata_payment_by_link_id
+from app.services.pricing_catalog import PricingCatalogSnapshot, pricing_catalog
 from app.services.privacy_policy_service import PrivacyPolicyService
 from app.services.promo_offer_service import promo_offer_service
 from app.services.promocode_service import PromoCodeService
@@ -82,6 +86,7 @@ from app.services.subscription_renewal_service import (
     with_admin_notification_service,
 )
 from app.services.subscription_service import SubscriptionService
+from app.services.subscription_usage_refresher import subscription_usage_refresher
 from app.services.trial_activation_service import (
     TrialPaymentChargeFailed,
     TrialPaymentInsufficientFunds,
@@ -91,6 +96,7 @@ from app.services.trial_activation_service import (
     rollback_trial_subscription_activation,
 )
 from app.services.tribute_service import TributeService
+from app.utils.cache import LEGAL_CONTENT_NAMESPACE, PROMO_GROUPS_NAMESPACE, cache, cache_key
 from app.utils.currency_converter import currency_converter
 from app.utils.pricing_utils import (
     apply_percentage_discount,
@@ -99,6 +105,7 @@ from app.utils.pricing_utils import (
     get_remaining_months,
 )
 from app.utils.promo_offer import get_user_active_promo_discount_percent
+from app.utils.section_timings import SectionTimings, gather_sections
 from app.utils.subscription_utils import get_happ_cryptolink_redirect_link
 from app.utils.telegram_webapp import (
     TelegramWebAppAuthError,
@@ -240,15 +247,19 @@ def _get_tariff_monthly_price(tariff) -> int:
 
 
 @router.get('/app-config.json')
-async def get_app_config() -> dict[str, Any]:
-    data = _load_app_config_data()
-    if data is None:
+async def get_app_config(request: Request) -> Response:
+    snapshot = app_config_provider.get_file_config(_get_app_config_candidate_files())
+    if snapshot is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='App config not found')
 
-    return data
+    headers = {'ETag': snapshot.etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(snapshot.etag, request.headers.get('If-None-Match')):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type='application/json', headers=headers)
 
 
-def _get_app_config_candidate_files() -> list[Path]:
+@lru_cache(maxsize=1)
+def _get_app_config_candidate_files() -> tuple[Path, ...]:
     seen: set[Path] = set()
     candidates: list[Path] = []
 
@@ -269,25 +280,7 @@ def _get_app_config_candidate_files() -> list[Path]:
 
     _add_candidate(Path('/var/www/remnawave-miniapp/app-config.json'))
 
-    return candidates
-
-
-def _load_app_config_data() -> dict[str, Any] | None:
-    for path in _get_app_config_candidate_files():
-        if not path.is_file():
-            continue
-
-        try:
-            with path.open('r', encoding='utf-8') as file:
-                data = json.load(file)
-        except (OSError, json.JSONDecodeError) as error:
-            logger.warning('Failed to load app-config from', path=path, error=error)
-            continue
-
-        if isinstance(data, dict):
-            return data
-
-    return None
+    return tuple(candidates)
 
 
 _DECIMAL_ONE_HUNDRED = Decimal(100)
@@ -3059,192 +3052,122 @@ def _is_trial_available_for_user(user: User) -> bool:
     return True
 
 
-@router.post('/subscription', response_model=MiniAppSubscriptionResponse)
-async def get_subscription_details(
-    payload: MiniAppSubscriptionRequest,
-    db: AsyncSession = Depends(get_db_session),
-) -> MiniAppSubscriptionResponse:
-    # Check maintenance mode first
-    if maintenance_service.is_maintenance_active():
-        status_info = maintenance_service.get_status_info()
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail={
-                'code': 'maintenance',
-                'message': maintenance_service.get_maintenance_message() or 'Service is under maintenance',
-                'reason': status_info.get('reason'),
-            },
-        )
+MINIAPP_CONTENT_CACHE_KEY = 'miniapp'
 
-    try:
-        webapp_data = parse_webapp_init_data(payload.init_data, settings.BOT_TOKEN)
-    except TelegramWebAppAuthError as error:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=str(error),
-        ) from error
 
-    telegram_user = webapp_data.get('user')
-    if not isinstance(telegram_user, dict) or 'id' not in telegram_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='Invalid Telegram user payload',
-        )
+async def _ensure_channel_subscription(telegram_id: int) -> None:
+    if not (settings.CHANNEL_IS_REQUIRED_SUB and settings.CHANNEL_SUB_ID):
+        return
 
     try:
-        telegram_id = int(telegram_user['id'])
-    except (TypeError, ValueError):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='Invalid Telegram user identifier',
-        ) from None
-
-    # Check required channel subscription
-    if settings.CHANNEL_IS_REQUIRED_SUB and settings.CHANNEL_SUB_ID:
-        try:
-            bot = _get_channel_check_bot()
-            chat_member = await bot.get_chat_member(chat_id=settings.CHANNEL_SUB_ID, user_id=telegram_id)
-            # Не закрываем сессию - бот переиспользуется
+        bot = _get_channel_check_bot()
+        chat_member = await bot.get_chat_member(chat_id=settings.CHANNEL_SUB_ID, user_id=telegram_id)
+        # Не закрываем сессию - бот переиспользуется
+    except Exception as e:
+        logger.warning('Failed to check channel subscription for user', telegram_id=telegram_id, error=e)
+        # Don't block user if check fails
+        return
 
-            if chat_member.status not in ['member', 'administrator', 'creator']:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail={
-                        'code': 'channel_subscription_required',
-                        'message': 'Please subscribe to our channel to continue',
-                        'channel_link': settings.CHANNEL_LINK,
-                    },
-                )
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.warning('Failed to check channel subscription for user', telegram_id=telegram_id, error=e)
-            # Don't block user if check fails
+    if chat_member.status not in ['member', 'administrator', 'creator']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                'code': 'channel_subscription_required',
+                'message': 'Please subscribe to our channel to continue',
+                'channel_link': settings.CHANNEL_LINK,
+            },
+        )
 
-    user = await get_user_by_telegram_id(db, telegram_id)
-    purchase_url = (settings.MINIAPP_PURCHASE_URL or '').strip()
 
-    if not user:
-        detail: dict[str, Any] = {
-            'code': 'user_not_found',
-            'message': 'User not found. Please register in the bot to continue.',
-            'title': 'Registration required',
-        }
-        if purchase_url:
-            detail['purchase_url'] = purchase_url
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=detail,
+async def _load_transactions_section(user_id: int) -> tuple[list[MiniAppTransaction], int]:
+    async with AsyncSessionLocal() as db:
+        transactions_result = await db.execute(
+            select(Transaction).where(Transaction.user_id == user_id).order_by(Transaction.created_at.desc()).limit(10)
         )
+        transactions = [_serialize_transaction(tx) for tx in transactions_result.scalars().all()]
+        total_spent_kopeks = await get_user_total_spent_kopeks(db, user_id)
+    return transactions, total_spent_kopeks
 
-    subscription = getattr(user, 'subscription', None)
-    usage_synced = False
 
-    if subscription and _is_remnawave_configured():
-        service = SubscriptionService()
-        try:
-            usage_synced = await service.sync_subscription_usage(db, subscription)
-        except Exception as error:  # pragma: no cover - defensive logging
-            logger.warning(
-                'Failed to sync subscription usage for user', getattr=getattr(user, 'id', 'unknown'), error=error
-            )
+async def _load_connected_servers_section(squad_uuids: list[str]) -> list[MiniAppConnectedServer]:
+    if not squad_uuids:
+        return []
+    async with AsyncSessionLocal() as db:
+        return await _resolve_connected_servers(db, squad_uuids)
 
-    if usage_synced:
-        try:
-            await db.refresh(subscription, attribute_names=['traffic_used_gb', 'updated_at'])
-        except Exception as refresh_error:  # pragma: no cover - defensive logging
-            logger.debug('Failed to refresh subscription after usage sync', refresh_error=refresh_error)
 
-        try:
-            await db.refresh(user)
-        except Exception as refresh_error:  # pragma: no cover - defensive logging
-            logger.debug('Failed to refresh user after usage sync', refresh_error=refresh_error)
-            user = await get_user_by_telegram_id(db, telegram_id)
+async def _no_subscription_links() -> dict[str, Any]:
+    return {}
 
-        subscription = getattr(user, 'subscription', subscription)
-    lifetime_used = _bytes_to_gb(getattr(user, 'lifetime_used_traffic_bytes', 0))
 
-    transactions_query = (
-        select(Transaction).where(Transaction.user_id == user.id).order_by(Transaction.created_at.desc()).limit(10)
+async def _get_auto_promo_levels() -> list[MiniAppAutoPromoGroupLevel]:
+    """Auto-assign promo group levels without per-user flags (cached)."""
+    cached = await cache.get_or_load(
+        PROMO_GROUPS_NAMESPACE,
+        'auto_assign_levels',
+        _load_auto_promo_levels,
+        expire=settings.MINIAPP_CONTENT_CACHE_SECONDS,
     )
-    transactions_result = await db.execute(transactions_query)
-    transactions = list(transactions_result.scalars().all())
+    return [MiniAppAutoPromoGroupLevel.model_validate(level) for level in cached or []]
 
-    balance_currency = getattr(user, 'balance_currency', None)
-    if isinstance(balance_currency, str):
-        balance_currency = balance_currency.upper()
 
-    promo_group = getattr(user, 'promo_group', None)
-    total_spent_kopeks = await get_user_total_spent_kopeks(db, user.id)
-    auto_assign_groups = await get_auto_assign_promo_groups(db)
+async def _load_auto_promo_levels() -> list[dict[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        groups = await get_auto_assign_promo_groups(db)
 
-    auto_promo_levels: list[MiniAppAutoPromoGroupLevel] = []
-    for group in auto_assign_groups:
+    levels: list[dict[str, Any]] = []
+    for group in groups:
         threshold = group.auto_assign_total_spent_kopeks or 0
         if threshold <= 0:
             continue
 
-        auto_promo_levels.append(
+        levels.append(
             MiniAppAutoPromoGroupLevel(
                 id=group.id,
                 name=group.name,
                 threshold_kopeks=threshold,
                 threshold_rubles=round(threshold / 100, 2),
                 threshold_label=settings.format_price(threshold),
-                is_reached=total_spent_kopeks >= threshold,
-                is_current=bool(promo_group and promo_group.id == group.id),
                 **_extract_promo_discounts(group),
-            )
+            ).model_dump(mode='json')
         )
+    return levels
 
-    active_discount_percent = 0
-    try:
-        active_discount_percent = int(getattr(user, 'promo_offer_discount_percent', 0) or 0)
-    except (TypeError, ValueError):
-        active_discount_percent = 0
 
-    active_discount_expires_at = getattr(user, 'promo_offer_discount_expires_at', None)
-    now = datetime.now(UTC)
-    if active_discount_expires_at and active_discount_expires_at <= now:
-        active_discount_expires_at = None
-        active_discount_percent = 0
+async def _get_content_sections(
+    language_preference: str,
+) -> tuple[MiniAppFaq | None, MiniAppLegalDocuments | None]:
+    """FAQ and legal documents for a language (cached, invalidated on edits)."""
+    cached = await cache.get_or_load(
+        LEGAL_CONTENT_NAMESPACE,
+        cache_key(MINIAPP_CONTENT_CACHE_KEY, language_preference),
+        lambda: _load_content_sections(language_preference),
+        expire=settings.MINIAPP_CONTENT_CACHE_SECONDS,
+    )
+    faq = cached.get('faq')
+    legal_documents = cached.get('legal_documents')
+    return (
+        MiniAppFaq.model_validate(faq) if faq else None,
+        MiniAppLegalDocuments.model_validate(legal_documents) if legal_documents else None,
+    )
 
-    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
 
-    promo_offer_source = getattr(user, 'promo_offer_discount_source', None)
-    active_offer_contexts: list[ActiveOfferContext] = []
-    if promo_offer_source or active_discount_percent > 0:
-        active_discount_offer = await get_latest_claimed_offer_for_user(
-            db,
-            user.id,
-            promo_offer_source,
-        )
-        if active_discount_offer and active_discount_percent > 0:
-            active_offer_contexts.append(
-                (
-                    active_discount_offer,
-                    active_discount_percent,
-                    active_discount_expires_at,
-                )
-            )
-
-    if subscription:
-        active_offer_contexts.extend(await _find_active_test_access_offers(db, subscription))
+async def _load_content_sections(language_preference: str) -> dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        faq_payload = await _build_faq_payload(db, language_preference)
+        legal_documents_payload = await _build_legal_documents_payload(db, language_preference)
+    return {
+        'faq': faq_payload.model_dump(mode='json') if faq_payload else None,
+        'legal_documents': legal_documents_payload.model_dump(mode='json') if legal_documents_payload else None,
+    }
 
-    promo_offers = await _build_promo_offer_models(
-        db,
-        available_promo_offers,
-        active_offer_contexts,
-        user=user,
-    )
 
-    content_language_preference = user.language or settings.DEFAULT_LANGUAGE or 'ru'
+def _normalize_rules_language(language: str | None) -> str:
+    base_language = language or settings.DEFAULT_LANGUAGE or 'ru'
+    return base_language.split('-')[0].lower()
 
-    def _normalize_language_code(language: str | None) -> str:
-        base_language = language or settings.DEFAULT_LANGUAGE or 'ru'
-        return base_language.split('-')[0].lower()
 
-    faq_payload: MiniAppFaq | None = None
+async def _build_faq_payload(db: AsyncSession, content_language_preference: str) -> MiniAppFaq | None:
     requested_faq_language = FaqService.normalize_language(content_language_preference)
     faq_pages = await FaqService.get_pages(
         db,
@@ -3252,51 +3175,58 @@ async def get_subscription_details(
         include_inactive=False,
         fallback=True,
     )
+    if not faq_pages:
+        return None
 
-    if faq_pages:
-        faq_setting = await FaqService.get_setting(
-            db,
-            requested_faq_language,
-            fallback=True,
-        )
-        is_enabled = bool(faq_setting.is_enabled) if faq_setting else True
+    faq_setting = await FaqService.get_setting(
+        db,
+        requested_faq_language,
+        fallback=True,
+    )
+    is_enabled = bool(faq_setting.is_enabled) if faq_setting else True
+    if not is_enabled:
+        return None
 
-        if is_enabled:
-            ordered_pages = sorted(
-                faq_pages,
-                key=lambda page: (
-                    (page.display_order or 0),
-                    page.id,
-                ),
+    ordered_pages = sorted(
+        faq_pages,
+        key=lambda page: (
+            (page.display_order or 0),
+            page.id,
+        ),
+    )
+    faq_items: list[MiniAppFaqItem] = []
+    for page in ordered_pages:
+        raw_content = (page.content or '').strip()
+        if not raw_content:
+            continue
+        if not re.sub(r'<[^>]+>', '', raw_content).strip():
+            continue
+        faq_items.append(
+            MiniAppFaqItem(
+                id=page.id,
+                title=page.title or None,
+                content=page.content or '',
+                display_order=getattr(page, 'display_order', None),
             )
-            faq_items: list[MiniAppFaqItem] = []
-            for page in ordered_pages:
-                raw_content = (page.content or '').strip()
-                if not raw_content:
-                    continue
-                if not re.sub(r'<[^>]+>', '', raw_content).strip():
-                    continue
-                faq_items.append(
-                    MiniAppFaqItem(
-                        id=page.id,
-                        title=page.title or None,
-                        content=page.content or '',
-                        display_order=getattr(page, 'display_order', None),
-                    )
-                )
+        )
 
-            if faq_items:
-                resolved_language = (
-                    faq_setting.language if faq_setting and faq_setting.language else ordered_pages[0].language
-                )
-                faq_payload = MiniAppFaq(
-                    requested_language=requested_faq_language,
-                    language=resolved_language or requested_faq_language,
-                    is_enabled=is_enabled,
-                    total=len(faq_items),
-                    items=faq_items,
-                )
+    if not faq_items:
+        return None
+
+    resolved_language = faq_setting.language if faq_setting and faq_setting.language else ordered_pages[0].language
+    return MiniAppFaq(
+        requested_language=requested_faq_language,
+        language=resolved_language or requested_faq_language,
+        is_enabled=is_enabled,
+        total=len(faq_items),
+        items=faq_items,
+    )
 
+
+async def _build_legal_documents_payload(
+    db: AsyncSession,
+    content_language_preference: str,
+) -> MiniAppLegalDocuments | None:
     legal_documents_payload: MiniAppLegalDocuments | None = None
 
     requested_offer_language = PublicOfferService.normalize_language(content_language_preference)
@@ -3333,8 +3263,8 @@ async def get_subscription_details(
             updated_at=privacy_policy.updated_at,
         )
 
-    requested_rules_language = _normalize_language_code(content_language_preference)
-    default_rules_language = _normalize_language_code(settings.DEFAULT_LANGUAGE)
+    requested_rules_language = _normalize_rules_language(content_language_preference)
+    default_rules_language = _normalize_rules_language(settings.DEFAULT_LANGUAGE)
     service_rules = await get_rules_by_language(db, requested_rules_language)
     if not service_rules and requested_rules_language != default_rules_language:
         service_rules = await get_rules_by_language(db, default_rules_language)
@@ -3351,15 +3281,257 @@ async def get_subscription_details(
             updated_at=getattr(service_rules, 'updated_at', None),
         )
 
-    links_payload: dict[str, Any] = {}
-    connected_squads: list[str] = []
-    connected_servers: list[MiniAppConnectedServer] = []
-    links: list[str] = []
-    ss_conf_links: dict[str, str] = {}
+    return legal_documents_payload
+
+
+@dataclass(slots=True)
+class _AccountSections:
+    """User-specific parts of the subscription screen loaded on the request session."""
+
+    promo_offers: list[MiniAppPromoOffer]
+    active_discount_percent: int
+    active_discount_expires_at: datetime | None
+    promo_offer_source: str | None
+    referral_info: MiniAppReferralInfo | None
+    traffic_purchases: list[dict[str, Any]]
+    current_tariff: MiniAppCurrentTariff | None
+    is_daily_tariff: bool = False
+    is_daily_paused: bool = False
+    daily_tariff_name: str | None = None
+    daily_price_kopeks: int | None = None
+    daily_price_label: str | None = None
+    daily_next_charge_at: datetime | None = None
+
+
+async def _load_account_sections(
+    db: AsyncSession,
+    user: User,
+    subscription: Subscription | None,
+) -> _AccountSections:
+    active_discount_percent = 0
+    try:
+        active_discount_percent = int(getattr(user, 'promo_offer_discount_percent', 0) or 0)
+    except (TypeError, ValueError):
+        active_discount_percent = 0
+
+    active_discount_expires_at = getattr(user, 'promo_offer_discount_expires_at', None)
+    now = datetime.now(UTC)
+    if active_discount_expires_at and active_discount_expires_at <= now:
+        active_discount_expires_at = None
+        active_discount_percent = 0
+
+    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
+
+    promo_offer_source = getattr(user, 'promo_offer_discount_source', None)
+    active_offer_contexts: list[ActiveOfferContext] = []
+    if promo_offer_source or active_discount_percent > 0:
+        active_discount_offer = await get_latest_claimed_offer_for_user(
+            db,
+            user.id,
+            promo_offer_source,
+        )
+        if active_discount_offer and active_discount_percent > 0:
+            active_offer_contexts.append(
+                (
+                    active_discount_offer,
+                    active_discount_percent,
+                    active_discount_expires_at,
+                )
+            )
+
+    if subscription:
+        active_offer_contexts.extend(await _find_active_test_access_offers(db, subscription))
+
+    promo_offers = await _build_promo_offer_models(
+        db,
+        available_promo_offers,
+        active_offer_contexts,
+        user=user,
+    )
+
+    sections = _AccountSections(
+        promo_offers=promo_offers,
+        active_discount_percent=active_discount_percent,
+        active_discount_expires_at=active_discount_expires_at,
+        promo_offer_source=promo_offer_source,
+        referral_info=None,
+        traffic_purchases=[],
+        current_tariff=None,
+    )
+
+    # Загружаем данные суточного тарифа
+    if subscription and getattr(subscription, 'tariff_id', None):
+        tariff = await get_tariff_by_id(db, subscription.tariff_id)
+        if tariff and getattr(tariff, 'is_daily', False):
+            sections.is_daily_tariff = True
+            sections.is_daily_paused = getattr(subscription, 'is_daily_paused', False)
+            sections.daily_tariff_name = tariff.name
+            daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
+            sections.daily_price_kopeks = daily_price_kopeks
+            sections.daily_price_label = (
+                settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
+            )
+            # Оставшееся время подписки (показываем даже при паузе)
+            if subscription.end_date:
+                sections.daily_next_charge_at = subscription.end_date
+
+    sections.referral_info = await _build_referral_info(db, user)
+
+    # Получаем докупки трафика
+    if subscription:
+        sections.traffic_purchases = await _load_traffic_purchases(db, subscription)
+        sections.current_tariff = await _get_current_tariff_model(db, subscription, user)
+
+    return sections
+
+
+async def _load_traffic_purchases(db: AsyncSession, subscription: Subscription) -> list[dict[str, Any]]:
+    from app.database.models import TrafficPurchase
+
+    now = datetime.now(UTC)
+    purchases_query = (
+        select(TrafficPurchase)
+        .where(TrafficPurchase.subscription_id == subscription.id)
+        .where(TrafficPurchase.expires_at > now)
+        .order_by(TrafficPurchase.expires_at.asc())
+    )
+    purchases_result = await db.execute(purchases_query)
+    purchases = purchases_result.scalars().all()
+
+    traffic_purchases_data = []
+    for purchase in purchases:
+        time_remaining = purchase.expires_at - now
+        days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
+        total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
+        elapsed_seconds = (now - purchase.created_at).total_seconds()
+        progress_percent = min(
+            100.0, max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0)
+        )
+
+        traffic_purchases_data.append(
+            {
+                'id': purchase.id,
+                'traffic_gb': purchase.traffic_gb,
+                'expires_at': purchase.expires_at,
+                'created_at': purchase.created_at,
+                'days_remaining': days_remaining,
+                'progress_percent': round(progress_percent, 1),
+            }
+        )
+    return traffic_purchases_data
+
+
+@router.post('/subscription', response_model=MiniAppSubscriptionResponse)
+async def get_subscription_details(
+    payload: MiniAppSubscriptionRequest,
+    db: AsyncSession = Depends(get_db_session),
+) -> MiniAppSubscriptionResponse:
+    # Check maintenance mode first
+    if maintenance_service.is_maintenance_active():
+        status_info = maintenance_service.get_status_info()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                'code': 'maintenance',
+                'message': maintenance_service.get_maintenance_message() or 'Service is under maintenance',
+                'reason': status_info.get('reason'),
+            },
+        )
+
+    try:
+        webapp_data = parse_webapp_init_data(payload.init_data, settings.BOT_TOKEN)
+    except TelegramWebAppAuthError as error:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(error),
+        ) from error
+
+    telegram_user = webapp_data.get('user')
+    if not isinstance(telegram_user, dict) or 'id' not in telegram_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid Telegram user payload',
+        )
+
+    try:
+        telegram_id = int(telegram_user['id'])
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid Telegram user identifier',
+        ) from None
+
+    timings = SectionTimings('Mini app subscription sections')
+
+    # Check required channel subscription while the user is being loaded
+    _, user = await gather_sections(
+        timings.run('channel_check', _ensure_channel_subscription(telegram_id)),
+        timings.run('user', get_user_by_telegram_id(db, telegram_id)),
+    )
+    purchase_url = (settings.MINIAPP_PURCHASE_URL or '').strip()
+
+    if not user:
+        detail: dict[str, Any] = {
+            'code': 'user_not_found',
+            'message': 'User not found. Please register in the bot to continue.',
+            'title': 'Registration required',
+        }
+        if purchase_url:
+            detail['purchase_url'] = purchase_url
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=detail,
+        )
+
+    subscription = getattr(user, 'subscription', None)
+
+    # Usage is shown from the database; RemnaWave is polled in the background
+    if subscription and _is_remnawave_configured():
+        subscription_usage_refresher.schedule(subscription.id)
+
+    lifetime_used = _bytes_to_gb(getattr(user, 'lifetime_used_traffic_bytes', 0))
+    content_language_preference = user.language or settings.DEFAULT_LANGUAGE or 'ru'
+    connected_squads: list[str] = list(subscription.connected_squads or []) if subscription else []
+
+    (
+        (transactions, total_spent_kopeks),
+        auto_promo_levels_cached,
+        (faq_payload, legal_documents_payload),
+        links_payload,
+        connected_servers,
+        (devices_count, devices),
+        account,
+    ) = await gather_sections(
+        timings.run('transactions', _load_transactions_section(user.id)),
+        timings.run('promo_groups', _get_auto_promo_levels()),
+        timings.run('content', _get_content_sections(content_language_preference)),
+        timings.run('links', _load_subscription_links(subscription) if subscription else _no_subscription_links()),
+        timings.run('servers', _load_connected_servers_section(connected_squads)),
+        timings.run('devices', _load_devices_info(user)),
+        timings.run('account', _load_account_sections(db, user, subscription)),
+    )
+
+    balance_currency = getattr(user, 'balance_currency', None)
+    if isinstance(balance_currency, str):
+        balance_currency = balance_currency.upper()
+
+    promo_group = getattr(user, 'promo_group', None)
+    auto_promo_levels = [
+        level.model_copy(
+            update={
+                'is_reached': total_spent_kopeks >= level.threshold_kopeks,
+                'is_current': bool(promo_group and promo_group.id == level.id),
+            }
+        )
+        for level in auto_promo_levels_cached
+    ]
+
+    hide_subscription_link: bool = False
     subscription_url: str | None = None
     subscription_crypto_link: str | None = None
     happ_redirect_link: str | None = None
-    hide_subscription_link: bool = False
+    links: list[str] = []
+    ss_conf_links: dict[str, str] = {}
     remnawave_short_uuid: str | None = None
     status_actual = 'missing'
     subscription_status_value = 'none'
@@ -3373,14 +3545,11 @@ async def get_subscription_details(
         traffic_limit_value = subscription.traffic_limit_gb or 0
         status_actual = subscription.actual_status
         subscription_status_value = subscription.status
-        links_payload = await _load_subscription_links(subscription)
         # Флаг скрытия ссылки (скрывается только текст, кнопки работают)
         hide_subscription_link = settings.should_hide_subscription_link()
         subscription_url = links_payload.get('subscription_url') or subscription.subscription_url
         subscription_crypto_link = links_payload.get('happ_crypto_link') or subscription.subscription_crypto_link
         happ_redirect_link = get_happ_cryptolink_redirect_link(subscription_crypto_link)
-        connected_squads = list(subscription.connected_squads or [])
-        connected_servers = await _resolve_connected_servers(db, connected_squads)
         links = links_payload.get('links') or connected_squads
         ss_conf_links = links_payload.get('ss_conf_links') or {}
         remnawave_short_uuid = subscription.remnawave_short_uuid
@@ -3397,28 +3566,6 @@ async def get_subscription_details(
         autopay_payload,
     )
 
-    devices_count, devices = await _load_devices_info(user)
-
-    # Загружаем данные суточного тарифа
-    is_daily_tariff = False
-    is_daily_paused = False
-    daily_tariff_name = None
-    daily_price_kopeks = None
-    daily_price_label = None
-    daily_next_charge_at = None
-
-    if subscription and getattr(subscription, 'tariff_id', None):
-        tariff = await get_tariff_by_id(db, subscription.tariff_id)
-        if tariff and getattr(tariff, 'is_daily', False):
-            is_daily_tariff = True
-            is_daily_paused = getattr(subscription, 'is_daily_paused', False)
-            daily_tariff_name = tariff.name
-            daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
-            daily_price_label = settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
-            # Оставшееся время подписки (показываем даже при паузе)
-            if subscription.end_date:
-                daily_next_charge_at = subscription.end_date
-
     response_user = MiniAppSubscriptionUser(
         telegram_id=user.telegram_id,
         username=user.username,
@@ -3445,19 +3592,17 @@ async def get_subscription_details(
         traffic_limit_label=_format_limit_label(traffic_limit_value),
         lifetime_used_traffic_gb=lifetime_used,
         has_active_subscription=status_actual in {'active', 'trial'},
-        promo_offer_discount_percent=active_discount_percent,
-        promo_offer_discount_expires_at=active_discount_expires_at,
-        promo_offer_discount_source=promo_offer_source,
-        is_daily_tariff=is_daily_tariff,
-        is_daily_paused=is_daily_paused,
-        daily_tariff_name=daily_tariff_name,
-        daily_price_kopeks=daily_price_kopeks,
-        daily_price_label=daily_price_label,
-        daily_next_charge_at=daily_next_charge_at,
+        promo_offer_discount_percent=account.active_discount_percent,
+        promo_offer_discount_expires_at=account.active_discount_expires_at,
+        promo_offer_discount_source=account.promo_offer_source,
+        is_daily_tariff=account.is_daily_tariff,
+        is_daily_paused=account.is_daily_paused,
+        daily_tariff_name=account.daily_tariff_name,
+        daily_price_kopeks=account.daily_price_kopeks,
+        daily_price_label=account.daily_price_label,
+        daily_next_charge_at=account.daily_next_charge_at,
     )
 
-    referral_info = await _build_referral_info(db, user)
-
     trial_available = _is_trial_available_for_user(user)
     trial_duration_days = settings.TRIAL_DURATION_DAYS if settings.TRIAL_DURATION_DAYS > 0 else None
     trial_price_kopeks = settings.get_trial_activation_price()
@@ -3471,45 +3616,10 @@ async def get_subscription_details(
         else:
             subscription_missing_reason = 'not_found'
 
-    # Получаем докупки трафика
-    traffic_purchases_data = []
-    if subscription:
-        from sqlalchemy import select as sql_select
-
-        from app.database.models import TrafficPurchase
-
-        now = datetime.now(UTC)
-        purchases_query = (
-            sql_select(TrafficPurchase)
-            .where(TrafficPurchase.subscription_id == subscription.id)
-            .where(TrafficPurchase.expires_at > now)
-            .order_by(TrafficPurchase.expires_at.asc())
-        )
-        purchases_result = await db.execute(purchases_query)
-        purchases = purchases_result.scalars().all()
-
-        for purchase in purchases:
-            time_remaining = purchase.expires_at - now
-            days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
-            total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
-            elapsed_seconds = (now - purchase.created_at).total_seconds()
-            progress_percent = min(
-                100.0, max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0)
-            )
-
-            traffic_purchases_data.append(
-                {
-                    'id': purchase.id,
-                    'traffic_gb': purchase.traffic_gb,
-                    'expires_at': purchase.expires_at,
-                    'created_at': purchase.created_at,
-                    'days_remaining': days_remaining,
-                    'progress_percent': round(progress_percent, 1),
-                }
-            )
+    timings.log(telegram_id=telegram_id)
 
     return MiniAppSubscriptionResponse(
-        traffic_purchases=traffic_purchases_data,
+        traffic_purchases=account.traffic_purchases,
         subscription_id=getattr(subscription, 'id', None),
         remnawave_short_uuid=remnawave_short_uuid,
         user=response_user,
@@ -3531,8 +3641,8 @@ async def get_subscription_details(
         balance_kopeks=user.balance_kopeks,
         balance_rubles=round(user.balance_rubles, 2),
         balance_currency=balance_currency,
-        transactions=[_serialize_transaction(tx) for tx in transactions],
-        promo_offers=promo_offers,
+        transactions=transactions,
+        promo_offers=account.promo_offers,
         promo_group=(
             MiniAppPromoGroup(
                 id=promo_group.id,
@@ -3555,7 +3665,7 @@ async def get_subscription_details(
         branding=settings.get_miniapp_branding(),
         faq=faq_payload,
         legal_documents=legal_documents_payload,
-        referral=referral_info,
+        referral=account.referral_info,
         subscription_missing=subscription is None,
         subscription_missing_reason=subscription_missing_reason,
         trial_available=trial_available,
@@ -3565,7 +3675,7 @@ async def get_subscription_details(
         trial_price_kopeks=trial_price_kopeks if trial_payment_required else None,
         trial_price_label=trial_price_label,
         sales_mode=settings.get_sales_mode(),
-        current_tariff=await _get_current_tariff_model(db, subscription, user) if subscription else None,
+        current_tariff=account.current_tariff,
         **autopay_extras,
     )
 
@@ -6266,7 +6376,7 @@ def _format_traffic_limit_label(traffic_gb: int) -> str:
 
 
 async def _build_tariff_model(
-    db: AsyncSession,
+    catalog: PricingCatalogSnapshot,
     tariff,
     current_tariff_id: int | None = None,
     promo_group=None,
@@ -6281,54 +6391,28 @@ async def _build_tariff_model(
     if tariff.allowed_squads:
         servers_count = len(tariff.allowed_squads)
         for squad_uuid in tariff.allowed_squads[:5]:  # Ограничиваем для превью
-            server = await get_server_squad_by_uuid(db, squad_uuid)
-            if server:
-                servers.append(
-                    MiniAppConnectedServer(
-                        uuid=squad_uuid,
-                        name=server.display_name or squad_uuid[:8],
-                    )
-                )
-
-    # Получаем скидки промогруппы по периодам
-    period_discounts = {}
-    if promo_group:
-        raw_discounts = getattr(promo_group, 'period_discounts', None) or {}
-        for k, v in raw_discounts.items():
-            try:
-                period_discounts[int(k)] = max(0, min(100, int(v)))
-            except (TypeError, ValueError):
-                pass
+            server_name = catalog.server_name(squad_uuid)
+            if server_name:
+                servers.append(MiniAppConnectedServer(uuid=squad_uuid, name=server_name))
 
+    # Цены периодов со скидкой промогруппы рассчитаны в каталоге заранее
     periods: list[MiniAppTariffPeriod] = []
-    if tariff.period_prices:
-        for period_str, original_price_kopeks in sorted(tariff.period_prices.items(), key=lambda x: int(x[0])):
-            period_days = int(period_str)
-
-            # Применяем скидку промогруппы
-            discount_percent = period_discounts.get(period_days, 0)
-            if discount_percent > 0:
-                price_kopeks = int(original_price_kopeks * (100 - discount_percent) / 100)
-            else:
-                price_kopeks = original_price_kopeks
-
-            months = max(1, period_days // 30)
-            per_month = price_kopeks // months if months > 0 else price_kopeks
-
-            periods.append(
-                MiniAppTariffPeriod(
-                    days=period_days,
-                    months=months,
-                    label=format_period_description(period_days),
-                    price_kopeks=price_kopeks,
-                    price_label=settings.format_price(price_kopeks),
-                    price_per_month_kopeks=per_month,
-                    price_per_month_label=settings.format_price(per_month),
-                    original_price_kopeks=original_price_kopeks if discount_percent > 0 else None,
-                    original_price_label=settings.format_price(original_price_kopeks) if discount_percent > 0 else None,
-                    discount_percent=discount_percent,
-                )
+    for period in catalog.period_prices(tariff.id, promo_group.id if promo_group else None):
+        has_discount = period.discount_percent > 0
+        periods.append(
+            MiniAppTariffPeriod(
+                days=period.days,
+                months=period.months,
+                label=format_period_description(period.days),
+                price_kopeks=period.price_kopeks,
+                price_label=settings.format_price(period.price_kopeks),
+                price_per_month_kopeks=period.price_per_month_kopeks,
+                price_per_month_label=settings.format_price(period.price_per_month_kopeks),
+                original_price_kopeks=period.original_price_kopeks if has_discount else None,
+                original_price_label=settings.format_price(period.original_price_kopeks) if has_discount else None,
+                discount_percent=period.discount_percent,
             )
+        )
 
     # Расчёт стоимости переключения тарифа (если есть текущий тариф и это не он же)
     switch_cost_kopeks = None
@@ -6457,8 +6541,9 @@ async def get_tariffs_endpoint(
     )
     promo_group_id = promo_group.id if promo_group else None
 
-    # Получаем тарифы, доступные пользователю
-    tariffs = await get_tariffs_for_user(db, promo_group_id)
+    # Тарифы, доступные пользователю, берутся из каталога цен в памяти
+    catalog = await pricing_catalog.get(db)
+    tariffs = catalog.tariffs_for_promo_group(promo_group_id)
 
     # Текущий тариф пользователя
     subscription = getattr(user, 'subscription', None)
@@ -6473,7 +6558,7 @@ async def get_tariffs_endpoint(
         remaining_days = max(0, delta.days)
 
     if current_tariff_id:
-        current_tariff = await get_tariff_by_id(db, current_tariff_id)
+        current_tariff = catalog.get_tariff(current_tariff_id)
         if current_tariff:
             current_tariff_model = await _build_current_tariff_model(db, current_tariff, promo_group)
 
@@ -6481,7 +6566,7 @@ async def get_tariffs_endpoint(
     tariff_models: list[MiniAppTariff] = []
     for tariff in tariffs:
         model = await _build_tariff_model(
-            db,
+            catalog,
             tariff,
             current_tariff_id,
             promo_group,
@@ -24,6 +24,7 @@ from app.database.crud.rules import (
     restore_rules_version,
 )
 from app.database.models import ServiceRule
+from app.localization.texts import broadcast_rules_changed, clear_rules_cache
 from app.services.faq_service import FaqService
 from app.services.privacy_policy_service import PrivacyPolicyService
 from app.services.public_offer_service import PublicOfferService
@@ -457,6 +458,8 @@ async def update_service_rules(
         language=lang,
         title=title,
     )
+    clear_rules_cache()
+    await broadcast_rules_changed(lang)
 
     return _serialize_rules(rules)
 
@@ -469,6 +472,8 @@ async def clear_service_rules(
 ) -> Response:
     lang = language.split('-')[0].lower()
     await clear_all_rules(db, lang)
+    clear_rules_cache()
+    await broadcast_rules_changed(lang)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -504,4 +509,6 @@ async def restore_service_rules_version(
     restored = await restore_rules_version(db, rule_id, language=lang)
     if not restored:
         raise HTTPException(status.HTTP_404_NOT_FOUND, 'Rules version not found')
+    clear_rules_cache()
+    await broadcast_rules_changed(lang)
     return _serialize_rules(restored)
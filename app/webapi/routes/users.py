@@ -17,6 +17,7 @@ from app.database.crud.subscription import (
     replace_subscription,
 )
 from app.database.crud.user import (
+    USERS_KEYSET_ORDER,
     add_user_balance,
     create_user,
     get_user_by_id,
@@ -26,6 +27,7 @@ from app.database.crud.user import (
 )
 from app.database.models import PromoGroup, Subscription, User, UserStatus
 from app.services.subscription_service import SubscriptionService
+from app.utils.pagination import InvalidCursorError, paginate_keyset
 
 from ..dependencies import get_db_session, require_api_token
 from ..schemas.users import (
@@ -129,6 +131,7 @@ async def list_users(
     status_filter: UserStatus | None = Query(default=None, alias='status'),
     promo_group_id: int | None = Query(default=None),
     search: str | None = Query(default=None),
+    cursor: str | None = Query(default=None, max_length=512),
 ) -> UserListResponse:
     base_query = select(User).options(
         selectinload(User.subscription),
@@ -147,6 +150,22 @@ async def list_users(
     total_query = base_query.with_only_columns(func.count()).order_by(None)
     total = await db.scalar(total_query) or 0
 
+    # Первая страница и переход по курсору — keyset без OFFSET; явный offset поддерживается для совместимости
+    if cursor or offset == 0:
+        try:
+            page = await paginate_keyset(db, base_query, USERS_KEYSET_ORDER, limit=limit, cursor=cursor)
+        except InvalidCursorError as error:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, 'Invalid cursor') from error
+
+        return UserListResponse(
+            items=[_serialize_user(user) for user in page.items],
+            total=int(total),
+            limit=limit,
+            offset=0,
+            next_cursor=page.next_cursor,
+            prev_cursor=page.prev_cursor,
+        )
+
     result = await db.execute(base_query.order_by(User.created_at.desc()).offset(offset).limit(limit))
     users = result.scalars().unique().all()
 
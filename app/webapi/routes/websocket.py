@@ -78,17 +78,19 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error('WebSocket: Failed to accept connection from', client_host=client_host, e=e)
         return
 
-    # Регистрируем подключение
-    event_emitter.register_websocket(websocket)
+    # Регистрируем подключение; дальше все исходящие сообщения идут через очередь
+    outbox = event_emitter.register_websocket(websocket)
 
     try:
         # Отправляем приветственное сообщение
-        await websocket.send_json(
-            {
-                'type': 'connection',
-                'status': 'connected',
-                'message': 'WebSocket connection established',
-            }
+        outbox.offer(
+            json.dumps(
+                {
+                    'type': 'connection',
+                    'status': 'connected',
+                    'message': 'WebSocket connection established',
+                }
+            )
         )
 
         # Обрабатываем входящие сообщения (ping/pong для keepalive)
@@ -99,7 +101,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
                 # Обработка ping
                 if message.get('type') == 'ping':
-                    await websocket.send_json({'type': 'pong'})
+                    outbox.offer(json.dumps({'type': 'pong'}))
                 # Можно добавить другие типы сообщений (подписки на конкретные события и т.д.)
 
             except json.JSONDecodeError:
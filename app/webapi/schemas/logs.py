@@ -76,7 +76,11 @@ class SystemLogPreviewResponse(BaseModel):
         description='Дата и время последнего изменения лог-файла',
     )
     size_bytes: int = Field(..., ge=0, description='Размер лог-файла в байтах')
-    size_chars: int = Field(..., ge=0, description='Количество символов в лог-файле')
+    size_chars: int = Field(
+        ...,
+        ge=0,
+        description='Количество символов в лог-файле; для усеченного предпросмотра — оценка по размеру в байтах',
+    )
     preview: str = Field(
         default='',
         description='Фрагмент содержимого лог-файла, возвращаемый для предпросмотра',
@@ -98,3 +102,26 @@ class SystemLogFullResponse(BaseModel):
     size_bytes: int
     size_chars: int
     content: str
+    truncated: bool = False
+
+
+class SystemLogLineEntry(BaseModel):
+    """Запись системного лога вместе со строками-продолжениями."""
+
+    offset: int = Field(..., ge=0, description='Байтовое смещение начала записи в файле')
+    level: str | None = Field(default=None, description='Уровень записи, если он указан в строке')
+    text: str
+
+
+class SystemLogPageResponse(BaseModel):
+    """Страница записей системного лога в хронологическом порядке."""
+
+    items: list[SystemLogLineEntry] = Field(default_factory=list)
+    next_cursor: int | None = Field(
+        default=None,
+        description='Значение параметра before для загрузки более ранних записей',
+    )
+    has_more: bool = False
+    scanned_bytes: int = Field(0, ge=0, description='Сколько байт файла просмотрено для страницы')
+    size_bytes: int = Field(0, ge=0)
+    updated_at: datetime | None = None
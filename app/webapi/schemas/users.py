@@ -57,6 +57,8 @@ class UserListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
 class UserCreateRequest(BaseModel):
@@ -20,6 +20,7 @@ from app.external.tribute import TributeService as TributeAPI
 from app.external.wata_webhook import WataWebhookHandler
 from app.services.pal24_service import Pal24Service
 from app.services.payment_service import PaymentService
+from app.services.payment_webhook_inbox_service import build_webhook_event_key, payment_webhook_inbox_service
 from app.services.tribute_service import TributeService
 
 
@@ -149,6 +150,31 @@ async def _process_payment_service_callback(
             pass
 
 
+async def _handle_payment_callback(
+    payment_service: PaymentService,
+    payload: dict,
+    method_name: str,
+    *,
+    provider: str,
+    event_key: str,
+) -> bool:
+    """Поставить проверенный webhook в очередь или, если очередь не работает, обработать сразу."""
+    if payment_webhook_inbox_service.accepts_events():
+        await payment_webhook_inbox_service.enqueue(provider, method_name, payload, event_key)
+        return True
+    return await _process_payment_service_callback(payment_service, payload, method_name)
+
+
+def _yookassa_event_id(event_type: str, webhook_data: dict) -> str | None:
+    payment_id = (webhook_data.get('object') or {}).get('id')
+    return f'{event_type}:{payment_id}' if payment_id else None
+
+
+def _cloudpayments_event_id(kind: str, webhook_data: dict) -> str | None:
+    transaction_id = webhook_data.get('transaction_id')
+    return f'{kind}:{transaction_id}' if transaction_id else None
+
+
 async def _parse_pal24_payload(request: Request) -> dict[str, str]:
     try:
         if request.headers.get('content-type', '').startswith('application/json'):
@@ -266,10 +292,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     payload,
                     'process_mulenpay_callback',
+                    provider='mulenpay',
+                    event_key=build_webhook_event_key(payload, payload.get('uuid') or payload.get('id')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -329,10 +357,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     payload,
                     'process_cryptobot_webhook',
+                    provider='cryptobot',
+                    event_key=build_webhook_event_key(payload, event_id=payload.get('update_id')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -445,10 +475,15 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 return JSONResponse({'status': 'ok', 'ignored': event_type})
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     webhook_data,
                     'process_yookassa_webhook',
+                    provider='yookassa',
+                    event_key=build_webhook_event_key(
+                        webhook_data,
+                        event_id=_yookassa_event_id(event_type, webhook_data),
+                    ),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -516,10 +551,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     payload,
                     'process_wata_webhook',
+                    provider='wata',
+                    event_key=build_webhook_event_key(payload, payload.get('orderId') or payload.get('order_id')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -580,10 +617,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     payload,
                     'process_heleket_webhook',
+                    provider='heleket',
+                    event_key=build_webhook_event_key(payload, payload.get('uuid')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -651,10 +690,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     parsed_payload,
                     'process_pal24_callback',
+                    provider='pal24',
+                    event_key=build_webhook_event_key(parsed_payload, parsed_payload.get('InvId')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -705,10 +746,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 )
 
             try:
-                success = await _process_payment_service_callback(
+                success = await _handle_payment_callback(
                     payment_service,
                     payload,
                     'process_platega_webhook',
+                    provider='platega',
+                    event_key=build_webhook_event_key(payload, payload.get('id')),
                 )
                 if success:
                     return JSONResponse({'status': 'ok'})
@@ -816,10 +859,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 return JSONResponse({'code': 0})  # Возвращаем 0, чтобы не было повторов
 
             # Обрабатываем платёж
-            await _process_payment_service_callback(
+            await _handle_payment_callback(
                 payment_service,
                 webhook_data,
                 'process_cloudpayments_pay_webhook',
+                provider='cloudpayments',
+                event_key=build_webhook_event_key(webhook_data, event_id=_cloudpayments_event_id('pay', webhook_data)),
             )
 
             return JSONResponse({'code': 0})
@@ -848,10 +893,12 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 return JSONResponse({'code': 0})
 
             # Обрабатываем неуспешный платёж
-            await _process_payment_service_callback(
+            await _handle_payment_callback(
                 payment_service,
                 webhook_data,
                 'process_cloudpayments_fail_webhook',
+                provider='cloudpayments',
+                event_key=build_webhook_event_key(webhook_data, event_id=_cloudpayments_event_id('fail', webhook_data)),
             )
 
             return JSONResponse({'code': 0})
@@ -900,10 +947,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
 
                 if status_value in ('Declined', 'Cancelled'):
                     # Неуспешная оплата (Fail notification)
-                    await _process_payment_service_callback(
+                    await _handle_payment_callback(
                         payment_service,
                         webhook_data,
                         'process_cloudpayments_fail_webhook',
+                        provider='cloudpayments',
+                        event_key=build_webhook_event_key(
+                            webhook_data, event_id=_cloudpayments_event_id('fail', webhook_data)
+                        ),
                     )
                 elif status_value in ('Completed', 'Authorized') and is_pay_notification:
                     # Успешная оплата (Pay notification) - есть Reason или AuthCode
@@ -913,10 +964,14 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                         reason=reason,
                         auth_code=auth_code,
                     )
-                    await _process_payment_service_callback(
+                    await _handle_payment_callback(
                         payment_service,
                         webhook_data,
                         'process_cloudpayments_pay_webhook',
+                        provider='cloudpayments',
+                        event_key=build_webhook_event_key(
+                            webhook_data, event_id=_cloudpayments_event_id('pay', webhook_data)
+                        ),
                     )
                 else:
                     # Check notification или другой тип - просто разрешаем (code=0)
@@ -999,6 +1054,36 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 logger.warning('Freekassa webhook: неверный формат параметров')
                 return Response('Invalid parameters format', status_code=status.HTTP_400_BAD_REQUEST)
 
+            if payment_webhook_inbox_service.accepts_events():
+                from app.services.freekassa_service import freekassa_service
+
+                if not freekassa_service.verify_webhook_ip(client_ip):
+                    logger.warning('Freekassa webhook: недоверенный IP', client_ip=client_ip)
+                    return Response('Error', status_code=status.HTTP_400_BAD_REQUEST)
+                if not freekassa_service.verify_webhook_signature(merchant_id_int, amount_float, order_id, sign):
+                    logger.warning('Freekassa webhook: неверная подпись для order_id', order_id=order_id)
+                    return Response('Error', status_code=status.HTTP_400_BAD_REQUEST)
+
+                try:
+                    await payment_webhook_inbox_service.enqueue(
+                        'freekassa',
+                        'process_freekassa_webhook',
+                        {
+                            'merchant_id': merchant_id_int,
+                            'amount': amount_float,
+                            'order_id': order_id,
+                            'sign': sign,
+                            'intid': intid,
+                            'cur_id': cur_id_int,
+                            'client_ip': client_ip,
+                        },
+                        event_key=str(intid),
+                    )
+                except Exception as e:
+                    logger.exception('Freekassa webhook enqueue error', e=e)
+                    return Response('Error', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                return Response('YES', status_code=status.HTTP_200_OK)
+
             # Обрабатываем callback
             db_generator = get_db()
             try:
@@ -1075,6 +1160,32 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                 logger.error('KassaAI webhook: некорректные параметры', e=e)
                 return Response('Invalid parameters', status_code=status.HTTP_400_BAD_REQUEST)
 
+            if payment_webhook_inbox_service.accepts_events():
+                from app.services.kassa_ai_service import kassa_ai_service
+
+                if not kassa_ai_service.verify_webhook_signature(merchant_id_int, amount_float, order_id, sign):
+                    logger.warning('KassaAI webhook: неверная подпись для order_id', order_id=order_id)
+                    return Response('Error', status_code=status.HTTP_400_BAD_REQUEST)
+
+                try:
+                    await payment_webhook_inbox_service.enqueue(
+                        'kassa_ai',
+                        'process_kassa_ai_webhook',
+                        {
+                            'merchant_id': merchant_id_int,
+                            'amount': amount_float,
+                            'order_id': order_id,
+                            'sign': sign,
+                            'intid': intid,
+                            'cur_id': cur_id_int,
+                        },
+                        event_key=str(intid),
+                    )
+                except Exception as e:
+                    logger.exception('KassaAI webhook enqueue error', e=e)
+                    return Response('Error', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                return Response('YES', status_code=status.HTTP_200_OK)
+
             # Обрабатываем webhook
             db_generator = get_db()
             try:
@@ -1126,6 +1237,8 @@ def create_payment_router(bot: Bot, payment_service: PaymentService) -> APIRoute
                     'cloudpayments_enabled': settings.is_cloudpayments_enabled(),
                     'freekassa_enabled': settings.is_freekassa_enabled(),
                     'kassa_ai_enabled': settings.is_kassa_ai_enabled(),
+                    'inbox_enabled': payment_webhook_inbox_service.is_enabled(),
+                    'inbox_running': payment_webhook_inbox_service.is_running(),
                 }
             )
 
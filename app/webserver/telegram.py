@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any
+import math
+import time
+from typing import Any, Protocol
 
 import structlog
 from aiogram import Bot, Dispatcher
@@ -27,8 +29,111 @@ class TelegramWebhookOverloadedError(TelegramWebhookProcessorError):
     """Очередь переполнена и не успевает обрабатывать новые обновления."""
 
 
+class TelegramUpdateIngress(Protocol):
+    """Приёмник обновлений webhook: очередь в памяти или поток Redis."""
+
+    @property
+    def is_running(self) -> bool: ...
+
+    async def enqueue(self, update: Update) -> None: ...
+
+    def get_metrics(self) -> dict[str, Any]: ...
+
+
+async def collect_ingress_metrics(processor: TelegramUpdateIngress | None) -> dict[str, Any] | None:
+    """Метрики приёмника для health-эндпоинтов.
+
+    Поток Redis отдаёт длину потоков и число неподтверждённых записей только
+    асинхронно (``get_metrics_async``), очередь в памяти — синхронно.
+    """
+    if processor is None:
+        return None
+    get_metrics_async = getattr(processor, 'get_metrics_async', None)
+    if get_metrics_async is not None:
+        return await get_metrics_async()
+    return processor.get_metrics()
+
+
+def resolve_update_shard_key(update: Update) -> int:
+    """Ключ шардирования: пользователь, иначе чат, иначе update_id.
+
+    Обновления с одинаковым ключом обрабатываются строго по очереди.
+    """
+    event = None
+    try:
+        event = update.event
+    except Exception:  # pragma: no cover - неизвестный тип обновления
+        event = None
+
+    if event is not None:
+        for attribute in ('from_user', 'user'):
+            user = getattr(event, attribute, None)
+            user_id = getattr(user, 'id', None)
+            if isinstance(user_id, int):
+                return user_id
+
+        chat = getattr(event, 'chat', None)
+        if chat is None:
+            message = getattr(event, 'message', None)
+            chat = getattr(message, 'chat', None)
+        chat_id = getattr(chat, 'id', None)
+        if isinstance(chat_id, int):
+            return chat_id
+
+    return update.update_id
+
+
+class _WebhookShard:
+    """Очередь одного шарда и её метрики."""
+
+    __slots__ = (
+        'index',
+        'last_latency',
+        'max_lag',
+        'next_sequence',
+        'pending',
+        'processed',
+        'queue',
+        'rejected',
+    )
+
+    def __init__(self, index: int, maxsize: int) -> None:
+        self.index = index
+        self.queue: asyncio.Queue[tuple[int, Update] | object] = asyncio.Queue(maxsize=maxsize)
+        # Время постановки ожидающих обновлений; первый элемент — самое старое
+        self.pending: dict[int, float] = {}
+        self.next_sequence = 0
+        self.processed = 0
+        self.rejected = 0
+        self.last_latency = 0.0
+        self.max_lag = 0.0
+
+    def lag(self, now: float) -> float:
+        if not self.pending:
+            return 0.0
+        return now - next(iter(self.pending.values()))
+
+    def snapshot(self, now: float) -> dict[str, Any]:
+        return {
+            'shard': self.index,
+            'depth': self.queue.qsize(),
+            'maxsize': self.queue.maxsize,
+            'lag_seconds': round(self.lag(now), 3),
+            'max_lag_seconds': round(self.max_lag, 3),
+            'last_latency_seconds': round(self.last_latency, 3),
+            'processed': self.processed,
+            'rejected': self.rejected,
+        }
+
+
 class TelegramWebhookProcessor:
-    """Асинхронная очередь обработки Telegram webhook-ов."""
+    """Асинхронная обработка Telegram webhook-ов с шардированием по пользователю.
+
+    Каждый шард — отдельная очередь с одним воркером, поэтому обновления одного
+    пользователя обрабатываются по порядку, а разные пользователи — параллельно.
+    Общий лимит очереди делится между шардами: переполненный шард отклоняет
+    новые обновления (Telegram повторит доставку), не задерживая остальные.
+    """
 
     def __init__(
         self,
@@ -46,7 +151,9 @@ class TelegramWebhookProcessor:
         self._worker_count = max(0, worker_count)
         self._enqueue_timeout = max(0.0, enqueue_timeout)
         self._shutdown_timeout = max(1.0, shutdown_timeout)
-        self._queue: asyncio.Queue[Update | object] = asyncio.Queue(maxsize=self._queue_maxsize)
+        self._shard_count = max(1, self._worker_count)
+        self._shard_maxsize = max(1, math.ceil(self._queue_maxsize / self._shard_count))
+        self._shards = self._create_shards()
         self._workers: list[asyncio.Task[None]] = []
         self._running = False
         self._stop_sentinel: object = object()
@@ -56,27 +163,54 @@ class TelegramWebhookProcessor:
     def is_running(self) -> bool:
         return self._running
 
+    @property
+    def shard_count(self) -> int:
+        return self._shard_count
+
+    def _create_shards(self) -> list[_WebhookShard]:
+        return [_WebhookShard(index, self._shard_maxsize) for index in range(self._shard_count)]
+
+    def shard_for(self, update: Update) -> int:
+        return resolve_update_shard_key(update) % self._shard_count
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Глубина, задержка и счётчики по шардам для health-эндпоинтов."""
+        now = time.monotonic()
+        shards = [shard.snapshot(now) for shard in self._shards]
+        return {
+            'running': self._running,
+            'shards': len(shards),
+            'shard_maxsize': self._shard_maxsize,
+            'depth': sum(item['depth'] for item in shards),
+            'max_lag_seconds': max((item['lag_seconds'] for item in shards), default=0.0),
+            'processed': sum(item['processed'] for item in shards),
+            'rejected': sum(item['rejected'] for item in shards),
+            'saturated_shards': sum(1 for shard in self._shards if shard.queue.full()),
+            'per_shard': shards,
+        }
+
     async def start(self) -> None:
         async with self._lifecycle_lock:
             if self._running:
                 return
 
             self._running = True
-            self._queue = asyncio.Queue(maxsize=self._queue_maxsize)
+            self._shards = self._create_shards()
             self._workers.clear()
 
             for index in range(self._worker_count):
                 task = asyncio.create_task(
-                    self._worker_loop(index),
+                    self._worker_loop(self._shards[index]),
                     name=f'telegram-webhook-worker-{index}',
                 )
                 self._workers.append(task)
 
             if self._worker_count:
                 logger.info(
-                    '🚀 Telegram webhook processor запущен: воркеров, очередь',
+                    '🚀 Telegram webhook processor запущен: шардов, очередь на шард',
                     worker_count=self._worker_count,
                     queue_maxsize=self._queue_maxsize,
+                    shard_maxsize=self._shard_maxsize,
                 )
             else:
                 logger.warning('Telegram webhook processor запущен без воркеров — обновления не будут обрабатываться')
@@ -90,7 +224,7 @@ class TelegramWebhookProcessor:
 
             if self._worker_count > 0:
                 try:
-                    await asyncio.wait_for(self._queue.join(), timeout=self._shutdown_timeout)
+                    await asyncio.wait_for(self._join_all(), timeout=self._shutdown_timeout)
                 except TimeoutError:
                     logger.warning(
                         '⏱️ Не удалось дождаться завершения очереди Telegram webhook за секунд',
@@ -98,25 +232,27 @@ class TelegramWebhookProcessor:
                     )
             else:
                 drained = 0
-                while not self._queue.empty():
-                    try:
-                        self._queue.get_nowait()
-                    except asyncio.QueueEmpty:  # pragma: no cover - гонка состояния
-                        break
-                    else:
-                        drained += 1
-                        self._queue.task_done()
+                for shard in self._shards:
+                    while not shard.queue.empty():
+                        try:
+                            shard.queue.get_nowait()
+                        except asyncio.QueueEmpty:  # pragma: no cover - гонка состояния
+                            break
+                        else:
+                            drained += 1
+                            shard.queue.task_done()
+                    shard.pending.clear()
                 if drained:
                     logger.warning(
                         'Очередь Telegram webhook остановлена без воркеров, потеряно обновлений', drained=drained
                     )
 
-            for _ in range(len(self._workers)):
+            for shard in self._shards[: len(self._workers)]:
                 try:
-                    self._queue.put_nowait(self._stop_sentinel)
+                    shard.queue.put_nowait(self._stop_sentinel)
                 except asyncio.QueueFull:
                     # Очередь переполнена, подождём пока освободится место
-                    await self._queue.put(self._stop_sentinel)
+                    await shard.queue.put(self._stop_sentinel)
 
             if self._workers:
                 await asyncio.gather(*self._workers, return_exceptions=True)
@@ -127,38 +263,50 @@ class TelegramWebhookProcessor:
         if not self._running:
             raise TelegramWebhookProcessorNotRunningError
 
+        shard = self._shards[self.shard_for(update)]
+        sequence = shard.next_sequence
+        shard.next_sequence += 1
+        shard.pending[sequence] = time.monotonic()
         try:
             if self._enqueue_timeout <= 0:
-                self._queue.put_nowait(update)
+                shard.queue.put_nowait((sequence, update))
             else:
-                await asyncio.wait_for(self._queue.put(update), timeout=self._enqueue_timeout)
-        except asyncio.QueueFull as error:  # pragma: no cover - защитный сценарий
-            raise TelegramWebhookOverloadedError from error
-        except TimeoutError as error:
-            raise TelegramWebhookOverloadedError from error
+                await asyncio.wait_for(shard.queue.put((sequence, update)), timeout=self._enqueue_timeout)
+        except (asyncio.QueueFull, TimeoutError) as error:
+            shard.pending.pop(sequence, None)
+            shard.rejected += 1
+            raise TelegramWebhookOverloadedError(f'shard {shard.index} is full') from error
 
     async def wait_until_drained(self, timeout: float | None = None) -> None:
         if not self._running or self._worker_count == 0:
             return
         if timeout is None:
-            await self._queue.join()
+            await self._join_all()
             return
-        await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        await asyncio.wait_for(self._join_all(), timeout=timeout)
 
-    async def _worker_loop(self, worker_id: int) -> None:
+    async def _join_all(self) -> None:
+        await asyncio.gather(*(shard.queue.join() for shard in self._shards))
+
+    async def _worker_loop(self, shard: _WebhookShard) -> None:
+        worker_id = shard.index
         try:
             while True:
                 try:
-                    item = await self._queue.get()
+                    item = await shard.queue.get()
                 except asyncio.CancelledError:  # pragma: no cover - остановка приложения
                     logger.debug('Worker cancelled', worker_id=worker_id)
                     raise
 
                 if item is self._stop_sentinel:
-                    self._queue.task_done()
+                    shard.queue.task_done()
                     break
 
-                update = item
+                sequence, update = item
+                started_at = time.monotonic()
+                enqueued_at = shard.pending.pop(sequence, started_at)
+                shard.max_lag = max(shard.max_lag, started_at - enqueued_at)
+
                 try:
                     await self._dispatcher.feed_update(self._bot, update)  # type: ignore[arg-type]
                 except asyncio.CancelledError:  # pragma: no cover - остановка приложения
@@ -167,7 +315,9 @@ class TelegramWebhookProcessor:
                 except Exception as error:  # pragma: no cover - логируем сбой обработчика
                     logger.exception('Ошибка обработки Telegram update в worker', worker_id=worker_id, error=error)
                 finally:
-                    self._queue.task_done()
+                    shard.processed += 1
+                    shard.last_latency = time.monotonic() - started_at
+                    shard.queue.task_done()
         finally:
             logger.debug('Worker завершён', worker_id=worker_id)
 
@@ -177,7 +327,7 @@ async def _dispatch_update(
     *,
     dispatcher: Dispatcher,
     bot: Bot,
-    processor: TelegramWebhookProcessor | None,
+    processor: TelegramUpdateIngress | None,
 ) -> None:
     if processor is not None:
         try:
@@ -199,7 +349,7 @@ def create_telegram_router(
     bot: Bot,
     dispatcher: Dispatcher,
     *,
-    processor: TelegramWebhookProcessor | None = None,
+    processor: TelegramUpdateIngress | None = None,
 ) -> APIRouter:
     router = APIRouter()
     webhook_path = settings.get_telegram_webhook_path()
@@ -242,6 +392,7 @@ def create_telegram_router(
                 'webhook_configured': bool(settings.get_telegram_webhook_url()),
                 'queue_maxsize': settings.get_webhook_queue_maxsize(),
                 'workers': settings.get_webhook_worker_count(),
+                'queue': await collect_ingress_metrics(processor),
             }
         )
 
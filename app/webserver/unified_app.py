@@ -15,7 +15,7 @@ from app.services.payment_service import PaymentService
 from app.webapi.app import create_web_api_app
 from app.webapi.docs import add_redoc_endpoint
 
-from . import payments, telegram
+from . import payments, telegram, update_stream
 
 
 logger = structlog.get_logger(__name__)
@@ -133,14 +133,17 @@ def create_unified_app(
     }
 
     if enable_telegram_webhook:
-        telegram_processor = telegram.TelegramWebhookProcessor(
-            bot=bot,
-            dispatcher=dispatcher,
-            queue_maxsize=settings.get_webhook_queue_maxsize(),
-            worker_count=settings.get_webhook_worker_count(),
-            enqueue_timeout=settings.get_webhook_enqueue_timeout(),
-            shutdown_timeout=settings.get_webhook_shutdown_timeout(),
-        )
+        if settings.get_webhook_ingress_mode() == 'redis_stream':
+            telegram_processor = update_stream.create_stream_ingress(bot, dispatcher)
+        else:
+            telegram_processor = telegram.TelegramWebhookProcessor(
+                bot=bot,
+                dispatcher=dispatcher,
+                queue_maxsize=settings.get_webhook_queue_maxsize(),
+                worker_count=settings.get_webhook_worker_count(),
+                enqueue_timeout=settings.get_webhook_enqueue_timeout(),
+                shutdown_timeout=settings.get_webhook_shutdown_timeout(),
+            )
         app.state.telegram_webhook_processor = telegram_processor
 
         @app.on_event('startup')
@@ -149,7 +152,10 @@ def create_unified_app(
 
         @app.on_event('shutdown')
         async def stop_telegram_webhook_processor() -> None:  # pragma: no cover - event hook
-            await telegram_processor.stop()
+            if isinstance(telegram_processor, update_stream.StreamUpdateIngress):
+                await telegram_processor.close()
+            else:
+                await telegram_processor.stop()
 
         app.include_router(telegram.create_telegram_router(bot, dispatcher, processor=telegram_processor))
     else:
@@ -177,8 +183,10 @@ def create_unified_app(
             'url': settings.get_telegram_webhook_url(),
             'path': webhook_path,
             'secret_configured': bool(settings.WEBHOOK_SECRET_TOKEN),
+            'ingress_mode': settings.get_webhook_ingress_mode(),
             'queue_maxsize': settings.get_webhook_queue_maxsize(),
             'workers': settings.get_webhook_worker_count(),
+            'queue': await telegram.collect_ingress_metrics(telegram_processor),
         }
 
         payment_state = {
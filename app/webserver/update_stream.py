@@ -0,0 +1,451 @@
+"""Надёжный приём Telegram-обновлений через Redis Streams.
+
+В режиме ``WEBHOOK_INGRESS_MODE=redis_stream`` webhook не держит обновления
+в памяти процесса, а дописывает их в один из потоков Redis
+(``{WEBHOOK_STREAM_PREFIX}:{partition}``). Партиция выбирается по
+пользователю, поэтому его обновления остаются в одном потоке и
+обрабатываются по порядку.
+
+Потоки читают процессы бота через consumer group. Процесс с индексом ``i``
+из ``WEBHOOK_STREAM_CONSUMERS`` обслуживает партиции ``p % consumers == i``,
+каждую — отдельной задачей. Запись подтверждается (XACK) после
+``feed_update``. После рестарта процесс сначала дочитывает свои
+неподтверждённые записи, а записи, зависшие у других потребителей дольше
+``WEBHOOK_STREAM_CLAIM_IDLE_SECONDS``, забирает через XAUTOCLAIM.
+
+Для тестов есть ``InMemoryUpdateStreamBackend`` с той же семантикой.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from app.config import settings
+
+from .telegram import (
+    TelegramWebhookOverloadedError,
+    TelegramWebhookProcessorNotRunningError,
+    resolve_update_shard_key,
+)
+
+
+logger = structlog.get_logger(__name__)
+
+
+StreamEntry = tuple[str, dict[str, str]]
+
+UPDATE_FIELD = 'update'
+PENDING_START_ID = '0'
+NEW_ENTRIES_ID = '>'
+
+
+def _decode(value: Any) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+def _decode_entries(raw_entries: Any) -> list[StreamEntry]:
+    entries: list[StreamEntry] = []
+    for entry_id, fields in raw_entries or []:
+        if fields is None:
+            # Запись удалена из потока (MAXLEN), но осталась в pending
+            entries.append((_decode(entry_id), {}))
+            continue
+        entries.append((_decode(entry_id), {_decode(key): _decode(value) for key, value in fields.items()}))
+    return entries
+
+
+class RedisUpdateStreamBackend:
+    """Операции с потоками Redis, нужные приёму обновлений."""
+
+    def __init__(self, client: Any, *, maxlen: int) -> None:
+        self._client = client
+        self._maxlen = maxlen
+
+    async def append(self, stream: str, fields: dict[str, str]) -> str:
+        entry_id = await self._client.xadd(stream, fields, maxlen=self._maxlen, approximate=True)
+        return _decode(entry_id)
+
+    async def ensure_group(self, stream: str, group: str) -> None:
+        try:
+            await self._client.xgroup_create(stream, group, id='0', mkstream=True)
+        except Exception as error:
+            if 'BUSYGROUP' not in str(error):
+                raise
+
+    async def read_group(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        *,
+        start_id: str,
+        count: int,
+        block_ms: int | None,
+    ) -> list[StreamEntry]:
+        response = await self._client.xreadgroup(group, consumer, {stream: start_id}, count=count, block=block_ms)
+        entries: list[StreamEntry] = []
+        for _stream_name, raw_entries in response or []:
+            entries.extend(_decode_entries(raw_entries))
+        return entries
+
+    async def ack(self, stream: str, group: str, entry_id: str) -> None:
+        await self._client.xack(stream, group, entry_id)
+
+    async def autoclaim(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        *,
+        min_idle_ms: int,
+        count: int,
+    ) -> list[StreamEntry]:
+        response = await self._client.xautoclaim(stream, group, consumer, min_idle_ms, start_id='0-0', count=count)
+        return _decode_entries(response[1] if response else [])
+
+    async def pending_count(self, stream: str, group: str) -> int:
+        summary = await self._client.xpending(stream, group)
+        return int((summary or {}).get('pending', 0))
+
+    async def length(self, stream: str) -> int:
+        return int(await self._client.xlen(stream))
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class InMemoryUpdateStreamBackend:
+    """Потоки и consumer group в памяти процесса — замена Redis для тестов."""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, list[StreamEntry]] = {}
+        # stream -> group -> номер следующей недоставленной записи
+        self._cursors: dict[str, dict[str, int]] = {}
+        # stream -> group -> entry_id -> (consumer, время выдачи)
+        self._pending: dict[str, dict[str, dict[str, tuple[str, float]]]] = {}
+        self._sequence = 0
+        self._changed = asyncio.Event()
+
+    async def append(self, stream: str, fields: dict[str, str]) -> str:
+        self._sequence += 1
+        entry_id = f'{int(time.time() * 1000)}-{self._sequence}'
+        self._entries.setdefault(stream, []).append((entry_id, dict(fields)))
+        self._changed.set()
+        return entry_id
+
+    async def ensure_group(self, stream: str, group: str) -> None:
+        self._entries.setdefault(stream, [])
+        self._cursors.setdefault(stream, {}).setdefault(group, 0)
+        self._pending.setdefault(stream, {}).setdefault(group, {})
+
+    async def read_group(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        *,
+        start_id: str,
+        count: int,
+        block_ms: int | None,
+    ) -> list[StreamEntry]:
+        pending = self._pending[stream][group]
+        if start_id != NEW_ENTRIES_ID:
+            return [entry for entry in self._entries[stream] if pending.get(entry[0], ('',))[0] == consumer][:count]
+
+        entries = self._take_new(stream, group, consumer, count)
+        if entries or not block_ms:
+            return entries
+
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=block_ms / 1000)
+        except TimeoutError:
+            return []
+        return self._take_new(stream, group, consumer, count)
+
+    def _take_new(self, stream: str, group: str, consumer: str, count: int) -> list[StreamEntry]:
+        cursor = self._cursors[stream][group]
+        entries = self._entries[stream][cursor : cursor + count]
+        self._cursors[stream][group] = cursor + len(entries)
+        now = time.monotonic()
+        for entry_id, _fields in entries:
+            self._pending[stream][group][entry_id] = (consumer, now)
+        return entries
+
+    async def ack(self, stream: str, group: str, entry_id: str) -> None:
+        self._pending[stream][group].pop(entry_id, None)
+
+    async def autoclaim(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        *,
+        min_idle_ms: int,
+        count: int,
+    ) -> list[StreamEntry]:
+        pending = self._pending[stream][group]
+        now = time.monotonic()
+        claimed: list[StreamEntry] = []
+        for entry_id, fields in self._entries[stream]:
+            owner = pending.get(entry_id)
+            if owner is None or (now - owner[1]) * 1000 < min_idle_ms:
+                continue
+            pending[entry_id] = (consumer, now)
+            claimed.append((entry_id, fields))
+            if len(claimed) >= count:
+                break
+        return claimed
+
+    async def pending_count(self, stream: str, group: str) -> int:
+        return len(self._pending.get(stream, {}).get(group, {}))
+
+    async def length(self, stream: str) -> int:
+        return len(self._entries.get(stream, []))
+
+    async def close(self) -> None:
+        return None
+
+
+class StreamUpdateIngress:
+    """Приём обновлений в потоки Redis и их обработка партициями этого процесса."""
+
+    def __init__(
+        self,
+        *,
+        bot: Bot,
+        dispatcher: Dispatcher,
+        backend: RedisUpdateStreamBackend | InMemoryUpdateStreamBackend,
+        stream_prefix: str,
+        group: str,
+        partitions: int,
+        consumer_index: int,
+        consumer_count: int,
+        claim_idle_seconds: float,
+        block_ms: int = 1000,
+        batch_size: int = 32,
+        shutdown_timeout: float = 30.0,
+    ) -> None:
+        self._bot = bot
+        self._dispatcher = dispatcher
+        self._backend = backend
+        self._stream_prefix = stream_prefix.rstrip(':')
+        self._group = group
+        self._partitions = max(1, partitions)
+        self._consumer_count = max(1, consumer_count)
+        self._consumer_index = min(max(0, consumer_index), self._consumer_count - 1)
+        self._consumer_name = f'worker-{self._consumer_index}'
+        self._claim_idle_ms = max(1000, int(claim_idle_seconds * 1000))
+        self._block_ms = max(1, block_ms)
+        self._batch_size = max(1, batch_size)
+        self._shutdown_timeout = max(1.0, shutdown_timeout)
+        self._tasks: list[asyncio.Task[None]] = []
+        self._running = False
+        self._lifecycle_lock = asyncio.Lock()
+        self._appended = 0
+        self._processed = 0
+        self._redelivered = 0
+        self._failed = 0
+        self._last_latency = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def owned_partitions(self) -> list[int]:
+        return [
+            partition
+            for partition in range(self._partitions)
+            if partition % self._consumer_count == self._consumer_index
+        ]
+
+    def stream_for_partition(self, partition: int) -> str:
+        return f'{self._stream_prefix}:{partition}'
+
+    def partition_for(self, update: Update) -> int:
+        return resolve_update_shard_key(update) % self._partitions
+
+    async def start(self) -> None:
+        async with self._lifecycle_lock:
+            if self._running:
+                return
+
+            for partition in range(self._partitions):
+                await self._backend.ensure_group(self.stream_for_partition(partition), self._group)
+
+            self._running = True
+            self._tasks = [
+                asyncio.create_task(
+                    self._partition_loop(partition),
+                    name=f'telegram-update-stream-{partition}',
+                )
+                for partition in self.owned_partitions
+            ]
+            logger.info(
+                '🚀 Приём Telegram-обновлений через Redis Streams запущен',
+                consumer=self._consumer_name,
+                consumers=self._consumer_count,
+                partitions=self.owned_partitions,
+            )
+
+    async def stop(self) -> None:
+        async with self._lifecycle_lock:
+            if not self._running:
+                return
+
+            self._running = False
+            if self._tasks:
+                _done, still_running = await asyncio.wait(self._tasks, timeout=self._shutdown_timeout)
+                for task in still_running:
+                    task.cancel()
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks.clear()
+            logger.info('🛑 Приём Telegram-обновлений через Redis Streams остановлен')
+
+    async def close(self) -> None:
+        await self.stop()
+        try:
+            await self._backend.close()
+        except Exception as error:  # pragma: no cover - закрытие соединения
+            logger.debug('Ошибка закрытия соединения Redis Streams', error=error)
+
+    async def enqueue(self, update: Update) -> None:
+        if not self._running:
+            raise TelegramWebhookProcessorNotRunningError
+
+        stream = self.stream_for_partition(self.partition_for(update))
+        payload = update.model_dump_json(exclude_unset=True, by_alias=True)
+        try:
+            await self._backend.append(stream, {UPDATE_FIELD: payload})
+        except Exception as error:
+            logger.warning('Не удалось записать Telegram update в поток', stream=stream, error=error)
+            raise TelegramWebhookOverloadedError(str(error)) from error
+        self._appended += 1
+
+    async def get_metrics_async(self) -> dict[str, Any]:
+        """Длина потоков и количество неподтверждённых записей по партициям."""
+        metrics = self.get_metrics()
+        per_partition: list[dict[str, Any]] = []
+        for partition in self.owned_partitions:
+            stream = self.stream_for_partition(partition)
+            try:
+                length = await self._backend.length(stream)
+                pending = await self._backend.pending_count(stream, self._group)
+            except Exception as error:
+                logger.debug('Не удалось получить метрики потока', stream=stream, error=error)
+                continue
+            per_partition.append({'partition': partition, 'length': length, 'pending': pending})
+        metrics['per_partition'] = per_partition
+        return metrics
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            'mode': 'redis_stream',
+            'running': self._running,
+            'consumer': self._consumer_name,
+            'partitions': self.owned_partitions,
+            'appended': self._appended,
+            'processed': self._processed,
+            'redelivered': self._redelivered,
+            'failed': self._failed,
+            'last_latency_seconds': round(self._last_latency, 3),
+        }
+
+    async def _partition_loop(self, partition: int) -> None:
+        stream = self.stream_for_partition(partition)
+        last_claim_at = 0.0
+
+        while self._running:
+            try:
+                # Сначала свои неподтверждённые записи (остались после падения процесса)
+                pending = await self._backend.read_group(
+                    stream,
+                    self._group,
+                    self._consumer_name,
+                    start_id=PENDING_START_ID,
+                    count=self._batch_size,
+                    block_ms=None,
+                )
+                if pending:
+                    self._redelivered += len(pending)
+                    await self._handle_entries(stream, pending)
+                    continue
+
+                now = time.monotonic()
+                if now - last_claim_at >= self._claim_idle_ms / 1000:
+                    last_claim_at = now
+                    claimed = await self._backend.autoclaim(
+                        stream,
+                        self._group,
+                        self._consumer_name,
+                        min_idle_ms=self._claim_idle_ms,
+                        count=self._batch_size,
+                    )
+                    if claimed:
+                        logger.warning('Забраны зависшие Telegram-обновления', stream=stream, count=len(claimed))
+                        self._redelivered += len(claimed)
+                        await self._handle_entries(stream, claimed)
+                        continue
+
+                entries = await self._backend.read_group(
+                    stream,
+                    self._group,
+                    self._consumer_name,
+                    start_id=NEW_ENTRIES_ID,
+                    count=self._batch_size,
+                    block_ms=self._block_ms,
+                )
+                await self._handle_entries(stream, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error('Ошибка чтения потока Telegram-обновлений', stream=stream, error=error)
+                await asyncio.sleep(1.0)
+
+    async def _handle_entries(self, stream: str, entries: list[StreamEntry]) -> None:
+        for entry_id, fields in entries:
+            started_at = time.monotonic()
+            raw_update = fields.get(UPDATE_FIELD)
+            if raw_update:
+                try:
+                    update = Update.model_validate_json(raw_update)
+                    await self._dispatcher.feed_update(self._bot, update)
+                except asyncio.CancelledError:
+                    # Запись останется в pending и будет обработана после рестарта
+                    raise
+                except Exception as error:
+                    self._failed += 1
+                    logger.exception('Ошибка обработки Telegram update из потока', entry_id=entry_id, error=error)
+
+            # Ошибка обработчика не повторяется, иначе «ядовитое» обновление заблокирует партицию
+            await self._backend.ack(stream, self._group, entry_id)
+            self._processed += 1
+            self._last_latency = time.monotonic() - started_at
+
+
+def create_stream_ingress(bot: Bot, dispatcher: Dispatcher) -> StreamUpdateIngress:
+    """Приём обновлений через Redis Streams по настройкам приложения."""
+    backend = RedisUpdateStreamBackend(
+        redis.from_url(settings.REDIS_URL),
+        maxlen=settings.get_webhook_stream_maxlen(),
+    )
+    return StreamUpdateIngress(
+        bot=bot,
+        dispatcher=dispatcher,
+        backend=backend,
+        stream_prefix=settings.WEBHOOK_STREAM_PREFIX,
+        group=settings.WEBHOOK_STREAM_GROUP,
+        partitions=settings.get_webhook_stream_partitions(),
+        consumer_index=settings.WEBHOOK_STREAM_CONSUMER_INDEX,
+        consumer_count=settings.get_webhook_stream_consumers(),
+        claim_idle_seconds=settings.WEBHOOK_STREAM_CLAIM_IDLE_SECONDS,
+        shutdown_timeout=settings.get_webhook_shutdown_timeout(),
+    )
@@ -14,12 +14,14 @@ from app.bot import setup_bot
 from app.config import settings
 from app.database.database import init_db
 from app.database.models import PaymentMethod
-from app.database.universal_migration import run_universal_migration
+from app.database.universal_migration import get_last_migration_report, run_universal_migration
 from app.localization.loader import ensure_locale_templates
 from app.logging_config import setup_logging
+from app.services.app_config_provider import app_config_provider
 from app.services.backup_service import backup_service
 from app.services.ban_notification_service import ban_notification_service
 from app.services.broadcast_service import broadcast_service
+from app.services.cache_invalidation_service import cache_invalidation_bus
 from app.services.contest_rotation_service import contest_rotation_service
 from app.services.daily_subscription_service import daily_subscription_service
 from app.services.external_admin_service import ensure_external_admin_token
@@ -35,12 +37,17 @@ from app.services.payment_verification_service import (
     get_enabled_auto_methods,
     method_display_name,
 )
+from app.services.payment_webhook_inbox_service import payment_webhook_inbox_service
 from app.services.referral_contest_service import referral_contest_service
 from app.services.remnawave_sync_service import remnawave_sync_service
 from app.services.reporting_service import reporting_service
+from app.services.server_status_service import server_status_service
+from app.services.subscription_usage_refresher import subscription_usage_refresher
 from app.services.system_settings_service import bot_configuration_service
 from app.services.traffic_monitoring_service import traffic_monitoring_scheduler
+from app.services.traffic_warehouse_service import traffic_warehouse_service
 from app.services.version_service import version_service
+from app.services.websocket_relay_service import websocket_relay
 from app.utils.log_handlers import ExcludePaymentFilter, LevelFilterHandler
 from app.utils.payment_logger import configure_payment_logger
 from app.utils.startup_timeline import StartupTimeline
@@ -198,8 +205,28 @@ async def main():
                         migration_success = await run_universal_migration()
                     finally:
                         migration_log.setLevel(original_level)
-                    if migration_success:
-                        stage.success('Миграция завершена успешно')
+                    migration_report = get_last_migration_report()
+                    if migration_report:
+                        stage.log(
+                            f'Снимок схемы: {migration_report.snapshot_seconds:.2f}s, '
+                            f'проверок из снимка: {migration_report.snapshot_hits}, '
+                            f'запросов к каталогу: {migration_report.live_queries}'
+                        )
+                        timeline.add_manual_step(
+                            'Снимок схемы БД',
+                            '🗺️',
+                            'Готово',
+                            f'перечитываний: {migration_report.snapshot_reloads}',
+                            duration=migration_report.snapshot_seconds,
+                        )
+                    if migration_report and migration_report.skipped:
+                        stage.skip('Схема не изменилась с прошлого запуска, проход миграции пропущен')
+                    elif migration_success:
+                        stage.success(
+                            f'Миграция завершена успешно за {migration_report.pass_seconds:.2f}s'
+                            if migration_report
+                            else 'Миграция завершена успешно'
+                        )
                     else:
                         stage.warning('Миграция завершилась с предупреждениями, запуск продолжится')
                         logger.warning('⚠️ Миграция завершилась с предупреждениями, но продолжаем запуск')
@@ -271,6 +298,36 @@ async def main():
                 stage.warning(f'Не удалось загрузить конфигурацию: {error}')
                 logger.error('❌ Не удалось загрузить конфигурацию', error=error)
 
+        async with timeline.stage(
+            'Шина инвалидации кешей',
+            '📡',
+            success_message='Шина инвалидации запущена',
+        ) as stage:
+            try:
+                await cache_invalidation_bus.start()
+                if cache_invalidation_bus.is_distributed():
+                    stage.log(f'Канал: {cache_invalidation_bus.channel}')
+                else:
+                    stage.skip('Локальный режим: Redis недоступен или шина отключена')
+            except Exception as error:
+                stage.warning(f'Не удалось запустить шину инвалидации: {error}')
+                logger.error('❌ Не удалось запустить шину инвалидации кешей', error=error)
+
+        async with timeline.stage(
+            'Ретрансляция WebSocket',
+            '🔁',
+            success_message='Ретрансляция WebSocket запущена',
+        ) as stage:
+            try:
+                await websocket_relay.start()
+                if websocket_relay.is_distributed():
+                    stage.log(f'Канал: {websocket_relay.channel}')
+                else:
+                    stage.skip('Локальный режим: Redis недоступен или ретрансляция отключена')
+            except Exception as error:
+                stage.warning(f'Не удалось запустить ретрансляцию WebSocket: {error}')
+                logger.error('❌ Не удалось запустить ретрансляцию WebSocket', error=error)
+
         bot = None
         dp = None
         async with timeline.stage('Настройка бота', '🤖', success_message='Бот настроен') as stage:
@@ -416,6 +473,7 @@ async def main():
 
         payment_service = PaymentService(bot)
         auto_payment_verification_service.set_payment_service(payment_service)
+        payment_webhook_inbox_service.set_payment_service(payment_service)
 
         # Настройка сервиса очереди чеков NaloGO
         if payment_service.nalogo_service:
@@ -467,6 +525,21 @@ async def main():
             if auto_verification_active:
                 stage.log('Фоновая автопроверка запущена')
 
+        async with timeline.stage(
+            'Очередь webhook платежей',
+            '📥',
+            success_message='Обработчик очереди webhook запущен',
+        ) as stage:
+            if payment_webhook_inbox_service.is_enabled():
+                try:
+                    await payment_webhook_inbox_service.start()
+                    stage.log(f'Параллельных обработок: {payment_webhook_inbox_service.get_concurrency()}')
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска очереди webhook: {e}')
+                    logger.error('❌ Ошибка запуска очереди webhook платежей', error=e)
+            else:
+                stage.skip('Webhook обрабатываются в запросе: очередь отключена настройками')
+
         async with timeline.stage(
             'Очередь чеков NaloGO',
             '🧾',
@@ -626,6 +699,48 @@ async def main():
                 traffic_monitoring_task = None
                 stage.skip('Мониторинг трафика отключен настройками')
 
+        async with timeline.stage(
+            'Хранилище трафика',
+            '🗄️',
+            success_message='Сборщик суточного трафика запущен',
+        ) as stage:
+            if traffic_warehouse_service.is_enabled():
+                try:
+                    await traffic_warehouse_service.start()
+                    stage.log(f'Интервал проверки: {settings.TRAFFIC_WAREHOUSE_INTERVAL_MINUTES} мин')
+                except Exception as error:
+                    stage.warning(f'Не удалось запустить сборщик трафика: {error}')
+                    logger.error('❌ Не удалось запустить сборщик суточного трафика', error=error)
+            else:
+                stage.skip('Хранилище трафика отключено настройками')
+
+        async with timeline.stage(
+            'Статус серверов',
+            '📡',
+            success_message='Опрос метрик статуса серверов запущен',
+        ) as stage:
+            if server_status_service.is_enabled():
+                try:
+                    await server_status_service.start()
+                    stage.log(f'Интервал опроса: {settings.get_server_status_poll_interval()} сек')
+                except Exception as error:
+                    stage.warning(f'Не удалось запустить опрос метрик: {error}')
+                    logger.error('❌ Не удалось запустить опрос метрик статуса серверов', error=error)
+            else:
+                stage.skip('Опрос метрик не требуется: режим xray не настроен')
+
+        async with timeline.stage(
+            'Конфиг приложений',
+            '📱',
+            success_message='Фоновое обновление app-config запущено',
+        ) as stage:
+            try:
+                await app_config_provider.start()
+                stage.log(f'Интервал обновления RemnaWave: {settings.get_app_config_refresh_seconds()} сек')
+            except Exception as error:
+                stage.warning(f'Не удалось запустить обновление app-config: {error}')
+                logger.error('❌ Не удалось запустить обновление app-config', error=error)
+
         async with timeline.stage(
             'Суточные подписки',
             '💳',
@@ -836,6 +951,31 @@ async def main():
             except asyncio.CancelledError:
                 pass
 
+        try:
+            await traffic_warehouse_service.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки сборщика суточного трафика', error=e)
+
+        try:
+            await payment_webhook_inbox_service.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки очереди webhook платежей', error=e)
+
+        try:
+            await server_status_service.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки опроса метрик статуса серверов', error=e)
+
+        try:
+            await app_config_provider.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки обновления app-config', error=e)
+
+        try:
+            await subscription_usage_refresher.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки фонового обновления трафика подписок', error=e)
+
         if daily_subscription_task and not daily_subscription_task.done():
             logger.info('ℹ️ Остановка сервиса суточных подписок...')
             daily_subscription_service.stop_monitoring()
@@ -888,6 +1028,16 @@ async def main():
         except Exception as e:
             logger.error('Ошибка остановки сервиса бекапов', error=e)
 
+        try:
+            await cache_invalidation_bus.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки шины инвалидации кешей', error=e)
+
+        try:
+            await websocket_relay.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки ретрансляции WebSocket', error=e)
+
         if polling_task and not polling_task.done():
             logger.info('ℹ️ Остановка polling...')
             polling_task.cancel()
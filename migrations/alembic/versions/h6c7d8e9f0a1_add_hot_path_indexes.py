@@ -0,0 +1,40 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h6c7d8e9f0a1'
+down_revision: Union[str, None] = 'g5b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_user_created', 'transactions', ['user_id', 'created_at'], if_not_exists=True)
+    op.create_index(
+        'ix_transactions_type_completed_created',
+        'transactions',
+        ['type', 'is_completed', 'created_at'],
+        if_not_exists=True,
+    )
+    op.create_index('ix_transactions_payment_method', 'transactions', ['payment_method'], if_not_exists=True)
+
+    op.create_index('ix_subscriptions_status_end_date', 'subscriptions', ['status', 'end_date'], if_not_exists=True)
+    op.create_index(
+        'ix_subscriptions_autopay_end_date',
+        'subscriptions',
+        ['end_date'],
+        postgresql_where=sa.text('autopay_enabled = true'),
+        sqlite_where=sa.text('autopay_enabled = 1'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_autopay_end_date', table_name='subscriptions', if_exists=True)
+    op.drop_index('ix_subscriptions_status_end_date', table_name='subscriptions', if_exists=True)
+    op.drop_index('ix_transactions_payment_method', table_name='transactions', if_exists=True)
+    op.drop_index('ix_transactions_type_completed_created', table_name='transactions', if_exists=True)
+    op.drop_index('ix_transactions_user_created', table_name='transactions', if_exists=True)
@@ -0,0 +1,18 @@
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'j8e9f0a1b2c3'
+down_revision: Union[str, None] = 'i7d8e9f0a1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_external_id', 'transactions', ['external_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_external_id', table_name='transactions')
@@ -0,0 +1,40 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k9f0a1b2c3d4'
+down_revision: Union[str, None] = 'j8e9f0a1b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'payment_webhook_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('provider', sa.String(length=32), nullable=False),
+        sa.Column('event_key', sa.String(length=255), nullable=False),
+        sa.Column('handler', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint('provider', 'event_key', name='uq_payment_webhook_events_provider_key'),
+    )
+    op.create_index('ix_payment_webhook_events_id', 'payment_webhook_events', ['id'])
+    op.create_index(
+        'ix_payment_webhook_events_status_next_attempt', 'payment_webhook_events', ['status', 'next_attempt_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_webhook_events_status_next_attempt', table_name='payment_webhook_events')
+    op.drop_index('ix_payment_webhook_events_id', table_name='payment_webhook_events')
+    op.drop_table('payment_webhook_events')
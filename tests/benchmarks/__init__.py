@@ -0,0 +1 @@
+# Замеры производительности; запускаются только при PRICING_BENCHMARK=1.
@@ -0,0 +1,126 @@
+"""Замеры расчёта цен: ``PRICING_BENCHMARK=1 pytest tests/benchmarks -s``.
+
+Ничего не утверждают о скорости — только печатают время, чтобы не зависеть от загрузки машины.
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.database.crud import server_squad
+from app.database.models import PromoGroup
+from app.services.pricing_catalog import CatalogServer, CatalogTariff, PricingCatalogSnapshot, PromoGroupDiscounts
+from app.services.subscription_service import SubscriptionService
+from app.utils.pricing_utils import compute_simple_subscription_price
+
+
+pytestmark = pytest.mark.skipif(os.getenv('PRICING_BENCHMARK') != '1', reason='PRICING_BENCHMARK=1 не задан')
+
+LOOPS = 2000
+PERIODS = (7, 14, 30, 60, 90, 180, 365)
+
+
+def _promo_group() -> PromoGroup:
+    return PromoGroup(
+        id=1,
+        name='Benchmark',
+        period_discounts={str(days): days % 40 for days in PERIODS},
+        server_discount_percent=10,
+        traffic_discount_percent=5,
+        device_discount_percent=5,
+        apply_discounts_to_addons=True,
+        is_default=False,
+    )
+
+
+def _server(index: int):
+    return SimpleNamespace(
+        id=index,
+        squad_uuid=f'squad-{index}',
+        display_name=f'Server {index}',
+        price_kopeks=5000,
+        is_available=True,
+        is_full=False,
+    )
+
+
+def _snapshot(group: PromoGroup) -> PricingCatalogSnapshot:
+    tariffs = [
+        CatalogTariff.from_model(
+            SimpleNamespace(
+                id=tariff_id,
+                name=f'Tariff {tariff_id}',
+                description=None,
+                display_order=tariff_id,
+                is_active=True,
+                tier_level=1,
+                traffic_limit_gb=0,
+                device_limit=1,
+                allowed_squads=['squad-1'],
+                period_prices={str(days): days * 330 for days in PERIODS},
+                traffic_topup_packages={},
+                allowed_promo_groups=[],
+                is_daily=False,
+                daily_price_kopeks=0,
+            )
+        )
+        for tariff_id in range(1, 21)
+    ]
+    servers = [CatalogServer(squad_uuid='squad-1', display_name=None, price_kopeks=5000, is_available=True)]
+    return PricingCatalogSnapshot.build(
+        tariffs=tariffs, servers=servers, promo_groups=[PromoGroupDiscounts.from_model(group)]
+    )
+
+
+async def _time_async(func) -> float:
+    started = time.perf_counter()
+    for _ in range(LOOPS):
+        await func()
+    return (time.perf_counter() - started) / LOOPS * 1_000_000
+
+
+def _time_sync(func) -> float:
+    started = time.perf_counter()
+    for _ in range(LOOPS):
+        func()
+    return (time.perf_counter() - started) / LOOPS * 1_000_000
+
+
+async def test_report_pricing_timings(monkeypatch):
+    servers = {server.id: server for server in map(_server, range(1, 4))}
+    servers_by_uuid = {server.squad_uuid: server for server in servers.values()}
+
+    async def get_server_squad_by_id(db, server_id):
+        return servers.get(server_id)
+
+    async def get_server_squad_by_uuid(db, squad_uuid):
+        return servers_by_uuid.get(squad_uuid)
+
+    # Поиск серверов подменён: замеряется только сам расчёт, без обращений к БД
+    monkeypatch.setattr(server_squad, 'get_server_squad_by_id', get_server_squad_by_id)
+    monkeypatch.setattr(server_squad, 'get_server_squad_by_uuid', get_server_squad_by_uuid)
+
+    group = _promo_group()
+    snapshot = _snapshot(group)
+    service = SubscriptionService()
+    params = {'period_days': 30, 'traffic_limit_gb': 100, 'device_limit': 3, 'promo_group': group}
+
+    timings = {
+        'calculate_subscription_price_with_months': await _time_async(
+            lambda: service.calculate_subscription_price_with_months(30, 100, list(servers), 3, None, promo_group=group)
+        ),
+        'compute_simple_subscription_price': await _time_async(
+            lambda: compute_simple_subscription_price(None, params, resolved_squad_uuids=list(servers_by_uuid))
+        ),
+        'catalog: tariffs and period prices for a promo group': _time_sync(
+            lambda: [
+                snapshot.period_prices(tariff.id, group.id) for tariff in snapshot.tariffs_for_promo_group(group.id)
+            ]
+        ),
+    }
+
+    print()
+    for name, microseconds in timings.items():
+        print(f'{name}: {microseconds:.1f} µs')
@@ -153,6 +153,93 @@ if 'yookassa' not in sys.modules:
     sys.modules['yookassa.domain.common.confirmation_type'] = confirmation_module
 
 
+class SyncConnectionAdapter:
+    """Асинхронный интерфейс AsyncConnection поверх синхронного соединения."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def execute(self, statement, params=None):
+        return self._connection.execute(statement, params)
+
+    async def exec_driver_sql(self, statement, params=None):
+        return self._connection.exec_driver_sql(statement, params)
+
+
+class SyncSessionAdapter:
+    """Асинхронный интерфейс AsyncSession поверх синхронной сессии SQLite.
+
+    aiosqlite заглушен, поэтому CRUD проверяем на синхронном SQLite.
+    Выполненные запросы копятся в ``statements`` для проверки SQL под PostgreSQL.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self.bind = session.bind
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def get_bind(self):
+        return self._session.get_bind()
+
+    def add(self, instance):
+        self._session.add(instance)
+
+    async def get(self, entity, ident, **kwargs):
+        return self._session.get(entity, ident, **kwargs)
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return self._session.execute(statement, params)
+
+    async def scalar(self, statement, params=None):
+        return self._session.scalar(statement, params)
+
+    async def connection(self):
+        return SyncConnectionAdapter(self._session.connection())
+
+    async def flush(self):
+        self._session.flush()
+
+    async def commit(self):
+        self._session.commit()
+
+    async def rollback(self):
+        self._session.rollback()
+
+
+@pytest.fixture
+def session_adapter() -> type[SyncSessionAdapter]:
+    """Обёртка для сессий, которые тест открывает сам (свой движок, потоки, фабрики сессий)."""
+    return SyncSessionAdapter
+
+
+@pytest.fixture
+def sqlite_session():
+    """Синхронная сессия на SQLite в памяти со схемой моделей бота."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database.models import Base
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_db(sqlite_session) -> SyncSessionAdapter:
+    """Асинхронная обёртка над ``sqlite_session`` для CRUD-функций."""
+    return SyncSessionAdapter(sqlite_session)
+
+
 @pytest.fixture
 def fixed_datetime() -> datetime:
     """Возвращает фиксированную отметку времени для воспроизводимых проверок."""
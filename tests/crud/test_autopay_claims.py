@@ -0,0 +1,97 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.database.crud.subscription import (
+    claim_autopay_subscriptions,
+    get_subscriptions_for_autopay,
+    release_autopay_claims,
+)
+from app.database.models import Subscription, SubscriptionStatus, Tariff, User
+
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=UTC)
+
+
+def _subscription(session: Session, user_id: int, end_in: timedelta, **overrides) -> Subscription:
+    session.add(User(id=user_id, telegram_id=1000 + user_id))
+    values = {
+        'user_id': user_id,
+        'status': SubscriptionStatus.ACTIVE.value,
+        'is_trial': False,
+        'autopay_enabled': True,
+        'autopay_days_before': 3,
+        'end_date': NOW + end_in,
+    }
+    values.update(overrides)
+    subscription = Subscription(**values)
+    session.add(subscription)
+    session.commit()
+    return subscription
+
+
+async def test_window_matches_days_before_rules(sqlite_session, sqlite_db):
+    daily = Tariff(name='Daily', is_daily=True)
+    sqlite_session.add(daily)
+    sqlite_session.commit()
+
+    inside = _subscription(sqlite_session, 1, timedelta(days=3, hours=23))
+    one_day = _subscription(sqlite_session, 2, timedelta(days=1, hours=12), autopay_days_before=1)
+    capped = _subscription(sqlite_session, 3, timedelta(days=3, hours=1), autopay_days_before=7)
+    expired_active = _subscription(sqlite_session, 4, timedelta(hours=-2))
+    _subscription(sqlite_session, 5, timedelta(days=4, minutes=1))
+    _subscription(sqlite_session, 6, timedelta(days=2), autopay_days_before=1)
+    _subscription(sqlite_session, 7, timedelta(days=1), autopay_enabled=False)
+    _subscription(sqlite_session, 8, timedelta(days=1), is_trial=True)
+    _subscription(sqlite_session, 9, timedelta(days=1), tariff_id=daily.id)
+    _subscription(sqlite_session, 10, timedelta(days=1), status=SubscriptionStatus.EXPIRED.value)
+
+    subscriptions = await get_subscriptions_for_autopay(sqlite_db, now=NOW)
+
+    assert [sub.id for sub in subscriptions] == [expired_active.id, one_day.id, capped.id, inside.id]
+
+
+async def test_claims_are_taken_in_batches_and_released(sqlite_session, sqlite_db):
+    subscriptions = [_subscription(sqlite_session, user_id, timedelta(hours=user_id)) for user_id in range(1, 6)]
+
+    first = await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=2, lease_seconds=600)
+    second = await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=2, lease_seconds=600)
+    third = await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=2, lease_seconds=600)
+
+    assert first == [subscriptions[0].id, subscriptions[1].id]
+    assert second == [subscriptions[2].id, subscriptions[3].id]
+    assert third == [subscriptions[4].id]
+    assert await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=2, lease_seconds=600) == []
+
+    await release_autopay_claims(sqlite_db, first)
+    assert await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=10, lease_seconds=600) == first
+
+
+async def test_expired_lease_is_reclaimed(sqlite_session, sqlite_db):
+    subscription = _subscription(sqlite_session, 1, timedelta(hours=5))
+
+    assert await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=5, lease_seconds=600) == [subscription.id]
+    later = NOW + timedelta(seconds=601)
+    assert await claim_autopay_subscriptions(sqlite_db, now=later, batch_size=5, lease_seconds=600) == [subscription.id]
+
+
+async def test_claim_does_not_touch_updated_at(sqlite_session, sqlite_db):
+    subscription = _subscription(sqlite_session, 1, timedelta(hours=5))
+    updated_at = sqlite_session.scalar(select(Subscription.updated_at).where(Subscription.id == subscription.id))
+
+    await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=5, lease_seconds=600)
+
+    sqlite_session.expire_all()
+    assert sqlite_session.get(Subscription, subscription.id).updated_at == updated_at
+
+
+async def test_claim_query_skips_locked_rows_on_postgresql(sqlite_session, sqlite_db):
+    _subscription(sqlite_session, 1, timedelta(hours=5))
+
+    await claim_autopay_subscriptions(sqlite_db, now=NOW, batch_size=5, lease_seconds=600)
+
+    sql = str(sqlite_db.statements[0].compile(dialect=postgresql.dialect()))
+    assert 'FOR UPDATE OF subscriptions SKIP LOCKED' in sql
+    assert 'LIMIT' in sql
@@ -0,0 +1,108 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.crud.subscription import (
+    claim_daily_subscription_for_charge,
+    daily_billing_key,
+    get_due_daily_subscription_ids,
+)
+from app.database.models import Subscription, SubscriptionStatus, Tariff, Transaction, TransactionType, User
+
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def daily_tariff(sqlite_session):
+    tariff = Tariff(name='Daily', is_daily=True, daily_price_kopeks=1000)
+    sqlite_session.add(tariff)
+    sqlite_session.commit()
+    return tariff
+
+
+def _subscription(session: Session, user_id: int, tariff: Tariff, **overrides) -> Subscription:
+    session.add(User(id=user_id, telegram_id=1000 + user_id))
+    values = {
+        'user_id': user_id,
+        'tariff_id': tariff.id,
+        'status': SubscriptionStatus.ACTIVE.value,
+        'is_trial': False,
+        'end_date': NOW + timedelta(hours=3),
+    }
+    values.update(overrides)
+    subscription = Subscription(**values)
+    session.add(subscription)
+    session.commit()
+    return subscription
+
+
+async def test_due_ids_are_listed_by_keyset(sqlite_session, daily_tariff, sqlite_db):
+    regular = Tariff(name='Monthly', is_daily=False)
+    sqlite_session.add(regular)
+    sqlite_session.commit()
+
+    due = [_subscription(sqlite_session, user_id, daily_tariff) for user_id in range(1, 5)]
+    _subscription(sqlite_session, 5, daily_tariff, last_daily_charge_at=NOW - timedelta(hours=2))
+    _subscription(sqlite_session, 6, daily_tariff, is_daily_paused=True)
+    _subscription(sqlite_session, 7, daily_tariff, is_trial=True)
+    _subscription(sqlite_session, 8, regular)
+
+    first = await get_due_daily_subscription_ids(sqlite_db, now=NOW, limit=3)
+    second = await get_due_daily_subscription_ids(sqlite_db, now=NOW, after_id=first[-1], limit=3)
+
+    assert first == [sub.id for sub in due[:3]]
+    assert second == [due[3].id]
+
+
+async def test_claim_skips_rows_that_are_no_longer_due(sqlite_session, daily_tariff, sqlite_db):
+    subscription = _subscription(sqlite_session, 1, daily_tariff, last_daily_charge_at=NOW - timedelta(hours=2))
+
+    assert await claim_daily_subscription_for_charge(sqlite_db, subscription.id, now=NOW) is None
+
+
+async def test_claim_query_skips_locked_rows_on_postgresql(sqlite_session, daily_tariff, sqlite_db):
+    subscription = _subscription(sqlite_session, 1, daily_tariff)
+
+    claimed = await claim_daily_subscription_for_charge(sqlite_db, subscription.id, now=NOW)
+
+    assert claimed.id == subscription.id
+    sql = str(sqlite_db.statements[0].compile(dialect=postgresql.dialect()))
+    assert 'FOR UPDATE OF subscriptions SKIP LOCKED' in sql
+
+
+def test_billing_key_follows_billing_period():
+    subscription = Subscription(id=7, last_daily_charge_at=NOW - timedelta(hours=25), end_date=NOW + timedelta(hours=3))
+
+    assert daily_billing_key(subscription) == 'daily:7:2026-03-09T11:00:00+00:00'
+
+    # После смены тарифа отметки нет: ключ берётся из end_date и не зависит от времени запуска
+    subscription.last_daily_charge_at = None
+    assert daily_billing_key(subscription) == 'daily:7:2026-03-10T15:00:00+00:00'
+
+
+def test_database_rejects_second_charge_for_same_period(sqlite_session):
+    sqlite_session.add(User(id=1, telegram_id=1001))
+    sqlite_session.commit()
+
+    def _charge(external_id):
+        sqlite_session.add(
+            Transaction(
+                user_id=1,
+                type=TransactionType.SUBSCRIPTION_PAYMENT.value,
+                amount_kopeks=1000,
+                external_id=external_id,
+            )
+        )
+        sqlite_session.commit()
+
+    # id платежей провайдеров под ограничение не попадают
+    _charge('yk-1')
+    _charge('yk-1')
+
+    _charge('daily:7:2026-03-09T11:00:00+00:00')
+    with pytest.raises(IntegrityError):
+        _charge('daily:7:2026-03-09T11:00:00+00:00')
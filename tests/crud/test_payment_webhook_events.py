@@ -0,0 +1,97 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+from app.database.crud.payment_webhook_event import (
+    claim_payment_webhook_events,
+    delete_processed_payment_webhook_events,
+    enqueue_payment_webhook_event,
+    get_payment_webhook_event_counts,
+    mark_payment_webhook_event_failed,
+    mark_payment_webhook_event_processed,
+)
+from app.database.models import PaymentWebhookEvent
+
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=UTC)
+
+
+async def _enqueue(db, key: str, payload: dict | None = None):
+    return await enqueue_payment_webhook_event(
+        db,
+        provider='yookassa',
+        event_key=key,
+        handler='process_yookassa_webhook',
+        payload=payload or {'key': key},
+        now=NOW,
+    )
+
+
+async def test_repeated_delivery_is_deduplicated(sqlite_db, sqlite_session):
+    first, created = await _enqueue(sqlite_db, 'payment.succeeded:1')
+    again, created_again = await _enqueue(sqlite_db, 'payment.succeeded:1')
+
+    assert created is True
+    assert created_again is False
+    assert again.id == first.id
+    assert sqlite_session.query(PaymentWebhookEvent).count() == 1
+
+
+async def test_failed_event_is_requeued_on_redelivery(sqlite_db, sqlite_session):
+    event, _ = await _enqueue(sqlite_db, 'k')
+    await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=5, lease_seconds=60)
+    await mark_payment_webhook_event_failed(sqlite_db, event.id, error='boom', retry_at=None)
+
+    await _enqueue(sqlite_db, 'k', {'retry': True})
+
+    sqlite_session.expire_all()
+    stored = sqlite_session.get(PaymentWebhookEvent, event.id)
+    assert (stored.status, stored.attempts, stored.payload) == ('pending', 0, {'retry': True})
+
+
+async def test_claims_batches_and_retries(sqlite_db):
+    events = [(await _enqueue(sqlite_db, f'k{index}'))[0] for index in range(3)]
+
+    first = await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=2, lease_seconds=60)
+    second = await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=2, lease_seconds=60)
+    assert first == [events[0].id, events[1].id]
+    assert second == [events[2].id]
+    assert await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=5, lease_seconds=60) == []
+
+    await mark_payment_webhook_event_processed(sqlite_db, events[0].id, now=NOW)
+    retry_at = NOW + timedelta(seconds=30)
+    await mark_payment_webhook_event_failed(sqlite_db, events[1].id, error='panel down', retry_at=retry_at)
+
+    assert await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=5, lease_seconds=60) == []
+    assert await claim_payment_webhook_events(sqlite_db, now=retry_at, batch_size=5, lease_seconds=60) == [events[1].id]
+
+    counts = await get_payment_webhook_event_counts(sqlite_db)
+    assert counts == {'pending': 0, 'processing': 2, 'processed': 1, 'failed': 0}
+
+
+async def test_expired_lease_is_reclaimed(sqlite_db):
+    event, _ = await _enqueue(sqlite_db, 'k')
+
+    assert await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=5, lease_seconds=60) == [event.id]
+    later = NOW + timedelta(seconds=61)
+    assert await claim_payment_webhook_events(sqlite_db, now=later, batch_size=5, lease_seconds=60) == [event.id]
+
+
+async def test_claim_query_skips_locked_rows_on_postgresql(sqlite_db):
+    await _enqueue(sqlite_db, 'k')
+    sqlite_db.statements.clear()
+
+    await claim_payment_webhook_events(sqlite_db, now=NOW, batch_size=5, lease_seconds=60)
+
+    sql = str(sqlite_db.statements[0].compile(dialect=postgresql.dialect()))
+    assert 'FOR UPDATE SKIP LOCKED' in sql
+
+
+async def test_old_processed_events_are_deleted(sqlite_db, sqlite_session):
+    old, _ = await _enqueue(sqlite_db, 'old')
+    fresh, _ = await _enqueue(sqlite_db, 'fresh')
+    await mark_payment_webhook_event_processed(sqlite_db, old.id, now=NOW - timedelta(days=40))
+    await mark_payment_webhook_event_processed(sqlite_db, fresh.id, now=NOW)
+
+    assert await delete_processed_payment_webhook_events(sqlite_db, before=NOW - timedelta(days=30)) == 1
+    assert [event.event_key for event in sqlite_session.query(PaymentWebhookEvent)] == ['fresh']
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.database.crud.promocode import release_promocode_use, reserve_promocode_use, use_promocode
+from app.database.models import Base, PromoCode, PromoCodeType, PromoCodeUse
+
+
+WORKERS = 32
+ATTEMPTS = 200
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "promocodes.db"}',
+        connect_args={'timeout': 30, 'check_same_thread': False},
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _promocode(engine, **overrides) -> int:
+    values = {
+        'code': 'FLASH',
+        'type': PromoCodeType.BALANCE.value,
+        'balance_bonus_kopeks': 10000,
+        'max_uses': 50,
+        'current_uses': 0,
+        'is_active': True,
+        'valid_from': datetime.now(UTC) - timedelta(hours=1),
+    }
+    values.update(overrides)
+    with Session(engine) as session:
+        promocode = PromoCode(**values)
+        session.add(promocode)
+        session.commit()
+        return promocode.id
+
+
+def _fire(engine, session_adapter, attempts: int, redeem) -> list:
+    """Запускает попытки из параллельных потоков; у каждого своя сессия."""
+    barrier = threading.Barrier(WORKERS)
+
+    def worker(worker_index: int) -> list:
+        barrier.wait()
+        results = []
+        for attempt in range(worker_index, attempts, WORKERS):
+            with Session(engine) as session:
+                results.append(asyncio.run(redeem(session_adapter(session), attempt)))
+        return results
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        chunks = list(executor.map(worker, range(WORKERS)))
+    return [result for chunk in chunks for result in chunk]
+
+
+def _current_uses(engine, promocode_id: int) -> int:
+    with Session(engine) as session:
+        return session.get(PromoCode, promocode_id).current_uses
+
+
+async def _reserve_and_commit(db, promocode_id):
+    current_uses = await reserve_promocode_use(db, promocode_id)
+    await db.commit()
+    return current_uses
+
+
+def test_concurrent_reservations_never_exceed_max_uses(engine, session_adapter):
+    promocode_id = _promocode(engine, max_uses=50)
+
+    results = _fire(engine, session_adapter, ATTEMPTS, lambda db, _: _reserve_and_commit(db, promocode_id))
+
+    granted = [value for value in results if value is not None]
+    assert sorted(granted) == list(range(1, 51))
+    assert results.count(None) == ATTEMPTS - 50
+    assert _current_uses(engine, promocode_id) == 50
+
+
+def test_concurrent_redemptions_record_exact_usage(engine, session_adapter):
+    promocode_id = _promocode(engine, max_uses=75)
+
+    results = _fire(
+        engine, session_adapter, ATTEMPTS, lambda db, attempt: use_promocode(db, promocode_id, user_id=attempt + 1)
+    )
+
+    assert results.count(True) == 75
+    assert _current_uses(engine, promocode_id) == 75
+    with Session(engine) as session:
+        uses = session.scalar(select(func.count(PromoCodeUse.id)).where(PromoCodeUse.promocode_id == promocode_id))
+    assert uses == 75
+
+
+def test_released_uses_can_be_taken_again(engine, session_adapter):
+    promocode_id = _promocode(engine, max_uses=10, current_uses=10)
+
+    released = _fire(engine, session_adapter, 4, lambda db, _: _release_and_commit(db, promocode_id))
+    retaken = _fire(engine, session_adapter, 40, lambda db, _: _reserve_and_commit(db, promocode_id))
+
+    assert sorted(released) == [6, 7, 8, 9]
+    assert sum(value is not None for value in retaken) == 4
+    assert _current_uses(engine, promocode_id) == 10
+
+
+async def _release_and_commit(db, promocode_id):
+    current_uses = await release_promocode_use(db, promocode_id)
+    await db.commit()
+    return current_uses
+
+
+async def test_release_never_goes_below_zero(engine, session_adapter):
+    promocode_id = _promocode(engine, current_uses=0)
+
+    with Session(engine) as session:
+        assert await release_promocode_use(session_adapter(session), promocode_id) is None
+
+
+@pytest.mark.parametrize(
+    'overrides',
+    [
+        {'is_active': False},
+        {'valid_until': datetime.now(UTC) - timedelta(minutes=1)},
+        {'valid_from': datetime.now(UTC) + timedelta(hours=1)},
+        {'max_uses': 3, 'current_uses': 3},
+    ],
+)
+async def test_invalid_promocode_is_not_reserved(engine, session_adapter, overrides):
+    promocode_id = _promocode(engine, **overrides)
+
+    with Session(engine) as session:
+        assert await reserve_promocode_use(session_adapter(session), promocode_id) is None
+        session.commit()
+
+    assert _current_uses(engine, promocode_id) == overrides.get('current_uses', 0)
@@ -0,0 +1,174 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.database.crud.server_squad import get_server_statistics
+from app.database.crud.subscription import get_subscriptions_statistics, get_tariff_subscriptions_statistics
+from app.database.crud.transaction import get_transactions_statistics
+from app.database.crud.user import get_users_statistics
+from app.database.models import (
+    PaymentMethod,
+    ServerSquad,
+    Subscription,
+    SubscriptionServer,
+    SubscriptionStatus,
+    Tariff,
+    Transaction,
+    TransactionType,
+    User,
+    UserStatus,
+)
+
+
+@pytest.fixture
+def db(sqlite_session, sqlite_db):
+    now = datetime.now(UTC)
+    sqlite_session.add(Tariff(id=1, name='Base', display_order=1))
+    sqlite_session.add_all(
+        [
+            User(id=1, telegram_id=1, status=UserStatus.ACTIVE.value, created_at=now),
+            User(id=2, telegram_id=2, status=UserStatus.ACTIVE.value, created_at=now - timedelta(days=10)),
+            User(id=3, telegram_id=3, status=UserStatus.BLOCKED.value, created_at=now),
+        ]
+    )
+    sqlite_session.add_all(
+        [
+            Subscription(
+                user_id=1,
+                status=SubscriptionStatus.ACTIVE.value,
+                is_trial=True,
+                end_date=now + timedelta(days=3),
+                created_at=now,
+                tariff_id=1,
+            ),
+            Subscription(
+                user_id=2,
+                status=SubscriptionStatus.ACTIVE.value,
+                is_trial=False,
+                end_date=now + timedelta(days=30),
+                created_at=now - timedelta(days=10),
+                tariff_id=1,
+            ),
+            Subscription(
+                user_id=3,
+                status=SubscriptionStatus.EXPIRED.value,
+                is_trial=False,
+                end_date=now - timedelta(days=1),
+                created_at=now,
+            ),
+        ]
+    )
+    sqlite_session.add_all(
+        [
+            Transaction(
+                user_id=1,
+                type=TransactionType.DEPOSIT.value,
+                amount_kopeks=10000,
+                payment_method=PaymentMethod.YOOKASSA.value,
+                created_at=now,
+            ),
+            Transaction(
+                user_id=1,
+                type=TransactionType.DEPOSIT.value,
+                amount_kopeks=500,
+                payment_method=PaymentMethod.MANUAL.value,
+                created_at=now,
+            ),
+            Transaction(
+                user_id=2,
+                type=TransactionType.SUBSCRIPTION_PAYMENT.value,
+                amount_kopeks=-3000,
+                created_at=now,
+            ),
+            Transaction(
+                user_id=2,
+                type=TransactionType.WITHDRAWAL.value,
+                amount_kopeks=700,
+                created_at=now,
+                is_completed=False,
+            ),
+        ]
+    )
+    sqlite_session.commit()
+    return sqlite_db
+
+
+async def test_users_statistics(db):
+    stats = await get_users_statistics(db)
+
+    assert stats == {
+        'total_users': 3,
+        'active_users': 2,
+        'blocked_users': 1,
+        'new_today': 1,
+        'new_week': 1,
+        'new_month': 2,
+    }
+
+
+async def test_subscriptions_statistics(db):
+    stats = await get_subscriptions_statistics(db)
+
+    assert stats['total_subscriptions'] == 3
+    assert stats['active_subscriptions'] == 2
+    assert stats['trial_subscriptions'] == 1
+    assert stats['paid_subscriptions'] == 1
+    assert stats['purchased_today'] == 1
+    assert stats['purchased_week'] == 1
+    assert stats['purchased_month'] == 2
+
+    by_tariff = await get_tariff_subscriptions_statistics(db)
+    assert by_tariff == {
+        1: {
+            'active_subscriptions': 2,
+            'trial_subscriptions': 1,
+            'purchased_today': 0,
+            'purchased_week': 0,
+            'purchased_month': 1,
+        }
+    }
+
+
+async def test_transactions_statistics(db):
+    now = datetime.now(UTC)
+    stats = await get_transactions_statistics(db, now - timedelta(days=1), now + timedelta(minutes=1))
+
+    assert stats['totals'] == {
+        'income_kopeks': 10000,
+        'expenses_kopeks': 0,
+        'profit_kopeks': 10000,
+        'subscription_income_kopeks': 3000,
+    }
+    assert stats['today'] == {'transactions_count': 3, 'income_kopeks': 10000}
+    assert stats['by_type'][TransactionType.DEPOSIT.value] == {'count': 2, 'amount': 10500}
+    assert stats['by_payment_method'] == {
+        PaymentMethod.YOOKASSA.value: {'count': 1, 'amount': 10000},
+        PaymentMethod.MANUAL.value: {'count': 1, 'amount': 500},
+    }
+
+
+async def test_server_statistics(db, sqlite_session):
+    sqlite_session.add_all(
+        [
+            ServerSquad(id=1, squad_uuid='squad-a', display_name='A', is_available=True),
+            ServerSquad(id=2, squad_uuid='squad-b', display_name='B', is_available=True),
+            ServerSquad(id=3, squad_uuid='squad-c', display_name='C', is_available=False),
+        ]
+    )
+    active, _, expired = sqlite_session.query(Subscription).order_by(Subscription.user_id).all()
+    active.connected_squads = ['squad-a']
+    # Подписка истекла: её сервер не считается подключённым
+    expired.connected_squads = ['squad-b']
+    sqlite_session.add(SubscriptionServer(subscription_id=active.id, server_squad_id=1, paid_price_kopeks=2500))
+    sqlite_session.commit()
+
+    stats = await get_server_statistics(db)
+
+    assert stats == {
+        'total_servers': 3,
+        'available_servers': 2,
+        'unavailable_servers': 1,
+        'servers_with_connections': 1,
+        'total_revenue_kopeks': 2500,
+        'total_revenue_rubles': 25.0,
+    }
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.database.crud.user_search import build_user_search_condition, search_users
+from app.database.models import User
+
+
+@pytest.fixture
+def db(sqlite_session, sqlite_db):
+    sqlite_session.add_all(
+        [
+            User(id=1, telegram_id=1001, first_name='Ivan', last_name='Petrov', username='ivanp'),
+            User(id=2, telegram_id=1002, first_name='Maria', username='mari_ivanova'),
+            User(id=3, telegram_id=1003, first_name='Олег', email='oleg@example.com'),
+            User(id=4, telegram_id=555, first_name='Petr', username='petr100'),
+        ]
+    )
+    sqlite_session.commit()
+    return sqlite_db
+
+
+def test_search_text_is_maintained_on_write(db):
+    user = db._session.get(User, 1)
+    assert user.search_text == 'ivan petrov ivanp'
+
+    user.username = 'Ivan_New'
+    db._session.commit()
+    assert user.search_text == 'ivan petrov ivan_new'
+
+
+async def test_prefix_search_ranks_leading_match_first(db):
+    users, total = await search_users(db, 'iva')
+
+    assert total == 1
+    assert [user.id for user in users] == [1]
+
+    users, total = await search_users(db, 'OLEG')
+    assert [user.id for user in users] == [3]
+
+
+async def test_numeric_search_uses_id_and_telegram_id_only(db):
+    users, total = await search_users(db, '1002')
+    assert [user.id for user in users] == [2]
+
+    users, total = await search_users(db, '4')
+    assert [user.id for user in users] == [4]
+
+    # Цифры в username числовым запросом не ищутся
+    users, total = await search_users(db, '100')
+    assert total == 0
+
+
+async def test_page_beyond_results_still_reports_total(db):
+    users, total = await search_users(db, 'p', limit=1, offset=5)
+
+    assert users == []
+    assert total == 2
+
+
+def test_postgres_uses_trigram_friendly_ilike():
+    condition = build_user_search_condition('Ivan_', 'postgresql')
+    compiled = str(condition.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+    assert compiled.count('ILIKE') == 4
+    assert 'ivan\\\\_' in compiled
+    assert 'search_text' not in compiled
+
+    short = build_user_search_condition('iv', 'postgresql')
+    short_compiled = str(short.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert "'iv%%'" in short_compiled
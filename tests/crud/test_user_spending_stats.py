@@ -0,0 +1,139 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from app.database import universal_migration
+from app.database.crud import user_spending_stats
+from app.database.crud.transaction import get_user_total_spent_kopeks
+from app.database.crud.user_spending_stats import rebuild_user_spending_stats
+from app.database.models import Base, Transaction, TransactionType, User, UserSpendingStats
+
+
+@pytest.fixture
+def session(sqlite_session):
+    sqlite_session.add_all([User(id=1, telegram_id=101), User(id=2, telegram_id=102)])
+    sqlite_session.commit()
+    return sqlite_session
+
+
+def _payment(user_id: int, amount: int, *, completed: bool = True, type_: TransactionType | None = None):
+    return Transaction(
+        user_id=user_id,
+        type=(type_ or TransactionType.SUBSCRIPTION_PAYMENT).value,
+        amount_kopeks=amount,
+        is_completed=completed,
+    )
+
+
+def _stats(session: Session, user_id: int) -> tuple[int, int] | None:
+    session.expire_all()
+    row = session.get(UserSpendingStats, user_id)
+    return (row.total_spent_kopeks, row.purchase_count) if row else None
+
+
+def test_rollup_follows_transaction_writes(session):
+    session.add_all(
+        [
+            _payment(1, 10000),
+            _payment(1, -5000),  # часть оплат пишется с минусом
+            _payment(1, 7000, type_=TransactionType.DEPOSIT),
+            _payment(2, 3000, completed=False),
+        ]
+    )
+    session.commit()
+
+    assert _stats(session, 1) == (15000, 2)
+    assert _stats(session, 2) is None
+
+    pending = session.query(Transaction).filter_by(user_id=2).one()
+    pending.is_completed = True
+    session.commit()
+    assert _stats(session, 2) == (3000, 1)
+
+    pending.amount_kopeks = 4500
+    session.commit()
+    assert _stats(session, 2) == (4500, 1)
+
+    session.delete(pending)
+    session.commit()
+    assert _stats(session, 2) == (0, 0)
+
+
+async def test_rebuild_matches_transactions(session, sqlite_db):
+    session.add_all([_payment(1, 10000), _payment(1, 2000), _payment(2, 500)])
+    session.commit()
+    # Массовое удаление обходит ORM — свёртка расходится с транзакциями
+    session.execute(delete(Transaction).where(Transaction.user_id == 2))
+    session.commit()
+
+    rebuilt = await rebuild_user_spending_stats(sqlite_db)
+
+    assert rebuilt == 1
+    assert _stats(session, 1) == (12000, 2)
+    assert _stats(session, 2) is None
+
+
+class _AsyncConnectionAdapter:
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, statement, params=None):
+        return self._conn.execute(statement, params)
+
+
+class _AsyncEngineAdapter:
+    """Минимальная асинхронная обёртка над синхронным движком для кода миграции."""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.dialect = engine.dialect
+
+    @asynccontextmanager
+    async def begin(self):
+        with self._engine.begin() as conn:
+            yield _AsyncConnectionAdapter(conn)
+
+
+async def test_upgrade_backfills_rollup_created_by_init_db(tmp_path, monkeypatch, session_adapter):
+    engine = create_engine(f'sqlite:///{tmp_path / "upgrade.db"}')
+    # init_db: create_all создаёт пустую свёртку раньше универсальной миграции
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{'id': 1, 'telegram_id': 101}, {'id': 2, 'telegram_id': 102}])
+        # История до появления свёртки: вставка в обход ORM-событий
+        conn.execute(
+            Transaction.__table__.insert(),
+            [
+                {'user_id': 1, 'type': TransactionType.SUBSCRIPTION_PAYMENT.value, 'amount_kopeks': 10000},
+                {'user_id': 1, 'type': TransactionType.SUBSCRIPTION_PAYMENT.value, 'amount_kopeks': -5000},
+                {'user_id': 2, 'type': TransactionType.DEPOSIT.value, 'amount_kopeks': 7000},
+            ],
+        )
+
+    @asynccontextmanager
+    async def session_factory():
+        with Session(engine) as session:
+            yield session_adapter(session)
+
+    rebuilds = []
+
+    async def counting_rebuild(db, user_ids=None):
+        rebuilds.append(user_ids)
+        return await rebuild_user_spending_stats(db, user_ids)
+
+    monkeypatch.setattr(universal_migration, 'engine', _AsyncEngineAdapter(engine))
+    monkeypatch.setattr(universal_migration, 'AsyncSessionLocal', session_factory)
+    monkeypatch.setattr(user_spending_stats, 'rebuild_user_spending_stats', counting_rebuild)
+
+    assert await universal_migration.create_user_spending_stats_table()
+
+    async with session_factory() as db:
+        assert await get_user_total_spent_kopeks(db, 1) == 15000
+        assert await get_user_total_spent_kopeks(db, 2) == 0
+
+    # Маркер выставлен и свёртка заполнена: повторный запуск не пересчитывает
+    assert await universal_migration.create_user_spending_stats_table()
+    assert len(rebuilds) == 1
+    engine.dispose()
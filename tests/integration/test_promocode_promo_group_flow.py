@@ -77,6 +77,9 @@ async def test_promo_group_promocode_full_workflow(
     create_usage_mock = AsyncMock()
     monkeypatch.setattr('app.services.promocode_service.create_promocode_use', create_usage_mock)
 
+    reserve_use_mock = AsyncMock(return_value=1)
+    monkeypatch.setattr('app.services.promocode_service.reserve_promocode_use', reserve_use_mock)
+
     # Execute: User activates promocode
     service = PromoCodeService()
     result = await service.activate_promocode(mock_db_session, sample_user.id, 'INTEGRATIONTEST')
@@ -101,7 +104,8 @@ async def test_promo_group_promocode_full_workflow(
     create_usage_mock.assert_awaited_once_with(mock_db_session, promocode.id, sample_user.id)
 
     # Verify: Counter incremented
-    assert promocode.current_uses == 1
+    reserve_use_mock.assert_awaited_once_with(mock_db_session, promocode.id)
+    assert result['promocode']['current_uses'] == 1
 
     # Verify: Database committed
     mock_db_session.commit.assert_awaited()
@@ -158,6 +162,9 @@ async def test_duplicate_promo_group_assignment_edge_case(
     create_usage_mock = AsyncMock()
     monkeypatch.setattr('app.services.promocode_service.create_promocode_use', create_usage_mock)
 
+    reserve_use_mock = AsyncMock(return_value=6)
+    monkeypatch.setattr('app.services.promocode_service.reserve_promocode_use', reserve_use_mock)
+
     # Execute
     service = PromoCodeService()
     result = await service.activate_promocode(mock_db_session, sample_user.id, 'DUPLICATE')
@@ -172,7 +179,7 @@ async def test_duplicate_promo_group_assignment_edge_case(
     create_usage_mock.assert_awaited_once()
 
     # Verify: Counter still incremented
-    assert promocode.current_uses == 6
+    assert result['promocode']['current_uses'] == 6
 
 
 async def test_missing_promo_group_graceful_failure(
@@ -230,6 +237,9 @@ async def test_missing_promo_group_graceful_failure(
     create_usage_mock = AsyncMock()
     monkeypatch.setattr('app.services.promocode_service.create_promocode_use', create_usage_mock)
 
+    reserve_use_mock = AsyncMock(return_value=1)
+    monkeypatch.setattr('app.services.promocode_service.reserve_promocode_use', reserve_use_mock)
+
     # Execute
     service = PromoCodeService()
     result = await service.activate_promocode(mock_db_session, sample_user.id, 'ORPHANED')
@@ -247,4 +257,4 @@ async def test_missing_promo_group_graceful_failure(
     create_usage_mock.assert_awaited_once()
 
     # Verify: Counter still incremented
-    assert promocode.current_uses == 1
+    assert result['promocode']['current_uses'] == 1
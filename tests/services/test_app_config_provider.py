@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.services.app_config_provider import SOURCE_FILE, SOURCE_REMNAWAVE, AppConfigProvider, etag_matches
+from app.webapi.routes import miniapp
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def provider(clock, monkeypatch):
+    monkeypatch.setattr(settings, 'APP_CONFIG_REFRESH_SECONDS', 60)
+    return AppConfigProvider(clock=clock)
+
+
+def _write(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_file_is_parsed_again_only_after_change(provider, tmp_path):
+    path = tmp_path / 'app-config.json'
+    _write(path, {'platforms': {'ios': []}}, mtime_ns=1_000_000_000)
+
+    first = provider.get_file_config([path])
+    assert provider.get_file_config([path]) is first
+    assert first.source == SOURCE_FILE
+    assert json.loads(first.body) == {'platforms': {'ios': []}}
+
+    _write(path, {'platforms': {'android': []}}, mtime_ns=2_000_000_000)
+    second = provider.get_file_config([path])
+
+    assert second is not first
+    assert second.etag != first.etag
+    assert second.data == {'platforms': {'android': []}}
+
+
+def test_broken_file_keeps_last_good_copy(provider, tmp_path):
+    path = tmp_path / 'app-config.json'
+    _write(path, {'platforms': {}}, mtime_ns=1_000_000_000)
+    good = provider.get_file_config([path])
+
+    path.write_text('{"platforms": ', encoding='utf-8')
+
+    assert provider.get_file_config([path]) is good
+
+
+def test_first_readable_candidate_wins(provider, tmp_path):
+    broken = tmp_path / 'broken.json'
+    broken.write_text('[1, 2]', encoding='utf-8')
+    valid = tmp_path / 'valid.json'
+    _write(valid, {'config': {}})
+
+    snapshot = provider.get_file_config([tmp_path / 'missing.json', broken, valid])
+
+    assert snapshot.data == {'config': {}}
+
+
+def test_copy_data_is_independent(provider, tmp_path):
+    path = tmp_path / 'app-config.json'
+    _write(path, {'platforms': {'ios': [{'name': 'Happ'}]}})
+    snapshot = provider.get_file_config([path])
+
+    copy = snapshot.copy_data()
+    copy['platforms']['ios'][0]['deepLink'] = 'happ://add/x'
+
+    assert 'deepLink' not in snapshot.data['platforms']['ios'][0]
+
+
+async def test_remnawave_config_is_fetched_once_per_interval(provider, clock):
+    calls = []
+
+    async def fetch(config_uuid):
+        calls.append(config_uuid)
+        await asyncio.sleep(0)
+        return {'platforms': {'ios': {'apps': []}}}
+
+    provider._fetch_remnawave_config = fetch
+
+    results = await asyncio.gather(*(provider.get_remnawave_config('uuid-1') for _ in range(5)))
+    assert calls == ['uuid-1']
+    assert all(snapshot is results[0] for snapshot in results)
+    assert results[0].source == SOURCE_REMNAWAVE
+
+    clock.now += 61
+    refreshed = await provider.get_remnawave_config('uuid-1')
+
+    assert calls == ['uuid-1', 'uuid-1']
+    # Содержимое не изменилось — тот же снимок и ETag
+    assert refreshed is results[0]
+
+
+async def test_panel_outage_serves_last_good_copy(provider, clock):
+    responses = [{'platforms': {}}, RuntimeError('panel down')]
+
+    async def fetch(config_uuid):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    provider._fetch_remnawave_config = fetch
+    good = await provider.get_remnawave_config('uuid-1')
+
+    clock.now += 61
+    assert await provider.get_remnawave_config('uuid-1') is good
+    # До следующего интервала панель не запрашивается повторно
+    assert await provider.get_remnawave_config('uuid-1') is good
+    assert provider.remnawave_fetches == 1
+
+
+async def test_cabinet_falls_back_to_file_without_panel_config(provider, tmp_path, monkeypatch):
+    path = tmp_path / 'app-config.json'
+    _write(path, {'platforms': {}})
+    monkeypatch.setattr(settings, 'APP_CONFIG_PATH', str(path))
+
+    async def fetch(config_uuid):
+        return None
+
+    provider._fetch_remnawave_config = fetch
+
+    snapshot = await provider.get_cabinet_config('uuid-1')
+
+    assert snapshot.source == SOURCE_FILE
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"abc"', 'W/"abc", "def"')
+    assert etag_matches('"abc"', '*')
+    assert not etag_matches('"abc"', '"def"')
+    assert not etag_matches('"abc"', None)
+
+
+def _request(headers=None):
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({'type': 'http', 'method': 'GET', 'path': '/app-config.json', 'headers': raw_headers})
+
+
+async def test_miniapp_app_config_answers_304_for_known_etag(provider, tmp_path, monkeypatch):
+    path = tmp_path / 'app-config.json'
+    _write(path, {'platforms': {'ios': []}})
+    monkeypatch.setattr(miniapp, 'app_config_provider', provider)
+    monkeypatch.setattr(miniapp, '_get_app_config_candidate_files', lambda: (path,))
+
+    response = await miniapp.get_app_config(_request())
+    etag = response.headers['etag']
+
+    assert response.status_code == 200
+    assert json.loads(response.body) == {'platforms': {'ios': []}}
+
+    not_modified = await miniapp.get_app_config(_request({'If-None-Match': etag}))
+
+    assert not_modified.status_code == 304
+    assert not_modified.body == b''
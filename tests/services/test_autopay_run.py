@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services import monitoring_service as monitoring_module
+from app.services.monitoring_service import (
+    AUTOPAY_CHARGED,
+    AUTOPAY_INSUFFICIENT_BALANCE,
+    AUTOPAY_SKIPPED,
+    MonitoringService,
+)
+
+
+class _Db:
+    def __init__(self):
+        self.rollbacks = 0
+        self.expired = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def rollback(self):
+        # Как AsyncSession: откат протухает все загруженные в сессию объекты
+        self.rollbacks += 1
+        self.expired = True
+
+
+class _Subscription:
+    def __init__(self, subscription_id: int, db: _Db):
+        self._id = subscription_id
+        self._db = db
+
+    @property
+    def id(self):
+        if self._db.expired:
+            raise RuntimeError('MissingGreenlet: expired attribute accessed after rollback')
+        return self._id
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(settings, 'AUTOPAY_BATCH_SIZE', 2)
+    state = SimpleNamespace(pending=[1, 2, 3], claims=[], released=[], events=[], sessions=[])
+
+    def session_factory():
+        session = _Db()
+        state.sessions.append(session)
+        return session
+
+    async def claim(db, *, now, batch_size, lease_seconds):
+        batch, state.pending = state.pending[:batch_size], state.pending[batch_size:]
+        state.claims.append(batch)
+        return batch
+
+    async def load(db, ids):
+        return [_Subscription(subscription_id, db) for subscription_id in ids]
+
+    async def release(db, ids):
+        state.released.extend(ids)
+
+    monkeypatch.setattr(monitoring_module, 'claim_autopay_subscriptions', claim)
+    monkeypatch.setattr(monitoring_module, 'get_subscriptions_for_autopay_charge', load)
+    monkeypatch.setattr(monitoring_module, 'release_autopay_claims', release)
+    monkeypatch.setattr(monitoring_module, 'AsyncSessionLocal', session_factory)
+    return state
+
+
+@pytest.fixture
+def service(queue):
+    service = MonitoringService()
+
+    async def log_event(db, event_type, message, data=None, is_success=True):
+        queue.events.append((event_type, data, is_success))
+
+    service._log_monitoring_event = log_event
+    return service
+
+
+async def test_run_processes_batches_and_records_outcomes(service, queue):
+    outcomes = {1: AUTOPAY_CHARGED, 2: AUTOPAY_INSUFFICIENT_BALANCE, 3: AUTOPAY_SKIPPED}
+
+    async def charge(db, subscription):
+        return outcomes[subscription.id]
+
+    service._charge_autopay_subscription = charge
+    await service._process_autopayments(_Db())
+
+    run = service.last_autopay_run
+    assert queue.claims == [[1, 2], [3]]
+    assert queue.released == [1, 2, 3]
+    assert (run.batches, run.claimed, run.charged, run.insufficient_balance, run.skipped) == (2, 3, 1, 1, 1)
+
+    event_type, data, is_success = queue.events[0]
+    assert event_type == 'autopayments_processed'
+    assert data['processed'] == 1
+    assert data['failed'] == 1
+    assert data['run']['claimed'] == 3
+    assert is_success is True
+
+
+async def test_charge_error_does_not_stop_the_run(service, queue):
+    async def charge(db, subscription):
+        if subscription.id == 2:
+            raise RuntimeError('panel down')
+        return AUTOPAY_CHARGED
+
+    service._charge_autopay_subscription = charge
+    await service._process_autopayments(_Db())
+
+    run = service.last_autopay_run
+    assert run.charged == 2
+    assert run.errors == 1
+    assert [session.rollbacks for session in queue.sessions] == [0, 1, 0]
+    assert queue.released == [1, 2, 3]
+    assert queue.events[0][2] is False
+
+
+async def test_failed_charge_does_not_expire_rest_of_batch(service, queue, monkeypatch):
+    monkeypatch.setattr(settings, 'AUTOPAY_BATCH_SIZE', 3)
+    charged = []
+
+    async def charge(db, subscription):
+        if subscription.id == 1:
+            raise RuntimeError('panel down')
+        charged.append(subscription.id)
+        return AUTOPAY_CHARGED
+
+    service._charge_autopay_subscription = charge
+    await service._process_autopayments(_Db())
+
+    assert queue.claims[0] == [1, 2, 3]
+    assert charged == [2, 3]
+    assert (service.last_autopay_run.charged, service.last_autopay_run.errors) == (2, 1)
@@ -0,0 +1,150 @@
+import json
+
+from app.config import settings
+from app.services.cache_invalidation_service import CacheInvalidationBus
+from app.services.system_settings_service import bot_configuration_service
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.published: list[tuple[str, str]] = []
+
+    async def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def get(self, key):
+        value = self.values.get(key)
+        return str(value).encode() if value is not None else None
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+def _message(topic, version, payload=None, origin='other-node'):
+    return json.dumps({'origin': origin, 'topic': topic, 'version': version, 'payload': payload})
+
+
+async def test_publish_sends_versioned_message():
+    bus = CacheInvalidationBus()
+    fake_redis = _FakeRedis()
+    bus._redis = fake_redis
+
+    first = await bus.publish('menu_layout')
+    second = await bus.publish('menu_layout', {'reason': 'save'})
+
+    assert (first, second) == (1, 2)
+    channel, raw = fake_redis.published[-1]
+    assert channel == settings.CACHE_INVALIDATION_CHANNEL
+    data = json.loads(raw)
+    assert data['version'] == 2
+    assert data['origin'] == bus.instance_id
+    assert data['payload'] == {'reason': 'save'}
+
+
+async def test_publish_without_redis_stays_local():
+    bus = CacheInvalidationBus()
+
+    assert await bus.publish('rules') == 1
+    assert await bus.publish('rules') == 2
+    assert not bus.is_distributed()
+
+
+async def test_handle_message_skips_stale_full_invalidations():
+    bus = CacheInvalidationBus()
+    calls = []
+    bus.register('menu_layout', calls.append)
+
+    assert await bus.handle_message(_message('menu_layout', 3, {'a': 1}))
+    assert not await bus.handle_message(_message('menu_layout', 2))
+    assert not await bus.handle_message(_message('menu_layout', 3))
+    assert not await bus.handle_message(_message('menu_layout', 4, origin=bus.instance_id))
+    assert await bus.handle_message(_message('menu_layout', 5))
+
+    assert calls == [{'a': 1}, None]
+    assert bus.get_applied_version('menu_layout') == 5
+
+
+async def test_interleaved_events_for_different_keys_are_all_applied():
+    bus = CacheInvalidationBus()
+    calls = []
+    bus.register('system_settings', calls.append)
+
+    # Узлы A и B публикуют почти одновременно: событие с версией 2 приходит раньше версии 1
+    assert await bus.handle_message(_message('system_settings', 2, {'key': 'B', 'raw_value': 'b'}))
+    assert await bus.handle_message(_message('system_settings', 1, {'key': 'A', 'raw_value': 'a'}))
+    # Устаревшее событие того же ключа не должно перезаписать новое значение
+    assert not await bus.handle_message(_message('system_settings', 1, {'key': 'B', 'raw_value': 'old'}))
+
+    assert calls == [{'key': 'B', 'raw_value': 'b'}, {'key': 'A', 'raw_value': 'a'}]
+    assert bus.get_applied_version('system_settings') == 2
+
+
+async def test_full_invalidation_supersedes_older_key_events():
+    bus = CacheInvalidationBus()
+    calls = []
+    bus.register('system_settings', calls.append)
+
+    assert await bus.handle_message(_message('system_settings', 5))
+    assert not await bus.handle_message(_message('system_settings', 4, {'key': 'A', 'raw_value': 'a'}))
+    assert await bus.handle_message(_message('system_settings', 6, {'key': 'A', 'raw_value': 'b'}))
+
+    assert calls == [None, {'key': 'A', 'raw_value': 'b'}]
+
+
+async def test_resync_invalidates_topics_missed_while_disconnected():
+    bus = CacheInvalidationBus()
+    fake_redis = _FakeRedis()
+    bus._redis = fake_redis
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+
+    bus.register('rules', handler)
+
+    # Первое подключение только запоминает текущую версию
+    fake_redis.values['bedolaga:cache-version:rules'] = 4
+    assert await bus.resync_versions() == []
+
+    fake_redis.values['bedolaga:cache-version:rules'] = 6
+    assert await bus.resync_versions() == ['rules']
+    assert calls == [None]
+
+
+async def test_failing_handler_does_not_block_others():
+    bus = CacheInvalidationBus()
+    calls = []
+
+    def broken(payload):
+        raise RuntimeError('boom')
+
+    bus.register('locales', broken)
+    bus.register('locales', calls.append)
+
+    await bus.handle_message(_message('locales', 1))
+
+    assert calls == [None]
+
+
+async def test_remote_settings_change_is_applied(monkeypatch):
+    bot_configuration_service.initialize_definitions()
+    monkeypatch.setattr(settings, 'SUPPORT_USERNAME', '@local')
+    monkeypatch.setattr(bot_configuration_service, '_overrides_raw', {})
+    monkeypatch.setattr(bot_configuration_service, '_env_override_keys', set())
+
+    await bot_configuration_service._handle_remote_invalidation({'key': 'SUPPORT_USERNAME', 'raw_value': '@remote'})
+
+    assert settings.SUPPORT_USERNAME == '@remote'
+    assert bot_configuration_service.has_override('SUPPORT_USERNAME')
+
+    original = dict(bot_configuration_service._original_values)
+    original['SUPPORT_USERNAME'] = '@original'
+    monkeypatch.setattr(bot_configuration_service, '_original_values', original)
+
+    await bot_configuration_service._handle_remote_invalidation({'key': 'SUPPORT_USERNAME', 'reset': True})
+
+    assert settings.SUPPORT_USERNAME == '@original'
+    assert not bot_configuration_service.has_override('SUPPORT_USERNAME')
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.services import daily_subscription_service as daily_module
+from app.services.daily_subscription_service import DailySubscriptionService
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def rollback(self):
+        return None
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, 'DAILY_BILLING_BATCH_SIZE', 2)
+    monkeypatch.setattr(settings, 'DAILY_BILLING_CONCURRENCY', 2)
+    monkeypatch.setattr(daily_module, 'IS_SQLITE', False)
+    monkeypatch.setattr(daily_module, 'AsyncSessionLocal', _Session)
+
+    pending = [1, 2, 3, 4, 5]
+
+    async def due_ids(db, *, now, after_id=0, limit=100):
+        return [subscription_id for subscription_id in pending if subscription_id > after_id][:limit]
+
+    monkeypatch.setattr(daily_module, 'get_due_daily_subscription_ids', due_ids)
+    return DailySubscriptionService()
+
+
+async def test_run_charges_batches_with_bounded_concurrency(service):
+    outcomes = {1: 'charged', 2: 'suspended', 3: 'skipped', 4: 'charged', 5: 'charged'}
+    state = SimpleNamespace(active=0, peak=0, seen=[])
+
+    async def charge(db, subscription_id, now):
+        state.active += 1
+        state.peak = max(state.peak, state.active)
+        await asyncio.sleep(0)
+        state.active -= 1
+        state.seen.append(subscription_id)
+        return outcomes[subscription_id]
+
+    service._process_single_charge = charge
+    stats = await service.process_daily_charges()
+
+    assert sorted(state.seen) == [1, 2, 3, 4, 5]
+    assert state.peak == 2
+    assert (stats['batches'], stats['checked'], stats['charged']) == (3, 5, 3)
+    assert (stats['suspended'], stats['skipped'], stats['errors']) == (1, 1, 0)
+    assert service.last_run.throughput_per_second >= 0
+
+
+async def test_failed_charge_is_counted_and_run_continues(service):
+    async def charge(db, subscription_id, now):
+        if subscription_id == 2:
+            raise RuntimeError('db down')
+        return 'charged'
+
+    service._process_single_charge = charge
+    stats = await service.process_daily_charges()
+
+    assert stats['charged'] == 4
+    assert stats['errors'] == 1
+
+
+async def test_sqlite_charges_one_at_a_time(service, monkeypatch):
+    monkeypatch.setattr(daily_module, 'IS_SQLITE', True)
+
+    assert service.get_concurrency() == 1
+
+
+async def test_charge_already_billed_for_period_is_skipped(service, monkeypatch):
+    now = datetime(2026, 3, 10, 12, 0, tzinfo=UTC)
+    subscription = SimpleNamespace(
+        id=7,
+        user_id=1,
+        last_daily_charge_at=datetime(2026, 3, 9, 11, 0, tzinfo=UTC),
+        tariff=SimpleNamespace(id=1, name='Daily', daily_price_kopeks=1000),
+    )
+
+    async def claim(db, subscription_id, *, now):
+        return subscription
+
+    class _Db(_Session):
+        def __init__(self):
+            self.rollbacks = 0
+            self.statements = []
+
+        async def scalar(self, statement):
+            self.statements.append(statement)
+            return 99
+
+        async def rollback(self):
+            self.rollbacks += 1
+
+    monkeypatch.setattr(daily_module, 'claim_daily_subscription_for_charge', claim)
+    db = _Db()
+
+    assert await service._process_single_charge(db, 7, now) == 'skipped'
+    assert db.rollbacks == 1
+    assert 'daily:7:2026-03-09T11:00:00+00:00' in str(db.statements[0].compile(compile_kwargs={'literal_binds': True}))
+
+
+async def test_same_day_tariff_switch_is_charged_for_new_period(service, monkeypatch):
+    morning = datetime(2026, 3, 10, 9, 0, tzinfo=UTC)
+    afternoon = datetime(2026, 3, 10, 15, 0, tzinfo=UTC)
+    subscription = SimpleNamespace(
+        id=7,
+        user_id=1,
+        last_daily_charge_at=datetime(2026, 3, 9, 9, 0, tzinfo=UTC),
+        end_date=morning,
+        tariff=SimpleNamespace(id=1, name='Daily', daily_price_kopeks=1000),
+    )
+    user = SimpleNamespace(id=1, telegram_id=100, email=None, balance_kopeks=5000, updated_at=None)
+    billing_keys = []
+
+    async def claim(db, subscription_id, *, now):
+        return subscription
+
+    async def create_transaction(db, **kwargs):
+        billing_keys.append(kwargs['external_id'])
+
+    class _Db(_Session):
+        async def scalar(self, statement):
+            if statement.column_descriptions[0]['entity'] is daily_module.User:
+                return user
+            sql = str(statement.compile(compile_kwargs={'literal_binds': True}))
+            return 99 if any(key in sql for key in billing_keys) else None
+
+    monkeypatch.setattr(daily_module, 'claim_daily_subscription_for_charge', claim)
+    monkeypatch.setattr(daily_module, 'create_transaction', create_transaction)
+
+    assert await service._process_single_charge(_Db(), 7, morning) == 'charged'
+
+    # Смена тарифа сбрасывает отметку списания; новый тариф оплачивается сразу, а не после полуночи
+    subscription.last_daily_charge_at = None
+    subscription.tariff = SimpleNamespace(id=2, name='Daily Plus', daily_price_kopeks=1500)
+
+    assert await service._process_single_charge(_Db(), 7, afternoon) == 'charged'
+    assert billing_keys == ['daily:7:2026-03-09T09:00:00+00:00', 'daily:7:2026-03-11T09:00:00+00:00']
+    assert user.balance_kopeks == 2500
+
+
+async def test_concurrent_charge_rejected_by_unique_key_is_skipped(service, monkeypatch):
+    subscription = SimpleNamespace(
+        id=7,
+        user_id=1,
+        last_daily_charge_at=None,
+        end_date=datetime(2026, 3, 10, 15, 0, tzinfo=UTC),
+        tariff=SimpleNamespace(id=1, name='Daily', daily_price_kopeks=1000),
+    )
+    user = SimpleNamespace(id=1, telegram_id=100, email=None, balance_kopeks=5000, updated_at=None)
+    billing_keys = []
+
+    async def claim(db, subscription_id, *, now):
+        # Каждый запуск видит подписку до коммита параллельного списания
+        subscription.last_daily_charge_at = None
+        subscription.end_date = datetime(2026, 3, 10, 15, 0, tzinfo=UTC)
+        return subscription
+
+    async def create_transaction(db, **kwargs):
+        if kwargs['external_id'] in billing_keys:
+            raise IntegrityError('INSERT INTO transactions', {}, Exception('duplicate key'))
+        billing_keys.append(kwargs['external_id'])
+
+    class _Db(_Session):
+        async def scalar(self, statement):
+            if statement.column_descriptions[0]['entity'] is daily_module.User:
+                return user
+            return None
+
+    monkeypatch.setattr(daily_module, 'claim_daily_subscription_for_charge', claim)
+    monkeypatch.setattr(daily_module, 'create_transaction', create_transaction)
+
+    assert await service._process_single_charge(_Db(), 7, datetime(2026, 3, 10, 12, 0, tzinfo=UTC)) == 'charged'
+    # Ключ не зависит от времени запуска: повтор часом позже упирается в уникальный индекс
+    assert await service._process_single_charge(_Db(), 7, datetime(2026, 3, 10, 13, 0, tzinfo=UTC)) == 'skipped'
+    assert billing_keys == ['daily:7:2026-03-10T15:00:00+00:00']
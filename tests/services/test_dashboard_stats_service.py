@@ -0,0 +1,140 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from app.config import settings
+from app.services import dashboard_stats_service as dashboard_module
+from app.services.dashboard_stats_service import DashboardSnapshot, DashboardStatsService
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _snapshot(marker: int) -> DashboardSnapshot:
+    return DashboardSnapshot(
+        nodes=[],
+        subscriptions={'total_subscriptions': marker},
+        transactions={},
+        revenue=[],
+        servers={},
+        tariffs=[],
+        computed_at=datetime.now(UTC),
+    )
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, 'DASHBOARD_STATS_CACHE_TTL_SECONDS', 60)
+    monkeypatch.setattr(settings, 'DASHBOARD_STATS_STALE_SECONDS', 300)
+    clock = _Clock()
+    service = DashboardStatsService(clock=clock)
+    service.clock = clock
+    service.calls = 0
+    service.release = asyncio.Event()
+
+    async def compute():
+        service.calls += 1
+        await service.release.wait()
+        return _snapshot(service.calls)
+
+    service._compute = compute
+    return service
+
+
+async def test_concurrent_requests_share_one_computation(service):
+    waiters = [asyncio.create_task(service.get_snapshot()) for _ in range(5)]
+    await asyncio.sleep(0)
+    service.release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert service.calls == 1
+    assert all(result is results[0] for result in results)
+
+
+async def test_fresh_snapshot_is_served_from_cache(service):
+    service.release.set()
+    first = await service.get_snapshot()
+    service.clock.now += 30
+
+    assert await service.get_snapshot() is first
+    assert service.calls == 1
+
+
+async def test_stale_snapshot_is_returned_while_refreshing(service):
+    service.release.set()
+    first = await service.get_snapshot()
+    service.release.clear()
+    service.clock.now += 120
+
+    stale = await service.get_snapshot()
+    assert stale is first
+    await asyncio.sleep(0)
+    assert service.calls == 2  # пересчёт запущен в фоне
+
+    service.release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert (await service.get_snapshot()).subscriptions['total_subscriptions'] == 2
+
+
+async def test_expired_snapshot_waits_for_refresh(service):
+    service.release.set()
+    await service.get_snapshot()
+    service.clock.now += 1000
+
+    fresh = await service.get_snapshot()
+    assert fresh.subscriptions['total_subscriptions'] == 2
+
+
+async def test_failed_refresh_keeps_previous_snapshot(service):
+    service.release.set()
+    first = await service.get_snapshot()
+
+    async def failing_compute():
+        raise RuntimeError('db is down')
+
+    service._compute = failing_compute
+    service.clock.now += 120
+    assert await service.get_snapshot() is first
+    await asyncio.sleep(0)
+
+    service.clock.now += 1000
+    with pytest.raises(RuntimeError):
+        await service.get_snapshot(force=True)
+
+
+async def test_failed_tariff_block_does_not_fail_dashboard(monkeypatch):
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+    async def empty_nodes(self):
+        return []
+
+    async def statistics(db, *args, **kwargs):
+        return {'total': 1}
+
+    async def broken_tariffs(db):
+        raise RuntimeError('tariffs table is locked')
+
+    monkeypatch.setattr(dashboard_module, 'AsyncSessionLocal', _Session)
+    monkeypatch.setattr(dashboard_module.RemnaWaveService, 'get_all_nodes', empty_nodes)
+    monkeypatch.setattr(dashboard_module, 'get_subscriptions_statistics', statistics)
+    monkeypatch.setattr(dashboard_module, 'get_transactions_statistics', statistics)
+    monkeypatch.setattr(dashboard_module, 'get_revenue_by_period', statistics)
+    monkeypatch.setattr(dashboard_module, 'get_server_statistics', statistics)
+    monkeypatch.setattr(dashboard_module, '_get_tariff_statistics', broken_tariffs)
+
+    snapshot = await DashboardStatsService().get_snapshot()
+
+    assert snapshot.tariffs is None
+    assert snapshot.subscriptions == snapshot.servers == {'total': 1}
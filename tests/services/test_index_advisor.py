@@ -0,0 +1,45 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.database.models import Subscription, User
+from app.services.index_advisor_service import IndexAdvisor, index_advisor
+
+
+@pytest.fixture
+def db(sqlite_db):
+    return sqlite_db
+
+
+async def test_hot_queries_use_indexes(db):
+    reports = await index_advisor.analyze(db, min_table_rows=0)
+
+    assert {report.name for report in reports} >= {
+        'income_statistics',
+        'users_spending',
+        'expiring_subscriptions',
+        'autopay_subscriptions',
+    }
+    assert all(report.error is None for report in reports)
+    flagged = [report.name for report in reports if report.flagged]
+    assert flagged == []
+
+
+async def test_full_scan_is_flagged_above_threshold(db):
+    db._session.execute(text('DROP INDEX ix_subscriptions_status_end_date'))
+    db._session.execute(text('DROP INDEX ix_subscriptions_autopay_end_date'))
+    db._session.add(User(id=1, telegram_id=100))
+    db._session.add(Subscription(id=1, user_id=1, status='active', end_date=datetime(2030, 1, 1, tzinfo=UTC)))
+    db._session.flush()
+
+    advisor = IndexAdvisor()
+    advisor.register('expiring', 'test', index_advisor._queries['expiring_subscriptions'].build)
+
+    [report] = await advisor.analyze(db, min_table_rows=1)
+    assert report.flagged
+    assert report.sequential_scans[0].table == 'subscriptions'
+    assert report.sequential_scans[0].table_rows == 1
+
+    [report] = await advisor.analyze(db, min_table_rows=10)
+    assert not report.flagged
@@ -0,0 +1,268 @@
+import hashlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services import nalogo_queue_service as queue_service_module, nalogo_receipt_queue as queue_module
+from app.services.nalogo_queue_service import NalogoQueueService
+from app.services.nalogo_receipt_queue import (
+    IN_FLIGHT_KEY,
+    LEGACY_QUEUE_KEY,
+    RECEIPTS_KEY,
+    SCHEDULED_KEY,
+    NalogoReceiptQueue,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FakeRedis:
+    """Redis в памяти; Lua-скрипты очереди повторены на Python."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, bytes]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.lists: dict[str, list[bytes]] = {}
+
+    def _hash(self, key):
+        return self.hashes.setdefault(key, {})
+
+    def _zset(self, key):
+        return self.zsets.setdefault(key, {})
+
+    def _due(self, key, now, limit=None):
+        ids = sorted((score, member) for member, score in self._zset(key).items() if score <= now)
+        ids = [member for _, member in ids]
+        return ids if limit is None else ids[:limit]
+
+    async def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == queue_module.ENQUEUE_SCRIPT:
+            receipts, scheduled, enqueued = keys
+            receipt_id, payload, now = argv
+            if receipt_id in self._hash(receipts):
+                return 0
+            self._hash(receipts)[receipt_id] = payload.encode()
+            self._zset(scheduled)[receipt_id] = float(now)
+            self._zset(enqueued)[receipt_id] = float(now)
+            return 1
+        if script == queue_module.CLAIM_SCRIPT:
+            scheduled, in_flight, receipts = keys
+            now, limit, visible_until = float(argv[0]), int(argv[1]), float(argv[2])
+            for receipt_id in self._due(in_flight, now):
+                del self._zset(in_flight)[receipt_id]
+                self._zset(scheduled)[receipt_id] = now
+            result = []
+            for receipt_id in self._due(scheduled, now, limit):
+                del self._zset(scheduled)[receipt_id]
+                payload = self._hash(receipts).get(receipt_id)
+                if payload is not None:
+                    self._zset(in_flight)[receipt_id] = visible_until
+                    result += [receipt_id.encode(), payload]
+            return result
+        if script == queue_module.ACK_SCRIPT:
+            in_flight, scheduled, receipts, enqueued = keys
+            (receipt_id,) = argv
+            for key in (in_flight, scheduled, enqueued):
+                self._zset(key).pop(receipt_id, None)
+            return int(self._hash(receipts).pop(receipt_id, None) is not None)
+        if script == queue_module.RETRY_SCRIPT:
+            in_flight, scheduled, receipts = keys
+            receipt_id, payload, retry_at = argv
+            if self._zset(in_flight).pop(receipt_id, None) is None:
+                return 0
+            self._hash(receipts)[receipt_id] = payload.encode()
+            self._zset(scheduled)[receipt_id] = float(retry_at)
+            return 1
+        if script == queue_module.MIGRATE_LEGACY_SCRIPT:
+            legacy, receipts, scheduled, enqueued = keys
+            (now,) = argv
+            moved = 0
+            items = self.lists.get(legacy, [])
+            while items:
+                item = items.pop()
+                receipt_id = hashlib.sha1(item).hexdigest()
+                if receipt_id not in self._hash(receipts):
+                    self._hash(receipts)[receipt_id] = item
+                    self._zset(scheduled)[receipt_id] = float(now)
+                    self._zset(enqueued)[receipt_id] = float(now)
+                    moved += 1
+            return moved
+        raise AssertionError('unknown script')
+
+    async def hlen(self, key):
+        return len(self._hash(key))
+
+    async def hvals(self, key):
+        return list(self._hash(key).values())
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def zcard(self, key):
+        return len(self._zset(key))
+
+    async def zcount(self, key, minimum, maximum):
+        return len(self._due(key, float(maximum)))
+
+    async def zrange(self, key, start, end, withscores=False):
+        items = sorted(self._zset(key).items(), key=lambda item: item[1])[start : end + 1]
+        return [(member.encode(), score) for member, score in items]
+
+    async def delete(self, key):
+        return 1
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def redis_client():
+    return _FakeRedis()
+
+
+@pytest.fixture
+def queue(redis_client, clock):
+    return NalogoReceiptQueue(SimpleNamespace(is_connected=True, redis_client=redis_client), clock=clock)
+
+
+async def test_claimed_receipt_stays_until_ack(queue, redis_client):
+    assert await queue.enqueue('pay-1', {'payment_id': 'pay-1', 'amount': 100})
+    assert not await queue.enqueue('pay-1', {'payment_id': 'pay-1', 'amount': 100})
+
+    claimed = await queue.claim(limit=5, visibility_timeout=60)
+
+    assert [receipt.receipt_id for receipt in claimed] == ['pay-1']
+    assert claimed[0].data['amount'] == 100
+    assert await queue.claim(limit=5, visibility_timeout=60) == []
+    assert await queue.depth() == 1
+
+    await queue.ack('pay-1')
+
+    assert await queue.depth() == 0
+    assert redis_client.zsets[IN_FLIGHT_KEY] == {}
+
+
+async def test_unacked_receipt_returns_after_visibility_timeout(queue, clock):
+    await queue.enqueue('pay-1', {'payment_id': 'pay-1'})
+    await queue.claim(limit=1, visibility_timeout=60)
+
+    clock.now += 59
+    assert await queue.claim(limit=1, visibility_timeout=60) == []
+
+    clock.now += 2
+    reclaimed = await queue.claim(limit=1, visibility_timeout=60)
+    assert [receipt.receipt_id for receipt in reclaimed] == ['pay-1']
+
+
+async def test_retry_delays_receipt_and_ignores_expired_claim(queue, clock):
+    await queue.enqueue('pay-1', {'payment_id': 'pay-1'})
+    await queue.claim(limit=1, visibility_timeout=60)
+
+    assert await queue.retry('pay-1', {'payment_id': 'pay-1', 'attempts': 1}, delay_seconds=300)
+    assert not await queue.retry('pay-1', {'payment_id': 'pay-1', 'attempts': 2}, delay_seconds=300)
+
+    clock.now += 299
+    assert await queue.claim(limit=1, visibility_timeout=60) == []
+    clock.now += 1
+    claimed = await queue.claim(limit=1, visibility_timeout=60)
+    assert claimed[0].data['attempts'] == 1
+
+
+async def test_legacy_list_is_migrated_once(queue, redis_client):
+    payload = json.dumps({'payment_id': 'old', 'amount': 50}).encode()
+    redis_client.lists[LEGACY_QUEUE_KEY] = [payload, payload]
+
+    assert await queue.migrate_legacy() == 1
+    assert redis_client.lists[LEGACY_QUEUE_KEY] == []
+    assert await queue.list_receipts() == [{'payment_id': 'old', 'amount': 50}]
+
+
+async def test_metrics_report_depth_and_age(queue, clock):
+    await queue.enqueue('pay-1', {'payment_id': 'pay-1'})
+    clock.now += 30
+    await queue.enqueue('pay-2', {'payment_id': 'pay-2'})
+    await queue.enqueue('pay-3', {'payment_id': 'pay-3'})
+    await queue.claim(limit=2, visibility_timeout=60)
+    await queue.retry('pay-1', {'payment_id': 'pay-1'}, delay_seconds=600)
+    clock.now += 10
+
+    metrics = await queue.get_metrics()
+
+    assert metrics.as_dict() == {
+        'depth': 3,
+        'ready': 1,
+        'delayed': 1,
+        'in_flight': 1,
+        'oldest_age_seconds': 40,
+    }
+
+
+@pytest.fixture
+def queue_service(monkeypatch, queue):
+    monkeypatch.setattr(queue_service_module, 'nalogo_receipt_queue', queue)
+    monkeypatch.setattr(queue_service_module, 'cache', SimpleNamespace(delete=_noop))
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_RECEIPT_DELAY', 0)
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_CHECK_INTERVAL', 300)
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_MAX_RETRY_DELAY', 1000)
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_CONCURRENCY', 2)
+
+    nalogo = SimpleNamespace(sent=[], fail=set())
+
+    async def create_receipt(**kwargs):
+        nalogo.sent.append(kwargs['payment_id'])
+        return None if kwargs['payment_id'] in nalogo.fail else f'uuid-{kwargs["payment_id"]}'
+
+    async def get_queue_length():
+        return await queue.depth()
+
+    async def get_queued_receipts():
+        return await queue.list_receipts()
+
+    nalogo.create_receipt = create_receipt
+    nalogo.get_queue_length = get_queue_length
+    nalogo.get_queued_receipts = get_queued_receipts
+    service = NalogoQueueService(nalogo)
+    service.nalogo = nalogo
+    return service
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+async def test_service_sends_all_due_receipts(queue_service, queue):
+    for index in range(3):
+        await queue.enqueue(f'pay-{index}', {'payment_id': f'pay-{index}', 'amount': 10, 'amount_kopeks': 1000})
+
+    await queue_service._process_pending_receipts()
+
+    assert sorted(queue_service.nalogo.sent) == ['pay-0', 'pay-1', 'pay-2']
+    assert await queue.depth() == 0
+
+
+async def test_service_backs_off_failed_receipt(queue_service, queue, redis_client, clock):
+    queue_service.nalogo.fail = {'pay-0'}
+    await queue.enqueue('pay-0', {'payment_id': 'pay-0', 'amount': 10, 'amount_kopeks': 1000})
+
+    await queue_service._process_pending_receipts()
+    assert redis_client.zsets[SCHEDULED_KEY]['pay-0'] == clock.now + 300
+
+    clock.now += 300
+    await queue_service._process_pending_receipts()
+    assert redis_client.zsets[SCHEDULED_KEY]['pay-0'] == clock.now + 600
+
+    clock.now += 600
+    await queue_service._process_pending_receipts()
+    assert redis_client.zsets[SCHEDULED_KEY]['pay-0'] == clock.now + 1000
+    assert json.loads(redis_client.hashes[RECEIPTS_KEY]['pay-0'])['attempts'] == 3
@@ -0,0 +1,109 @@
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import PaymentWebhookEvent
+from app.services import payment_webhook_inbox_service as inbox_module
+from app.services.payment_webhook_inbox_service import (
+    PaymentWebhookInboxService,
+    build_webhook_event_key,
+    retry_delay_seconds,
+)
+
+
+@pytest.fixture
+def payment_service():
+    service = SimpleNamespace(calls=[], results=[])
+
+    async def process_yookassa_webhook(db, payload):
+        service.calls.append(payload)
+        result = service.results.pop(0) if service.results else True
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def process_freekassa_webhook(db, *, order_id, **kwargs):
+        service.calls.append(order_id)
+        return True
+
+    service.process_yookassa_webhook = process_yookassa_webhook
+    service.process_freekassa_webhook = process_freekassa_webhook
+    return service
+
+
+@pytest.fixture
+def inbox(monkeypatch, sqlite_session, session_adapter, payment_service):
+    monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(inbox_module, 'IS_SQLITE', True)
+    service = PaymentWebhookInboxService(session_factory=lambda: session_adapter(sqlite_session))
+    service.set_payment_service(payment_service)
+    return service
+
+
+def _event(session: Session, event_key: str) -> PaymentWebhookEvent:
+    session.expire_all()
+    return session.query(PaymentWebhookEvent).filter_by(event_key=event_key).one()
+
+
+async def test_event_is_processed_once(inbox, sqlite_session, payment_service):
+    assert await inbox.enqueue('yookassa', 'process_yookassa_webhook', {'id': 1}, 'k1') is True
+    assert await inbox.enqueue('yookassa', 'process_yookassa_webhook', {'id': 1}, 'k1') is False
+
+    assert await inbox.process_due() == 1
+    assert await inbox.process_due() == 0
+
+    assert payment_service.calls == [{'id': 1}]
+    event = _event(sqlite_session, 'k1')
+    assert (event.status, event.attempts) == ('processed', 1)
+    assert inbox.stats == {'received': 1, 'duplicates': 1, 'processed': 1}
+
+
+async def test_failure_is_retried_with_backoff_then_marked_failed(inbox, sqlite_session, payment_service):
+    payment_service.results = [RuntimeError('panel down'), False]
+    await inbox.enqueue('yookassa', 'process_yookassa_webhook', {'id': 2}, 'k2')
+
+    started = datetime.now(UTC)
+    await inbox.process_due()
+    event = _event(sqlite_session, 'k2')
+    assert event.status == 'pending'
+    assert 'panel down' in event.last_error
+    assert event.next_attempt_at.replace(tzinfo=UTC) >= started + timedelta(seconds=retry_delay_seconds(1))
+
+    # Повтор раньше срока не выполняется
+    assert await inbox.process_due() == 0
+
+    event.next_attempt_at = started
+    sqlite_session.commit()
+    await inbox.process_due()
+
+    event = _event(sqlite_session, 'k2')
+    assert (event.status, event.attempts) == ('failed', 2)
+    assert inbox.stats['retried'] == 1
+    assert inbox.stats['failed'] == 1
+
+
+async def test_keyword_handlers_receive_payload_as_arguments(inbox, sqlite_session, payment_service):
+    payload = {'merchant_id': 1, 'amount': 10.0, 'order_id': 'o-1', 'sign': 's', 'intid': '7', 'cur_id': None}
+    await inbox.enqueue('freekassa', 'process_freekassa_webhook', payload, '7')
+
+    await inbox.process_due()
+
+    assert payment_service.calls == ['o-1']
+    assert _event(sqlite_session, '7').status == 'processed'
+
+
+def test_event_key_prefers_provider_id_and_hashes_content():
+    assert build_webhook_event_key({'a': 1}, event_id=42) == '42'
+
+    key = build_webhook_event_key({'status': 'paid', 'id': 'x'}, 'x')
+    assert key == build_webhook_event_key({'id': 'x', 'status': 'paid'}, 'x')
+    assert key.startswith('x:')
+    assert key != build_webhook_event_key({'status': 'pending', 'id': 'x'}, 'x')
+
+
+def test_retry_delay_grows_and_is_capped():
+    assert [retry_delay_seconds(attempt) for attempt in (1, 2, 3)] == [15, 30, 60]
+    assert retry_delay_seconds(20) == 3600
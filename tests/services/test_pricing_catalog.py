@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+
+from app.services.pricing_catalog import (
+    CatalogServer,
+    CatalogTariff,
+    PricingCatalog,
+    PricingCatalogSnapshot,
+    PromoGroupDiscounts,
+)
+from app.utils.cache import PRICING_CATALOG_NAMESPACE, PROMO_GROUPS_NAMESPACE, cache
+
+
+def _tariff(tariff_id: int, *, period_prices=None, promo_group_ids=(), is_active=True, display_order=0):
+    return CatalogTariff.from_model(
+        SimpleNamespace(
+            id=tariff_id,
+            name=f'Tariff {tariff_id}',
+            description=None,
+            display_order=display_order,
+            is_active=is_active,
+            tier_level=1,
+            traffic_limit_gb=0,
+            device_limit=1,
+            allowed_squads=['squad-a'],
+            period_prices=period_prices or {'30': 10000, '90': 27000, '365': 99900},
+            traffic_topup_packages={},
+            allowed_promo_groups=[SimpleNamespace(id=group_id) for group_id in promo_group_ids],
+            is_daily=False,
+            daily_price_kopeks=0,
+        )
+    )
+
+
+def _group(group_id: int, period_discounts=None):
+    return PromoGroupDiscounts.from_model(
+        SimpleNamespace(
+            id=group_id,
+            name=f'Group {group_id}',
+            period_discounts=period_discounts or {},
+            server_discount_percent=0,
+            traffic_discount_percent=0,
+            device_discount_percent=0,
+            apply_discounts_to_addons=True,
+            is_default=False,
+        )
+    )
+
+
+def _snapshot(tariffs, groups=(), versions=()):
+    servers = [CatalogServer(squad_uuid='squad-a', display_name=None, price_kopeks=0, is_available=True)]
+    return PricingCatalogSnapshot.build(tariffs=tariffs, servers=servers, promo_groups=groups, versions=versions)
+
+
+def _legacy_period_prices(period_prices: dict, raw_discounts: dict) -> list[tuple[int, int, int]]:
+    """Прежний расчёт экрана тарифов: разбор скидок и цен на каждый запрос."""
+    period_discounts = {}
+    for key, value in raw_discounts.items():
+        period_discounts[int(key)] = max(0, min(100, int(value)))
+
+    result = []
+    for period_str, original_price_kopeks in sorted(period_prices.items(), key=lambda item: int(item[0])):
+        period_days = int(period_str)
+        discount_percent = period_discounts.get(period_days, 0)
+        if discount_percent > 0:
+            price_kopeks = int(original_price_kopeks * (100 - discount_percent) / 100)
+        else:
+            price_kopeks = original_price_kopeks
+        result.append((period_days, price_kopeks, price_kopeks // max(1, period_days // 30)))
+    return result
+
+
+def test_period_prices_match_per_request_formula():
+    raw_prices = {'30': 19900, '90': 53700, '180': 99900, '365': 189900, '7': 5900}
+    raw_discounts = {'30': '10', 90: 15, '365': 150, 'bad': 5}
+    snapshot = _snapshot([_tariff(1, period_prices=raw_prices)], [_group(5, raw_discounts)])
+
+    expected = _legacy_period_prices(raw_prices, {'30': '10', 90: 15, '365': 150})
+    actual = [(p.days, p.price_kopeks, p.price_per_month_kopeks) for p in snapshot.period_prices(1, 5)]
+
+    assert actual == expected
+    assert [p.discount_percent for p in snapshot.period_prices(1, 5)] == [0, 10, 15, 0, 100]
+    assert [p.price_kopeks for p in snapshot.period_prices(1, None)] == [5900, 19900, 53700, 99900, 189900]
+
+
+def test_unknown_promo_group_falls_back_to_base_prices():
+    snapshot = _snapshot([_tariff(1), _tariff(2, promo_group_ids=[5])], [_group(5, {'30': 50})])
+
+    assert snapshot.period_prices(1, 999) == snapshot.period_prices(1, None)
+    assert [tariff.id for tariff in snapshot.tariffs_for_promo_group(999)] == [1]
+
+
+def test_tariffs_for_promo_group_follow_restrictions_and_order():
+    snapshot = _snapshot(
+        [
+            _tariff(1, display_order=2),
+            _tariff(2, promo_group_ids=[5], display_order=1),
+            _tariff(3, is_active=False),
+            _tariff(4, promo_group_ids=[6]),
+        ],
+        [_group(5), _group(6)],
+    )
+
+    assert [tariff.id for tariff in snapshot.tariffs_for_promo_group(None)] == [1]
+    assert [tariff.id for tariff in snapshot.tariffs_for_promo_group(5)] == [2, 1]
+    assert [tariff.id for tariff in snapshot.tariffs_for_promo_group(6)] == [4, 1]
+    assert snapshot.get_tariff(3).is_active is False
+    assert snapshot.server_name('squad-a') == 'squad-a'
+    assert snapshot.server_name('missing') is None
+
+
+def test_catalog_tariff_mirrors_tariff_price_helpers():
+    tariff = _tariff(1, period_prices={'90': 27000, '30': 10000}, promo_group_ids=[5])
+
+    assert tariff.get_available_periods() == [30, 90]
+    assert tariff.get_price_for_period(90) == 27000
+    assert tariff.get_price_for_period(7) is None
+    assert tariff.is_available_for_promo_group(5)
+    assert not tariff.is_available_for_promo_group(6)
+
+
+async def test_catalog_reloads_only_after_invalidation(monkeypatch):
+    catalog = PricingCatalog()
+    loaded = []
+
+    async def load(db, versions):
+        loaded.append(versions)
+        return _snapshot([_tariff(len(loaded))], versions=versions)
+
+    monkeypatch.setattr(catalog, '_load', load)
+
+    first = await catalog.get(db=None)
+    assert await catalog.get(db=None) is first
+
+    await cache.invalidate(PRICING_CATALOG_NAMESPACE)
+    second = await catalog.get(db=None)
+    assert second is not first
+
+    await cache.invalidate(PROMO_GROUPS_NAMESPACE)
+    third = await catalog.get(db=None)
+
+    assert third is not second
+    assert catalog.loads == 3
+    assert len(set(loaded)) == 3
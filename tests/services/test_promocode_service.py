@@ -2,8 +2,10 @@
 Tests for PromoCodeService - focus on promo group integration
 """
 
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
+from app.database.models import PromoCodeType
 from app.services.promocode_service import PromoCodeService
 
 
@@ -51,6 +53,9 @@ async def test_activate_promo_group_promocode_success(
     create_usage_mock = AsyncMock()
     monkeypatch.setattr('app.services.promocode_service.create_promocode_use', create_usage_mock)
 
+    reserve_use_mock = AsyncMock(return_value=21)
+    monkeypatch.setattr('app.services.promocode_service.reserve_promocode_use', reserve_use_mock)
+
     # Execute
     service = PromoCodeService()
     result = await service.activate_promocode(mock_db_session, sample_user.id, 'VIPGROUP')
@@ -75,7 +80,8 @@ async def test_activate_promo_group_promocode_success(
     create_usage_mock.assert_awaited_once_with(mock_db_session, sample_promocode_promo_group.id, sample_user.id)
 
     # Verify counter incremented
-    assert sample_promocode_promo_group.current_uses == 21
+    reserve_use_mock.assert_awaited_once_with(mock_db_session, sample_promocode_promo_group.id)
+    assert result['promocode']['current_uses'] == 21
     mock_db_session.commit.assert_awaited()
 
 
@@ -382,3 +388,55 @@ async def test_promocode_data_includes_promo_group_id(
     assert 'promocode' in result
     assert 'promo_group_id' in result['promocode']
     assert result['promocode']['promo_group_id'] == sample_promo_group.id
+
+
+def _balance_promocode_setup(monkeypatch, reserved_uses):
+    user = SimpleNamespace(id=7, telegram_id=700, email=None, balance_kopeks=0)
+    promocode = SimpleNamespace(
+        id=3,
+        code='FLASH',
+        type=PromoCodeType.BALANCE.value,
+        balance_bonus_kopeks=10000,
+        subscription_days=0,
+        max_uses=100,
+        current_uses=99,
+        is_valid=True,
+        first_purchase_only=False,
+        promo_group_id=None,
+        valid_until=None,
+    )
+    monkeypatch.setattr('app.services.promocode_service.get_user_by_id', AsyncMock(return_value=user))
+    monkeypatch.setattr('app.services.promocode_service.get_promocode_by_code', AsyncMock(return_value=promocode))
+    monkeypatch.setattr('app.services.promocode_service.check_user_promocode_usage', AsyncMock(return_value=False))
+    monkeypatch.setattr('app.database.crud.promocode.count_user_recent_activations', AsyncMock(return_value=0))
+    reserve_mock = AsyncMock(return_value=reserved_uses)
+    monkeypatch.setattr('app.services.promocode_service.reserve_promocode_use', reserve_mock)
+    release_mock = AsyncMock(return_value=reserved_uses)
+    monkeypatch.setattr('app.services.promocode_service.release_promocode_use', release_mock)
+    return promocode, reserve_mock, release_mock
+
+
+async def test_activation_rejected_when_no_uses_left(monkeypatch):
+    promocode, _, release_mock = _balance_promocode_setup(monkeypatch, reserved_uses=None)
+    add_balance_mock = AsyncMock()
+    monkeypatch.setattr('app.services.promocode_service.add_user_balance', add_balance_mock)
+
+    result = await PromoCodeService().activate_promocode(AsyncMock(), 7, 'FLASH')
+
+    assert result == {'success': False, 'error': 'used'}
+    add_balance_mock.assert_not_awaited()
+    release_mock.assert_not_awaited()
+
+
+async def test_failed_activation_returns_reserved_use(monkeypatch):
+    promocode, reserve_mock, release_mock = _balance_promocode_setup(monkeypatch, reserved_uses=100)
+    monkeypatch.setattr(
+        'app.services.promocode_service.add_user_balance', AsyncMock(side_effect=RuntimeError('db down'))
+    )
+    db = AsyncMock()
+
+    result = await PromoCodeService().activate_promocode(db, 7, 'FLASH')
+
+    assert result == {'success': False, 'error': 'server_error'}
+    reserve_mock.assert_awaited_once_with(db, promocode.id)
+    release_mock.assert_awaited_once_with(db, promocode.id)
@@ -0,0 +1,71 @@
+from datetime import UTC, datetime, timedelta
+
+from app.services.referral_click_index import ReferralClickIndex
+
+
+def _now() -> datetime:
+    return datetime.now(UTC).replace(microsecond=0)
+
+
+def _line(moment: datetime, message: str) -> str:
+    return f'{moment:%Y-%m-%d %H:%M:%S},123 - app.handlers - INFO - {message}\n'
+
+
+def _start_click(moment: datetime, telegram_id: int, code: str) -> str:
+    return _line(moment, f'📩 Сообщение от ID:{telegram_id} текст: /start {code}')
+
+
+def test_sync_reads_only_appended_lines(tmp_path):
+    log_path = tmp_path / 'bot.log'
+    moment = _now()
+    log_path.write_text(_start_click(moment, 1, 'ref_refABC') + _line(moment, 'обычная строка'))
+
+    index = ReferralClickIndex(log_path)
+    assert index.sync() == 1
+    assert index.sync() == 0
+
+    with log_path.open('a') as handle:
+        handle.write(_line(moment, "💾 Сохранен start payload 'refXYZ' для пользователя 2"))
+        # Недописанная строка не индексируется до следующей синхронизации
+        handle.write(_start_click(moment, 3, 'refQQQ').rstrip('\n'))
+
+    assert index.sync() == 1
+
+    with log_path.open('a') as handle:
+        handle.write('\n')
+
+    assert index.sync() == 1
+
+    clicks, total_lines, lines_in_period = index.query(moment - timedelta(hours=1), moment + timedelta(hours=1))
+    assert [(click.telegram_id, click.clean_code) for click in clicks] == [(1, 'refABC'), (2, 'refXYZ'), (3, 'refQQQ')]
+    assert total_lines == 4
+    assert lines_in_period == 4
+
+
+def test_clicks_survive_rotation(tmp_path):
+    log_path = tmp_path / 'bot.log'
+    yesterday = _now() - timedelta(days=1)
+    log_path.write_text(_start_click(yesterday, 1, 'refOLD') * 3)
+
+    index = ReferralClickIndex(log_path)
+    assert index.sync() == 3
+
+    # Ротация очищает файл на месте, затем в него пишутся новые строки
+    log_path.write_text('')
+    today = _now()
+    log_path.write_text(_start_click(today, 2, 'refNEW'))
+
+    assert index.sync() == 1
+
+    clicks, total_lines, _ = index.query(yesterday - timedelta(hours=1), today + timedelta(hours=1))
+    assert sorted(click.clean_code for click in clicks) == ['refNEW', 'refOLD', 'refOLD', 'refOLD']
+    assert total_lines == 1
+
+
+def test_state_is_persisted_between_instances(tmp_path):
+    log_path = tmp_path / 'bot.log'
+    moment = _now()
+    log_path.write_text(_start_click(moment, 1, 'refABC'))
+
+    assert ReferralClickIndex(log_path).sync() == 1
+    assert ReferralClickIndex(log_path).sync() == 0
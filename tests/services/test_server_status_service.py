@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.handlers.server_status import _build_status_message
+from app.services.server_status_service import ServerStatusError, ServerStatusService
+
+
+METRICS = (
+    'xray_proxy_latency_ms{address="1.1.1.1",name="🇩🇪 Frankfurt",protocol="vless"} 42.4\n'
+    'xray_proxy_status{address="1.1.1.1",name="🇩🇪 Frankfurt",protocol="vless"} 1\n'
+    'xray_proxy_latency_ms{address="2.2.2.2",name="🇳🇱 Amsterdam",protocol="vless"} 0\n'
+    'xray_proxy_status{address="2.2.2.2",name="🇳🇱 Amsterdam",protocol="vless"} 0\n'
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Texts:
+    def t(self, key, default):
+        return default
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_STATUS_MODE', 'xray')
+    monkeypatch.setattr(settings, 'SERVER_STATUS_METRICS_URL', 'http://checker/metrics')
+    monkeypatch.setattr(settings, 'SERVER_STATUS_POLL_INTERVAL_SECONDS', 30)
+    monkeypatch.setattr(settings, 'SERVER_STATUS_STALE_SECONDS', 300)
+    monkeypatch.setattr(settings, 'SERVER_STATUS_HISTORY_SIZE', 3)
+    clock = _Clock()
+    service = ServerStatusService(clock=clock)
+    service.clock = clock
+    service.requests = []
+    service.responses = []
+
+    async def request_metrics(url, headers):
+        service.requests.append(headers)
+        await asyncio.sleep(0)
+        response = service.responses.pop(0) if service.responses else (200, METRICS, '"v1"', None)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    service._request_metrics = request_metrics
+    return service
+
+
+async def test_snapshot_is_parsed_and_served_from_memory(service):
+    snapshot = await service.get_snapshot()
+    service.clock.now += 10
+    again = await service.get_snapshot()
+
+    assert again is snapshot
+    assert len(service.requests) == 1
+    assert [server.display_name for server in snapshot.servers] == ['Frankfurt', 'Amsterdam']
+    assert snapshot.servers[0].latency_ms == 42
+    assert snapshot.servers[0].is_online is True
+    assert snapshot.servers[1].is_online is False
+
+
+async def test_concurrent_refreshes_share_one_request(service):
+    results = await asyncio.gather(*(service.get_snapshot() for _ in range(5)))
+
+    assert len(service.requests) == 1
+    assert all(result is results[0] for result in results)
+
+
+async def test_stale_snapshot_uses_conditional_request(service):
+    await service.get_snapshot()
+    service.clock.now += 31
+    service.responses.append((304, '', None, None))
+
+    snapshot = await service.get_snapshot()
+
+    assert service.requests[1] == {'If-None-Match': '"v1"'}
+    assert service.unchanged == 1
+    assert snapshot.checked_at == service.clock.now
+    assert len(service.get_history(snapshot.servers[0])) == 2
+
+
+async def test_unchanged_body_is_not_parsed_again(service):
+    first = await service.get_snapshot()
+    service._parse_metrics = None  # повторный разбор упадёт
+    service.clock.now += 31
+
+    assert await service.get_snapshot() is first
+    assert service.unchanged == 1
+
+
+async def test_failed_refresh_serves_stale_snapshot_until_limit(service):
+    snapshot = await service.get_snapshot()
+
+    service.clock.now += 60
+    service.responses.append(ServerStatusError('timeout'))
+    assert await service.get_snapshot() is snapshot
+
+    service.clock.now += 300
+    service.responses.append(ServerStatusError('timeout'))
+    with pytest.raises(ServerStatusError):
+        await service.get_snapshot()
+
+
+async def test_history_is_bounded_and_builds_trends(service):
+    offline = METRICS.replace('name="🇩🇪 Frankfurt",protocol="vless"} 1', 'name="🇩🇪 Frankfurt",protocol="vless"} 0')
+    for body in (METRICS, offline, METRICS, METRICS):
+        service.responses.append((200, body, None, None))
+        await service.refresh()
+
+    frankfurt = service.snapshot.servers[0]
+    assert len(service.get_history(frankfurt)) == 3
+
+    trend = service.get_trends()[frankfurt.key]
+    assert trend.uptime_percent == 67
+    assert trend.avg_latency_ms == 42
+
+
+async def test_unchanged_polls_count_towards_uptime(service, monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_STATUS_HISTORY_SIZE', 10)
+    offline = METRICS.replace('name="🇩🇪 Frankfurt",protocol="vless"} 1', 'name="🇩🇪 Frankfurt",protocol="vless"} 0')
+    service.responses.extend(
+        [
+            (200, METRICS, '"v1"', None),
+            (304, '', None, None),
+            (304, '', None, None),
+            (200, METRICS, '"v1"', None),
+            (200, offline, '"v2"', None),
+        ]
+    )
+    for _ in range(5):
+        await service.refresh()
+
+    frankfurt_key = next(server.key for server in service.snapshot.servers if server.display_name == 'Frankfurt')
+    trend = service.get_trends()[frankfurt_key]
+    assert len(trend.samples) == 5
+    assert trend.uptime_percent == 80
+
+
+async def test_status_message_shows_snapshot_time_and_uptime(service):
+    service.responses.append((200, METRICS, None, None))
+    await service.refresh()
+    service.responses.append((200, METRICS + '# changed\n', None, None))
+    snapshot = await service.refresh()
+
+    message, _, _ = _build_status_message(
+        snapshot.servers,
+        _Texts(),
+        1,
+        updated_at=snapshot.fetched_at,
+        trends=service.get_trends(),
+    )
+
+    assert snapshot.fetched_at.strftime('%H:%M:%S') in message
+    assert 'Frankfurt — 42 мс · 100% в сети' in message
+    assert 'Amsterdam — нет ответа · 0% в сети' in message
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.subscription_service import SubscriptionService
+from app.services.subscription_usage_refresher import SubscriptionUsageRefresher
+from app.utils.section_timings import SectionTimings, gather_sections
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get(self, model, subscription_id):
+        return {'id': subscription_id}
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    calls = []
+
+    async def sync_subscription_usage(self, db, subscription):
+        calls.append(subscription['id'])
+        await asyncio.sleep(0)
+        return True
+
+    monkeypatch.setattr(SubscriptionService, 'sync_subscription_usage', sync_subscription_usage)
+    monkeypatch.setattr(settings, 'MINIAPP_USAGE_SYNC_INTERVAL_SECONDS', 60)
+    return calls
+
+
+async def _drain(refresher):
+    await asyncio.gather(*refresher._tasks.values())
+
+
+async def test_concurrent_schedules_share_one_refresh(clock, synced):
+    refresher = SubscriptionUsageRefresher(session_factory=_Session, clock=clock)
+
+    started = [refresher.schedule(7) for _ in range(5)]
+    await _drain(refresher)
+
+    assert started == [True, False, False, False, False]
+    assert synced == [7]
+    assert refresher.is_fresh(7)
+
+
+async def test_refresh_runs_again_after_interval(clock, synced):
+    refresher = SubscriptionUsageRefresher(session_factory=_Session, clock=clock)
+
+    refresher.schedule(7)
+    await _drain(refresher)
+    assert not refresher.schedule(7)
+
+    clock.now += 61
+    assert refresher.schedule(7)
+    await _drain(refresher)
+
+    assert synced == [7, 7]
+
+
+async def test_failed_refresh_is_not_retried_immediately(clock, monkeypatch):
+    calls = []
+
+    async def sync_subscription_usage(self, db, subscription):
+        calls.append(subscription['id'])
+        raise RuntimeError('panel down')
+
+    monkeypatch.setattr(SubscriptionService, 'sync_subscription_usage', sync_subscription_usage)
+    refresher = SubscriptionUsageRefresher(session_factory=_Session, clock=clock)
+
+    refresher.schedule(7)
+    await _drain(refresher)
+
+    assert calls == [7]
+    assert not refresher.schedule(7)
+
+
+async def test_gather_sections_waits_for_all_before_raising():
+    finished = []
+
+    async def failing():
+        raise ValueError('boom')
+
+    async def slow():
+        await asyncio.sleep(0.01)
+        finished.append('slow')
+        return 'done'
+
+    with pytest.raises(ValueError):
+        await gather_sections(failing(), slow())
+
+    assert finished == ['slow']
+
+
+async def test_section_timings_record_each_section():
+    timings = SectionTimings('test')
+
+    result = await timings.run('answer', asyncio.sleep(0, result=42))
+
+    assert result == 42
+    assert set(timings.sections) == {'answer'}
@@ -0,0 +1,146 @@
+from datetime import UTC, date, datetime, timedelta
+
+import app.services.traffic_warehouse_service as warehouse_module
+from app.services.traffic_warehouse_service import TrafficWarehouseService, split_range_by_days
+
+
+def test_split_range_keeps_partial_first_day():
+    start = datetime(2026, 3, 1, 12, 30, tzinfo=UTC)
+    end = datetime(2026, 3, 4, 8, 0, tzinfo=UTC)
+
+    assert split_range_by_days(start, end) == [date(2026, 3, d) for d in range(1, 5)]
+    assert split_range_by_days(end - timedelta(minutes=30), end) == [date(2026, 3, 4)]
+
+
+async def test_partial_first_day_is_fetched_live_from_period_start(monkeypatch):
+    start = datetime(2026, 3, 1, 12, 32, tzinfo=UTC)
+    end = datetime(2026, 3, 3, 12, 32, tzinfo=UTC)
+    requested_days: list[list[date]] = []
+    panel_ranges: list[list[tuple[str, str]]] = []
+
+    async def fake_collected(_db, first, last):
+        # Все сутки периода собраны, включая неполные на краях
+        return {first + timedelta(days=offset): end for offset in range((last - first).days + 1)}
+
+    async def fake_totals(_db, days):
+        requested_days.append(list(days))
+        return {}
+
+    service = TrafficWarehouseService()
+
+    async def fake_panel(ranges):
+        panel_ranges.append(list(ranges))
+        return [({}, True) for _ in ranges], []
+
+    async def fake_nodes():
+        return []
+
+    monkeypatch.setattr(warehouse_module, 'get_collected_traffic_days', fake_collected)
+    monkeypatch.setattr(warehouse_module, 'get_traffic_totals', fake_totals)
+    monkeypatch.setattr(service, '_fetch_from_panel', fake_panel)
+    monkeypatch.setattr(service, 'get_nodes', fake_nodes)
+
+    report = await service.get_traffic(None, start, end)
+
+    # Период остаётся скользящим окном: неполные сутки на краях берутся по границам периода
+    assert requested_days == [[date(2026, 3, 2)]]
+    assert panel_ranges == [
+        [('2026-03-01T12:30:00Z', '2026-03-02T00:00:00Z'), ('2026-03-03T00:00:00Z', '2026-03-03T12:30:00Z')]
+    ]
+    assert (report.stored_days, report.live_ranges) == (1, 2)
+
+
+async def test_get_traffic_reads_stored_days_and_fetches_only_the_rest(monkeypatch):
+    today = datetime.now(UTC).date()
+    stored_day = today - timedelta(days=2)
+    missing_day = today - timedelta(days=1)
+    requested_days: list[list[date]] = []
+    panel_ranges: list[list[tuple[str, str]]] = []
+
+    async def fake_collected(_db, _start, _end):
+        return {stored_day: datetime.now(UTC)}
+
+    async def fake_totals(_db, days):
+        requested_days.append(list(days))
+        return {'user-1': {'node-a': 100}}
+
+    service = TrafficWarehouseService()
+
+    async def fake_panel(ranges):
+        panel_ranges.append(list(ranges))
+        return [({'user-1': {'node-a': 10}, 'user-2': {'node-b': 5}}, True) for _ in ranges], []
+
+    async def fake_nodes():
+        return []
+
+    monkeypatch.setattr(warehouse_module, 'get_collected_traffic_days', fake_collected)
+    monkeypatch.setattr(warehouse_module, 'get_traffic_totals', fake_totals)
+    monkeypatch.setattr(service, '_fetch_from_panel', fake_panel)
+    monkeypatch.setattr(service, 'get_nodes', fake_nodes)
+
+    start = datetime.combine(stored_day, datetime.min.time(), tzinfo=UTC)
+    end = datetime.now(UTC)
+    report = await service.get_traffic(None, start, end)
+
+    assert requested_days == [[stored_day]]
+    # Вчера и сегодня идут одним диапазоном в панель
+    assert len(panel_ranges) == 1
+    assert [item[0][:10] for item in panel_ranges[0]] == [missing_day.isoformat()]
+    assert report.user_traffic == {'user-1': {'node-a': 110}, 'user-2': {'node-b': 5}}
+    assert report.stored_days == 1
+
+    # Повторный запрос обслуживается из кеша живых данных
+    await service.get_traffic(None, start, end)
+    assert len(panel_ranges) == 1
+
+
+async def test_collect_pending_days_skips_finalized_and_incomplete(monkeypatch):
+    today = date(2026, 3, 10)
+    finalized_day = today - timedelta(days=3)
+    early_day = today - timedelta(days=2)
+    saved: dict[date, dict] = {}
+
+    async def fake_collected(_db, _start, _end):
+        return {
+            finalized_day: datetime(2026, 3, 8, 2, 0, tzinfo=UTC),
+            # Собрано до окончания суток — нужно пересобрать
+            early_day: datetime(2026, 3, 8, 23, 0, tzinfo=UTC),
+        }
+
+    async def fake_replace(_db, day, totals):
+        saved[day] = totals
+
+    async def fake_delete(_db, _day):
+        return 0
+
+    class _Session:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *args):
+            return False
+
+    class _Configured:
+        is_configured = True
+
+    service = TrafficWarehouseService()
+
+    async def fake_panel(ranges):
+        reports = []
+        for start_str, _ in ranges:
+            complete = not start_str.startswith((today - timedelta(days=1)).isoformat())
+            reports.append(({'user-1': {'node-a': 7}}, complete))
+        return reports, []
+
+    monkeypatch.setattr(warehouse_module.settings, 'TRAFFIC_WAREHOUSE_BACKFILL_DAYS', 3)
+    monkeypatch.setattr(warehouse_module, 'AsyncSessionLocal', _Session)
+    monkeypatch.setattr(warehouse_module, 'RemnaWaveService', _Configured)
+    monkeypatch.setattr(warehouse_module, 'get_collected_traffic_days', fake_collected)
+    monkeypatch.setattr(warehouse_module, 'replace_traffic_day', fake_replace)
+    monkeypatch.setattr(warehouse_module, 'delete_traffic_days_before', fake_delete)
+    monkeypatch.setattr(service, '_fetch_from_panel', fake_panel)
+
+    done = await service.collect_pending_days(today=today)
+
+    assert done == [early_day]
+    assert saved == {early_day: {('user-1', 'node-a'): 7}}
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from app.services import user_service as user_service_module
+from app.services.user_service import UserService
+from app.utils.pagination import KeysetCursor, KeysetPage
+
+
+async def test_default_users_list_pages_by_cursor(monkeypatch):
+    keyset_calls = []
+    offset_calls = []
+
+    async def keyset_page(db, *, limit, cursor, status):
+        keyset_calls.append(cursor)
+        return KeysetPage([SimpleNamespace(id=9)], next_cursor='next', prev_cursor='prev' if cursor else None)
+
+    async def users_list(db, *, offset, limit, **kwargs):
+        offset_calls.append((offset, kwargs['order_by_balance']))
+        return []
+
+    async def users_count(db, status=None):
+        return 25
+
+    monkeypatch.setattr(user_service_module, 'get_users_keyset_page', keyset_page)
+    monkeypatch.setattr(user_service_module, 'get_users_list', users_list)
+    monkeypatch.setattr(user_service_module, 'get_users_count', users_count)
+    service = UserService()
+    cursor = KeysetCursor((9,))
+
+    first = await service.get_users_page(None, page=1, limit=10)
+    second = await service.get_users_page(None, page=2, limit=10, cursor=cursor)
+    # Без курсора глубокая страница и другие сортировки идут прежним путём через OFFSET
+    await service.get_users_page(None, page=3, limit=10)
+    await service.get_users_page(None, page=1, limit=10, order_by_balance=True)
+
+    assert keyset_calls == [None, cursor]
+    assert offset_calls == [(20, False), (0, True)]
+    assert (first['has_prev'], first['has_next'], first['total_pages']) == (False, True, 3)
+    assert (second['has_prev'], second['current_page']) == (True, 2)
@@ -0,0 +1,67 @@
+import json
+
+from app.config import settings
+from app.services.websocket_relay_service import WebSocketRelay
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.published: list[tuple[str, str]] = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+def _message(kind, data, target=None, origin='other-node'):
+    return json.dumps({'origin': origin, 'kind': kind, 'target': target, 'data': data})
+
+
+async def test_publish_is_noop_without_redis():
+    relay = WebSocketRelay()
+
+    await relay.publish('cabinet.user', '{}', target=1)
+
+    assert relay.published == 0
+
+
+async def test_publish_sends_serialized_message():
+    relay = WebSocketRelay()
+    fake_redis = _FakeRedis()
+    relay._redis = fake_redis
+
+    await relay.publish('cabinet.user', '{"type": "ping"}', target=7)
+
+    channel, raw = fake_redis.published[-1]
+    assert channel == settings.WEBSOCKET_RELAY_CHANNEL
+    assert json.loads(raw) == {
+        'origin': relay.instance_id,
+        'kind': 'cabinet.user',
+        'target': 7,
+        'data': '{"type": "ping"}',
+    }
+
+
+async def test_handle_message_delivers_to_registered_handler():
+    relay = WebSocketRelay()
+    delivered: list[tuple[int | None, str]] = []
+
+    async def handler(target, data):
+        delivered.append((target, data))
+
+    relay.register('cabinet.user', handler)
+
+    assert await relay.handle_message(_message('cabinet.user', '{"a": 1}', target=5))
+    assert delivered == [(5, '{"a": 1}')]
+
+
+async def test_handle_message_ignores_own_and_unknown_messages():
+    relay = WebSocketRelay()
+    delivered: list[str] = []
+    relay.register('cabinet.admins', lambda _target, data: delivered.append(data))
+
+    assert not await relay.handle_message(_message('cabinet.admins', 'x', origin=relay.instance_id))
+    assert not await relay.handle_message(_message('unknown', 'x'))
+    assert not await relay.handle_message('not json')
+    assert await relay.handle_message(_message('cabinet.admins', 'y'))
+    assert delivered == ['y']
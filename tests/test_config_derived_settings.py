@@ -0,0 +1,59 @@
+from app.config import settings
+
+
+def test_is_admin_uses_rebuilt_snapshot_after_change(monkeypatch):
+    monkeypatch.setattr(settings, 'ADMIN_IDS', '10, 20')
+    monkeypatch.setattr(settings, 'ADMIN_EMAILS', 'Root@Example.com')
+
+    assert settings.is_admin(telegram_id=20)
+    assert settings.is_admin(email='root@example.COM')
+    assert not settings.is_admin(telegram_id=30)
+
+    monkeypatch.setattr(settings, 'ADMIN_IDS', '30')
+
+    assert settings.is_admin(telegram_id=30)
+    assert not settings.is_admin(telegram_id=20)
+    assert settings.get_admin_ids() == [30]
+
+
+def test_snapshot_is_reused_until_source_changes(monkeypatch):
+    monkeypatch.setattr(settings, 'AUTOPAY_WARNING_DAYS', '5,2,1')
+
+    first = settings.derived
+    assert settings.derived is first
+    assert settings.get_autopay_warning_days() == [5, 2, 1]
+
+    monkeypatch.setattr(settings, 'SUPPORT_USERNAME', '@support')
+    assert settings.derived is first
+
+    monkeypatch.setattr(settings, 'AUTOPAY_WARNING_DAYS', '7')
+    assert settings.derived is not first
+    assert settings.get_autopay_warning_days() == [7]
+
+
+def test_traffic_price_matches_nearest_package(monkeypatch):
+    monkeypatch.setattr(settings, 'TRAFFIC_PACKAGES_CONFIG', '5:100:true,20:300:true,50:500:false,0:900:true')
+
+    assert settings.get_traffic_price(5) == 100
+    assert settings.get_traffic_price(7) == 300
+    assert settings.get_traffic_price(40) == 900
+    assert settings.get_traffic_price(None) == 900
+    assert settings.get_traffic_price(0) == 900
+
+
+def test_traffic_price_without_unlimited_package(monkeypatch):
+    monkeypatch.setattr(settings, 'TRAFFIC_PACKAGES_CONFIG', '5:100:true,20:300:true')
+
+    assert settings.get_traffic_price(100) == 300
+    assert settings.get_traffic_price(0) == 0
+
+
+def test_returned_packages_do_not_leak_into_snapshot(monkeypatch):
+    monkeypatch.setattr(settings, 'TRAFFIC_PACKAGES_CONFIG', '5:100:true')
+    monkeypatch.setattr(settings, 'TRAFFIC_TOPUP_PACKAGES_CONFIG', '')
+
+    packages = settings.get_traffic_packages()
+    packages[0]['price'] = 1
+
+    assert settings.get_traffic_packages() == [{'gb': 5, 'price': 100, 'enabled': True}]
+    assert settings.get_traffic_topup_price(5) == 100
@@ -0,0 +1,106 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+from app.database.crud import user_message
+from app.handlers import menu
+from app.utils.cache import MAIN_MENU_NAMESPACE, USER_MESSAGES_NAMESPACE, cache
+from app.utils.promo_offer import render_test_access_hint
+from app.utils.section_timings import SectionTimings, gather_sections
+
+
+@asynccontextmanager
+async def _loader_session():
+    yield 'loader-session'
+
+
+class DummyTexts:
+    language = 'en'
+
+    def t(self, key: str, default: str):
+        return default
+
+
+async def test_random_message_reuses_active_messages_until_invalidated(monkeypatch):
+    loads = []
+    messages = [SimpleNamespace(message_text='<b>Hello</b>')]
+
+    async def get_active_user_messages(db):
+        loads.append(db)
+        return messages
+
+    monkeypatch.setattr(user_message, 'get_active_user_messages', get_active_user_messages)
+    monkeypatch.setattr(user_message, 'AsyncSessionLocal', _loader_session)
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
+
+    assert [await user_message.get_random_active_message(db='session') for _ in range(5)] == ['<b>Hello</b>'] * 5
+    assert loads == ['loader-session']
+
+    messages[:] = []
+    await cache.invalidate(USER_MESSAGES_NAMESPACE)
+
+    assert await user_message.get_random_active_message(db='session') is None
+    assert len(loads) == 2
+
+
+async def test_missing_test_access_is_cached(monkeypatch):
+    loads = []
+
+    async def load_test_access_state(db, subscription_id):
+        loads.append((db, subscription_id))
+
+    monkeypatch.setattr(menu, 'load_test_access_state', load_test_access_state)
+    monkeypatch.setattr(menu, 'AsyncSessionLocal', _loader_session)
+    await cache.invalidate(MAIN_MENU_NAMESPACE)
+    user = SimpleNamespace(subscription=SimpleNamespace(id=11))
+
+    for _ in range(3):
+        assert render_test_access_hint(await menu._get_test_access_state(db=None, user=user), DummyTexts()) is None
+
+    assert loads == [('loader-session', 11)]
+
+
+def test_test_access_hint_counts_down_from_cached_state():
+    state = {
+        'expires_at': (datetime.now(UTC) + timedelta(hours=2)).isoformat(),
+        'total_seconds': 4 * 3600,
+        'servers': 'Finland',
+    }
+
+    hint = render_test_access_hint(state, DummyTexts())
+
+    assert hint.startswith('🧪 Test servers active: Finland')
+    assert '2h 0m' in hint
+    assert '█████░░░░░' in hint
+
+
+def test_expired_test_access_state_renders_nothing():
+    state = {'expires_at': (datetime.now(UTC) - timedelta(seconds=1)).isoformat(), 'total_seconds': 60, 'servers': 'X'}
+
+    assert render_test_access_hint(state, DummyTexts()) is None
+    assert render_test_access_hint({}, DummyTexts()) is None
+
+
+async def test_menu_sections_run_concurrently():
+    timings = SectionTimings('test')
+    running = 0
+    peak = 0
+
+    async def section(result):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return result
+
+    results = await gather_sections(
+        timings.run('text', section('menu')),
+        timings.run('checkout_draft', section(False)),
+        timings.run('cart', section(True)),
+    )
+
+    assert results == ['menu', False, True]
+    assert peak == 3
+    assert set(timings.sections) == {'text', 'checkout_draft', 'cart'}
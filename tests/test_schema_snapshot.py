@@ -0,0 +1,154 @@
+from pathlib import Path
+
+import pytest
+
+from app.database import universal_migration
+from app.database.schema_snapshot import (
+    SchemaSnapshot,
+    SchemaSnapshotTracker,
+    compute_schema_fingerprint,
+)
+
+
+def _snapshot(**overrides):
+    data = {
+        'dialect': 'postgresql',
+        'tables': {'users', 'transactions'},
+        'columns': {'users': {'id': 'integer', 'email': 'character varying'}},
+        'indexes': {'users': {'users_pkey', 'ix_users_email'}},
+        'constraints': {'users': {'users_pkey'}},
+    }
+    data.update(overrides)
+    return SchemaSnapshot(**data)
+
+
+def test_fingerprint_is_stable_and_tracks_schema_changes(tmp_path):
+    source = tmp_path / 'migration.py'
+    source.write_text('steps = 1')
+
+    first = compute_schema_fingerprint(_snapshot(), source)
+    assert first == compute_schema_fingerprint(_snapshot(), source)
+
+    changed_columns = _snapshot(columns={'users': {'id': 'integer', 'email': 'text'}})
+    assert compute_schema_fingerprint(changed_columns, source) != first
+
+    source.write_text('steps = 2')
+    assert compute_schema_fingerprint(_snapshot(), source) != first
+
+
+def test_constraints_unknown_for_dialect_without_catalog():
+    snapshot = _snapshot(dialect='sqlite', constraints=None)
+
+    assert snapshot.has_constraint('users', 'users_pkey') is None
+    assert snapshot.has_index('users', 'ix_users_email')
+    assert not snapshot.has_column('users', 'missing')
+
+
+@pytest.mark.parametrize(
+    ('statement', 'stale'),
+    [
+        ('DROP INDEX IF EXISTS idx_wata_link_id', True),
+        ('ALTER TABLE users DROP CONSTRAINT users_fk', True),
+        ('ALTER TABLE users_new RENAME TO users', True),
+        ('ALTER TABLE users ADD COLUMN vk_id BIGINT', False),
+        ('CREATE INDEX ix_users_vk ON users (vk_id)', False),
+        ('SELECT 1', False),
+    ],
+)
+def test_tracker_marks_snapshot_stale_after_destructive_ddl(statement, stale):
+    tracker = SchemaSnapshotTracker(engine=None)
+    tracker._snapshot = _snapshot()
+
+    tracker._on_before_cursor_execute(None, None, statement, None, None, False)
+
+    assert tracker._stale is stale
+
+
+async def test_helpers_answer_positive_checks_from_snapshot(monkeypatch):
+    tracker = SchemaSnapshotTracker(engine=None)
+    tracker._snapshot = _snapshot()
+    monkeypatch.setattr(universal_migration, '_schema_tracker', tracker)
+
+    assert await universal_migration.check_table_exists('users')
+    assert await universal_migration.check_column_exists('users', 'email')
+    assert await universal_migration.check_index_exists('users', 'ix_users_email')
+    assert await universal_migration.check_constraint_exists('users', 'users_pkey')
+    assert tracker.snapshot_hits == 4
+    assert tracker.live_queries == 0
+
+
+@pytest.mark.parametrize('data_steps_ok', [True, False])
+async def test_migration_pass_skipped_when_fingerprint_matches(monkeypatch, data_steps_ok):
+    snapshot = _snapshot()
+
+    class _Tracker(SchemaSnapshotTracker):
+        async def activate(self):
+            self._snapshot = snapshot
+            return snapshot
+
+        def deactivate(self):
+            self._snapshot = None
+
+    async def fake_load_fingerprint():
+        return compute_schema_fingerprint(snapshot, Path(universal_migration.__file__))
+
+    async def fail_pass():
+        raise AssertionError('migration pass must be skipped')
+
+    async def fake_sync_sequences():
+        return True
+
+    data_steps = []
+
+    async def fake_data_steps():
+        data_steps.append(True)
+        return data_steps_ok
+
+    monkeypatch.setattr(universal_migration, '_run_data_steps', fake_data_steps)
+    monkeypatch.setattr(universal_migration, '_schema_tracker', _Tracker(engine=None))
+    monkeypatch.setattr(universal_migration, '_load_schema_fingerprint', fake_load_fingerprint)
+    monkeypatch.setattr(universal_migration, '_run_migration_pass', fail_pass)
+    monkeypatch.setattr(universal_migration, 'sync_postgres_sequences', fake_sync_sequences)
+
+    assert await universal_migration.run_universal_migration() is data_steps_ok
+
+    report = universal_migration.get_last_migration_report()
+    assert report.skipped
+    # Ошибка шагов данных не теряется, даже когда проход по схеме пропущен
+    assert report.success is data_steps_ok
+    # Шаги, зависящие от настроек и данных, не пропускаются вместе с проходом по схеме
+    assert data_steps == [True]
+
+
+async def test_data_steps_run_in_order_and_report_failures(monkeypatch):
+    calls = []
+
+    def step(name, result=True):
+        async def run():
+            calls.append(name)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return run
+
+    monkeypatch.setattr(universal_migration, 'ensure_default_web_api_token', step('token'))
+    monkeypatch.setattr(universal_migration, 'migrate_discount_offer_effect_types', step('effect_types'))
+    monkeypatch.setattr(universal_migration, 'reset_discount_offer_bonuses', step('bonuses', False))
+    monkeypatch.setattr(universal_migration, 'migrate_existing_user_promo_groups_data', step('promo_data'))
+    monkeypatch.setattr(universal_migration, 'ensure_promo_groups_setup', step('promo_groups', RuntimeError('db')))
+    monkeypatch.setattr(universal_migration, 'ensure_server_promo_groups_setup', step('server_promo_groups'))
+    monkeypatch.setattr(universal_migration, '_backfill_user_spending_stats', step('spending'))
+    monkeypatch.setattr(universal_migration, 'fix_subscription_duplicates_universal', step('duplicates', 0))
+
+    assert await universal_migration._run_data_steps() is False
+    assert calls == [
+        'token',
+        'effect_types',
+        'bonuses',
+        'promo_data',
+        'promo_groups',
+        'server_promo_groups',
+        'spending',
+        'duplicates',
+    ]
@@ -0,0 +1,202 @@
+import asyncio
+import fnmatch
+
+import pytest
+
+from app.config import settings
+from app.utils.cache import CacheService, LocalLRUCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.commands: list[str] = []
+
+    async def get(self, key):
+        self.commands.append('get')
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.commands.append('set')
+        self.data[key] = value.encode()
+        return True
+
+    async def incr(self, key):
+        self.commands.append('incr')
+        value = int(self.data.get(key, b'0')) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def scan_iter(self, match='*', count=None):
+        self.commands.append('scan')
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key.encode()
+
+    async def unlink(self, *keys):
+        self.commands.append('unlink')
+        removed = 0
+        for key in keys:
+            removed += self.data.pop(key.decode(), None) is not None
+        return removed
+
+    async def keys(self, pattern):  # pragma: no cover - не должен вызываться
+        raise AssertionError('KEYS must not be used')
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def redis_client():
+    return _FakeRedis()
+
+
+@pytest.fixture
+def cache(monkeypatch, clock, redis_client):
+    monkeypatch.setattr(settings, 'CACHE_LOCAL_TTL_SECONDS', 10)
+    monkeypatch.setattr(settings, 'CACHE_LOCAL_MAX_ENTRIES', 100)
+    service = CacheService(clock=clock)
+    service.redis_client = redis_client
+    service._connected = True
+    return service
+
+
+def _loader(value, calls: list):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    return load
+
+
+def test_local_lru_evicts_least_recently_used(clock):
+    local = LocalLRUCache(2, clock=clock)
+    local.set('a', 1, 10)
+    local.set('b', 2, 10)
+    local.get('a')
+    local.set('c', 3, 10)
+
+    assert local.get('a') == 1
+    assert local.get('c') == 3
+    assert len(local) == 2
+
+    clock.now += 11
+    local.get('a')
+    local.get('c')
+    assert len(local) == 0
+
+
+async def test_local_tier_serves_repeated_reads_without_redis(cache, redis_client):
+    calls: list = []
+    assert await cache.get_or_load('countries', 'all', _loader([1, 2], calls)) == [1, 2]
+    commands_after_load = len(redis_client.commands)
+
+    for _ in range(5):
+        assert await cache.get_or_load('countries', 'all', _loader([9], calls)) == [1, 2]
+
+    assert calls == [[1, 2]]
+    assert len(redis_client.commands) == commands_after_load
+    stats = cache.get_stats()['countries']
+    assert stats['misses'] == 1
+    assert stats['local_hits'] == 5
+
+
+async def test_redis_tier_is_shared_between_processes(cache, clock, redis_client):
+    calls: list = []
+    await cache.get_or_load('countries', 'all', _loader(['de'], calls))
+
+    other = CacheService(clock=clock)
+    other.redis_client = redis_client
+    other._connected = True
+
+    assert await other.get_or_load('countries', 'all', _loader(['nl'], calls)) == ['de']
+    assert calls == [['de']]
+    assert other.get_stats()['countries']['redis_hits'] == 1
+
+
+async def test_concurrent_misses_share_one_load(cache):
+    calls: list = []
+    results = await asyncio.gather(*(cache.get_or_load('countries', 'all', _loader(['de'], calls)) for _ in range(5)))
+
+    assert calls == [['de']]
+    assert all(result == ['de'] for result in results)
+    assert cache.get_stats()['countries']['coalesced'] == 4
+
+
+async def test_invalidate_bumps_version_without_scanning(cache, redis_client):
+    calls: list = []
+    await cache.get_or_load('countries', 'all', _loader(['de'], calls))
+
+    assert await cache.invalidate('countries') == 1
+    assert await cache.get_or_load('countries', 'all', _loader(['nl'], calls)) == ['nl']
+    assert 'scan' not in redis_client.commands
+    assert redis_client.data['cache:version:countries'] == b'1'
+
+
+async def test_other_process_sees_invalidation_after_local_ttl(cache, clock, redis_client):
+    calls: list = []
+    await cache.get_or_load('countries', 'all', _loader(['de'], calls))
+
+    other = CacheService(clock=clock)
+    other.redis_client = redis_client
+    other._connected = True
+    await other.invalidate('countries')
+
+    assert await cache.get_or_load('countries', 'all', _loader(['nl'], calls)) == ['de']
+    clock.now += 11
+    assert await cache.get_or_load('countries', 'all', _loader(['nl'], calls)) == ['nl']
+
+
+async def test_works_in_process_without_redis(monkeypatch, clock):
+    monkeypatch.setattr(settings, 'CACHE_LOCAL_TTL_SECONDS', 10)
+    service = CacheService(clock=clock)
+    calls: list = []
+
+    assert await service.get_or_load('countries', 1, _loader(['de'], calls)) == ['de']
+    assert await service.get_or_load('countries', 1, _loader(['nl'], calls)) == ['de']
+    await service.invalidate('countries')
+    assert await service.get_or_load('countries', 1, _loader(['nl'], calls)) == ['nl']
+
+
+async def test_expire_callable_and_none_results(cache, redis_client):
+    async def load_none():
+        return None
+
+    assert await cache.get_or_load('countries', 'x', load_none) is None
+    assert not any(key.startswith('countries:') for key in redis_client.data)
+
+    calls: list = []
+    await cache.get_or_load('countries', 'y', _loader([], calls), expire=lambda value: 60 if not value else 300)
+    assert await cache.get_or_load('countries', 'y', _loader(['de'], calls)) == []
+
+
+async def test_loader_error_is_counted_and_not_cached(cache):
+    async def failing():
+        raise RuntimeError('db down')
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load('countries', 'all', failing)
+
+    calls: list = []
+    assert await cache.get_or_load('countries', 'all', _loader(['de'], calls)) == ['de']
+    assert cache.get_stats()['countries']['load_errors'] == 1
+
+
+async def test_delete_pattern_uses_scan(cache, redis_client):
+    redis_client.data.update({'a:1': b'1', 'a:2': b'2', 'b:1': b'3'})
+
+    assert await cache.delete_pattern('a:*') == 2
+    assert list(redis_client.data) == ['b:1']
+    assert await cache.get_keys('b:*') == ['b:1']
@@ -0,0 +1,112 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, select
+from sqlalchemy.orm import declarative_base
+
+from app.utils.pagination import (
+    InvalidCursorError,
+    KeysetColumn,
+    KeysetCursor,
+    count_rows,
+    keyset_page_callback,
+    paginate_keyset,
+    parse_keyset_page_callback,
+)
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+
+    id = Column(Integer, primary_key=True)
+    group = Column(String(10), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def db(sqlite_session, sqlite_db):
+    Base.metadata.create_all(sqlite_session.bind)
+    started = datetime(2026, 1, 1, tzinfo=UTC)
+    sqlite_session.add_all(
+        Item(id=index, group='a' if index % 2 else 'b', created_at=started + timedelta(minutes=index // 3))
+        for index in range(1, 24)
+    )
+    sqlite_session.commit()
+    return sqlite_db
+
+
+async def _walk(db, order_by, limit):
+    pages = []
+    cursor = None
+    while True:
+        page = await paginate_keyset(db, select(Item), order_by, limit=limit, cursor=cursor)
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+
+async def test_forward_walk_returns_every_row_once(db):
+    order_by = [KeysetColumn(Item.created_at, descending=True), KeysetColumn(Item.id, descending=True)]
+    pages = await _walk(db, order_by, limit=5)
+
+    ids = [item.id for page in pages for item in page.items]
+    assert ids == sorted(range(1, 24), key=lambda index: (index // 3, index), reverse=True)
+    assert [len(page.items) for page in pages] == [5, 5, 5, 5, 3]
+    assert not pages[0].has_prev
+    assert all(page.has_prev for page in pages[1:])
+
+
+async def test_backward_cursor_returns_previous_page(db):
+    order_by = [KeysetColumn(Item.id, descending=True)]
+    pages = await _walk(db, order_by, limit=4)
+
+    previous = await paginate_keyset(db, select(Item), order_by, limit=4, cursor=pages[2].prev_cursor)
+
+    assert [item.id for item in previous.items] == [item.id for item in pages[1].items]
+    assert previous.has_next
+
+
+async def test_mixed_directions_use_expanded_condition(db):
+    order_by = [KeysetColumn(Item.group), KeysetColumn(Item.id, descending=True)]
+    pages = await _walk(db, order_by, limit=7)
+
+    ids = [item.id for page in pages for item in page.items]
+    odd = sorted((index for index in range(1, 24) if index % 2), reverse=True)
+    even = sorted((index for index in range(1, 24) if not index % 2), reverse=True)
+    assert ids == odd + even
+
+
+async def test_cursor_for_other_ordering_is_rejected(db):
+    page = await paginate_keyset(db, select(Item), [KeysetColumn(Item.id, descending=True)], limit=3)
+
+    with pytest.raises(InvalidCursorError):
+        await paginate_keyset(db, select(Item), [KeysetColumn(Item.id)], limit=3, cursor=page.next_cursor)
+
+    with pytest.raises(InvalidCursorError):
+        KeysetCursor.decode('not-a-cursor')
+
+
+async def test_cursor_round_trip_keeps_datetimes():
+    moment = datetime(2026, 5, 1, 12, 30, tzinfo=UTC)
+    cursor = KeysetCursor.decode(KeysetCursor((moment, 7), backwards=True).encode())
+
+    assert cursor.values == (moment, 7)
+    assert cursor.backwards
+
+
+async def test_count_rows_is_exact_outside_postgres(db):
+    assert await count_rows(db, select(Item).where(Item.group == 'a'), estimate_table='items') == (12, False)
+
+
+def test_page_callback_round_trip():
+    page, cursor = parse_keyset_page_callback(keyset_page_callback('admin_users_list', 3, 120, backwards=True))
+
+    assert (page, cursor.values, cursor.backwards) == (3, (120,), True)
+    assert len(keyset_page_callback('admin_users_list', 9999, 2**31)) <= 64
+    # Кнопки, отправленные до перехода на курсоры, несут только номер страницы
+    assert parse_keyset_page_callback('admin_users_list_page_4') == (4, None)
+    assert parse_keyset_page_callback('admin_mon_logs') == (1, None)
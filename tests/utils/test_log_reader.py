@@ -0,0 +1,107 @@
+from app.utils.log_reader import iter_filtered_log, read_records_before, read_tail_text
+
+
+LOG_LINES = [
+    '2026-10-19 10:00:00 [info] app.main | Бот запущен',
+    '2026-10-19 10:00:01 [warning] app.services | Медленный ответ API',
+    '2026-10-19 10:00:02 [error] app.handlers | Ошибка обработки платежа',
+    'Traceback (most recent call last):',
+    '  File "app/handlers/payment.py", line 10, in handle',
+    'RuntimeError: boom',
+    '2026-10-19 10:00:03 [info] app.main | Платеж обработан',
+    '2026-10-19 10:00:04 [debug] app.main | Отладка',
+]
+
+
+def _write_log(tmp_path, lines=LOG_LINES):
+    path = tmp_path / 'bot.log'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def test_tail_text_reads_only_end_of_file(tmp_path):
+    path = _write_log(tmp_path)
+
+    text, size, truncated = read_tail_text(path, 10)
+
+    assert text == '| Отладка\n'
+    assert size == path.stat().st_size
+    assert truncated
+
+    full_text, _, full_truncated = read_tail_text(path, 100_000)
+    assert full_text == path.read_text(encoding='utf-8')
+    assert not full_truncated
+
+
+def test_pages_walk_backwards_without_gaps(tmp_path):
+    path = _write_log(tmp_path)
+
+    first = read_records_before(path, limit=2, block_size=16)
+    assert [item.level for item in first.items] == ['info', 'debug']
+    assert first.has_more
+
+    second = read_records_before(path, before=first.next_cursor, limit=2, block_size=16)
+    assert [item.level for item in second.items] == ['warning', 'error']
+    assert second.items[1].text.endswith('RuntimeError: boom')
+
+    third = read_records_before(path, before=second.next_cursor, limit=2, block_size=16)
+    assert [item.level for item in third.items] == ['info']
+    assert not third.has_more
+    assert third.next_cursor is None
+
+    raw = path.read_bytes()
+    for item in first.items + second.items + third.items:
+        assert raw[item.offset :].decode('utf-8').startswith(item.text.splitlines()[0])
+
+
+def test_filters_apply_to_whole_record(tmp_path):
+    path = _write_log(tmp_path)
+
+    errors = read_records_before(path, min_level='warning')
+    assert [item.level for item in errors.items] == ['warning', 'error']
+
+    by_traceback = read_records_before(path, contains='runtimeerror')
+    assert len(by_traceback.items) == 1
+    assert by_traceback.items[0].level == 'error'
+
+
+def test_scan_limit_stops_early_and_keeps_cursor(tmp_path):
+    lines = [f'2026-10-19 10:00:{index:02d} [info] app.main | запись {index}' for index in range(50)]
+    path = _write_log(tmp_path, lines)
+
+    page = read_records_before(path, contains='несуществующая', max_scan_bytes=500, block_size=64)
+
+    assert page.items == []
+    assert page.has_more
+    assert 0 < page.scanned_bytes <= 500 + 100
+    assert page.next_cursor == path.stat().st_size - page.scanned_bytes
+
+
+def test_line_longer_than_scan_limit_is_returned_truncated(tmp_path):
+    huge = '2026-10-19 10:00:01 [error] app.main | ' + 'x' * 5000
+    lines = ['2026-10-19 10:00:00 [info] app.main | до', huge, '2026-10-19 10:00:02 [info] app.main | после']
+    path = _write_log(tmp_path, lines)
+
+    pages = []
+    cursor = None
+    while len(pages) < 10:
+        page = read_records_before(path, before=cursor, limit=5, max_scan_bytes=500, block_size=64)
+        pages.append(page)
+        if not page.has_more:
+            break
+        assert page.next_cursor != cursor
+        cursor = page.next_cursor
+
+    items = [item for page in reversed(pages) for item in page.items]
+    assert [item.level for item in items] == ['info', 'error', 'info']
+    assert items[1].offset == len(lines[0].encode('utf-8')) + 1
+    assert huge.startswith(items[1].text)
+    assert len(items[1].text.encode('utf-8')) <= 500
+
+
+def test_filtered_stream_keeps_tracebacks(tmp_path):
+    path = _write_log(tmp_path)
+
+    content = b''.join(iter_filtered_log(path, min_level='error', chunk_size=8)).decode('utf-8')
+
+    assert content.splitlines() == LOG_LINES[2:6]
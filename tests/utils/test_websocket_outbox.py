@@ -0,0 +1,87 @@
+import asyncio
+
+from app.utils.websocket_outbox import WebSocketOutbox
+
+
+class _Socket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent: list[str] = []
+        self.closed_with: int | None = None
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str = '') -> None:
+        self.closed_with = code
+
+
+async def _drain(outbox: WebSocketOutbox) -> None:
+    for _ in range(100):
+        if outbox.depth == 0:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+
+
+async def test_outbox_sends_in_order():
+    socket = _Socket()
+    outbox = WebSocketOutbox(socket)
+    outbox.start()
+
+    for index in range(5):
+        assert outbox.offer(str(index))
+
+    await _drain(outbox)
+    outbox.close(close_socket=False)
+
+    assert socket.sent == ['0', '1', '2', '3', '4']
+    assert outbox.sent == 5
+
+
+async def test_full_outbox_drops_oldest_messages():
+    socket = _Socket()
+    outbox = WebSocketOutbox(socket, maxsize=2, max_dropped=10)
+
+    # Писатель не запущен: очередь заполняется
+    for index in range(4):
+        assert outbox.offer(str(index))
+
+    assert outbox.dropped == 2
+    outbox.start()
+    await _drain(outbox)
+    outbox.close(close_socket=False)
+
+    assert socket.sent == ['2', '3']
+
+
+async def test_stalled_client_is_disconnected():
+    socket = _Socket()
+    outbox = WebSocketOutbox(socket, maxsize=1, max_dropped=2)
+
+    assert outbox.offer('a')
+    assert outbox.offer('b')
+    assert not outbox.offer('c')
+    await asyncio.sleep(0)
+
+    assert outbox.closed
+    assert socket.closed_with == 1013
+    assert not outbox.offer('d')
+
+
+async def test_slow_socket_does_not_delay_others():
+    slow, fast = _Socket(delay=1.0), _Socket()
+    outboxes = [WebSocketOutbox(slow), WebSocketOutbox(fast)]
+    for outbox in outboxes:
+        outbox.start()
+
+    for outbox in outboxes:
+        outbox.offer('event')
+
+    await _drain(outboxes[1])
+    assert fast.sent == ['event']
+    assert slow.sent == []
+
+    for outbox in outboxes:
+        outbox.close(close_socket=False)
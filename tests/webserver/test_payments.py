@@ -504,3 +504,32 @@ async def test_cryptobot_invalid_signature(monkeypatch: pytest.MonkeyPatch) -> N
     response = await route.endpoint(request)
 
     assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_yookassa_webhook_is_queued_when_inbox_running(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'YOOKASSA_ENABLED', True, raising=False)
+
+    enqueue_mock = AsyncMock(return_value=True)
+    monkeypatch.setattr('app.webserver.payments.payment_webhook_inbox_service.accepts_events', lambda: True)
+    monkeypatch.setattr('app.webserver.payments.payment_webhook_inbox_service.enqueue', enqueue_mock)
+
+    process_mock = AsyncMock(return_value=True)
+    service = SimpleNamespace(process_yookassa_webhook=process_mock)
+
+    router = create_payment_router(DummyBot(), service)
+    assert router is not None
+
+    route = _get_route(router, settings.YOOKASSA_WEBHOOK_PATH)
+    payload = {'event': 'payment.succeeded', 'object': {'id': 'pay-1'}}
+    request = _build_request(
+        settings.YOOKASSA_WEBHOOK_PATH,
+        body=json.dumps(payload).encode('utf-8'),
+        headers={},
+    )
+
+    response = await route.endpoint(request)
+
+    assert response.status_code == 200
+    process_mock.assert_not_awaited()
+    enqueue_mock.assert_awaited_once_with('yookassa', 'process_yookassa_webhook', payload, 'payment.succeeded:pay-1')
@@ -1,13 +1,16 @@
+import asyncio
 import json
 from typing import Any
 from unittest.mock import AsyncMock
 
 import pytest
+from aiogram.types import Update
 from fastapi import HTTPException
 from starlette.requests import Request
 
 from app.config import settings
 from app.webserver.telegram import (
+    TelegramWebhookOverloadedError,
     TelegramWebhookProcessor,
     create_telegram_router,
 )
@@ -334,3 +337,95 @@ async def test_health_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
     assert payload['webhook_configured'] is True
     assert payload['queue_maxsize'] == 42
     assert payload['workers'] == 2
+
+
+def _callback_update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate(
+        {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'user'},
+                'chat_instance': 'chat',
+                'data': 'noop',
+            },
+        }
+    )
+
+
+@pytest.mark.anyio
+async def test_processor_keeps_order_per_user_and_runs_users_in_parallel() -> None:
+    bot = AsyncMock()
+    dispatcher = AsyncMock()
+    processed: list[tuple[int, int]] = []
+    active: set[int] = set()
+    overlaps: list[tuple[int, int]] = []
+
+    async def feed_update(_bot, update):
+        user_id = update.callback_query.from_user.id
+        if active:
+            overlaps.append((user_id, next(iter(active))))
+        active.add(user_id)
+        await asyncio.sleep(0.01)
+        active.discard(user_id)
+        processed.append((user_id, update.update_id))
+
+    dispatcher.feed_update = feed_update
+
+    processor = TelegramWebhookProcessor(
+        bot=bot,
+        dispatcher=dispatcher,
+        queue_maxsize=16,
+        worker_count=2,
+        enqueue_timeout=0.0,
+        shutdown_timeout=1.0,
+    )
+    await processor.start()
+    assert processor.shard_for(_callback_update(1, 10)) != processor.shard_for(_callback_update(2, 11))
+
+    for update_id in range(1, 5):
+        await processor.enqueue(_callback_update(update_id, 10))
+        await processor.enqueue(_callback_update(100 + update_id, 11))
+
+    await processor.wait_until_drained(timeout=2.0)
+
+    assert [update_id for user_id, update_id in processed if user_id == 10] == [1, 2, 3, 4]
+    assert [update_id for user_id, update_id in processed if user_id == 11] == [101, 102, 103, 104]
+    assert overlaps
+    assert all(user_id != other for user_id, other in overlaps)
+
+    metrics = processor.get_metrics()
+    assert metrics['processed'] == 8
+    assert metrics['depth'] == 0
+
+    await processor.stop()
+
+
+@pytest.mark.anyio
+async def test_saturated_shard_does_not_block_other_users() -> None:
+    bot = AsyncMock()
+    dispatcher = AsyncMock()
+    dispatcher.feed_update = AsyncMock()
+
+    processor = TelegramWebhookProcessor(
+        bot=bot,
+        dispatcher=dispatcher,
+        queue_maxsize=2,
+        worker_count=0,
+        enqueue_timeout=0.0,
+        shutdown_timeout=1.0,
+    )
+    await processor.start()
+
+    await processor.enqueue(_callback_update(1, 10))
+    await processor.enqueue(_callback_update(2, 10))
+
+    with pytest.raises(TelegramWebhookOverloadedError):
+        await processor.enqueue(_callback_update(3, 10))
+
+    metrics = processor.get_metrics()
+    assert metrics['rejected'] == 1
+    assert metrics['saturated_shards'] == 1
+    assert metrics['per_shard'][0]['depth'] == 2
+
+    await processor.stop()
@@ -0,0 +1,168 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Update
+
+from app.webserver.telegram import collect_ingress_metrics
+from app.webserver.update_stream import InMemoryUpdateStreamBackend, StreamUpdateIngress
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate(
+        {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': 1715700000,
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'user'},
+                'text': f'message {update_id}',
+            },
+        }
+    )
+
+
+def _ingress(backend, dispatcher, **overrides) -> StreamUpdateIngress:
+    options = {
+        'bot': AsyncMock(),
+        'dispatcher': dispatcher,
+        'backend': backend,
+        'stream_prefix': 'test:updates',
+        'group': 'workers',
+        'partitions': 4,
+        'consumer_index': 0,
+        'consumer_count': 1,
+        'claim_idle_seconds': 1.0,
+        'block_ms': 20,
+        'shutdown_timeout': 1.0,
+    }
+    options.update(overrides)
+    return StreamUpdateIngress(**options)
+
+
+def _recording_dispatcher(processed: list[int]) -> AsyncMock:
+    dispatcher = AsyncMock()
+
+    async def feed_update(_bot, update):
+        processed.append(update.update_id)
+
+    dispatcher.feed_update = feed_update
+    return dispatcher
+
+
+async def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError('condition not reached')
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_updates_are_processed_in_order_and_acknowledged() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    processed: list[int] = []
+    ingress = _ingress(backend, _recording_dispatcher(processed))
+    await ingress.start()
+
+    for update_id in range(1, 6):
+        await ingress.enqueue(_update(update_id, 42))
+
+    await _wait_for(lambda: len(processed) == 5)
+    await ingress.stop()
+
+    assert processed == [1, 2, 3, 4, 5]
+    stream = ingress.stream_for_partition(ingress.partition_for(_update(1, 42)))
+    assert await backend.pending_count(stream, 'workers') == 0
+    assert ingress.get_metrics()['processed'] == 5
+
+
+@pytest.mark.anyio
+async def test_unacknowledged_entries_are_redelivered_after_restart() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    processed: list[int] = []
+    ingress = _ingress(backend, _recording_dispatcher(processed))
+    stream = ingress.stream_for_partition(ingress.partition_for(_update(1, 7)))
+
+    await backend.ensure_group(stream, 'workers')
+    await backend.append(stream, {'update': _update(1, 7).model_dump_json(exclude_unset=True, by_alias=True)})
+    # Процесс забрал запись и упал, не подтвердив её
+    assert await backend.read_group(stream, 'workers', 'worker-0', start_id='>', count=10, block_ms=None)
+
+    await ingress.start()
+    await _wait_for(lambda: processed == [1])
+    await ingress.stop()
+
+    assert ingress.get_metrics()['redelivered'] == 1
+    assert await backend.pending_count(stream, 'workers') == 0
+
+
+@pytest.mark.anyio
+async def test_entries_stuck_at_dead_consumer_are_claimed() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    processed: list[int] = []
+    ingress = _ingress(backend, _recording_dispatcher(processed))
+    stream = ingress.stream_for_partition(ingress.partition_for(_update(1, 7)))
+
+    await backend.ensure_group(stream, 'workers')
+    await backend.append(stream, {'update': _update(1, 7).model_dump_json(exclude_unset=True, by_alias=True)})
+    await backend.read_group(stream, 'workers', 'worker-9', start_id='>', count=10, block_ms=None)
+    entry_id, (consumer, delivered_at) = next(iter(backend._pending[stream]['workers'].items()))
+    backend._pending[stream]['workers'][entry_id] = (consumer, delivered_at - 5)
+
+    await ingress.start()
+    await _wait_for(lambda: processed == [1])
+    await ingress.stop()
+
+
+@pytest.mark.anyio
+async def test_partitions_are_split_between_processes() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    dispatcher = _recording_dispatcher([])
+
+    first = _ingress(backend, dispatcher, consumer_index=0, consumer_count=2)
+    second = _ingress(backend, dispatcher, consumer_index=1, consumer_count=2)
+
+    assert first.owned_partitions == [0, 2]
+    assert second.owned_partitions == [1, 3]
+
+
+@pytest.mark.anyio
+async def test_handler_error_is_acknowledged_and_does_not_block_partition() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    processed: list[int] = []
+    dispatcher = AsyncMock()
+
+    async def feed_update(_bot, update):
+        if update.update_id == 1:
+            raise RuntimeError('boom')
+        processed.append(update.update_id)
+
+    dispatcher.feed_update = feed_update
+    ingress = _ingress(backend, dispatcher)
+    await ingress.start()
+
+    await ingress.enqueue(_update(1, 5))
+    await ingress.enqueue(_update(2, 5))
+
+    await _wait_for(lambda: processed == [2])
+    await ingress.stop()
+
+    assert ingress.get_metrics()['failed'] == 1
+
+
+@pytest.mark.anyio
+async def test_health_reports_stream_length_and_pending() -> None:
+    backend = InMemoryUpdateStreamBackend()
+    ingress = _ingress(backend, _recording_dispatcher([]))
+    stream = ingress.stream_for_partition(ingress.partition_for(_update(1, 7)))
+
+    await backend.ensure_group(stream, 'workers')
+    await backend.append(stream, {'update': _update(1, 7).model_dump_json(exclude_unset=True, by_alias=True)})
+    await backend.read_group(stream, 'workers', 'worker-9', start_id='>', count=10, block_ms=None)
+
+    metrics = await collect_ingress_metrics(ingress)
+
+    assert metrics['mode'] == 'redis_stream'
+    assert {'partition': ingress.partition_for(_update(1, 7)), 'length': 1, 'pending': 1} in metrics['per_partition']